@@ -15,6 +15,7 @@ from .routers.router_cs25_needs_panel import router as cs25_needs_panel_router
 
 from src.graphs.cs25_graph.agent_langgraph.agent_langgraph_v2 import init_runtime as init_agent_runtime
 from src.graphs.cs25_graph.agent_langgraph.needs_panel_langgraph_v1 import init_runtime as init_needs_panel_runtime
+from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import close_openai_clients
 
 from dotenv import load_dotenv, find_dotenv
 
@@ -91,6 +92,9 @@ async def lifespan(app: FastAPI):
         await init_agent_runtime(mem_store, mem_checkpointer)
         await init_needs_panel_runtime(mem_store, mem_checkpointer)
         yield
+    finally:
+        # shared OpenAI connection pool: drain keep-alive connections on shutdown
+        await close_openai_clients()
 
 app = FastAPI(title="Engineer42 Agents", lifespan=lifespan)
 
@@ -2,8 +2,9 @@
 from typing import Any, Dict, Optional, AsyncGenerator, List
 import asyncio
 import json
+import uuid
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
@@ -12,6 +13,10 @@ from src.graphs.cs25_graph.agent_langgraph.agent_langgraph_v2 import (
     get_store,
     upsert_tab_context,
 )
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import cancel_run, watch_disconnect
+from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import pool_stats
+from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import scheduler_stats
+from src.graphs.cs25_graph.agent_langgraph.utils.nodes.find_relevant_sections import preview_for_tab
 
 from fastapi.encoders import jsonable_encoder
 
@@ -28,21 +33,36 @@ class RunIn(BaseModel):
         default=None,
         description="Optional tab-scoped context (e.g., selections) to persist before run",
     )
+    scan_options: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Optional per-run scan knobs (see ScanOptions); not persisted",
+    )
+    resume_run_id: Optional[str] = Field(
+        default=None,
+        description="run_id of an interrupted scan; its completed items are replayed instead of re-scanned",
+    )
 
 def _line(obj: Dict[str, Any]) -> bytes:
     # compact NDJSON line
     return (json.dumps(obj, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
 
 @router.post("/run/stream")
-async def run_agent_stream(payload: RunIn):
+async def run_agent_stream(payload: RunIn, request: Request):
+    run_id = uuid.uuid4().hex
+
     async def event_stream():
         ping_interval = 20  # seconds
         last = asyncio.get_event_loop().time()
+        # a closed tab must stop the scan, not just the response
+        watcher = asyncio.create_task(watch_disconnect(request.is_disconnected, run_id))
         try:
             async for chunk in stream_agent_response(
                 tab_id=payload.tab_id,
                 query=payload.query,
                 context=payload.context,
+                scan_options=payload.scan_options,
+                run_id=run_id,
+                resume_run_id=payload.resume_run_id,
             ):
                 yield _line(chunk)
                 last = asyncio.get_event_loop().time()
@@ -54,9 +74,13 @@ async def run_agent_stream(payload: RunIn):
                     yield _line({"type": "ping"})
                     last = now
         except asyncio.CancelledError:
-            return
+            # server-side disconnect: flag the run and let cancellation reach the graph
+            cancel_run(run_id, "disconnect")
+            raise
         except Exception as e:
             yield _line({"type": "error", "message": str(e)})
+        finally:
+            watcher.cancel()
 
     return StreamingResponse(
         event_stream(),
@@ -70,6 +94,57 @@ async def run_agent_stream(payload: RunIn):
         },
     )
 
+@router.post("/runs/{run_id}/cancel")
+async def cancel_agent_run(run_id: str):
+    """
+    Stop a live run: the graph, its in-flight LLM calls and retry sleeps are cancelled,
+    and the stream closes with a run_cancelled event carrying the usage spent so far.
+    """
+    handle = cancel_run(run_id, "client")
+    if handle is None:
+        raise HTTPException(status_code=404, detail=f"run not found or already finished: {run_id}")
+    return {"ok": True, "run_id": run_id, "usage": handle.usage()}
+
+@router.get("/diagnostics/openai_pool")
+async def openai_pool_diagnostics():
+    """Shared OpenAI connection pool: connections in use / idle, queued requests, pool wait times."""
+    return pool_stats()
+
+@router.get("/diagnostics/scheduler")
+async def scheduler_diagnostics():
+    """Shared LLM scheduler: slots in flight, waiters and tabs per priority class, average wait."""
+    return scheduler_stats()
+
+# ---------- sampling preview (estimate before a full scan) ----------
+
+class PreviewIn(BaseModel):
+    tab_id: str = Field(..., description="Frontend tab/session id (its selection is sampled)")
+    query: str = Field(..., description="Topic the full scan would run with")
+    scan_options: Optional[Dict[str, Any]] = Field(default=None, description="ScanOptions the full scan would use")
+    sample_size: int = Field(120, ge=10, le=1000, description="Traces evaluated, stratified by Subpart")
+    seed: Optional[int] = Field(default=None, description="Sampling seed (random if omitted; echoed back)")
+
+
+@router.post("/preview")
+async def preview_scan(payload: PreviewIn):
+    """
+    Evaluate a stratified sample and return the estimated relevant count (95% interval),
+    per-subpart estimates and the projected full-scan cost. Pass the returned preview_id
+    as resume_run_id to /run/stream so the sampled traces are not scanned again (reused when
+    the run keeps the tab's selection and scan options and its generated topic is this query,
+    or close to it under scan_options.speculative_reuse_similarity; reused items are flagged
+    `preview` and not checkpointed under the new run).
+    """
+    store = await get_store()
+    return await preview_for_tab(
+        store,
+        tab_id=payload.tab_id,
+        query=payload.query,
+        scan_options=payload.scan_options,
+        sample_size=payload.sample_size,
+        seed=payload.seed,
+    )
+
 # ---------- NEW: freeze / snapshot sync ----------
 
 class SnapshotRowIn(BaseModel):
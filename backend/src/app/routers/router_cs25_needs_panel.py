@@ -5,8 +5,9 @@ from typing import Any, Dict, Optional, AsyncGenerator
 import asyncio
 import json
 import time
+import uuid
 
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel, Field
@@ -16,6 +17,7 @@ from src.graphs.cs25_graph.agent_langgraph.needs_panel_langgraph_v1 import (
     stream_needs_panel_scan_response,
     get_store,  # comes from needs_panel_langgraph_v1 runtime
 )
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import cancel_run, watch_disconnect
 
 router = APIRouter(prefix="/cs25/needs_panel")
 
@@ -53,7 +55,7 @@ class NeedsPanelIn(BaseModel):
 # ----------------------- Streaming endpoint -----------------------
 
 @router.post("/run/stream")
-async def needs_panel_run_stream(req: NeedsPanelIn):
+async def needs_panel_run_stream(req: NeedsPanelIn, request: Request):
     """
     Streams NDJSON envelopes:
       { type, tab_id, payload, metadata }
@@ -63,6 +65,8 @@ async def needs_panel_run_stream(req: NeedsPanelIn):
     - optional node overrides: req.payload["node_kwargs"] (dict) -> forwarded to graph via config["configurable"]
     """
 
+    run_id = uuid.uuid4().hex
+
     async def event_stream() -> AsyncGenerator[bytes, None]:
         ping_interval = 20.0
         last_ping = asyncio.get_event_loop().time()
@@ -86,6 +90,8 @@ async def needs_panel_run_stream(req: NeedsPanelIn):
             metadata=meta,
         ))
 
+        # a closed tab must stop the scan, not just the response
+        watcher = asyncio.create_task(watch_disconnect(request.is_disconnected, run_id))
         try:
             # ✅ stream from needs_panel graph only
             async for evt in stream_needs_panel_scan_response(
@@ -94,6 +100,7 @@ async def needs_panel_run_stream(req: NeedsPanelIn):
                 payload=req.payload,
                 metadata=req.metadata,
                 node_kwargs=node_kwargs,
+                run_id=run_id,
             ):
                 etype = str(evt.get("type") or "needsPanel.event")
 
@@ -113,8 +120,10 @@ async def needs_panel_run_stream(req: NeedsPanelIn):
                     last_ping = now
 
         except asyncio.CancelledError:
-            yield _line(_envelope(type_="needsPanel.aborted", tab_id=req.tab_id, payload={}, metadata=meta))
-            return
+            # server-side disconnect: flag the run and let cancellation reach the graph
+            cancel_run(run_id, "disconnect")
+            watcher.cancel()
+            raise
         except Exception as e:
             yield _line(_envelope(
                 type_="needsPanel.error",
@@ -122,8 +131,8 @@ async def needs_panel_run_stream(req: NeedsPanelIn):
                 payload={"message": str(e)},
                 metadata=meta,
             ))
-        finally:
-            yield _line(_envelope(type_="needsPanel.runEnd", tab_id=req.tab_id, payload={}, metadata=meta))
+        watcher.cancel()
+        yield _line(_envelope(type_="needsPanel.runEnd", tab_id=req.tab_id, payload={}, metadata=meta))
 
     return StreamingResponse(
         event_stream(),
@@ -138,6 +147,15 @@ async def needs_panel_run_stream(req: NeedsPanelIn):
     )
 
 
+@router.post("/runs/{run_id}/cancel")
+async def needs_panel_cancel_run(run_id: str):
+    """Stop a live scan; the stream ends with needsPanel.cancelled (incl. usage so far)."""
+    handle = cancel_run(run_id, "client")
+    if handle is None:
+        raise HTTPException(status_code=404, detail=f"run not found or already finished: {run_id}")
+    return {"ok": True, "run_id": run_id, "usage": handle.usage()}
+
+
 # ----------------------- Optional: persist panel draft/state -----------------------
 
 @router.post("/state/sync")
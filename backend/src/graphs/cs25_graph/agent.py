@@ -1,8 +1,14 @@
 # backend/src/graphs/cs25_graph/agent.py
-import os, uuid, asyncio, time, random, json
+import uuid, asyncio, time, json
 from typing import Dict, Any, List, Optional, Tuple, Callable, AsyncGenerator
 from pydantic import BaseModel, Field
-from openai import AsyncOpenAI, APIStatusError
+
+from src.graphs.cs25_graph.agent_langgraph.utils.usage import (
+    enrich_usage_with_costs as _enrich_usage_with_costs,
+    usage_from_response, prompt_cache_key, UsageTally,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+from src.graphs.cs25_graph.agent_langgraph.utils.retry import RetryPolicy
 
 # ------------------ Agent (async, structured output) ------------------
 class AgentInputs(BaseModel):
@@ -18,7 +24,7 @@ class RelevanceResult(BaseModel):
 class AsyncAgent:
     def __init__(self, model, api_key: Optional[str] = None):
         self.model = model
-        self.client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.client = get_async_openai(api_key)
 
     async def run(self, query: str, inputs: AgentInputs) -> Dict[str, Any]:
         """
@@ -55,6 +61,7 @@ Important:
 - NEVER mention or expose the internal classification labels (e.g., normative_requirement, scope_setter, condition_clause, etc.) in your output.
 - Use them only to guide your reasoning about relevance.
 """)
+        # shared prefix first (system + query, byte-identical for the whole scan), trace last
         user_content = f"""
 <USER_QUERY>
 {query}
@@ -72,19 +79,17 @@ Important:
         #{inputs.cites_block or ""}
         #</CITATIONS>
         # print(user_content)
+        t0 = time.time()
         resp = await self.client.responses.parse(
             model=self.model,
             input=[{"role": "system", "content": system},
                    {"role": "user", "content": user_content}],
             text_format=RelevanceResult,  # enforce schema
+            prompt_cache_key=prompt_cache_key(system, query),
         )
         # Convert parsed pydantic obj to plain dict (works v1/v2)
         parsed = resp.output_parsed.model_dump() if hasattr(resp.output_parsed, "model_dump") else resp.output_parsed.dict()
-        usage = {
-            "input_tokens":  resp.usage.input_tokens,
-            "output_tokens": resp.usage.output_tokens,
-            "total_tokens":  resp.usage.total_tokens,
-        }
+        usage = usage_from_response(resp, latency_s=time.time() - t0)
         return {
             "run_id": f"filter-{uuid.uuid4().hex[:8]}",
             "response": parsed,   # <- no schema keys hard-coded
@@ -106,50 +111,17 @@ def iter_trace_nodes(G) -> List[Dict[str, Any]]:
 def chunked(items: List[Any], size: int) -> List[List[Any]]:
     return [items[i:i+size] for i in range(0, len(items), size)]
 
-# ------------------ Cost helper (no schema dependence) ------------------
-def _enrich_usage_with_costs(usage: Dict[str, Any], pricing_per_million: Tuple[float, float]) -> Dict[str, Any]:
-    u = dict(usage or {})
-    pin, pout = pricing_per_million
-    in_tok  = int(u.get("input_tokens", 0) or 0)
-    out_tok = int(u.get("output_tokens", 0) or 0)
-    total   = int(u.get("total_tokens", in_tok + out_tok) or (in_tok + out_tok))
-    in_cost  = (in_tok  / 1_000_000.0) * pin
-    out_cost = (out_tok / 1_000_000.0) * pout
-    u.update({
-        "input_tokens": in_tok,
-        "output_tokens": out_tok,
-        "total_tokens": total,
-        "input_cost": in_cost,
-        "output_cost": out_cost,
-        "total_cost": in_cost + out_cost,
-    })
-    return u
-
 # ------------------ Retry wrapper (always returns the SAME envelope) ----------
-async def _call_with_retry(agent: AsyncAgent, query: str, payload: AgentInputs, *, max_retries=5) -> Dict[str, Any]:
+async def _call_with_retry(agent: AsyncAgent, query: str, payload: AgentInputs, *, retry: Optional[RetryPolicy] = None) -> Dict[str, Any]:
     """
     Always returns:
       { run_id, response: <dict>, usage: {input_tokens, output_tokens, total_tokens} }
     On error, response={'error': '...'}, usage=0s — no schema keys are referenced.
     """
-    delay = 0.6
-    for attempt in range(max_retries):
-        try:
-            return await agent.run(query, payload)
-        except APIStatusError as e:
-            code = getattr(e, "status_code", 0)
-            retryable = code in (429, 500, 502, 503, 504)
-            if retryable and attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            break
-        except Exception:
-            if attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            break
+    try:
+        return await (retry or RetryPolicy()).call(lambda: agent.run(query, payload))
+    except Exception:
+        pass
     # unified error envelope:
     return {
         "run_id": f"filter-{uuid.uuid4().hex[:8]}",
@@ -178,9 +150,7 @@ async def _stream_batch_parallel(
     t0 = time.time()
     total = len(batch_items)
     done = 0
-    batch_in_tokens = 0
-    batch_out_tokens = 0
-    pin, pout = pricing_per_million
+    tally = UsageTally()
 
     yield {"type": "batch_start", "ts": time.time(), "size": total}
 
@@ -227,9 +197,7 @@ async def _stream_batch_parallel(
 
     for fut in asyncio.as_completed(tasks):
         item_obj = await fut
-        u = item_obj.get("usage") or {}
-        batch_in_tokens  += int(u.get("input_tokens", 0) or 0)
-        batch_out_tokens += int(u.get("output_tokens", 0) or 0)
+        tally.add(item_obj.get("usage") or {})
         done += 1
 
         # emit the actual result right away
@@ -247,9 +215,11 @@ async def _stream_batch_parallel(
             "ts": time.time(),
             "done": done,
             "total": total,
-            "tokens_in": batch_in_tokens,
-            "tokens_out": batch_out_tokens,
-            "batch_cost": (batch_in_tokens/1e6)*pin + (batch_out_tokens/1e6)*pout,
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
+            "batch_cost": tally.cost,
+            "cache": tally.cache(),
             "elapsed_s": time.time() - t0,
         }
 
@@ -258,9 +228,11 @@ async def _stream_batch_parallel(
         "type": "batch_end",
         "ts": time.time(),
         "elapsed_s": elapsed,
-        "tokens_in": batch_in_tokens,
-        "tokens_out": batch_out_tokens,
-        "batch_cost": (batch_in_tokens/1e6)*pin + (batch_out_tokens/1e6)*pout,
+        "tokens_in": tally.tokens_in,
+        "tokens_out": tally.tokens_out,
+        "tokens_cached": tally.tokens_cached,
+        "batch_cost": tally.cost,
+        "cache": tally.cache(),
         "size": total,
     }
 
@@ -307,8 +279,7 @@ async def stream_all_traces(
     }
 
     agent = AsyncAgent(model=model)
-    total_in_tokens = 0
-    total_out_tokens = 0
+    tally = UsageTally()
 
     for i, batch in enumerate(batches, start=1):
         yield {"type": "batch_header", "index": i, "of": num_batches, "size": len(batch), "ts": time.time()}
@@ -322,11 +293,8 @@ async def stream_all_traces(
         ):
             yield evt
             if evt["type"] == "item_done":
-                u = (evt.get("item") or {}).get("usage") or {}
-                total_in_tokens  += int(u.get("input_tokens", 0) or 0)
-                total_out_tokens += int(u.get("output_tokens", 0) or 0)
+                tally.add((evt.get("item") or {}).get("usage") or {})
 
-    grand_cost = (total_in_tokens/1e6)*pricing_per_million[0] + (total_out_tokens/1e6)*pricing_per_million[1]
     yield {
         "type": "run_end",
         "ts": time.time(),
@@ -336,10 +304,12 @@ async def stream_all_traces(
             "total_traces": total_traces,
             "batch_size_parallelism": batch_size,
             "num_batches": num_batches,
-            "tokens_in": total_in_tokens,
-            "tokens_out": total_out_tokens,
-            "estimated_cost": grand_cost,
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
+            "estimated_cost": tally.cost,
             "pricing_per_million": {"input_usd": pricing_per_million[0], "output_usd": pricing_per_million[1]},
+            "cache": tally.cache(),
         },
     }
 
@@ -35,6 +35,8 @@ from langchain_core.messages import BaseMessage, AIMessage, AIMessageChunk, Tool
 
 from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
 from src.graphs.cs25_graph.agent_langgraph.utils.progress_bus import register as pb_register, unregister as pb_unregister
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import open_run, close_run
+from src.graphs.cs25_graph.agent_langgraph.utils.speculation import discard_speculation
 
 
 from langgraph.graph import StateGraph, START, END
@@ -157,13 +159,28 @@ async def get_store():
 
 
 # Merge LangGraph updates with progress events coming from nodes via an asyncio.Queue
-async def _merge_graph_and_progress(graph_async_iter, progress_q: "asyncio.Queue[Dict[str, Any]]"):
+async def _merge_graph_and_progress(
+    graph_async_iter,
+    progress_q: "asyncio.Queue[Dict[str, Any]]",
+    cancelled: Optional[asyncio.Event] = None,
+):
     ait = graph_async_iter.__aiter__()
     t_graph = asyncio.create_task(ait.__anext__())
     t_prog  = asyncio.create_task(progress_q.get())
+    # run cancellation (client disconnect / cancel endpoint) → ("cancelled", reason)
+    t_cancel = asyncio.create_task(cancelled.wait()) if cancelled is not None else None
     try:
         while True:
-            done, _ = await asyncio.wait({t_graph, t_prog}, return_when=asyncio.FIRST_COMPLETED)
+            waiting = {t_graph, t_prog} | ({t_cancel} if t_cancel else set())
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+            if t_cancel is not None and t_cancel in done:
+                # stop the graph first: CancelledError reaches the running node and its LLM tasks
+                t_graph.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await t_graph
+                yield ("cancelled", None)
+                break
 
             if t_graph in done:
                 try:
@@ -188,10 +205,10 @@ async def _merge_graph_and_progress(graph_async_iter, progress_q: "asyncio.Queue
                 t_prog = asyncio.create_task(progress_q.get())
     finally:
         # cancel pending tasks cleanly
-        for t in (t_graph, t_prog):
-            if not t.done():
+        for t in (t_graph, t_prog, t_cancel):
+            if t is not None and not t.done():
                 t.cancel()
-                with contextlib.suppress(Exception):
+                with contextlib.suppress(asyncio.CancelledError, Exception):
                     await t
 
 
@@ -233,6 +250,9 @@ async def stream_agent_response(
     tab_id: str,
     query: str,
     context: Dict[str, Any] | None = None,
+    scan_options: Dict[str, Any] | None = None,
+    run_id: str | None = None,          # router-assigned so it can cancel the run on disconnect
+    resume_run_id: str | None = None,   # continue an interrupted scan from its checkpoints
 ) -> AsyncGenerator[Dict[str, Any], None]:
 
     graph = await get_agent_graph()
@@ -254,7 +274,8 @@ async def stream_agent_response(
     else:
         sink = "needs" if str(query or "").startswith("__needs_") else "agent_langgraph"
 
-    run_id = uuid.uuid4().hex
+    run_id = run_id or uuid.uuid4().hex
+    run = open_run(run_id, tab_id=tab_id, sink=sink)
 
     config = {"configurable": {"thread_id": tab_id}}
 
@@ -264,6 +285,7 @@ async def stream_agent_response(
         "tab_id": tab_id,
         "sink": sink,
         "run_id": run_id,
+        "resume_run_id": resume_run_id,
         "source": "graph",
     }
 
@@ -301,6 +323,10 @@ async def stream_agent_response(
 
         "selections_frozen": merged_ctx.get("selections_frozen"),
         "selections_frozen_at": merged_ctx.get("selections_frozen_at"),
+
+        "scan_options": scan_options or {},
+        "run_id": run_id,
+        "resume_run_id": resume_run_id,
     }
 
     assembled: list[str] = []
@@ -309,11 +335,25 @@ async def stream_agent_response(
     merged_iter = _merge_graph_and_progress(
         graph.astream(init_state, config=config, stream_mode="updates"),
         progress_q,
+        cancelled=run.cancelled,
     )
 
     try:
         async for source, payload in merged_iter:
+            if source == "cancelled":
+                print("[STREAM][cancelled]", {"reason": run.cancel_reason, "run_id": run_id, **run.usage()}, flush=True)
+                yield {
+                    "type": "run_cancelled",
+                    "reason": run.cancel_reason,
+                    "usage": run.usage(),
+                    "source": "graph",
+                    "sink": sink,
+                    "run_id": run_id,
+                }
+                break
+
             if source == "progress":
+                run.track(payload or {})
                 # debug: forwarded progress event from the bus
                 print("[STREAM][progress]", {"sink": sink, "run_id": run_id, "tab_id": tab_id, "keys": list((payload or {}).keys())}, flush=True)
                 yield {"source": "progress", **(payload or {})}
@@ -433,7 +473,7 @@ async def stream_agent_response(
                 }
             assembled.clear()
 
-        if not emitted_any:
+        if not emitted_any and not run.cancelled.is_set():
             print("[STREAM][message]", {"len": 0, "note": "no assistant message", "sink": sink, "run_id": run_id}, flush=True)
             yield {
                 "type": "message",
@@ -447,12 +487,16 @@ async def stream_agent_response(
     finally:
         if registered:
             await pb_unregister(tab_id)
-        print("[STREAM][run_end]", {"sink": sink, "run_id": run_id, "tab_id": tab_id}, flush=True)
+        await discard_speculation(run_id)   # speculative scan work the graph never took over
+        close_run(run_id)
+        print("[STREAM][run_end]", {"sink": sink, "run_id": run_id, "tab_id": tab_id, "cancelled": run.cancel_reason, **run.usage()}, flush=True)
         yield {
             "type": "run_end",
             "tab_id": tab_id,
             "source": "graph",
             "sink": sink,
             "run_id": run_id,
+            "cancelled": run.cancelled.is_set(),
+            "usage": run.usage(),
         }
 
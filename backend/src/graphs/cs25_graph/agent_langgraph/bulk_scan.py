@@ -0,0 +1,147 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/bulk_scan.py
+"""
+Bulk (batch-backend) relevance and needs scans from the command line: nightly sweeps and
+regression runs that need no browser tab. Events are written as NDJSON, with the same shapes as
+the streaming pipelines. The job id goes to stderr first, so an interrupted run is resumed with
+--job-id (only the items not delivered yet are written).
+
+  cd backend
+  python -m src.graphs.cs25_graph.agent_langgraph.bulk_scan relevance --query "heat exchanger header leaks" --out rel.ndjson
+  python -m src.graphs.cs25_graph.agent_langgraph.bulk_scan needs --query "heat exchanger header leaks" --rows-from rel.ndjson --out needs.ndjson
+  python -m src.graphs.cs25_graph.agent_langgraph.bulk_scan resume --job-id relevance-20250101T000000-abc123 --out rel.ndjson
+
+BULK_BACKEND=openai|local and BULK_JOBS_DIR choose the backend and the job store (utils/bulk_jobs.py).
+"""
+
+import sys
+import json
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional, TextIO
+
+
+def _load_lines(path: Optional[str]) -> List[str]:
+    if not path:
+        return []
+    return [ln.strip() for ln in Path(path).read_text(encoding="utf-8").splitlines() if ln.strip()]
+
+
+def needs_rows_from(path: str) -> List[Dict[str, Any]]:
+    """
+    Snapshot rows for the needs scan: a JSON list of rows ({trace_uuid, rationale, path_labels}),
+    or the NDJSON output of a relevance run (its relevant items become the rows).
+    """
+    text = Path(path).read_text(encoding="utf-8").strip()
+    if text.startswith("["):
+        rows = json.loads(text)
+    else:
+        rows = []
+        for ln in text.splitlines():
+            evt = json.loads(ln) if ln.strip() else {}
+            item = evt.get("item") or {}
+            resp = item.get("response") or {}
+            if evt.get("type") == "item_done" and resp.get("relevant") is True:
+                rows.append({"trace_uuid": item.get("trace_uuid"), "rationale": resp.get("rationale") or ""})
+    return [{**r, "relevant": True, "trace_seq": i} for i, r in enumerate(rows, start=1) if r.get("trace_uuid")]
+
+
+async def _write_events(events, out: TextIO) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    async for evt in events:
+        if evt.get("type") == "run_start":
+            print(f"[bulk] job_id {(evt.get('bulk') or {}).get('job_id')}", file=sys.stderr, flush=True)
+        elif evt.get("type") == "run_end":
+            summary = evt.get("summary") or {}
+        out.write(json.dumps(evt, ensure_ascii=False, default=str) + "\n")
+        out.flush()
+    return summary
+
+
+async def run(args: argparse.Namespace, out: TextIO) -> Dict[str, Any]:
+    from src.graphs.cs25_graph.agent_langgraph.utils.bulk_jobs import BulkJob, get_batch_backend
+    from src.graphs.cs25_graph.agent_langgraph.utils.compaction import compaction_policy
+    from src.graphs.cs25_graph.agent_langgraph.utils.scan_options import ScanOptions
+    from src.graphs.cs25_graph.agent_langgraph.utils.nodes import build_needs_table as needs
+    from src.graphs.cs25_graph.agent_langgraph.utils.nodes import find_relevant_sections as frs
+
+    options = ScanOptions.from_any(json.loads(args.scan_options or "{}"))
+    pipeline = args.command
+    backend_name = args.backend
+    if args.command == "resume":
+        job = BulkJob.load(args.job_id, args.jobs_dir)
+        pipeline = job.data.get("pipeline")
+        backend_name = backend_name or job.data.get("backend")
+    backend = get_batch_backend(backend_name)
+    common = {"backend": backend, "job_id": args.job_id, "jobs_dir": args.jobs_dir, "poll_interval": args.poll}
+
+    if pipeline == "relevance":
+        mg, ops = frs._get_runtime()
+        events = frs.stream_bulk_traces(
+            mg.G, ops,
+            query=args.query or "",
+            model=args.model or frs._SCAN_MODEL,
+            pricing_per_million=frs._SCAN_PRICING,
+            selected_trace_ids=_load_lines(args.traces) or None,
+            limit=args.limit,
+            options=options,
+            **common,
+        )
+    elif pipeline == "needs":
+        mg, ops = needs._get_runtime()
+        events = needs.stream_bulk_needs_for_snapshot(
+            snapshot_rows=needs_rows_from(args.rows_from) if args.rows_from else [],
+            G=mg.G,
+            ops=ops,
+            query=args.query or "",
+            **({"model": args.model} if args.model else {}),
+            compaction=compaction_policy(options),
+            **common,
+        )
+    else:
+        raise ValueError(f"unknown bulk pipeline: {pipeline!r}")
+    return await _write_events(events, out)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Run or resume a bulk (batch-backend) relevance / needs scan.")
+    p.add_argument("command", choices=["relevance", "needs", "resume"])
+    p.add_argument("--query", default=None, help="scan query (new jobs; a resumed job keeps its own)")
+    p.add_argument("--traces", default=None, help="relevance: file with one trace_uuid per line (default: all traces)")
+    p.add_argument("--limit", type=int, default=None, help="relevance: scan at most this many traces")
+    p.add_argument("--rows-from", default=None, help="needs: JSON list of snapshot rows, or a relevance run's NDJSON")
+    p.add_argument("--job-id", default=None, help="resume: the job to continue")
+    p.add_argument("--model", default=None)
+    p.add_argument("--scan-options", default=None, help="JSON ScanOptions (compaction applies to bulk prompts too)")
+    p.add_argument("--backend", default=None, help="openai | local (default: BULK_BACKEND, or the resumed job's)")
+    p.add_argument("--jobs-dir", default=None)
+    p.add_argument("--poll", type=float, default=30.0, help="seconds between backend polls")
+    p.add_argument("--out", default=None, help="append NDJSON events here (default: stdout)")
+    args = p.parse_args(argv)
+
+    if args.command == "resume" and not args.job_id:
+        p.error("resume requires --job-id")
+    if args.command != "resume" and args.job_id:
+        p.error("--job-id is only used with resume")
+    if args.command != "resume" and not args.query:
+        p.error(f"the {args.command} scan requires --query")
+    if args.command == "needs" and not args.rows_from:
+        p.error("the needs scan requires --rows-from")
+
+    from dotenv import load_dotenv, find_dotenv
+    load_dotenv(find_dotenv(".env"))
+
+    out = open(args.out, "a", encoding="utf-8") if args.out else sys.stdout
+    try:
+        summary = asyncio.run(run(args, out))
+    finally:
+        if args.out:
+            out.close()
+    bulk = summary.get("bulk") or {}
+    print(f"[bulk] {bulk.get('job_id')} {bulk.get('status')}: {summary.get('delivered', 0)} delivered,"
+          f" ${float(summary.get('estimated_cost') or 0.0):.4f}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -18,6 +18,7 @@ from src.graphs.cs25_graph.agent_langgraph.utils.progress_bus import (
     register as pb_register,
     unregister as pb_unregister,
 )
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import open_run, close_run
 from src.graphs.cs25_graph.agent_langgraph.utils.state import NeedsPanelScanState
 from src.graphs.cs25_graph.agent_langgraph.utils.nodes.scan_needs_panel import scan_needs_panel
 
@@ -80,13 +81,28 @@ async def get_store():
 
 
 # ---- merge helper (graph updates + progress bus events) ---------------------
-async def _merge_graph_and_progress(graph_async_iter, progress_q: "asyncio.Queue[Dict[str, Any]]"):
+async def _merge_graph_and_progress(
+    graph_async_iter,
+    progress_q: "asyncio.Queue[Dict[str, Any]]",
+    cancelled: Optional[asyncio.Event] = None,
+):
     ait = graph_async_iter.__aiter__()
     t_graph = asyncio.create_task(ait.__anext__())
     t_prog = asyncio.create_task(progress_q.get())
+    # run cancellation (client disconnect / cancel endpoint) → ("cancelled", reason)
+    t_cancel = asyncio.create_task(cancelled.wait()) if cancelled is not None else None
     try:
         while True:
-            done, _ = await asyncio.wait({t_graph, t_prog}, return_when=asyncio.FIRST_COMPLETED)
+            waiting = {t_graph, t_prog} | ({t_cancel} if t_cancel else set())
+            done, _ = await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+
+            if t_cancel is not None and t_cancel in done:
+                # stop the graph first: CancelledError reaches the running node and its LLM tasks
+                t_graph.cancel()
+                with contextlib.suppress(asyncio.CancelledError, Exception):
+                    await t_graph
+                yield ("cancelled", None)
+                break
 
             if t_graph in done:
                 try:
@@ -111,10 +127,10 @@ async def _merge_graph_and_progress(graph_async_iter, progress_q: "asyncio.Queue
                 t_prog = asyncio.create_task(progress_q.get())
 
     finally:
-        for t in (t_graph, t_prog):
-            if not t.done():
+        for t in (t_graph, t_prog, t_cancel):
+            if t is not None and not t.done():
                 t.cancel()
-                with contextlib.suppress(Exception):
+                with contextlib.suppress(asyncio.CancelledError, Exception):
                     await t
 
 
@@ -126,6 +142,7 @@ async def stream_needs_panel_scan_response(
     payload: Optional[Dict[str, Any]] = None,
     metadata: Optional[Dict[str, Any]] = None,
     node_kwargs: Optional[Dict[str, Any]] = None,  # optional overrides for scan node
+    run_id: Optional[str] = None,                  # router-assigned so it can cancel on disconnect
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Stream contract (envelope-first):
@@ -139,8 +156,9 @@ async def stream_needs_panel_scan_response(
     """
     graph = await get_needs_panel_graph()
 
-    run_id = uuid.uuid4().hex
+    run_id = run_id or uuid.uuid4().hex
     sink = "needs_panel"
+    run = open_run(run_id, tab_id=tab_id, sink=sink)
 
     base_meta = {
         "tabId": tab_id,
@@ -186,12 +204,22 @@ async def stream_needs_panel_scan_response(
             stream_mode="updates",
         ),
         progress_q,
+        cancelled=run.cancelled,
     )
 
     try:
         async for source, obj in merged_iter:
+            if source == "cancelled":
+                yield {
+                    "type": "needsPanel.cancelled",
+                    "payload": {"reason": run.cancel_reason, "usage": run.usage()},
+                    "metadata": base_meta,
+                }
+                break
+
             if source == "progress":
                 # forward node-emitted event as-is
+                run.track(obj)
                 yield obj
                 continue
 
@@ -233,9 +261,10 @@ async def stream_needs_panel_scan_response(
     finally:
         if registered:
             await pb_unregister(tab_id)
+        close_run(run_id)
 
         yield {
             "type": "needsPanel.streamEnd",
-            "payload": {},
+            "payload": {"cancelled": run.cancelled.is_set(), "usage": run.usage()},
             "metadata": base_meta,
         }
\ No newline at end of file
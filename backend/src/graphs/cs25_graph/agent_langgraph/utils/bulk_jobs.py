@@ -0,0 +1,439 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/bulk_jobs.py
+
+import os
+import io
+import json
+import time
+import uuid
+import asyncio
+from pathlib import Path
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Iterable, List, Optional, Set, Tuple, Type
+
+from pydantic import BaseModel
+
+
+# ------------------ Bulk (batch-style) LLM jobs ------------------
+#
+# Non-interactive scans (nightly sweeps, regressions) write every request to a JSONL job file,
+# hand it to a batch backend, poll, and stream results back as they land.
+#
+# Job layout (one directory per job, so a restart can pick it up again):
+#   <jobs_dir>/<job_id>/job.json         { job_id, pipeline, backend, batch_id, status, meta, ... }
+#   <jobs_dir>/<job_id>/requests.jsonl   one OpenAI batch line per item: {custom_id, method, url, body}
+#   <jobs_dir>/<job_id>/items.json       custom_id -> pipeline item (what to put back on the event)
+#   <jobs_dir>/<job_id>/delivered.txt    custom_ids already streamed to a consumer
+#
+# Backends:
+#   OpenAIBatchBackend  real /v1/batches (24h window, discounted pricing)
+#   LocalBatchBackend   file-based stand-in: processes the same JSONL in-process and writes an
+#                       output file in the batch output format; used for tests and local runs
+
+BATCH_DISCOUNT = 0.5          # batch API price vs. synchronous price
+DEFAULT_POLL_S = 30.0
+RESPONSES_URL = "/v1/responses"
+
+Handler = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def default_jobs_dir() -> Path:
+    return Path(os.getenv("BULK_JOBS_DIR", ".bulk_jobs")).resolve()
+
+
+def batch_pricing(pricing_per_million: Tuple[float, ...]) -> Tuple[float, ...]:
+    return tuple(float(p) * BATCH_DISCOUNT for p in pricing_per_million)
+
+
+# ------------------ Request / response encoding ------------------
+
+def _strictify(node: Any) -> Any:
+    if isinstance(node, dict):
+        out = {k: _strictify(v) for k, v in node.items() if k not in ("default", "title")}
+        if out.get("type") == "object" and "properties" in out:
+            out["additionalProperties"] = False
+            out["required"] = list(out["properties"].keys())
+        return out
+    if isinstance(node, list):
+        return [_strictify(v) for v in node]
+    return node
+
+
+def strict_json_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Pydantic schema → OpenAI strict json_schema (all keys required, no extra properties)."""
+    return _strictify(model.model_json_schema())
+
+
+def response_body(
+    *,
+    model: str,
+    system: str,
+    user: str,
+    text_format: Type[BaseModel],
+    prompt_cache_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """The same request responses.parse would send, as a plain /v1/responses body."""
+    body: Dict[str, Any] = {
+        "model": model,
+        "input": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user},
+        ],
+        "text": {
+            "format": {
+                "type": "json_schema",
+                "name": text_format.__name__,
+                "schema": strict_json_schema(text_format),
+                "strict": True,
+            }
+        },
+    }
+    if prompt_cache_key:
+        body["prompt_cache_key"] = prompt_cache_key
+    return body
+
+
+def parse_response_body(body: Dict[str, Any], text_format: Type[BaseModel]) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    (parsed dict | None, raw usage) from a /v1/responses result body.
+    None means the body had no parseable structured output.
+    """
+    u = (body or {}).get("usage") or {}
+    usage = {
+        "input_tokens": int(u.get("input_tokens", 0) or 0),
+        "output_tokens": int(u.get("output_tokens", 0) or 0),
+        "total_tokens": int(u.get("total_tokens", 0) or 0),
+        "cached_tokens": int(((u.get("input_tokens_details") or {}).get("cached_tokens", 0)) or 0),
+    }
+    text = body.get("output_text") if isinstance(body, dict) else None
+    if not text:
+        for out in (body or {}).get("output") or []:
+            for c in (out or {}).get("content") or []:
+                if (c or {}).get("type") == "output_text" and c.get("text"):
+                    text = c["text"]
+                    break
+            if text:
+                break
+    if not text:
+        return None, usage
+    try:
+        obj = text_format.model_validate_json(text)
+    except Exception:
+        return None, usage
+    return obj.model_dump(mode="json"), usage
+
+
+def batch_line(custom_id: str, body: Dict[str, Any]) -> Dict[str, Any]:
+    return {"custom_id": custom_id, "method": "POST", "url": RESPONSES_URL, "body": body}
+
+
+# ------------------ Backends ------------------
+
+class BatchBackend:
+    """submit a JSONL file, poll its status, read whatever output lines exist so far."""
+
+    name = "base"
+
+    async def submit(self, input_path: Path) -> str:
+        raise NotImplementedError
+
+    async def status(self, batch_id: str) -> Dict[str, Any]:
+        """{"status": "in_progress" | "completed" | "failed" | "expired" | "cancelled", ...}"""
+        raise NotImplementedError
+
+    async def read_output(self, batch_id: str) -> List[Dict[str, Any]]:
+        """Output lines available so far: {custom_id, response: {status_code, body}, error}."""
+        raise NotImplementedError
+
+
+_TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+
+class OpenAIBatchBackend(BatchBackend):
+    name = "openai"
+
+    def __init__(self, client=None, completion_window: str = "24h"):
+        if client is None:
+            from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+            client = get_async_openai()
+        self.client = client
+        self.completion_window = completion_window
+
+    async def submit(self, input_path: Path) -> str:
+        with open(input_path, "rb") as fh:
+            f = await self.client.files.create(file=fh, purpose="batch")
+        batch = await self.client.batches.create(
+            input_file_id=f.id,
+            endpoint=RESPONSES_URL,
+            completion_window=self.completion_window,
+        )
+        return batch.id
+
+    async def status(self, batch_id: str) -> Dict[str, Any]:
+        b = await self.client.batches.retrieve(batch_id)
+        counts = getattr(b, "request_counts", None)
+        return {
+            "status": b.status,
+            "completed": getattr(counts, "completed", None) if counts else None,
+            "failed": getattr(counts, "failed", None) if counts else None,
+            "total": getattr(counts, "total", None) if counts else None,
+        }
+
+    async def read_output(self, batch_id: str) -> List[Dict[str, Any]]:
+        # the batch API only exposes output once the batch is finished
+        b = await self.client.batches.retrieve(batch_id)
+        lines: List[Dict[str, Any]] = []
+        for file_id in (getattr(b, "output_file_id", None), getattr(b, "error_file_id", None)):
+            if not file_id:
+                continue
+            content = await self.client.files.content(file_id)
+            lines.extend(_read_jsonl_text(content.text))
+        return lines
+
+
+class LocalBatchBackend(BatchBackend):
+    """
+    File-based stand-in for the batch API.
+
+    <root>/<batch_id>/input.jsonl  copy of the submitted file
+    <root>/<batch_id>/output.jsonl appended as each request finishes (same shape as batch output)
+    <root>/<batch_id>/status.json  {"status": ...}
+
+    Work runs in-process; if the process restarts, the next status() call resumes the
+    requests that have no output line yet.
+    """
+
+    name = "local"
+
+    def __init__(self, root: Optional[Path] = None, handler: Optional[Handler] = None, concurrency: int = 8):
+        self.root = Path(root) if root else default_jobs_dir() / "_local_batches"
+        self.handler = handler or _openai_handler
+        self.concurrency = max(1, int(concurrency))
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def _dir(self, batch_id: str) -> Path:
+        return self.root / batch_id
+
+    async def submit(self, input_path: Path) -> str:
+        batch_id = f"localbatch_{uuid.uuid4().hex[:12]}"
+        d = self._dir(batch_id)
+        d.mkdir(parents=True, exist_ok=True)
+        (d / "input.jsonl").write_bytes(Path(input_path).read_bytes())
+        _write_json(d / "status.json", {"status": "in_progress", "created_at": time.time()})
+        self._ensure_running(batch_id)
+        return batch_id
+
+    def _ensure_running(self, batch_id: str) -> None:
+        t = self._tasks.get(batch_id)
+        if t is None or t.done():
+            self._tasks[batch_id] = asyncio.create_task(self._process(batch_id))
+
+    async def _process(self, batch_id: str) -> None:
+        d = self._dir(batch_id)
+        out_path = d / "output.jsonl"
+        if out_path.exists() and not out_path.read_bytes().endswith(b"\n") and out_path.stat().st_size:
+            with open(out_path, "a", encoding="utf-8") as fh:
+                fh.write("\n")   # terminate a line cut short by a crash before appending more
+        lines = _read_jsonl_text((d / "input.jsonl").read_text(encoding="utf-8"))
+        finished = {ln.get("custom_id") for ln in self._output(batch_id)}
+        pending = [ln for ln in lines if ln.get("custom_id") not in finished]
+        sem = asyncio.Semaphore(self.concurrency)
+        lock = asyncio.Lock()
+
+        async def run(line: Dict[str, Any]) -> None:
+            async with sem:
+                try:
+                    body = await self.handler(line.get("body") or {})
+                    out = {"custom_id": line.get("custom_id"), "response": {"status_code": 200, "body": body}, "error": None}
+                except Exception as e:
+                    out = {"custom_id": line.get("custom_id"), "response": None,
+                           "error": {"code": type(e).__name__, "message": str(e)}}
+            async with lock:
+                with open(out_path, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(out, ensure_ascii=False) + "\n")
+
+        await asyncio.gather(*[run(ln) for ln in pending])
+        _write_json(d / "status.json", {"status": "completed", "completed_at": time.time()})
+
+    def _output(self, batch_id: str) -> List[Dict[str, Any]]:
+        p = self._dir(batch_id) / "output.jsonl"
+        return _read_jsonl_text(p.read_text(encoding="utf-8")) if p.exists() else []
+
+    async def status(self, batch_id: str) -> Dict[str, Any]:
+        p = self._dir(batch_id) / "status.json"
+        if not p.exists():
+            return {"status": "failed", "error": "unknown batch"}
+        st = json.loads(p.read_text(encoding="utf-8"))
+        if st.get("status") not in _TERMINAL:
+            self._ensure_running(batch_id)  # resume after a restart
+        st["completed"] = len(self._output(batch_id))
+        return st
+
+    async def read_output(self, batch_id: str) -> List[Dict[str, Any]]:
+        return self._output(batch_id)
+
+
+async def _openai_handler(body: Dict[str, Any]) -> Dict[str, Any]:
+    from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+    resp = await get_async_openai().responses.create(**body)
+    return resp.model_dump(mode="json")
+
+
+def get_batch_backend(name: Optional[str] = None) -> BatchBackend:
+    """BULK_BACKEND=openai|local (default local, so nothing leaves the box by accident)."""
+    name = (name or os.getenv("BULK_BACKEND") or "local").strip().lower()
+    if name == "openai":
+        return OpenAIBatchBackend()
+    if name == "local":
+        return LocalBatchBackend()
+    raise ValueError(f"Unknown bulk backend: {name!r}")
+
+
+# ------------------ Job store ------------------
+
+class BulkJob:
+    def __init__(self, root: Path, data: Dict[str, Any]):
+        self.root = root
+        self.data = data
+
+    @property
+    def job_id(self) -> str:
+        return self.data["job_id"]
+
+    @property
+    def dir(self) -> Path:
+        return self.root / self.job_id
+
+    def save(self) -> None:
+        self.data["updated_at"] = time.time()
+        _write_json(self.dir / "job.json", self.data)
+
+    def items(self) -> Dict[str, Dict[str, Any]]:
+        p = self.dir / "items.json"
+        return json.loads(p.read_text(encoding="utf-8")) if p.exists() else {}
+
+    def delivered(self) -> Set[str]:
+        p = self.dir / "delivered.txt"
+        return set(p.read_text(encoding="utf-8").split()) if p.exists() else set()
+
+    def mark_delivered(self, custom_ids: Iterable[str]) -> None:
+        ids = [c for c in custom_ids if c]
+        if ids:
+            with open(self.dir / "delivered.txt", "a", encoding="utf-8") as fh:
+                fh.write("\n".join(ids) + "\n")
+
+    @classmethod
+    def create(
+        cls,
+        *,
+        pipeline: str,
+        requests: List[Tuple[str, Dict[str, Any], Dict[str, Any]]],   # (custom_id, body, item)
+        meta: Optional[Dict[str, Any]] = None,
+        jobs_dir: Optional[Path] = None,
+    ) -> "BulkJob":
+        root = Path(jobs_dir) if jobs_dir else default_jobs_dir()
+        job_id = f"{pipeline}-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        job = cls(root, {
+            "job_id": job_id,
+            "pipeline": pipeline,
+            "status": "created",
+            "batch_id": None,
+            "backend": None,
+            "count": len(requests),
+            "meta": meta or {},
+            "created_at": time.time(),
+        })
+        job.dir.mkdir(parents=True, exist_ok=True)
+        with open(job.dir / "requests.jsonl", "w", encoding="utf-8") as fh:
+            for cid, body, _ in requests:
+                fh.write(json.dumps(batch_line(cid, body), ensure_ascii=False) + "\n")
+        _write_json(job.dir / "items.json", {cid: item for cid, _, item in requests})
+        job.save()
+        return job
+
+    @classmethod
+    def load(cls, job_id: str, jobs_dir: Optional[Path] = None) -> "BulkJob":
+        root = Path(jobs_dir) if jobs_dir else default_jobs_dir()
+        p = root / job_id / "job.json"
+        if not p.exists():
+            raise FileNotFoundError(f"bulk job not found: {job_id}")
+        return cls(root, json.loads(p.read_text(encoding="utf-8")))
+
+
+async def run_bulk_job(
+    job: BulkJob,
+    backend: BatchBackend,
+    *,
+    poll_interval: float = DEFAULT_POLL_S,
+    replay: bool = False,
+) -> AsyncGenerator[Tuple[str, Dict[str, Any], Optional[Dict[str, Any]], Optional[str]], None]:
+    """
+    Submit (once) and poll a job; yields (custom_id, item, response_body | None, error | None)
+    for each result as it lands. Results already delivered before a restart are skipped
+    unless replay=True. Safe to call again with a reloaded job.
+    """
+    if not job.data.get("batch_id"):
+        job.data["batch_id"] = await backend.submit(job.dir / "requests.jsonl")
+        job.data["backend"] = backend.name
+        job.data["status"] = "submitted"
+        job.data["submitted_at"] = time.time()
+        job.save()
+
+    batch_id = job.data["batch_id"]
+    items = job.items()
+    seen: Set[str] = set() if replay else job.delivered()
+
+    while True:
+        st = await backend.status(batch_id)
+        fresh: List[str] = []
+        for line in await backend.read_output(batch_id):
+            cid = line.get("custom_id")
+            if not cid or cid in seen or cid not in items:
+                continue
+            seen.add(cid)
+            fresh.append(cid)
+            resp = line.get("response") or {}
+            err = line.get("error")
+            if err or int(resp.get("status_code", 0) or 0) != 200:
+                msg = (err or {}).get("message") if isinstance(err, dict) else None
+                yield cid, items[cid], None, msg or f"status_code={resp.get('status_code')}"
+            else:
+                yield cid, items[cid], resp.get("body") or {}, None
+        job.mark_delivered(fresh)
+
+        status = st.get("status")
+        if status in _TERMINAL:
+            # anything the backend never answered is reported once as an error
+            for cid, item in items.items():
+                if cid not in seen:
+                    seen.add(cid)
+                    job.mark_delivered([cid])
+                    yield cid, item, None, f"batch_{status}: no result"
+            job.data["status"] = status
+            job.data["finished_at"] = time.time()
+            job.save()
+            return
+
+        if job.data.get("status") != status:
+            job.data["status"] = status
+            job.save()
+        await asyncio.sleep(poll_interval)
+
+
+# ------------------ small file helpers ------------------
+
+def _read_jsonl_text(text: str) -> List[Dict[str, Any]]:
+    out: List[Dict[str, Any]] = []
+    for ln in io.StringIO(text or ""):
+        ln = ln.strip()
+        if not ln:
+            continue
+        try:
+            out.append(json.loads(ln))
+        except json.JSONDecodeError:
+            continue   # a half-written trailing line from a crash
+    return out
+
+
+def _write_json(path: Path, obj: Any) -> None:
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(json.dumps(obj, ensure_ascii=False, indent=2), encoding="utf-8")
+    os.replace(tmp, path)
@@ -0,0 +1,90 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/checkpoints.py
+
+import time
+from typing import Any, Dict, Optional
+
+
+# ------------------ Per-item scan checkpoints ------------------
+#
+# Each completed item of a fan-out scan is written to the LangGraph store (Redis in prod,
+# the in-memory store as dev fallback) under (namespace, pipeline, run_id) keyed by trace_uuid.
+# A later run started with resume_run_id loads them, replays the cached results and only sends
+# the remaining traces to the LLM. Replayed items are re-saved under the new run id, so the
+# newest run id is always the one to resume from. A preview's checkpoint ran before the topic
+# existed: the node matches it on the scan scope (traces, options) and checks its query itself.
+
+CHECKPOINT_NS = "cs25_scan_checkpoint"
+_META_KEY = "__meta__"
+_MAX_ITEMS = 100_000
+
+
+def _value(item: Any) -> Any:
+    if item is None:
+        return None
+    if isinstance(item, dict):
+        return item
+    return getattr(item, "value", None)
+
+
+class ScanCheckpoint:
+    def __init__(self, store, *, pipeline: str, run_id: Optional[str]):
+        self.store = store
+        self.pipeline = pipeline
+        self.run_id = run_id
+
+    @property
+    def enabled(self) -> bool:
+        return self.store is not None and bool(self.run_id)
+
+    @property
+    def namespace(self):
+        return (CHECKPOINT_NS, self.pipeline, self.run_id or "")
+
+    async def start(self, **meta: Any) -> None:
+        """Record what this run scans (query, model, ...) so a resume can reject a mismatched checkpoint."""
+        if not self.enabled:
+            return
+        try:
+            await self.store.aput(self.namespace, _META_KEY, {**meta, "ts": time.time()})
+        except Exception:
+            pass
+
+    async def save(self, key: Optional[str], item: Dict[str, Any]) -> None:
+        """Best-effort: a failed checkpoint write must never break the scan."""
+        if not self.enabled or not key:
+            return
+        try:
+            await self.store.aput(self.namespace, str(key), item)
+        except Exception:
+            pass
+
+    async def meta(self) -> Dict[str, Any]:
+        """What start() recorded for this run ({} when unknown)."""
+        if not self.enabled:
+            return {}
+        try:
+            return _value(await self.store.aget(self.namespace, _META_KEY)) or {}
+        except Exception:
+            return {}
+
+    async def load(self, **expect: Any) -> Dict[str, Dict[str, Any]]:
+        """
+        key -> saved item. Returns {} when the run is unknown or its recorded meta differs
+        from `expect` (e.g. the topic changed since the interrupted run).
+        """
+        if not self.enabled:
+            return {}
+        meta = await self.meta()
+        if not meta or any(meta.get(k) != v for k, v in expect.items()):
+            return {}
+        try:
+            hits = await self.store.asearch(self.namespace, query=None, limit=_MAX_ITEMS)
+        except Exception:
+            return {}
+        out: Dict[str, Dict[str, Any]] = {}
+        for h in hits or []:
+            key = getattr(h, "key", None)
+            val = _value(h)
+            if key and key != _META_KEY and isinstance(val, dict):
+                out[str(key)] = val
+        return out
@@ -0,0 +1,361 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/compaction.py
+
+import re
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from src.graphs.cs25_graph.agent_langgraph.utils.preflight import count_tokens
+
+
+# ------------------ Token-budgeted prompt compaction ------------------
+#
+# Works on the records GraphOps.build_records_for_bottom returns (intents, cites), before they are
+# rendered, so the formatters stay untouched. Each block has a token budget; while the rendered
+# block is over it, the next step of a fixed ladder is applied, cheapest information first:
+#
+#   intents:   rank + cap events -> section digest -> drop section events -> drop section summary
+#              -> drop section intent -> trace digest -> cap trace events -> cut the longest text
+#   citations: dedupe -> cap inbound fan-in per node -> drop reasons -> drop ancestor-node cites
+#              -> cap outbound per node -> one inbound cite per node
+#
+# The trace-level intent is the model's main guide, so it is the last thing touched. A digest is
+# a precomputed short summary stored on the Intent node (`digest`, built by corpus_digests.py);
+# it is only used if present.
+
+_TOKENIZER_MODEL = "gpt-4o"            # o200k_base, same family as the scan models
+_DIGEST_FIELD = "digest"
+_CUT_MARK = " …"
+_MAX_CUTS = 24
+
+
+class CompactionPolicy(NamedTuple):
+    """Hashable, so rendered blocks can be memoized per (trace, policy)."""
+    intents_tokens: int = 700
+    citations_tokens: int = 400
+    max_events: int = 4
+    max_inbound_cites: int = 6
+    use_digests: bool = True
+    prefer_section_digest: bool = False   # swap in section digests even when the block fits
+
+
+def compaction_policy(options: Any) -> Optional[CompactionPolicy]:
+    """CompactionPolicy from ScanOptions, or None when compaction is off."""
+    if not getattr(options, "compact", False):
+        return None
+    return CompactionPolicy(
+        intents_tokens=options.compact_intents_tokens,
+        citations_tokens=options.compact_citations_tokens,
+        max_events=options.compact_max_events,
+        max_inbound_cites=options.compact_max_inbound_cites,
+        use_digests=options.compact_use_digests,
+        prefer_section_digest=options.compact_prefer_section_digest,
+    )
+
+
+def _tokens(text: str) -> int:
+    return count_tokens(text, _TOKENIZER_MODEL)
+
+
+# ------------------ Event ranking ------------------
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the this to was were with
+""".split())
+
+
+def _terms(text: Any) -> set:
+    return {w for w in _WORD.findall(str(text or "").lower()) if w not in _STOP and len(w) > 2}
+
+
+def rank_events(events: List[Any], *, context: str, limit: int) -> List[Any]:
+    """
+    Keep the `limit` events that add the most terms not already in `context` (intent + summary)
+    or in a higher-ranked event; near-duplicates score ~0 and go first. Original order is kept.
+    """
+    if not isinstance(events, list) or len(events) <= limit:
+        return events
+    covered = _terms(context)
+    chosen: List[int] = []
+    remaining = list(range(len(events)))
+    while remaining and len(chosen) < limit:
+        best = max(remaining, key=lambda i: (len(_terms(events[i]) - covered), -i))
+        chosen.append(best)
+        remaining.remove(best)
+        covered |= _terms(events[best])
+    return [events[i] for i in sorted(chosen)]
+
+
+def _cut(text: Any, max_tokens: int) -> str:
+    s = str(text or "")
+    if _tokens(s) <= max_tokens:
+        return s
+    # chars-per-token of this text, then back off to a word boundary
+    keep = max(1, int(len(s) * max_tokens / max(1, _tokens(s))))
+    s = s[:keep].rsplit(" ", 1)[0]
+    return s + _CUT_MARK
+
+
+# ------------------ Intents ------------------
+
+def _copy_intents(intents: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [{**b, "intents": [dict(it) for it in (b.get("intents") or [])]} for b in (intents or [])]
+
+
+def compact_intents(
+    intents: List[Dict[str, Any]],
+    *,
+    render: Callable[[List[Dict[str, Any]]], str],
+    policy: CompactionPolicy,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    (compacted intents, report). `render` turns intents into the block exactly as the prompt
+    shows it (a partial of GraphOps.format_intents_block), so the budget is on real tokens.
+    """
+    recs = _copy_intents(intents)
+    section = [b for b in recs if b.get("ntype") == "Section"]
+    trace = [b for b in recs if b.get("ntype") != "Section"]
+    before = _tokens(render(intents))
+    report: Dict[str, Any] = {"tokens_before": before, "steps": [], "events_dropped": 0, "digests": 0}
+
+    def each(blocks, fn):
+        for b in blocks:
+            for it in b["intents"]:
+                fn(it)
+
+    def cap_events(blocks, limit):
+        def fn(it):
+            ev = it.get("events")
+            if isinstance(ev, list) and len(ev) > limit:
+                kept = rank_events(ev, context=f"{it.get('intent') or ''} {it.get('summary') or ''}", limit=limit)
+                report["events_dropped"] += len(ev) - len(kept)
+                it["events"] = kept
+        each(blocks, fn)
+
+    def use_digest(blocks):
+        def fn(it):
+            d = it.get(_DIGEST_FIELD)
+            if policy.use_digests and d:
+                it["intent"], it["summary"], it["events"] = d, None, None
+                report["digests"] += 1
+        each(blocks, fn)
+
+    def drop(blocks, field):
+        def fn(it):
+            if field == "events" and isinstance(it.get("events"), list):
+                report["events_dropped"] += len(it["events"])
+            it[field] = None
+        each(blocks, fn)
+
+    def drop_blocks(blocks):
+        for b in blocks:
+            recs.remove(b)
+        blocks.clear()
+
+    def cut_longest():
+        # last resort: halve the longest remaining text field until the block fits
+        fields = [(it, k) for b in recs for it in b["intents"] for k in ("events", "summary", "intent") if it.get(k)]
+        if not fields:
+            return False
+        it, k = max(fields, key=lambda f: len(str(f[0][f[1]])))
+        if k == "events":
+            it["events"] = it["events"][:-1] or None
+            report["events_dropped"] += 1
+            return True
+        cut = _cut(it[k], max(8, _tokens(str(it[k])) // 2))
+        if len(cut) >= len(str(it[k])):
+            return False
+        it[k] = cut
+        return True
+
+    ladder: List[Tuple[str, Callable[[], Any]]] = [
+        ("rank_events", lambda: cap_events(recs, policy.max_events)),
+        ("section_digest", lambda: use_digest(section)),
+        ("drop_section_events", lambda: drop(section, "events")),
+        ("drop_section_summary", lambda: drop(section, "summary")),
+        ("drop_section_intent", lambda: drop_blocks(section)),
+        ("trace_digest", lambda: use_digest(trace)),
+        ("cap_trace_events", lambda: cap_events(trace, 1)),
+    ]
+
+    size = before
+    if policy.prefer_section_digest:
+        use_digest(section)
+        size = _tokens(render(recs))
+        if size != before:
+            report["steps"].append("section_digest")
+    for name, step in ladder:
+        if size <= policy.intents_tokens:
+            break
+        step()
+        new = _tokens(render(recs))
+        if new != size:
+            report["steps"].append(name)
+        size = new
+    for _ in range(_MAX_CUTS):
+        if size <= policy.intents_tokens or not cut_longest():
+            break
+        size = _tokens(render(recs))
+        if "cut_text" not in report["steps"]:
+            report["steps"].append("cut_text")
+
+    report["tokens_after"] = size
+    return recs, report
+
+
+# ------------------ Citations ------------------
+
+def compact_cites(
+    cites: List[Dict[str, Any]],
+    *,
+    render: Callable[[List[Dict[str, Any]]], str],
+    policy: CompactionPolicy,
+    bottom_uuid: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """(compacted cites, report); same contract as compact_intents."""
+    recs = [{**e, "inbound_cites": list(e.get("inbound_cites") or []), "outbound_cites": list(e.get("outbound_cites") or [])}
+            for e in (cites or [])]
+    before = _tokens(render(cites))
+    report: Dict[str, Any] = {"tokens_before": before, "steps": [], "cites_dropped": 0}
+
+    def n_cites() -> int:
+        return sum(len(e["inbound_cites"]) + len(e["outbound_cites"]) for e in recs)
+
+    def dedupe():
+        for e in recs:
+            for key, end in (("inbound_cites", "ref_source"), ("outbound_cites", "ref_target")):
+                seen, out = set(), []
+                for c in e[key]:
+                    ref = c.get("ref") or {}
+                    k = (ref.get(end), ref.get("role"))
+                    if k not in seen:
+                        seen.add(k)
+                        out.append(c)
+                e[key] = out
+
+    def cap(key, limit):
+        for e in recs:
+            e[key] = e[key][:limit]
+
+    def drop_reasons():
+        for e in recs:
+            for key in ("inbound_cites", "outbound_cites"):
+                e[key] = [{**c, "ref": {**(c.get("ref") or {}), "comment": None}} for c in e[key]]
+
+    def drop_ancestors():
+        for e in recs:
+            if e.get("uuid_node") != bottom_uuid:
+                e["inbound_cites"], e["outbound_cites"] = [], []
+
+    ladder: List[Tuple[str, Callable[[], Any]]] = [
+        ("dedupe", dedupe),
+        ("cap_inbound", lambda: cap("inbound_cites", policy.max_inbound_cites)),
+        ("drop_reasons", drop_reasons),
+        ("drop_ancestor_cites", drop_ancestors),
+        ("cap_outbound", lambda: cap("outbound_cites", policy.max_inbound_cites)),
+        ("cap_inbound_hard", lambda: cap("inbound_cites", 1)),
+    ]
+    total = n_cites()
+    size = before
+    for name, step in ladder:
+        if size <= policy.citations_tokens:
+            break
+        step()
+        new = _tokens(render(recs))
+        if new != size:
+            report["steps"].append(name)
+        size = new
+
+    report["cites_dropped"] = total - n_cites()
+    report["tokens_after"] = size
+    return recs, report
+
+
+# ------------------ Rendering ------------------
+
+def render_blocks(
+    ops,
+    bundle: Dict[str, Any],
+    *,
+    policy: Optional[CompactionPolicy],
+    fields: List[str],
+    include_levels: List[str],
+    citations: bool = True,
+) -> Tuple[str, str, Optional[Dict[str, Any]]]:
+    """
+    (intents_block, citations_block, report) of one bundle; plain rendering when policy is None.
+    citations=False is for prompts that do not send the block: it is neither rendered nor
+    compacted (empty string, no "citations" report), so the run report only counts what is sent.
+    """
+    trace = bundle["trace"]
+
+    def intents_md(intents):
+        return ops.format_intents_block(trace, intents, fields=fields, include_uuids=False, include_levels=include_levels)
+
+    def cites_md(cites):
+        return ops.format_citations_block(trace, cites, include_uuids=False)
+
+    if policy is None:
+        return intents_md(bundle["intents"]), cites_md(bundle["cites"]) if citations else "", None
+    intents, ir = compact_intents(bundle["intents"], render=intents_md, policy=policy)
+    if not citations:
+        return intents_md(intents), "", {"intents": ir}
+    cites, cr = compact_cites(bundle["cites"], render=cites_md, policy=policy, bottom_uuid=bundle.get("bottom_uuid"))
+    return intents_md(intents), cites_md(cites), {"intents": ir, "citations": cr}
+
+
+# ------------------ Run-level report ------------------
+
+class CompactionTally:
+    """Size saved and what it cost in content, summed over a run's rendered prompts."""
+
+    def __init__(self, policy: Optional[CompactionPolicy]):
+        self.policy = policy
+        self.blocks = 0
+        self.compacted = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.over_budget = 0
+        self.events_dropped = 0
+        self.cites_dropped = 0
+        self.digests = 0
+        self.steps: Dict[str, int] = {}
+
+    def add(self, report: Optional[Dict[str, Any]], budget: int) -> None:
+        if not report:
+            return
+        self.blocks += 1
+        self.tokens_before += report["tokens_before"]
+        self.tokens_after += report["tokens_after"]
+        self.compacted += 1 if report["steps"] else 0
+        self.over_budget += 1 if report["tokens_after"] > budget else 0
+        self.events_dropped += report.get("events_dropped", 0)
+        self.cites_dropped += report.get("cites_dropped", 0)
+        self.digests += report.get("digests", 0)
+        for s in report["steps"]:
+            self.steps[s] = self.steps.get(s, 0) + 1
+
+    def add_payload(self, compaction: Optional[Dict[str, Any]]) -> None:
+        """Fold in the {"intents": report, "citations": report} attached to a rendered payload."""
+        if not compaction or self.policy is None:
+            return
+        self.add(compaction.get("intents"), self.policy.intents_tokens)
+        self.add(compaction.get("citations"), self.policy.citations_tokens)
+
+    def summary(self) -> Dict[str, Any]:
+        if self.policy is None:
+            return {"enabled": False}
+        return {
+            "enabled": True,
+            "policy": self.policy._asdict(),
+            "blocks": self.blocks,
+            "compacted": self.compacted,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "ratio": (self.tokens_after / self.tokens_before) if self.tokens_before else 1.0,
+            # quality side: how much content the budget cost
+            "still_over_budget": self.over_budget,
+            "events_dropped": self.events_dropped,
+            "cites_dropped": self.cites_dropped,
+            "digests_used": self.digests,
+            "steps": self.steps,   # how often each ladder step was needed
+        }
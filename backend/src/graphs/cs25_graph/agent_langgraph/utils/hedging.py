@@ -0,0 +1,155 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/hedging.py
+
+import time
+import asyncio
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, TypeVar
+
+from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import Lane
+from src.graphs.cs25_graph.agent_langgraph.utils.usage import enrich_usage_with_costs, merge_usage, usage_from_response
+
+T = TypeVar("T")
+
+
+# ------------------ Hedged requests (tail-latency cut) ------------------
+#
+# The slowest ~1% of calls decide when a wave (and the whole scan) finishes. A Hedger learns
+# the latency distribution of the current run; once a call has been in flight longer than the
+# configured percentile, it fires one duplicate and keeps whichever answer arrives first (the
+# other is cancelled). Duplicates are capped by a budget relative to the number of calls.
+# It plugs into RetryPolicy, so every attempt of every call site can be hedged; each attempt
+# takes its own scheduler slot. The losing calls' tokens are kept so the run pays for them.
+
+class Hedger:
+    def __init__(
+        self,
+        *,
+        percentile: float = 0.95,
+        budget_ratio: float = 0.05,    # duplicates allowed per call across the run
+        min_samples: int = 20,         # no hedging until the run has this many latencies
+        min_delay_s: float = 1.0,      # never hedge a call younger than this
+        window: int = 500,
+    ):
+        self.percentile = percentile
+        self.budget_ratio = budget_ratio
+        self.min_samples = min_samples
+        self.min_delay_s = min_delay_s
+        self._latencies: deque = deque(maxlen=window)
+
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0        # the duplicate answered first
+        self.usage: Dict[str, Any] = {}   # raw tokens of the calls that lost the race
+        self.estimated_losers = 0         # losers cancelled in flight (usage estimated)
+
+    def delay(self) -> Optional[float]:
+        """Current hedge threshold in seconds, or None while there are too few samples."""
+        n = len(self._latencies)
+        if n < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        idx = min(n - 1, int(self.percentile * n))
+        return max(self.min_delay_s, ordered[idx])
+
+    def _budget_left(self) -> bool:
+        return self.hedged + 1 <= self.calls * self.budget_ratio
+
+    def _record_loser(self, usage: Dict[str, Any], *, estimated: bool) -> None:
+        self.usage = merge_usage(self.usage, {k: v for k, v in usage.items() if k != "latency_s"})
+        if estimated:
+            self.estimated_losers += 1
+
+    async def run(self, fn: Callable[[], Awaitable[T]], *, lane: Optional[Lane] = None) -> T:
+        """
+        Await fn(), hedging it with a second fn() if it is slower than the learned percentile.
+        With a lane, each attempt holds its own slot and the clock starts once the primary has
+        one, so time queued in the scheduler never triggers a hedge.
+        """
+        self.calls += 1
+        started: Dict[asyncio.Future, float] = {}
+        in_slot = asyncio.Event()
+
+        def launch() -> asyncio.Future:
+            async def attempt() -> T:
+                started[task] = time.monotonic()
+                in_slot.set()
+                return await fn()
+            task = asyncio.ensure_future(attempt() if lane is None else lane.run(attempt))
+            return task
+
+        primary = launch()
+        tasks = [primary]
+        try:
+            threshold = self.delay()
+            if threshold is not None:
+                slot = asyncio.ensure_future(in_slot.wait())
+                try:
+                    await asyncio.wait({primary, slot}, return_when=asyncio.FIRST_COMPLETED)
+                finally:
+                    slot.cancel()
+                if not primary.done():
+                    done, _ = await asyncio.wait({primary}, timeout=threshold)
+                    if not done and self._budget_left():
+                        self.hedged += 1
+                        tasks.append(launch())
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                winners = [t for t in done if t.exception() is None]
+                if not winners:
+                    error = next(t.exception() for t in done)
+                    continue
+                win = primary if primary in winners else winners[0]
+                self._latencies.append(time.monotonic() - started[win])
+                if win is not primary:
+                    self.hedge_wins += 1
+                result = win.result()
+                for t in winners:
+                    if t is not win:
+                        self._record_loser(_usage_of(t.result()), estimated=False)
+                # a cancelled duplicate was still billed by the provider: estimate it as the winner's call
+                for t in pending:
+                    if t in started:
+                        self._record_loser(_usage_of(result), estimated=True)
+                return result
+            raise error  # every attempt failed: surface the last error to the retry policy
+        finally:
+            losers = [t for t in tasks if not t.done()]
+            for t in losers:
+                t.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "percentile": self.percentile,
+            "budget_ratio": self.budget_ratio,
+            "threshold_s": self.delay(),
+            "calls": self.calls,
+            "hedged_calls": self.hedged,
+            "extra_call_ratio": (self.hedged / self.calls) if self.calls else 0.0,
+            "hedge_wins": self.hedge_wins,
+            "estimated_losers": self.estimated_losers,
+        }
+
+    def usage_with_costs(self, pricing_per_million: Sequence[float]) -> Dict[str, Any]:
+        """The duplicates' extra usage, priced; nodes merge it into the run totals."""
+        return enrich_usage_with_costs(self.usage, pricing_per_million)
+
+
+def _usage_of(result: Any) -> Dict[str, Any]:
+    """Token usage of one call result: an agent envelope, a (response, latency) pair or a response."""
+    if isinstance(result, dict):
+        return dict(result.get("usage") or {})
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    return usage_from_response(result) if getattr(result, "usage", None) is not None else {}
+
+
+def hedger_for(options: Any) -> Optional[Hedger]:
+    """A fresh Hedger for one run if ScanOptions.hedge is on, else None."""
+    if not getattr(options, "hedge", False):
+        return None
+    return Hedger(percentile=options.hedge_percentile, budget_ratio=options.hedge_budget)
@@ -0,0 +1,553 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/llm_backend.py
+
+import os
+import json
+import math
+import random
+import asyncio
+import hashlib
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Type
+
+import httpx
+from openai import InternalServerError, RateLimitError
+from pydantic import BaseModel
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from src.graphs.cs25_graph.agent_langgraph.utils.packing import estimate_tokens
+
+
+# ------------------ Pluggable LLM backend (openai | mock | record | replay) ------------------
+#
+# Every pipeline gets its client from openai_clients.get_async_openai(), and only ever calls
+# responses.parse, responses.create and embeddings.create on it. LLM_BACKEND picks what sits
+# behind that surface:
+#
+#   openai  the real AsyncOpenAI client (default)
+#   mock    deterministic fake: structured outputs generated from the requested schema,
+#           lognormal latency with a heavy tail (plus an optional per-input-token term),
+#           optional 429/5xx injection. No network.
+#   record  real client, every response also written to a cassette keyed by request hash
+#   replay  answers from cassettes only; a missing cassette raises CassetteMiss
+#
+# The LangChain chat nodes (topic_llm, tool_calling_llm, ...) get their model from
+# openai_clients.get_chat_openai(): under mock and replay that is MockChatModel on the mock
+# backend, so no mode but openai/record reaches the network.
+#
+# Benchmarks and tests can also install a backend in-process with use_llm_backend().
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai").strip().lower()
+CASSETTE_DIR = os.getenv("LLM_CASSETTE_DIR", ".cassettes")
+
+MOCK_SEED = os.getenv("LLM_MOCK_SEED", "42")
+MOCK_LATENCY_MEDIAN_S = float(os.getenv("LLM_MOCK_LATENCY_MEDIAN_S", "0.8"))
+MOCK_LATENCY_SIGMA = float(os.getenv("LLM_MOCK_LATENCY_SIGMA", "0.35"))
+MOCK_TAIL_P = float(os.getenv("LLM_MOCK_TAIL_P", "0.01"))          # share of calls that hit the slow tail
+MOCK_TAIL_FACTOR = float(os.getenv("LLM_MOCK_TAIL_FACTOR", "10"))  # tail latency = base * factor
+MOCK_LATENCY_PER_1K_S = float(os.getenv("LLM_MOCK_LATENCY_PER_1K_S", "0"))  # extra latency per 1k input tokens
+MOCK_RATE_429 = float(os.getenv("LLM_MOCK_RATE_429", "0"))
+MOCK_RATE_5XX = float(os.getenv("LLM_MOCK_RATE_5XX", "0"))
+
+_EMBED_DIMS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072, "text-embedding-ada-002": 1536}
+
+
+class CassetteMiss(KeyError):
+    """Replay mode found no recorded response for a request."""
+
+
+class _Obj:
+    """Attribute view over a JSON dict, shaped like the SDK's response objects."""
+
+    def __init__(self, data: Dict[str, Any], **extra: Any):
+        self._data = data
+        for k, v in data.items():
+            setattr(self, k, _wrap(v))
+        for k, v in extra.items():
+            setattr(self, k, v)
+
+    def model_dump(self, mode: str = "python", **_: Any) -> Dict[str, Any]:
+        return dict(self._data)
+
+
+def _wrap(v: Any) -> Any:
+    if isinstance(v, dict):
+        return _Obj(v)
+    if isinstance(v, list):
+        return [_wrap(x) for x in v]
+    return v
+
+
+def request_key(op: str, kwargs: Dict[str, Any]) -> str:
+    """Stable hash of a request. prompt_cache_key is routing only, so it is left out."""
+    canon = {k: v for k, v in kwargs.items() if k not in ("prompt_cache_key", "timeout", "extra_headers")}
+    tf = canon.pop("text_format", None)
+    if tf is not None:
+        canon["text_format"] = tf.model_json_schema() if isinstance(tf, type) and issubclass(tf, BaseModel) else str(tf)
+    blob = json.dumps({"op": op, **canon}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _input_text(kwargs: Dict[str, Any]) -> str:
+    inp = kwargs.get("input")
+    if isinstance(inp, str):
+        return inp
+    return "\n".join(str((m or {}).get("content", "")) for m in (inp or []) if isinstance(m, dict))
+
+
+class LLMBackend(ABC):
+    """The slice of the AsyncOpenAI surface the pipelines use."""
+
+    name = "base"
+
+    def __init__(self):
+        self.responses = _Responses(self)
+        self.embeddings = _Embeddings(self)
+        self.calls: Dict[str, int] = {}
+
+    @abstractmethod
+    async def parse(self, **kwargs: Any) -> Any:
+        ...
+
+    @abstractmethod
+    async def create(self, **kwargs: Any) -> Any:
+        ...
+
+    @abstractmethod
+    async def embed(self, **kwargs: Any) -> Any:
+        ...
+
+    def _count(self, op: str) -> None:
+        self.calls[op] = self.calls.get(op, 0) + 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name, "calls": dict(self.calls)}
+
+
+class _Responses:
+    def __init__(self, backend: LLMBackend):
+        self._b = backend
+
+    async def parse(self, **kwargs: Any) -> Any:
+        self._b._count("responses.parse")
+        return await self._b.parse(**kwargs)
+
+    async def create(self, **kwargs: Any) -> Any:
+        self._b._count("responses.create")
+        return await self._b.create(**kwargs)
+
+
+class _Embeddings:
+    def __init__(self, backend: LLMBackend):
+        self._b = backend
+
+    async def create(self, **kwargs: Any) -> Any:
+        self._b._count("embeddings.create")
+        return await self._b.embed(**kwargs)
+
+
+# ------------------ Mock ------------------
+
+def _fake_from_schema(schema: Dict[str, Any], rng: random.Random, *, defs: Dict[str, Any], name: str, ids: List[str]) -> Any:
+    if "$ref" in schema:
+        return _fake_from_schema(defs.get(schema["$ref"].split("/")[-1], {}), rng, defs=defs, name=name, ids=ids)
+    for key in ("anyOf", "oneOf"):
+        if key in schema:
+            options = [s for s in schema[key] if s.get("type") != "null"] or schema[key]
+            return _fake_from_schema(options[0], rng, defs=defs, name=name, ids=ids)
+    if "const" in schema:
+        return schema["const"]
+    if "enum" in schema:
+        return rng.choice(schema["enum"])
+    t = schema.get("type")
+    if isinstance(t, list):
+        t = next((x for x in t if x != "null"), "null")
+    if t == "object" or "properties" in schema:
+        return {
+            k: _fake_from_schema(v, rng, defs=defs, name=k, ids=ids)
+            for k, v in (schema.get("properties") or {}).items()
+        }
+    if t == "array":
+        item_schema = schema.get("items") or {}
+        resolved = defs.get(item_schema["$ref"].split("/")[-1], {}) if "$ref" in item_schema else item_schema
+        if ids and "item_id" in (resolved.get("properties") or {}):
+            # packed output: one entry per <ITEM id="..."> in the prompt
+            return [{**_fake_from_schema(resolved, rng, defs=defs, name=name, ids=[]), "item_id": iid} for iid in ids]
+        lo = int(schema.get("minItems", 1))
+        hi = max(lo, min(int(schema.get("maxItems", 3)), 3))
+        return [_fake_from_schema(item_schema, rng, defs=defs, name=name, ids=[]) for _ in range(rng.randint(lo, hi))]
+    if t == "boolean":
+        return rng.random() < 0.5
+    if t in ("number", "integer"):
+        lo = schema.get("minimum", schema.get("exclusiveMinimum", 0))
+        hi = schema.get("maximum", schema.get("exclusiveMaximum", 1 if t == "number" else 10))
+        return round(rng.uniform(lo, hi), 3) if t == "number" else rng.randint(int(lo), int(hi))
+    if t == "string":
+        return f"mock {name} {rng.randrange(16 ** 6):06x}"
+    return None
+
+
+def fake_structured_output(schema: Dict[str, Any], rng: random.Random, *, ids: Optional[List[str]] = None) -> Dict[str, Any]:
+    """A schema-valid JSON object whose content is a deterministic function of `rng`."""
+    return _fake_from_schema(schema, rng, defs=schema.get("$defs") or {}, name="value", ids=list(ids or []))
+
+
+def _item_ids(text: str) -> List[str]:
+    out, i = [], 0
+    while True:
+        i = text.find('<ITEM id="', i)
+        if i < 0:
+            return out
+        i += len('<ITEM id="')
+        j = text.find('"', i)
+        if j < 0:
+            return out
+        out.append(text[i:j])
+        i = j
+
+
+class MockBackend(LLMBackend):
+    """
+    Deterministic fake. Output content depends only on the request hash; latency and error
+    injection depend on (request hash, attempt number), so a retried call can succeed and a
+    rerun of the same scan sees the same sequence regardless of task scheduling.
+    """
+
+    name = "mock"
+
+    def __init__(
+        self,
+        *,
+        seed: str = MOCK_SEED,
+        latency_median_s: float = MOCK_LATENCY_MEDIAN_S,
+        latency_sigma: float = MOCK_LATENCY_SIGMA,
+        tail_p: float = MOCK_TAIL_P,
+        tail_factor: float = MOCK_TAIL_FACTOR,
+        latency_per_1k_s: float = MOCK_LATENCY_PER_1K_S,
+        rate_429: float = MOCK_RATE_429,
+        rate_5xx: float = MOCK_RATE_5XX,
+        retry_after_ms: int = 500,
+    ):
+        super().__init__()
+        self.seed = str(seed)
+        self.latency_median_s = latency_median_s
+        self.latency_sigma = latency_sigma
+        self.tail_p = tail_p
+        self.tail_factor = tail_factor
+        self.latency_per_1k_s = latency_per_1k_s
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.retry_after_ms = retry_after_ms
+        self._attempts: Dict[str, int] = {}
+        self._seen_prefixes: set = set()
+        self.injected: Dict[str, int] = {"429": 0, "5xx": 0}
+
+    def _rng(self, key: str, salt: str = "") -> random.Random:
+        return random.Random(f"{self.seed}:{key}:{salt}")
+
+    async def _simulate(self, key: str, input_tokens: int = 0) -> None:
+        n = self._attempts.get(key, 0)
+        self._attempts[key] = n + 1
+        rng = self._rng(key, f"attempt{n}")
+        latency = self.latency_median_s * math.exp(rng.gauss(0.0, self.latency_sigma))
+        if rng.random() < self.tail_p:
+            latency *= self.tail_factor
+        latency += self.latency_per_1k_s * input_tokens / 1000.0  # prefill grows with the prompt
+        roll = rng.random()
+        if roll < self.rate_429:
+            await asyncio.sleep(min(latency, 0.05))
+            self.injected["429"] += 1
+            raise RateLimitError(
+                "mock rate limit",
+                response=_error_response(429, {"retry-after-ms": str(self.retry_after_ms)}),
+                body=None,
+            )
+        if roll < self.rate_429 + self.rate_5xx:
+            await asyncio.sleep(latency / 2)
+            self.injected["5xx"] += 1
+            raise InternalServerError("mock server error", response=_error_response(503, {}), body=None)
+        await asyncio.sleep(latency)
+
+    def _usage(self, kwargs: Dict[str, Any], output: str) -> Dict[str, Any]:
+        inp = kwargs.get("input")
+        system = ""
+        if isinstance(inp, list) and inp and isinstance(inp[0], dict) and inp[0].get("role") == "system":
+            system = str(inp[0].get("content") or "")
+        in_tok = estimate_tokens(_input_text(kwargs))
+        out_tok = estimate_tokens(output)
+        # prefix cache: a repeated system prompt of >= 1024 tokens is served from cache in 128-token steps
+        sys_tok = estimate_tokens(system)
+        cached = 0
+        prefix = hashlib.sha1(system.encode("utf-8")).hexdigest()
+        if sys_tok >= 1024 and prefix in self._seen_prefixes:
+            cached = min(in_tok, (sys_tok // 128) * 128)
+        self._seen_prefixes.add(prefix)
+        return {
+            "input_tokens": in_tok,
+            "output_tokens": out_tok,
+            "total_tokens": in_tok + out_tok,
+            "input_tokens_details": {"cached_tokens": cached},
+        }
+
+    def _structured(self, kwargs: Dict[str, Any], key: str, schema: Dict[str, Any]) -> Dict[str, Any]:
+        return fake_structured_output(schema, self._rng(key, "output"), ids=_item_ids(_input_text(kwargs)))
+
+    async def parse(self, **kwargs: Any) -> Any:
+        key = request_key("responses.parse", kwargs)
+        await self._simulate(key, estimate_tokens(_input_text(kwargs)))
+        text_format: Type[BaseModel] = kwargs["text_format"]
+        data = self._structured(kwargs, key, text_format.model_json_schema())
+        try:
+            parsed = text_format.model_validate(data)
+        except Exception:
+            parsed = text_format.model_construct(**data)
+        text = json.dumps(data, ensure_ascii=False)
+        body = {"id": f"resp_mock_{key[:16]}", "model": kwargs.get("model"), "output_text": text, "usage": self._usage(kwargs, text)}
+        return _Obj(body, output_parsed=parsed)
+
+    async def create(self, **kwargs: Any) -> Any:
+        key = request_key("responses.create", kwargs)
+        await self._simulate(key, estimate_tokens(_input_text(kwargs)))
+        fmt = ((kwargs.get("text") or {}).get("format") or {})
+        if fmt.get("type") == "json_schema":
+            text = json.dumps(self._structured(kwargs, key, fmt.get("schema") or {}), ensure_ascii=False)
+        else:
+            text = f"Mock answer {key[:8]}"
+        body = {
+            "id": f"resp_mock_{key[:16]}",
+            "model": kwargs.get("model"),
+            "output_text": text,
+            "output": [{"type": "message", "role": "assistant", "content": [{"type": "output_text", "text": text}]}],
+            "usage": self._usage(kwargs, text),
+        }
+        return _Obj(body)
+
+    async def embed(self, **kwargs: Any) -> Any:
+        texts = kwargs.get("input")
+        texts = [texts] if isinstance(texts, str) else list(texts or [])
+        model = kwargs.get("model") or "text-embedding-3-small"
+        await self._simulate(request_key("embeddings.create", kwargs))
+        dim = int(kwargs.get("dimensions") or _EMBED_DIMS.get(model, 1536))
+        data = []
+        for i, t in enumerate(texts):
+            rng = self._rng(hashlib.sha1(f"{model}:{t}".encode("utf-8")).hexdigest(), "embed")
+            v = [rng.gauss(0.0, 1.0) for _ in range(dim)]
+            norm = math.sqrt(sum(x * x for x in v)) or 1.0
+            data.append({"object": "embedding", "index": i, "embedding": [x / norm for x in v]})
+        tokens = sum(estimate_tokens(t) for t in texts)
+        return _Obj({"object": "list", "model": model, "data": data, "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "injected": dict(self.injected)}
+
+
+def _error_response(status: int, headers: Dict[str, str]) -> httpx.Response:
+    return httpx.Response(status, headers=headers, request=httpx.Request("POST", "https://mock.invalid/v1/responses"))
+
+
+# ------------------ Mock chat model (LangChain nodes) ------------------
+
+_CHAT_ROLES = {"human": "user", "ai": "assistant", "system": "system", "tool": "tool"}
+
+
+class MockChatModel(BaseChatModel):
+    """
+    Chat model answering from a MockBackend, keyed and priced like a Responses call with the
+    same messages (as the mock server's /v1/chat/completions does). bind_tools is accepted,
+    but the mock never calls a tool, so tool-routing nodes take their no-tool branch.
+    """
+
+    backend: Any = None
+    model_name: str = "gpt-4o"
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock-chat"
+
+    def bind_tools(self, tools: Any, **kwargs: Any) -> "MockChatModel":
+        return self
+
+    async def _agenerate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        resp = await self.backend.responses.create(
+            model=self.model_name,
+            input=[{"role": _CHAT_ROLES.get(m.type, m.type), "content": m.content} for m in messages],
+        )
+        usage = resp.model_dump().get("usage") or {}
+        message = AIMessage(
+            content=resp.output_text,
+            usage_metadata={
+                "input_tokens": usage.get("input_tokens", 0),
+                "output_tokens": usage.get("output_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            },
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Any = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        # sync invoke may come from inside a running loop (the nodes call llm.invoke in async defs):
+        # run the call on its own loop and block, as the real client's sync path would
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self._agenerate(messages, stop=stop, **kwargs)).result()
+
+
+# ------------------ Record / replay ------------------
+
+class CassetteBackend(LLMBackend):
+    """
+    <dir>/<op>/<key[:2]>/<key>.json holds one recorded response. In record mode every call
+    goes to `inner` and is saved; in replay mode nothing leaves the process.
+    """
+
+    def __init__(self, *, mode: str, directory: str = CASSETTE_DIR, inner: Any = None):
+        super().__init__()
+        if mode not in ("record", "replay"):
+            raise ValueError(f"unknown cassette mode: {mode}")
+        if mode == "record" and inner is None:
+            raise ValueError("record mode needs a real client")
+        self.name = mode
+        self.mode = mode
+        self.root = Path(directory)
+        self.inner = inner
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def _path(self, op: str, key: str) -> Path:
+        return self.root / op / key[:2] / f"{key}.json"
+
+    def _load(self, op: str, key: str) -> Optional[Dict[str, Any]]:
+        p = self._path(op, key)
+        if not p.exists():
+            return None
+        try:
+            return json.loads(p.read_text(encoding="utf-8"))
+        except Exception:
+            return None
+
+    def _save(self, op: str, key: str, record: Dict[str, Any]) -> None:
+        p = self._path(op, key)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        tmp = p.with_suffix(".tmp")
+        tmp.write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+        tmp.replace(p)
+        self.recorded += 1
+
+    async def _call(self, op: str, kwargs: Dict[str, Any], real: Callable[[], Any]) -> Dict[str, Any]:
+        key = request_key(op, kwargs)
+        if self.mode == "replay":
+            rec = self._load(op, key)
+            if rec is None:
+                self.misses += 1
+                raise CassetteMiss(f"no cassette for {op} {key[:12]} under {self.root}")
+            self.hits += 1
+            return rec
+        resp = await real()
+        rec = {
+            "op": op,
+            "model": kwargs.get("model"),
+            "response": resp.model_dump(mode="json"),
+            "output_text": getattr(resp, "output_text", None) if op != "embeddings.create" else None,
+        }
+        parsed = getattr(resp, "output_parsed", None)
+        if parsed is not None:
+            rec["parsed"] = parsed.model_dump(mode="json") if hasattr(parsed, "model_dump") else parsed
+        self._save(op, key, rec)
+        rec["_live"] = resp
+        return rec
+
+    async def parse(self, **kwargs: Any) -> Any:
+        rec = await self._call("responses.parse", kwargs, lambda: self.inner.responses.parse(**kwargs))
+        if "_live" in rec:
+            return rec["_live"]
+        text_format: Type[BaseModel] = kwargs["text_format"]
+        parsed = text_format.model_validate(rec["parsed"]) if rec.get("parsed") is not None else None
+        return _Obj({**rec["response"], "output_text": rec.get("output_text")}, output_parsed=parsed)
+
+    async def create(self, **kwargs: Any) -> Any:
+        rec = await self._call("responses.create", kwargs, lambda: self.inner.responses.create(**kwargs))
+        if "_live" in rec:
+            return rec["_live"]
+        return _Obj({**rec["response"], "output_text": rec.get("output_text")})
+
+    async def embed(self, **kwargs: Any) -> Any:
+        rec = await self._call("embeddings.create", kwargs, lambda: self.inner.embeddings.create(**kwargs))
+        if "_live" in rec:
+            return rec["_live"]
+        return _Obj(rec["response"])
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "dir": str(self.root), "hits": self.hits, "misses": self.misses, "recorded": self.recorded}
+
+
+# ------------------ Selection ------------------
+
+_override: Optional[LLMBackend] = None
+_shared: Dict[str, LLMBackend] = {}
+
+
+def use_llm_backend(backend: Optional[LLMBackend]) -> None:
+    """Install a backend for the whole process (benchmarks, tests); None restores LLM_BACKEND."""
+    global _override
+    _override = backend
+
+
+def backend_stats() -> Dict[str, Any]:
+    if _override is not None:
+        return _override.stats()
+    b = _shared.get(LLM_BACKEND)
+    return b.stats() if b is not None else {"backend": LLM_BACKEND or "openai"}
+
+
+def _shared_mock() -> MockBackend:
+    if "mock" not in _shared:
+        _shared["mock"] = MockBackend()
+    return _shared["mock"]
+
+
+def chat_mock_backend() -> Optional[MockBackend]:
+    """
+    The backend the chat nodes should answer from, or None for the real ChatOpenAI.
+    Cassettes only hold Responses/embeddings calls, so replay answers chat from the mock.
+    """
+    if _override is not None:
+        return _override if isinstance(_override, MockBackend) else None
+    if LLM_BACKEND in ("mock", "replay"):
+        return _shared_mock()
+    return None
+
+
+def make_backend(real_factory: Callable[[], Any]) -> Any:
+    """
+    The client get_async_openai() should hand out. `real_factory` builds the real pooled
+    AsyncOpenAI and is only called for the modes that need the network.
+    """
+    if _override is not None:
+        return _override
+    if LLM_BACKEND in ("", "openai"):
+        return real_factory()
+    if LLM_BACKEND == "mock":
+        return _shared_mock()
+    if LLM_BACKEND == "replay":
+        if "replay" not in _shared:
+            _shared["replay"] = CassetteBackend(mode="replay")
+        return _shared["replay"]
+    if LLM_BACKEND == "record":
+        if "record" not in _shared:
+            _shared["record"] = CassetteBackend(mode="record", inner=real_factory())
+        return _shared["record"]
+    raise ValueError(f"unknown LLM_BACKEND: {LLM_BACKEND}")
@@ -1,20 +1,45 @@
 # backend/src/graphs/cs25_graph/agent_langgraph/utils/nodes/build_needs_table.py
 
-import os
 import uuid
 import time
 import json
 import asyncio
-import random
 import hashlib
+from functools import lru_cache
 from typing import Dict, Any, List, Optional, Tuple, AsyncGenerator
 
 from pydantic import BaseModel, Field
-from openai import AsyncOpenAI, APIStatusError
+from openai import AsyncOpenAI
 from langchain_core.messages import AIMessage
 
 from src.graphs.cs25_graph.utils import ManifestGraph, GraphOps
 from src.graphs.cs25_graph.agent_langgraph.utils.progress_bus import emit as bus_emit
+from src.graphs.cs25_graph.agent_langgraph.utils.scan_options import ScanOptions
+from src.graphs.cs25_graph.agent_langgraph.utils.checkpoints import ScanCheckpoint
+from src.graphs.cs25_graph.agent_langgraph.utils.hedging import Hedger, hedger_for
+from src.graphs.cs25_graph.agent_langgraph.utils.retry import RetryPolicy, error_kind
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import cancel_tasks
+from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import Lane, lane_for, report_queue, MAX_INFLIGHT
+from src.graphs.cs25_graph.agent_langgraph.utils.compaction import (
+    CompactionPolicy, CompactionTally, compaction_policy, render_blocks,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.preflight import (
+    BudgetGuard, PreflightEstimator, budget_for, observe_run, project_run,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+from src.graphs.cs25_graph.agent_langgraph.utils.single_flight import coalesce, scan_fingerprint
+from src.graphs.cs25_graph.agent_langgraph.utils.usage import (
+    enrich_usage_with_costs as _enrich_usage_with_costs,
+    merge_usage as _merge_usage,
+    pricing_summary, usage_from_response, prompt_cache_key, UsageTally,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.bulk_jobs import (
+    BatchBackend, BulkJob, DEFAULT_POLL_S, batch_pricing, get_batch_backend,
+    parse_response_body, response_body, run_bulk_job,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.packing import (
+    estimate_tokens, pack_by_token_budget, packed_output_model, unpack_results, split_usage,
+)
 
 
 # ------------------ Stable IDs ------------------
@@ -33,6 +58,7 @@ class AgentInputs(BaseModel):
     cites_block: str
     intents_block: str
     paragraph_name: str
+    compaction: Optional[Dict[str, Any]] = None   # per-block report when rendered under a CompactionPolicy
 
 
 class Need(BaseModel):
@@ -50,17 +76,14 @@ class NeedsOutput(BaseModel):
     needs: List[Need] = Field(description="Zero, one, or multiple needs derived from intent.")
 
 
-class AsyncAgent:
-    def __init__(self, model: str, client: AsyncOpenAI):
-        self.model = model
-        self.client = client
-
-    async def run(self, query: str, inputs: AgentInputs) -> Dict[str, Any]:
-        system = f"""
+def _needs_prompt(query: str, inputs: AgentInputs) -> Tuple[str, str]:
+    # static system prompt: the paragraph name moved to the user message so the
+    # system + query prefix is byte-identical for every trace of a run (prefix caching)
+    system = """
 You are an expert aircraft certification engineer specialising in CS-25 and translating regulatory intent into engineering needs.
 
 Task:
-Extract ENGINEERING NEED STATEMENTS from the provided regulatory intent and trace structure for the bottom paragraph: <<{inputs.paragraph_name}>>
+Extract ENGINEERING NEED STATEMENTS from the provided regulatory intent and trace structure for the BOTTOM_PARAGRAPH named in the input.
 
 A “need” is:
 - a statement of what must be true for compliance
@@ -92,11 +115,15 @@ Output:
 Return JSON matching the schema exactly.
 """
 
-        user_content = f"""
+    user_content = f"""
 <USER_QUERY>
 {query}
 </USER_QUERY>
 
+<BOTTOM_PARAGRAPH>
+{inputs.paragraph_name}
+</BOTTOM_PARAGRAPH>
+
 **INPUT TRACES for {inputs.paragraph_name}:** 
 
 <TRACE>
@@ -107,9 +134,21 @@ Return JSON matching the schema exactly.
 {inputs.intents_block or ""}
 </INTENTS>
 """
+    return system, user_content
+
+
+class AsyncAgent:
+    def __init__(self, model: str, client: AsyncOpenAI):
+        self.model = model
+        self.client = client
+
+    async def run(self, query: str, inputs: AgentInputs) -> Dict[str, Any]:
+        system, user_content = _needs_prompt(query, inputs)
+
         print(f"============== [E42][NEEDS][PROMPT][SYSTEM] ==============\n {system}")
         print(f"============== [E42][NEEDS][PROMPT][USER] ================\n {user_content}")
 
+        t0 = time.time()
         resp = await self.client.responses.parse(
             model=self.model,
             input=[
@@ -117,6 +156,7 @@ Return JSON matching the schema exactly.
                 {"role": "user", "content": user_content},
             ],
             text_format=NeedsOutput,
+            prompt_cache_key=prompt_cache_key(system, query),
         )
 
         parsed = (
@@ -125,11 +165,7 @@ Return JSON matching the schema exactly.
             else resp.output_parsed.dict()
         )
 
-        usage = {
-            "input_tokens": resp.usage.input_tokens,
-            "output_tokens": resp.usage.output_tokens,
-            "total_tokens": resp.usage.total_tokens,
-        }
+        usage = usage_from_response(resp, latency_s=time.time() - t0)
 
         return {
             "run_id": f"needs-{uuid.uuid4().hex[:8]}",
@@ -138,27 +174,6 @@ Return JSON matching the schema exactly.
         }
 
 
-# ------------------ Cost helper (schema-agnostic) ------------------
-
-def _enrich_usage_with_costs(usage: Dict[str, Any], pricing_per_million: Tuple[float, float]) -> Dict[str, Any]:
-    u = dict(usage or {})
-    pin, pout = pricing_per_million
-    in_tok  = int(u.get("input_tokens", 0) or 0)
-    out_tok = int(u.get("output_tokens", 0) or 0)
-    total   = int(u.get("total_tokens", in_tok + out_tok) or (in_tok + out_tok))
-    in_cost  = (in_tok  / 1_000_000.0) * pin
-    out_cost = (out_tok / 1_000_000.0) * pout
-    u.update({
-        "input_tokens": in_tok,
-        "output_tokens": out_tok,
-        "total_tokens": total,
-        "input_cost": in_cost,
-        "output_cost": out_cost,
-        "total_cost": in_cost + out_cost,
-    })
-    return u
-
-
 # ------------------ Retry wrapper (stable envelope) ------------------
 
 async def _call_with_retry(
@@ -166,42 +181,21 @@ async def _call_with_retry(
     query: str,
     payload: AgentInputs,
     *,
-    max_retries: int = 5
+    retry: Optional[RetryPolicy] = None,
 ) -> Dict[str, Any]:
-    delay = 0.6
-    for attempt in range(max_retries):
-        try:
-            return await agent.run(query, payload)
-        except APIStatusError as e:
-            code = getattr(e, "status_code", 0)
-            retryable = code in (429, 500, 502, 503, 504)
-            if retryable and attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            break
-        except Exception:
-            if attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            break
-
-    return {
-        "run_id": f"needs-{uuid.uuid4().hex[:8]}",
-        "response": {"error": "agent_call_failed"},
-        "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
-    }
+    try:
+        return await (retry or RetryPolicy()).call(lambda: agent.run(query, payload))
+    except Exception as e:
+        return {
+            "run_id": f"needs-{uuid.uuid4().hex[:8]}",
+            "response": {"error": "agent_call_failed", "error_kind": error_kind(e)},
+            "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+        }
 
 # -----------------
 
-_OPENAI_CLIENT: Optional[AsyncOpenAI] = None
-
 def get_openai_client() -> AsyncOpenAI:
-    global _OPENAI_CLIENT
-    if _OPENAI_CLIENT is None:
-        _OPENAI_CLIENT = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    return _OPENAI_CLIENT
+    return get_async_openai()
 
 # ------------------ Graph runtime cache ------------------
 
@@ -241,6 +235,147 @@ def _intent_summary_for_node(intents: Any, uuid_node: Optional[str]) -> str:
 
 
 
+# ------------------ Per-trace prepare / unpack (shared by streaming and bulk runs) ------------------
+
+def _prepare_need_row(
+    row: Dict[str, Any], *, ops: GraphOps, G, compaction: Optional[CompactionPolicy] = None,
+) -> Tuple[Dict[str, Any], Optional[AgentInputs]]:
+    """
+    (ctx, payload). ctx is plain JSON (it is persisted by bulk jobs) and carries everything
+    needed to turn the agent response into StreamedNeedItems; payload is None if the trace
+    has no bottom paragraph.
+    """
+    trace_uuid = (row or {}).get("trace_uuid") or ""
+    ctx: Dict[str, Any] = {
+        "trace_uuid": trace_uuid,
+        "path_labels": (row or {}).get("path_labels") or [],
+        "trace_rationale": (row or {}).get("rationale") or "",
+        "frozen_at": (row or {}).get("frozen_at") or "",
+        "trace_seq": int((row or {}).get("trace_seq") or 0),
+    }
+
+    bottom_uuid = _bottom_uuid_for_trace(G, trace_uuid)
+    if not bottom_uuid:
+        return ctx, None
+
+    payload, extras = _need_blocks(ops, bottom_uuid, compaction)
+    ctx.update({"bottom_uuid": bottom_uuid, **extras})
+    return ctx, payload
+
+
+@lru_cache(maxsize=8192)
+def _need_blocks(
+    ops: GraphOps, bottom_uuid: str, compaction: Optional[CompactionPolicy] = None,
+) -> Tuple[AgentInputs, Dict[str, str]]:
+    """Rendered prompt blocks + ctx fields of one bottom paragraph; cached so pre-flight and scans share them."""
+    bundle = ops.build_records_for_bottom(bottom_uuid)
+    tb = ops.format_trace_block(bundle["trace"], include_uuids=False, include_text=False)
+    # the needs prompt does not send citations, so they are neither rendered nor compacted
+    ib, cb, _ = render_blocks(
+        ops, bundle, policy=None, fields=["intent", "events", "summary"], include_levels=["trace"], citations=False,
+    )
+    # the UI shows the full intents block; only the prompt gets the compacted one
+    prompt_ib, prompt_cb, report = ib, cb, None
+    if compaction is not None:
+        prompt_ib, prompt_cb, report = render_blocks(
+            ops, bundle, policy=compaction, fields=["intent", "events", "summary"], include_levels=["trace"], citations=False,
+        )
+
+    # section uuid from trace
+    section_uuid = next(
+        (n.get("uuid") for n in (bundle.get("trace") or []) if n.get("ntype") == "Section" and n.get("uuid")),
+        None
+    )
+
+    # pick one “best” summary (usually trace summary is more specific)
+    #TODO we must go back to the CS25 graph and rerun separate intent, summary, and events.
+    # At the moment this is only done for sections not for traces
+
+    paragraph_name = ops.get_paragraph_id(bottom_uuid)
+    extras = {
+        "paragraph_name": paragraph_name,
+        "intents_block_trace": (ib or "").strip(),
+        "intent_summary_trace": _intent_summary_for_node(bundle.get("intents"), bottom_uuid),
+        "intent_summary_section": _intent_summary_for_node(bundle.get("intents"), section_uuid),
+    }
+    payload = AgentInputs(
+        trace_block=tb, cites_block=prompt_cb, intents_block=prompt_ib, paragraph_name=paragraph_name, compaction=report,
+    )
+    return payload, extras
+
+
+def _split_prompt(query: str, payload: AgentInputs) -> Tuple[str, str]:
+    """(prefix shared by every trace of the run, per-trace rest) of one rendered needs prompt."""
+    system, user_content = _needs_prompt(query, payload)
+    cut = user_content.index("</USER_QUERY>") + len("</USER_QUERY>")
+    return system + user_content[:cut], user_content[cut:]
+
+
+def _missing_bottom_result(ctx: Dict[str, Any], usage: Dict[str, Any]) -> Dict[str, Any]:
+    trace_uuid = ctx["trace_uuid"]
+    return {
+        "trace_uuid": trace_uuid,
+        "path_labels": ctx["path_labels"],
+        "items": [{
+            "need_id": _stable_need_id(trace_uuid, "missing bottom_uuid", 0),
+            "trace_uuid": trace_uuid,
+            "path_labels": ctx["path_labels"],
+            "statement": "",
+            "rationale": "",
+            "headline": "",
+            "trace_rationale": ctx["trace_rationale"],
+            "frozen_at": ctx["frozen_at"],
+            "error": "missing bottom_uuid",
+            "relevance_rationale": "",
+            "intent_summary_trace": "",
+            "intent_summary_section": "",
+        }],
+        "usage": usage,
+    }
+
+
+def _need_items_from_response(ctx: Dict[str, Any], res: Dict[str, Any], usage: Dict[str, Any]) -> Dict[str, Any]:
+    trace_uuid = ctx["trace_uuid"]
+    trace_seq = ctx["trace_seq"]
+
+    resp = res.get("response") or {}
+    needs = resp.get("needs") if isinstance(resp, dict) else None
+    if not isinstance(needs, list):
+        needs = []
+
+    items: List[Dict[str, Any]] = []
+
+    for i, n in enumerate(needs):
+        st = (n or {}).get("statement", "") if isinstance(n, dict) else ""
+        ra = (n or {}).get("rationale", "") if isinstance(n, dict) else ""
+        obj = (n or {}).get("headline", "") if isinstance(n, dict) else ""
+
+        if not st.strip():
+            continue
+        items.append({
+            "need_id": _stable_need_id(trace_uuid, st, i),
+            "need_code": f"N-{trace_seq:02d}-{i + 1:02d}",  # ✅ UX id
+            "trace_uuid": trace_uuid,
+            "path_labels": ctx["path_labels"],
+            "statement": st.strip(),
+            "rationale": (ra or "").strip(),  # this is needs statement rationale
+            "headline": (obj or "").strip(),  # shor summary of the need statement
+            "frozen_at": ctx["frozen_at"],
+            "run_id": res.get("run_id"),
+            # Optional: attach usage per item; UI can ignore
+            "usage": usage,
+            "relevance_rationale": (ctx["trace_rationale"] or "").strip(),  # this is your frozen selection rationale
+            "intent_summary_trace": (ctx.get("intent_summary_trace") or "").strip(),
+            "intent_summary_section": (ctx.get("intent_summary_section") or "").strip(),
+            "paragraph_name": ctx.get("paragraph_name"),  # ✅ bottom paragraph id/name
+            "intents_block_trace": ctx.get("intents_block_trace") or "",  # ✅ full trace intents block (intent+events+summary)
+        })
+
+    # If the agent returns zero needs, still emit a “no needs” item? (optional)
+    # For now: emit nothing (items=[]). Caller can decide whether to stream empties.
+    return {"trace_uuid": trace_uuid, "path_labels": ctx["path_labels"], "items": items, "usage": usage}
+
+
 # ------------------ One batch, parallel, streaming ------------------
 
 async def _stream_batch_parallel(
@@ -250,7 +385,11 @@ async def _stream_batch_parallel(
     ops: GraphOps,
     G,
     query: str,
-    pricing_per_million: Tuple[float, float],
+    pricing_per_million: Tuple[float, ...],
+    retry: Optional[RetryPolicy] = None,
+    budget: Optional[BudgetGuard] = None,
+    estimator: Optional[PreflightEstimator] = None,
+    compaction: Optional[CompactionPolicy] = None,
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Emits:
@@ -258,160 +397,80 @@ async def _stream_batch_parallel(
       items_done   (a batch of StreamedNeedItems for a single trace_uuid)
       batch_progress
       batch_end
+    With a budget, traces whose call no longer fits come back with no items and budget_skipped=True.
     """
     t0 = time.time()
     total = len(batch_rows)
     done = 0
 
-    batch_in_tokens = 0
-    batch_out_tokens = 0
-    pin, pout = pricing_per_million
+    tally = UsageTally()
 
     yield {"type": "batch_start", "ts": time.time(), "size": total}
 
     async def one(row: Dict[str, Any]) -> Dict[str, Any]:
-        trace_uuid = (row or {}).get("trace_uuid") or ""
-        path_labels = (row or {}).get("path_labels") or []
-        trace_rationale = (row or {}).get("rationale") or ""
-        frozen_at = (row or {}).get("frozen_at") or ""
-        trace_seq = int((row or {}).get("trace_seq") or 0)
-
-        bottom_uuid = _bottom_uuid_for_trace(G, trace_uuid)
-        if not bottom_uuid:
+        ctx, payload = _prepare_need_row(row, ops=ops, G=G, compaction=compaction)
+        if payload is None:
             usage = _enrich_usage_with_costs({"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}, pricing_per_million)
-            return {
-                "trace_uuid": trace_uuid,
-                "path_labels": path_labels,
-                "items": [{
-                    "need_id": _stable_need_id(trace_uuid, "missing bottom_uuid", 0),
-                    "trace_uuid": trace_uuid,
-                    "path_labels": path_labels,
-                    "statement": "",
-                    "rationale": "",
-                    "headline": "",
-                    "trace_rationale": trace_rationale,
-                    "frozen_at": frozen_at,
-                    "error": "missing bottom_uuid",
-                    "relevance_rationale": "",
-                    "intent_summary_trace": "",
-                    "intent_summary_section": "",
-                }],
-                "usage": usage,
-            }
+            return _missing_bottom_result(ctx, usage)
 
-        bundle = ops.build_records_for_bottom(bottom_uuid)
-        tb = ops.format_trace_block(bundle["trace"], include_uuids=False, include_text=False)
-        cb = ops.format_citations_block(bundle["trace"], bundle["cites"], include_uuids=False)
-        ib = ops.format_intents_block(
-            bundle["trace"], bundle["intents"],
-            fields=["intent", "events", "summary"],
-            include_uuids=False,
-            include_levels=["trace"],
-        )
+        cost = 0.0
+        if budget is not None:
+            cost = estimator.call_cost(*_split_prompt(query, payload))
+            if not budget.admit(cost):
+                usage = _enrich_usage_with_costs({"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}, pricing_per_million)
+                return {"trace_uuid": ctx["trace_uuid"], "path_labels": ctx["path_labels"], "items": [], "usage": usage, "budget_skipped": True}
 
-        # section uuid from trace
-        section_uuid = next(
-            (n.get("uuid") for n in (bundle.get("trace") or []) if n.get("ntype") == "Section" and n.get("uuid")),
-            None
-        )
-
-        # pick one “best” summary (usually trace summary is more specific)
-        #TODO we must go back to the CS25 graph and rerun separate intent, summary, and events.
-        # At the moment this is only done for sections not for traces
-
-        trace_intent_summary = _intent_summary_for_node(bundle.get("intents"), bottom_uuid)
-        section_intent_summary = _intent_summary_for_node(bundle.get("intents"), section_uuid)
-
-        paragraph_name = ops.get_paragraph_id(bottom_uuid)
-
-        #print(f" ******************** \nTEST \n paragraph_name: \n {paragraph_name} \n\n")
-        #print(f" ******************** \nTEST \n ib: \n {ib} \n\n")
-        #print(f" ******************** \nTEST \n tb: \n {tb} \n\n")
-        #print(f" ******************** \nTEST \n cb: \n {cb} \n\n")
-        #print(f" ******************** \nTEST \n trace_intent_summary: \n {trace_intent_summary} \n\n")
-        #print(f" ******************** \nTEST \n section_intent_summary: \n {section_intent_summary} \n\n")
-
-        payload = AgentInputs(trace_block=tb, cites_block=cb, intents_block=ib, paragraph_name=paragraph_name)
-        res = await _call_with_retry(agent, query, payload)
+        res = await _call_with_retry(agent, query, payload, retry=retry)
         usage = _enrich_usage_with_costs(res.get("usage") or {}, pricing_per_million)
-
-        resp = res.get("response") or {}
-        needs = resp.get("needs") if isinstance(resp, dict) else None
-        if not isinstance(needs, list):
-            needs = []
-
-        items: List[Dict[str, Any]] = []
-
-
-
-        for i, n in enumerate(needs):
-            st = (n or {}).get("statement", "") if isinstance(n, dict) else ""
-            ra = (n or {}).get("rationale", "") if isinstance(n, dict) else ""
-            obj = (n or {}).get("headline", "") if isinstance(n, dict) else ""
-
-            if not st.strip():
-                continue
-            items.append({
-                "need_id": _stable_need_id(trace_uuid, st, i),
-                "need_code": f"N-{trace_seq:02d}-{i + 1:02d}",  # ✅ UX id
-                "trace_uuid": trace_uuid,
-                "path_labels": path_labels,
-                "statement": st.strip(),
-                "rationale": (ra or "").strip(),  # this is needs statement rationale
-                "headline": (obj or "").strip(),  # shor summary of the need statement
-                "frozen_at": frozen_at,
-                "run_id": res.get("run_id"),
-                # Optional: attach usage per item; UI can ignore
-                "usage": usage,
-                "relevance_rationale": (trace_rationale or "").strip(),  # this is your frozen selection rationale
-                "intent_summary_trace": (trace_intent_summary or "").strip(),
-                "intent_summary_section": (section_intent_summary or "").strip(),
-                "paragraph_name": paragraph_name,  # ✅ bottom paragraph id/name
-                "intents_block_trace": (ib or "").strip(),  # ✅ full trace intents block (intent+events+summary)
-            })
-
-        # If the agent returns zero needs, still emit a “no needs” item? (optional)
-        # For now: emit nothing (items=[]). Caller can decide whether to stream empties.
-        return {"trace_uuid": trace_uuid, "path_labels": path_labels, "items": items, "usage": usage}
+        if budget is not None:
+            budget.settle(cost, float(usage.get("total_cost", 0.0) or 0.0))
+        return _need_items_from_response(ctx, res, usage)
 
     tasks = [asyncio.create_task(one(r)) for r in batch_rows]
 
-    for fut in asyncio.as_completed(tasks):
-        obj = await fut
-        u = obj.get("usage") or {}
-        batch_in_tokens  += int(u.get("input_tokens", 0) or 0)
-        batch_out_tokens += int(u.get("output_tokens", 0) or 0)
-
-        done += 1
-        yield {
-            "type": "items_done",
-            "ts": time.time(),
-            "done": done,
-            "total": total,
-            "trace_uuid": obj.get("trace_uuid"),
-            "items": obj.get("items") or [],
-            "usage": u,
-        }
+    try:
+        for fut in asyncio.as_completed(tasks):
+            obj = await fut
+            u = obj.get("usage") or {}
+            tally.add(u)
+
+            done += 1
+            yield {
+                "type": "items_done",
+                "ts": time.time(),
+                "done": done,
+                "total": total,
+                "trace_uuid": obj.get("trace_uuid"),
+                "items": obj.get("items") or [],
+                "usage": u,
+                **({"budget_skipped": True} if obj.get("budget_skipped") else {}),
+            }
 
-        yield {
-            "type": "batch_progress",
-            "ts": time.time(),
-            "done": done,
-            "total": total,
-            "tokens_in": batch_in_tokens,
-            "tokens_out": batch_out_tokens,
-            "batch_cost": (batch_in_tokens / 1e6) * pin + (batch_out_tokens / 1e6) * pout,
-            "elapsed_s": time.time() - t0,
-        }
+            yield {
+                "type": "batch_progress",
+                "ts": time.time(),
+                "done": done,
+                "total": total,
+                "tokens_in": tally.tokens_in,
+                "tokens_out": tally.tokens_out,
+                "tokens_cached": tally.tokens_cached,
+                "batch_cost": tally.cost,
+                "cache": tally.cache(),
+                "elapsed_s": time.time() - t0,
+            }
+    finally:
+        await cancel_tasks(tasks)
 
     elapsed = time.time() - t0
     yield {
         "type": "batch_end",
         "ts": time.time(),
         "elapsed_s": elapsed,
-        "tokens_in": batch_in_tokens,
-        "tokens_out": batch_out_tokens,
-        "batch_cost": (batch_in_tokens / 1e6) * pin + (batch_out_tokens / 1e6) * pout,
+        "tokens_in": tally.tokens_in,
+        "tokens_out": tally.tokens_out,
+        "tokens_cached": tally.tokens_cached,
+        "batch_cost": tally.cost,
+        "cache": tally.cache(),
         "size": total,
     }
 
@@ -430,14 +489,48 @@ async def stream_needs_for_snapshot(
     query: str,
     model: str,
     batch_size: int,
-    pricing_per_million: Tuple[float, float],
+    pricing_per_million: Tuple[float, ...],
+    completed: Optional[Dict[str, Dict[str, Any]]] = None,   # trace_uuid -> checkpointed items_done (resume)
+    hedger: Optional[Hedger] = None,
+    lane: Optional[Lane] = None,
+    budget: Optional[BudgetGuard] = None,
+    preflight_sample: Optional[int] = 300,    # None: no pre-flight projection
+    compaction: Optional[CompactionPolicy] = None,
 ) -> AsyncGenerator[Dict[str, Any], None]:
 
     rows = list(snapshot_rows or [])
     total_traces = len(rows)
+
+    # resume: rows finished by the interrupted run are replayed, not re-sent to the LLM
+    replayed: List[Dict[str, Any]] = []
+    if completed:
+        replayed = [completed[r["trace_uuid"]] for r in rows if r.get("trace_uuid") in completed]
+        rows = [r for r in rows if r.get("trace_uuid") not in completed]
+
     batches = _chunked(rows, batch_size)
     num_batches = len(batches)
 
+    sampled_compaction = CompactionTally(compaction)
+
+    def render(row: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        bottom_uuid = _bottom_uuid_for_trace(G, row.get("trace_uuid") or "")
+        if not bottom_uuid:
+            return None
+        payload = _need_blocks(ops, bottom_uuid, compaction)[0]
+        sampled_compaction.add_payload(payload.compaction)
+        return _split_prompt(query, payload)
+
+    estimator = PreflightEstimator(
+        pipeline="needs", model=model, pricing_per_million=pricing_per_million,
+        concurrency=min(batch_size, MAX_INFLIGHT),
+    )
+    preflight: Optional[Dict[str, Any]] = None
+    if preflight_sample and rows:
+        preflight = await asyncio.to_thread(
+            project_run, estimator, rows, render=render, batch_size=batch_size, sample_max=preflight_sample,
+        )
+        preflight["compaction"] = sampled_compaction.summary()
+
     yield {
         "type": "run_start",
         "ts": time.time(),
@@ -446,13 +539,28 @@ async def stream_needs_for_snapshot(
         "total_traces": total_traces,
         "batch_size": batch_size,
         "num_batches": num_batches,
-        "pricing_per_million": {"input_usd": pricing_per_million[0], "output_usd": pricing_per_million[1]},
+        "pricing_per_million": pricing_summary(pricing_per_million),
+        "resumed": len(replayed),
+        "preflight": preflight,
+        "budget": budget.summary() if budget else None,
     }
 
+    for done, obj in enumerate(replayed, start=1):
+        yield {
+            "type": "items_done",
+            "ts": time.time(),
+            "done": done,
+            "total": len(replayed),
+            "trace_uuid": obj.get("trace_uuid"),
+            "items": obj.get("items") or [],
+            "usage": obj.get("usage") or {},
+            "replayed": True,
+        }
+
     agent = AsyncAgent(model=model, client=get_openai_client())
-    total_in_tokens = 0
-    total_out_tokens = 0
-    pin, pout = pricing_per_million
+    tally = UsageTally()
+    retry = RetryPolicy(hedger=hedger, lane=lane)  # shared by every call of this run
+    called = 0
 
     for i, batch in enumerate(batches, start=1):
         yield {"type": "batch_header", "ts": time.time(), "index": i, "of": num_batches, "size": len(batch)}
@@ -464,14 +572,29 @@ async def stream_needs_for_snapshot(
             G=G,
             query=query,
             pricing_per_million=pricing_per_million,
+            retry=retry,
+            budget=budget,
+            estimator=estimator,
+            compaction=compaction,
         ):
             yield evt
             if evt["type"] == "items_done":
-                u = evt.get("usage") or {}
-                total_in_tokens  += int(u.get("input_tokens", 0) or 0)
-                total_out_tokens += int(u.get("output_tokens", 0) or 0)
+                tally.add(evt.get("usage") or {})
+                called += 0 if evt.get("budget_skipped") else 1
+
+    observe_run("needs", model, items=called, tokens_out=tally.tokens_out, avg_latency_s=tally.avg_latency())
+
+    compaction_report = CompactionTally(compaction)
+    if compaction is not None:
+        for r in rows:
+            bottom_uuid = _bottom_uuid_for_trace(G, r.get("trace_uuid") or "")
+            if bottom_uuid:
+                compaction_report.add_payload(_need_blocks(ops, bottom_uuid, compaction)[0].compaction)  # memoized
+
+    hedge = retry.hedge_summary(pricing_per_million)
+    if hedge is not None:
+        tally.add(hedge["usage"])  # the duplicates that lost the race were billed too
 
-    grand_cost = (total_in_tokens / 1e6) * pin + (total_out_tokens / 1e6) * pout
     yield {
         "type": "run_end",
         "ts": time.time(),
@@ -479,12 +602,151 @@ async def stream_needs_for_snapshot(
             "model": model,
             "query": query,
             "total_traces": total_traces,
+            "resumed": len(replayed),
             "batch_size_parallelism": batch_size,
             "num_batches": num_batches,
-            "tokens_in": total_in_tokens,
-            "tokens_out": total_out_tokens,
-            "estimated_cost": grand_cost,
-            "pricing_per_million": {"input_usd": pin, "output_usd": pout},
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
+            "estimated_cost": tally.cost,
+            "pricing_per_million": pricing_summary(pricing_per_million),
+            "cache": tally.cache(),
+            "retry": retry.summary(),
+            "hedge": hedge,
+            "preflight": preflight,
+            "budget": budget.summary() if budget else None,
+            "compaction": compaction_report.summary(),
+        },
+    }
+
+
+# ------------------ Bulk run (batch backend, non-interactive) ------------------
+
+async def stream_bulk_needs_for_snapshot(
+    *,
+    snapshot_rows: Optional[List[Dict[str, Any]]] = None,
+    G,
+    ops: GraphOps,
+    query: str = "",
+    model: str = "gpt-5.2",
+    pricing_per_million: Tuple[float, ...] = (0.05, 0.005, 0.40),
+    compaction: Optional[CompactionPolicy] = None,
+    backend: Optional[BatchBackend] = None,
+    job_id: Optional[str] = None,          # resume an existing job instead of creating one
+    jobs_dir=None,
+    poll_interval: float = DEFAULT_POLL_S,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Same events as stream_needs_for_snapshot (items_done per trace), but all traces go through
+    one batch job at batch pricing. Pass job_id after a restart to resume delivery.
+    """
+    backend = backend or get_batch_backend()
+    missing: List[Dict[str, Any]] = []
+    if job_id:
+        job = BulkJob.load(job_id, jobs_dir)
+        query = job.data["meta"].get("query", query)
+        model = job.data["meta"].get("model", model)
+        pricing_per_million = tuple(job.data["meta"].get("pricing_per_million") or pricing_per_million)
+    else:
+        requests = []
+        for row in snapshot_rows or []:
+            ctx, payload = _prepare_need_row(row, ops=ops, G=G, compaction=compaction)
+            if payload is None:
+                missing.append(ctx)
+                continue
+            system, user = _needs_prompt(query, payload)
+            body = response_body(
+                model=model, system=system, user=user, text_format=NeedsOutput,
+                prompt_cache_key=prompt_cache_key(system, query),
+            )
+            requests.append((ctx["trace_uuid"], body, ctx))
+        job = BulkJob.create(
+            pipeline="needs",
+            requests=requests,
+            meta={"query": query, "model": model, "pricing_per_million": list(pricing_per_million)},
+            jobs_dir=jobs_dir,
+        )
+
+    pricing = batch_pricing(pricing_per_million)
+    total = int(job.data.get("count") or 0) + len(missing)
+    yield {
+        "type": "run_start",
+        "ts": time.time(),
+        "model": model,
+        "query": query,
+        "total_traces": total,
+        "batch_size": total,
+        "num_batches": 1,
+        "pricing_per_million": pricing_summary(pricing),
+        "bulk": {"job_id": job.job_id, "backend": backend.name, "resumed": bool(job_id)},
+    }
+
+    t0 = time.time()
+    tally = UsageTally()
+    done = 0
+    yield {"type": "batch_start", "ts": time.time(), "size": total, "bulk": True}
+
+    async def _results():
+        for ctx in missing:
+            yield _missing_bottom_result(ctx, _enrich_usage_with_costs({}, pricing))
+        async for cid, ctx, body, err in run_bulk_job(job, backend, poll_interval=poll_interval):
+            parsed, raw_usage = parse_response_body(body, NeedsOutput) if body is not None else (None, {})
+            res = {
+                "run_id": f"bulk-{job.job_id}",
+                "response": parsed if parsed is not None else {"error": err or "unparseable_response"},
+            }
+            yield _need_items_from_response(ctx, res, _enrich_usage_with_costs(raw_usage, pricing))
+
+    async for obj in _results():
+        u = obj.get("usage") or {}
+        tally.add(u)
+        done += 1
+        yield {
+            "type": "items_done",
+            "ts": time.time(),
+            "done": done,
+            "total": total,
+            "trace_uuid": obj.get("trace_uuid"),
+            "items": obj.get("items") or [],
+            "usage": u,
+        }
+        yield {
+            "type": "batch_progress",
+            "ts": time.time(),
+            "done": done,
+            "total": total,
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
+            "batch_cost": tally.cost,
+            "elapsed_s": time.time() - t0,
+        }
+
+    yield {
+        "type": "batch_end",
+        "ts": time.time(),
+        "elapsed_s": time.time() - t0,
+        "tokens_in": tally.tokens_in,
+        "tokens_out": tally.tokens_out,
+        "tokens_cached": tally.tokens_cached,
+        "batch_cost": tally.cost,
+        "size": total,
+        "bulk": True,
+    }
+    yield {
+        "type": "run_end",
+        "ts": time.time(),
+        "summary": {
+            "model": model,
+            "query": query,
+            "total_traces": total,
+            "delivered": done,
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
+            "estimated_cost": tally.cost,
+            "pricing_per_million": pricing_summary(pricing),
+            "bulk": {"job_id": job.job_id, "backend": backend.name, "status": job.data.get("status")},
         },
     }
 
@@ -510,6 +772,7 @@ def _wrap(evt: Dict[str, Any]) -> Dict[str, Any]:
 
 async def build_needs_table(state, store, **kwargs):
     tab_id = state.get("tab_id", "") or ""
+    options = ScanOptions.from_any(state.get("scan_options") or kwargs.get("scan_options"))
 
     item = await store.aget(("cs25_context", tab_id), "latest")
     ctx = item.value if item and hasattr(item, "value") else {}
@@ -548,29 +811,69 @@ async def build_needs_table(state, store, **kwargs):
         })
 
     mg, ops = _get_runtime()
+    topic = state.get("topic", "") or ""
+
+    # per-trace checkpoints under this run id; resume_run_id replays an interrupted run's results
+    checkpoint = ScanCheckpoint(store, pipeline="needs", run_id=state.get("run_id"))
+    completed: Dict[str, Dict[str, Any]] = {}
+    if state.get("resume_run_id"):
+        completed = await ScanCheckpoint(store, pipeline="needs", run_id=state["resume_run_id"]).load(
+            query=topic, frozen_at=frozen_at,
+        )
+    await checkpoint.start(query=topic, frozen_at=frozen_at, tab_id=tab_id)
 
     # node start ping (optional)
     await emit({
         "type": "needsTables.nodeStart",
         "node": "build_needs_table",
         "ts": time.time(),
-        "data": {"selectedCount": len(kept), "frozen_at": frozen_at},
+        "data": {"selectedCount": len(kept), "frozen_at": frozen_at, "resumed": len(completed)},
     })
 
     all_items: List[Dict[str, Any]] = []
 
     last_progress_ts = 0.0
+    lane = lane_for(tab_id, "needs")
 
-    try:
-        async for evt in stream_needs_for_snapshot(
+    def scan():
+        return stream_needs_for_snapshot(
             snapshot_rows=kept,
             G=mg.G,
             ops=ops,
-            query=state.get("topic", "") or "",
+            query=topic,
             model="gpt-5.2",
             batch_size=25,                 # <<< keep lower than 200; needs calls are heavier
-            pricing_per_million=(0.05, 0.40),
-        ):
+            pricing_per_million=(0.05, 0.005, 0.40),
+            completed=completed,
+            hedger=hedger_for(options),
+            lane=lane,
+            budget=budget_for(options, tab_id),
+            preflight_sample=options.preflight_sample if options.preflight_enabled else None,
+            compaction=compaction_policy(options),
+        )
+
+    # rows carry frozen_at / trace_seq into the items, so they are part of the key
+    scan_key = scan_fingerprint(
+        "needs",
+        corpus=(mg.manifest.get("integrity") or {}).get("checksum"),
+        model="gpt-5.2",
+        query=topic,
+        frozen_at=frozen_at,
+        rows=[f"{r['trace_uuid']}:{r['trace_seq']}" for r in kept],
+        resumed=list(completed),
+    )
+
+    queue_reporter = asyncio.create_task(
+        report_queue(lane, lambda q: emit({"type": "needsTables.queued", "queue": q}))
+    )
+    try:
+        async for evt in (coalesce(scan_key, scan) if options.coalesce else scan()):
+            if evt["type"] == "items_done" and not evt.get("budget_skipped"):
+                await checkpoint.save(evt.get("trace_uuid"), {
+                    "trace_uuid": evt.get("trace_uuid"),
+                    "items": evt.get("items") or [],
+                    "usage": evt.get("usage") or {},
+                })
             wrapped = _wrap(evt)
 
             # Your UI expects:
@@ -596,13 +899,20 @@ async def build_needs_table(state, store, **kwargs):
                 # You can choose to skip empty batches to reduce chatter
                 if items:
                     all_items.extend(items)  # ✅ collect for clustering later
-                    await emit({"type": "needsTables.itemsBatch", "ts": wrapped.get("ts"), "items": items})
+                    await emit({
+                        "type": "needsTables.itemsBatch",
+                        "ts": wrapped.get("ts"),
+                        "items": items,
+                        "usage": wrapped.get("usage"),
+                        **({"replayed": True} if wrapped.get("replayed") else {}),
+                    })
                 # progress uses trace-done count (not needs count)
                 await emit({
                     "type": "needsTables.progress",
                     "ts": wrapped.get("ts"),
                     "done": int(wrapped.get("done", 0) or 0),
                     "total": int(wrapped.get("total", 0) or 0),
+                    "queue": lane.status(),
                 })
                 continue
 
@@ -616,6 +926,7 @@ async def build_needs_table(state, store, **kwargs):
                     "ts": wrapped.get("ts"),
                     "done": int(wrapped.get("done", 0) or 0),
                     "total": int(wrapped.get("total", 0) or 0),
+                    "queue": lane.status(),
                 })
                 continue
 
@@ -657,6 +968,11 @@ async def build_needs_table(state, store, **kwargs):
                         topic=state.get("topic", "") or "",  # ✅ pass topic here
                         model="gpt-5.2",
                         batch_size=25,
+                        pack=options.pack,
+                        pack_max_items=options.pack_max_items,
+                        pack_token_budget=options.pack_token_budget,
+                        hedger=hedger_for(options),
+                        lane=lane,
                     )
 
                     await emit({
@@ -691,6 +1007,8 @@ async def build_needs_table(state, store, **kwargs):
     except Exception as e:
         await emit({"type": "needsTables.error", "node": "build_needs_table", "ts": time.time(), "data": {"message": str(e)}})
         return {"messages": [AIMessage(content=f"Needs table build failed: {e}")]}
+    finally:
+        queue_reporter.cancel()
 
     await emit({"type": "needsTables.nodeDone", "node": "build_needs_table", "ts": time.time()})
     return {"messages": [AIMessage(content=f"✅ Needs table streamed for {len(kept)} traces (frozen at {frozen_at}).")]}
@@ -952,7 +1270,12 @@ async def tag_needs_with_strands(
     model: str = "gpt-5.2",
     batch_size: int = 25,
     concurrency: int = 8,
-    pricing_per_million: Tuple[float, float] = (0.05, 0.40),  # ✅ add pricing like needs
+    pricing_per_million: Tuple[float, ...] = (0.05, 0.005, 0.40),  # ✅ add pricing like needs
+    pack: bool = False,              # several needs per request (list-typed output keyed by item id)
+    pack_max_items: int = 10,
+    pack_token_budget: int = 12000,
+    hedger: Optional[Hedger] = None,
+    lane: Optional[Lane] = None,
     debug: bool = True,
 ) -> Dict[str, Any]:
     usable = [it for it in items if (it.get("statement") or "").strip()]
@@ -968,13 +1291,13 @@ async def tag_needs_with_strands(
                 "tokens_in": 0,
                 "tokens_out": 0,
                 "estimated_cost": 0.0,
-                "pricing_per_million": {"input_usd": pricing_per_million[0], "output_usd": pricing_per_million[1]},
+                "pricing_per_million": pricing_summary(pricing_per_million),
             },
         }
 
     topic = (topic or "").strip()
     sem = asyncio.Semaphore(max(1, int(concurrency)))
-    pin, pout = pricing_per_million
+    retry = RetryPolicy(hedger=hedger, lane=lane)  # shared by every tagging call of this pass
 
     system = """
 You are an expert aerospace certification & technology maturation engineer.
@@ -1028,24 +1351,17 @@ Rules:
     # Totals across whole run
     total_in_tokens = 0
     total_out_tokens = 0
+    total_cached_tokens = 0
     total_cost = 0.0
     success = 0
     failed = 0
 
-    async def tag_one(it: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        need_id = it.get("need_id", "")
-        need_code = it.get("need_code", "")
+    def need_blocks(it: Dict[str, Any]) -> str:
         paragraph_name = (it.get("paragraph_name") or "").strip()
         intents_block = (it.get("intents_block_trace") or "").strip()
-        need_block = _need_core_block(it)
-
-        user = f"""
-<TOPIC>
-{topic}
-</TOPIC>
-
+        return f"""
 <NEED>
-{need_block}
+{_need_core_block(it)}
 </NEED>
 
 <BOTTOM_PARAGRAPH - this is the regulatory clause of focus>
@@ -1057,79 +1373,137 @@ Rules:
 </TRACE_INTENTS>
 """.strip()
 
-        delay = 0.6
-        for attempt in range(5):
+    def tag_result(need_id: str, parsed: Dict[str, Any], usage: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "need_id": need_id,                 # local mapping key (LLM never saw it)
+            "strand": parsed.get("strand"),
+            "confidence": float(parsed.get("confidence", 0.0) or 0.0),
+            "reason": (parsed.get("reason") or "").strip(),
+            "usage": usage,                     # ✅ attach per-need usage (optional)
+        }
+
+    async def tag_one(it: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        need_id = it.get("need_id", "")
+        need_code = it.get("need_code", "")
+
+        user = f"""
+<TOPIC>
+{topic}
+</TOPIC>
+
+{need_blocks(it)}
+""".strip()
+
+        if debug:
+            print("\n" + "=" * 120)
+            print(f"[E42][STRANDS][REQ] need_id={need_id} need_code={need_code} model={model}")
+            print("-" * 120)
+            print("[SYSTEM]\n" + system)
+            print("-" * 120)
+            print("[USER]\n" + user)
+            print("=" * 120 + "\n")
+
+        async def call():
+            async with sem:
+                t0 = time.time()
+                resp = await openai_client.responses.parse(
+                    model=model,
+                    input=[
+                        {"role": "system", "content": system},
+                        {"role": "user", "content": user},
+                    ],
+                    text_format=SingleStrandOutput,
+                    prompt_cache_key=prompt_cache_key(system, topic),
+                )
+            return resp, time.time() - t0
+
+        try:
+            resp, latency = await retry.call(call)
+        except Exception as e:
+            if debug:
+                print(f"[E42][STRANDS][{type(e).__name__}] need_id={need_id} kind={error_kind(e)} err={e}")
+            return None
+
+        parsed_obj = resp.output_parsed
+        parsed = parsed_obj.model_dump(mode="json") if hasattr(parsed_obj, "model_dump") else parsed_obj.dict()
+
+        # ✅ usage -> cost (same helper you already have)
+        usage = _enrich_usage_with_costs(usage_from_response(resp, latency_s=latency), pricing_per_million)
+
+        if debug:
+            print("\n" + "-" * 120)
+            print(f"[E42][STRANDS][RESP] need_id={need_id} need_code={need_code}")
+            print("[PARSED OUTPUT]")
             try:
-                if debug:
-                    print("\n" + "=" * 120)
-                    print(f"[E42][STRANDS][REQ] need_id={need_id} need_code={need_code} attempt={attempt+1}/5 model={model}")
-                    print("-" * 120)
-                    print("[SYSTEM]\n" + system)
-                    print("-" * 120)
-                    print("[USER]\n" + user)
-                    print("=" * 120 + "\n")
-
-                async with sem:
-                    resp = await openai_client.responses.parse(
-                        model=model,
-                        input=[
-                            {"role": "system", "content": system},
-                            {"role": "user", "content": user},
-                        ],
-                        text_format=SingleStrandOutput,
-                    )
+                print(json.dumps(parsed, indent=2, ensure_ascii=False))
+            except Exception:
+                print(parsed)
+            print("[USAGE]")
+            print(json.dumps(usage, indent=2))
+            print("-" * 120 + "\n")
 
-                parsed_obj = resp.output_parsed
-                parsed = parsed_obj.model_dump(mode="json") if hasattr(parsed_obj, "model_dump") else parsed_obj.dict()
-
-                # ✅ usage -> cost (same helper you already have)
-                usage = {
-                    "input_tokens": getattr(resp.usage, "input_tokens", 0) if getattr(resp, "usage", None) else 0,
-                    "output_tokens": getattr(resp.usage, "output_tokens", 0) if getattr(resp, "usage", None) else 0,
-                    "total_tokens": getattr(resp.usage, "total_tokens", 0) if getattr(resp, "usage", None) else 0,
-                }
-                usage = _enrich_usage_with_costs(usage, pricing_per_million)
-
-                if debug:
-                    print("\n" + "-" * 120)
-                    print(f"[E42][STRANDS][RESP] need_id={need_id} need_code={need_code}")
-                    print("[PARSED OUTPUT]")
-                    try:
-                        print(json.dumps(parsed, indent=2, ensure_ascii=False))
-                    except Exception:
-                        print(parsed)
-                    print("[USAGE]")
-                    print(json.dumps(usage, indent=2))
-                    print("-" * 120 + "\n")
-
-                return {
-                    "need_id": need_id,                 # local mapping key (LLM never saw it)
-                    "strand": parsed.get("strand"),
-                    "confidence": float(parsed.get("confidence", 0.0) or 0.0),
-                    "reason": (parsed.get("reason") or "").strip(),
-                    "usage": usage,                     # ✅ attach per-need usage (optional)
-                }
-
-            except APIStatusError as e:
-                code = getattr(e, "status_code", 0)
-                retryable = code in (429, 500, 502, 503, 504)
-                if debug:
-                    print(f"[E42][STRANDS][APIStatusError] need_id={need_id} code={code} retryable={retryable} err={e}")
-                if retryable and attempt < 4:
-                    await asyncio.sleep(delay + random.uniform(0, 0.4))
-                    delay = min(delay * 2, 6)
-                    continue
-                return None
-            except Exception as e:
-                if debug:
-                    print(f"[E42][STRANDS][Exception] need_id={need_id} attempt={attempt+1}/5 err={type(e).__name__}: {e}")
-                if attempt < 4:
-                    await asyncio.sleep(delay + random.uniform(0, 0.4))
-                    delay = min(delay * 2, 6)
-                    continue
-                return None
+        return tag_result(need_id, parsed, usage)
 
-        return None
+    packed_system = system + """
+
+Batch mode:
+- You will receive several ITEMs, each ONE need with its own context, all under the same TOPIC.
+- Classify every ITEM independently and return exactly one result per ITEM, copying its id into item_id.
+"""
+
+    async def tag_pack(pack_items: List[Dict[str, Any]]) -> List[Optional[Dict[str, Any]]]:
+        """Several needs in ONE call; needs missing from the reply fall back to tag_one."""
+        ids = {f"N{k}": it for k, it in enumerate(pack_items, start=1)}
+        user = f"""
+<TOPIC>
+{topic}
+</TOPIC>
+
+""" + "\n\n".join(f'<ITEM id="{iid}">\n{need_blocks(it)}\n</ITEM>' for iid, it in ids.items())
+
+        answered: Dict[str, Dict[str, Any]] = {}
+        usage: Dict[str, Any] = {}
+
+        async def call():
+            async with sem:
+                t0 = time.time()
+                resp = await openai_client.responses.parse(
+                    model=model,
+                    input=[
+                        {"role": "system", "content": packed_system},
+                        {"role": "user", "content": user.strip()},
+                    ],
+                    text_format=packed_output_model(SingleStrandOutput),
+                    prompt_cache_key=prompt_cache_key(packed_system, topic),
+                )
+            return resp, time.time() - t0
+
+        try:
+            resp, latency = await retry.call(call)
+            parsed_obj = resp.output_parsed
+            parsed = parsed_obj.model_dump(mode="json") if hasattr(parsed_obj, "model_dump") else parsed_obj.dict()
+            answered = unpack_results(parsed, list(ids))
+            usage = usage_from_response(resp, latency_s=latency)
+        except Exception as e:
+            if debug:
+                print(f"[E42][STRANDS][PACK][{type(e).__name__}] size={len(ids)} kind={error_kind(e)} err={e}")
+
+        if debug:
+            print(f"[E42][STRANDS][PACK] size={len(ids)} answered={len(answered)} usage={usage}")
+
+        shares = dict(zip(ids, split_usage(usage, [estimate_tokens(need_blocks(it)) for it in pack_items])))
+        out: List[Optional[Dict[str, Any]]] = []
+        fallback = []
+        for iid, it in ids.items():
+            share = _enrich_usage_with_costs(shares[iid], pricing_per_million)
+            if iid in answered:
+                out.append(tag_result(it.get("need_id", ""), answered[iid], share))
+            else:
+                fallback.append((it, share))
+        for r, (_, share) in zip(await asyncio.gather(*[tag_one(it) for it, _ in fallback]), fallback):
+            # keep the wasted packed share on the bill of the single-call retry
+            out.append({**r, "usage": _merge_usage(share, r.get("usage") or {})} if isinstance(r, dict) else r)
+        return out
 
     out_tags: List[Dict[str, Any]] = []
 
@@ -1139,10 +1513,19 @@ Rules:
         if debug:
             print("\n" + "#" * 120)
             print(f"[E42][STRANDS][BATCH] {i//batch_size + 1} | items {i}..{i + len(chunk) - 1} | "
-                  f"batch_size={batch_size} concurrency={concurrency} pricing_in={pin} pricing_out={pout}")
+                  f"batch_size={batch_size} concurrency={concurrency} pricing={pricing_summary(pricing_per_million)}")
             print("#" * 120 + "\n")
 
-        results = await asyncio.gather(*[asyncio.create_task(tag_one(it)) for it in chunk])
+        if pack:
+            packs = pack_by_token_budget(
+                chunk,
+                size_of=lambda it: estimate_tokens(need_blocks(it)),
+                token_budget=pack_token_budget,
+                max_items=pack_max_items,
+            )
+            results = [r for rs in await asyncio.gather(*[asyncio.create_task(tag_pack(p)) for p in packs]) for r in rs]
+        else:
+            results = await asyncio.gather(*[asyncio.create_task(tag_one(it)) for it in chunk])
 
         for r in results:
             if isinstance(r, dict) and r.get("need_id"):
@@ -1150,15 +1533,16 @@ Rules:
                 u = r.get("usage") or {}
                 total_in_tokens += int(u.get("input_tokens", 0) or 0)
                 total_out_tokens += int(u.get("output_tokens", 0) or 0)
+                total_cached_tokens += int(u.get("cached_tokens", 0) or 0)
                 total_cost += float(u.get("total_cost", 0.0) or 0.0)
                 success += 1
             else:
                 failed += 1
 
         if debug:
-            batch_cost = (total_in_tokens / 1e6) * pin + (total_out_tokens / 1e6) * pout
             print(f"[E42][STRANDS][PROGRESS] success={success} failed={failed} "
-                  f"tokens_in={total_in_tokens} tokens_out={total_out_tokens} est_cost={batch_cost:.6f}")
+                  f"tokens_in={total_in_tokens} tokens_cached={total_cached_tokens} "
+                  f"tokens_out={total_out_tokens} est_cost={total_cost:.6f}")
 
     # map need_id -> {strand, confidence, reason}
     m: Dict[str, Any] = {}
@@ -1172,6 +1556,13 @@ Rules:
             "reason": (t.get("reason") or "").strip(),
         }
 
+    hedge = retry.hedge_summary(pricing_per_million)
+    if hedge is not None:
+        total_in_tokens += hedge["usage"]["input_tokens"]
+        total_out_tokens += hedge["usage"]["output_tokens"]
+        total_cached_tokens += hedge["usage"]["cached_tokens"]
+        total_cost += hedge["usage"]["total_cost"]
+
     summary = {
         "model": model,
         "total_needs": len(usable),
@@ -1179,8 +1570,11 @@ Rules:
         "failed": failed,
         "tokens_in": total_in_tokens,
         "tokens_out": total_out_tokens,
-        "estimated_cost": (total_in_tokens / 1e6) * pin + (total_out_tokens / 1e6) * pout,
-        "pricing_per_million": {"input_usd": pin, "output_usd": pout},
+        "tokens_cached": total_cached_tokens,
+        "estimated_cost": total_cost,
+        "pricing_per_million": pricing_summary(pricing_per_million),
+        "retry": retry.summary(),
+        "hedge": hedge,
     }
 
     if debug:
@@ -10,13 +10,47 @@ from src.graphs.cs25_graph.agent_langgraph.utils.state import AgentState
 
 from src.graphs.cs25_graph.utils import ManifestGraph, GraphOps
 
-import os, uuid, asyncio, time, random, json
-from typing import Dict, Any, List, Optional, Tuple, Callable, AsyncGenerator
+import uuid, asyncio, time, random, json
+from functools import lru_cache
+from typing import Dict, Any, List, Optional, Set, Tuple, Callable, AsyncGenerator
 from pydantic import BaseModel, Field
-from openai import AsyncOpenAI, APIStatusError
+from openai import AsyncOpenAI
 from langchain_openai import ChatOpenAI
 
 from src.graphs.cs25_graph.agent_langgraph.utils.progress_bus import emit as bus_emit
+from src.graphs.cs25_graph.agent_langgraph.utils.scan_options import ScanOptions
+from src.graphs.cs25_graph.agent_langgraph.utils.checkpoints import ScanCheckpoint
+from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+from src.graphs.cs25_graph.agent_langgraph.utils.hedging import hedger_for
+from src.graphs.cs25_graph.agent_langgraph.utils.retry import RetryPolicy, error_kind
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import cancel_tasks
+from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import Lane, lane_for, report_queue, MAX_INFLIGHT
+from src.graphs.cs25_graph.agent_langgraph.utils.compaction import (
+    CompactionPolicy, CompactionTally, compaction_policy, render_blocks,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.preflight import (
+    BudgetGuard, PreflightEstimator, budget_for, count_tokens, observe_run, project_run,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.scan_order import (
+    EarlyStop, bm25_index, query_similarity, rank_traces, remember_results,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.speculation import Speculation, open_speculation, take_speculation
+from src.graphs.cs25_graph.agent_langgraph.utils.sampling import estimate_relevant, stratified_sample
+from src.graphs.cs25_graph.agent_langgraph.utils.single_flight import coalesce, scan_fingerprint
+from src.graphs.cs25_graph.agent_langgraph.utils.usage import (
+    enrich_usage_with_costs as _enrich_usage_with_costs,
+    merge_usage as _merge_usage,
+    pricing_summary, usage_from_response, prompt_cache_key, UsageTally,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.bulk_jobs import (
+    BatchBackend, BulkJob, DEFAULT_POLL_S, batch_pricing, get_batch_backend,
+    parse_response_body, response_body, run_bulk_job,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.packing import (
+    estimate_tokens, pack_by_token_budget, pack_first_fit_decreasing, packed_output_model, unpack_results, split_usage,
+)
+from src.graphs.cs25_graph.corpus_embeddings import get_trace_index, embed_query, select_candidates
+from src.graphs.cs25_graph.agent_langgraph.utils.tools.recommend_sections_tool import stream_all_sections
 
 
 from langchain_core.messages import AIMessage
@@ -28,24 +62,27 @@ class AgentInputs(BaseModel):
     trace_block: str
     cites_block: str
     intents_block: str
+    compaction: Optional[Dict[str, Any]] = None   # per-block report when rendered under a CompactionPolicy
 
 class RelevanceResult(BaseModel):
     # You can change these fields any time. We won't hard-code them elsewhere.
     relevant: bool
     rationale: Optional[str] = Field(description="Rationale in one plain-English sentence, BLUF style <20 words. Start with 'Included because' or 'Excluded because'.")
 
-class AsyncAgent:
-    def __init__(self, model, api_key: Optional[str] = None):
-        self.model = model
-        self.client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+class ScoredRelevanceResult(RelevanceResult):
+    # cascade small tier: same decision plus a self-reported confidence used for escalation
+    confidence: float = Field(ge=0, le=1, description="0..1 confidence that the relevance decision is correct.")
 
-    async def run(self, query: str, inputs: AgentInputs) -> Dict[str, Any]:
-        """
-        Returns a stable envelope:
-          { run_id: str, response: <dict>, usage: {input_tokens, output_tokens, total_tokens} }
-        'response' mirrors your Pydantic schema (no hard-coded keys).
-        """
-        system = ("""
+class RelevanceDecision(BaseModel):
+    # two-stage mode, stage one: the decision alone (a handful of output tokens per trace)
+    relevant: bool
+    confidence: float = Field(ge=0, le=1, description="0..1 confidence that the relevance decision is correct.")
+
+class RelevanceRationale(BaseModel):
+    # two-stage mode, stage two: only for included or borderline traces
+    rationale: str = Field(description="Rationale in one plain-English sentence, BLUF style <20 words. Start with 'Included because' or 'Excluded because'.")
+
+_RELEVANCE_SYSTEM = ("""
 You are the world’s best CS-25 aircraft certification and systems engineer.
 
 Task:
@@ -74,42 +111,155 @@ Important:
 - NEVER mention or expose the internal classification labels (e.g., normative_requirement, scope_setter, condition_clause, etc.) in your output.
 - Use them only to guide your reasoning about relevance.
 """)
-        user_content = f"""
-<USER_QUERY>
-{query}
-</USER_QUERY>
 
-<TRACE>
+_PACKED_SUFFIX = """
+
+Batch mode:
+- You will receive several ITEMs, each with its own TRACE and INTENTS, all judged against the same USER QUERY.
+- Judge every ITEM independently and return exactly one result per ITEM, copying its id into item_id.
+"""
+
+_MULTI_QUERY_SUFFIX = """
+
+Multi-query mode:
+- You will receive several USER QUERIES, each with an id, and ONE TRACE with its INTENTS.
+- Judge the TRACE against every query independently and return exactly one result per query, copying the query id into item_id.
+"""
+
+def _query_block(query: str) -> str:
+    # everything up to and including this block is identical for every trace of a scan
+    return f"<USER_QUERY>\n{(query or '').strip()}\n</USER_QUERY>\n\n"
+
+def _queries_block(queries: Dict[str, str]) -> str:
+    # multi-query mode: all formulations up front, so the prefix is still shared by every trace of the run
+    body = "\n".join(f'<QUERY id="{qid}">\n{(q or "").strip()}\n</QUERY>' for qid, q in queries.items())
+    return f"<USER_QUERIES>\n{body}\n</USER_QUERIES>\n\n"
+
+def _item_blocks(inputs: AgentInputs) -> str:
+    #<CITATIONS>
+    #{inputs.cites_block or ""}
+    #</CITATIONS>
+    return f"""<TRACE>
 {inputs.trace_block or ""}
 </TRACE>
 
 <INTENTS>
 {inputs.intents_block or ""}
-</INTENTS>
-"""
-        #<CITATIONS>
-        #{inputs.cites_block or ""}
-        #</CITATIONS>
+</INTENTS>"""
+
+def _decision_block(relevant: bool) -> str:
+    # appended after the item, so the rationale call still shares the decision call's cached prefix
+    verdict = "RELEVANT" if relevant else "NOT RELEVANT"
+    return f"""
+
+<DECISION>
+{verdict}
+</DECISION>
+
+The decision above is final. Give only its rationale."""
+
+def _packed_block(blocks: Dict[str, str]) -> str:
+    return "\n\n".join(f'<ITEM id="{iid}">\n{b}\n</ITEM>' for iid, b in blocks.items())
+
+class AsyncAgent:
+    def __init__(self, model, api_key: Optional[str] = None, text_format=RelevanceResult):
+        self.model = model
+        self.text_format = text_format
+        self.client = get_async_openai(api_key)
+
+    async def run(self, query: str, inputs: AgentInputs) -> Dict[str, Any]:
+        """
+        Returns a stable envelope:
+          { run_id: str, response: <dict>, usage: {input_tokens, output_tokens, total_tokens} }
+        'response' mirrors your Pydantic schema (no hard-coded keys).
+        """
+        # shared prefix first (system + query, byte-identical for the whole scan), trace last
+        user_content = _query_block(query) + _item_blocks(inputs)
         # print(user_content)
+        t0 = time.time()
         resp = await self.client.responses.parse(
             model=self.model,
-            input=[{"role": "system", "content": system},
+            input=[{"role": "system", "content": _RELEVANCE_SYSTEM},
                    {"role": "user", "content": user_content}],
-            text_format=RelevanceResult,  # enforce schema
+            text_format=self.text_format,  # enforce schema
+            prompt_cache_key=prompt_cache_key(_RELEVANCE_SYSTEM, query),
         )
         # Convert parsed pydantic obj to plain dict (works v1/v2)
         parsed = resp.output_parsed.model_dump() if hasattr(resp.output_parsed, "model_dump") else resp.output_parsed.dict()
-        usage = {
-            "input_tokens":  resp.usage.input_tokens,
-            "output_tokens": resp.usage.output_tokens,
-            "total_tokens":  resp.usage.total_tokens,
-        }
+        usage = usage_from_response(resp, latency_s=time.time() - t0)
         return {
             "run_id": f"filter-{uuid.uuid4().hex[:8]}",
             "response": parsed,   # <- no schema keys hard-coded
             "usage": usage,       # <- raw token counts only
         }
 
+    async def explain(self, query: str, inputs: AgentInputs, relevant: bool) -> Dict[str, Any]:
+        """
+        Stage two of the two-stage mode: the rationale of a decision already made.
+        Same envelope as run(); 'response' is {rationale}.
+        """
+        user_content = _query_block(query) + _item_blocks(inputs) + _decision_block(relevant)
+        t0 = time.time()
+        resp = await self.client.responses.parse(
+            model=self.model,
+            input=[{"role": "system", "content": _RELEVANCE_SYSTEM},
+                   {"role": "user", "content": user_content}],
+            text_format=RelevanceRationale,
+            prompt_cache_key=prompt_cache_key(_RELEVANCE_SYSTEM, query),
+        )
+        parsed = resp.output_parsed.model_dump() if hasattr(resp.output_parsed, "model_dump") else resp.output_parsed.dict()
+        usage = usage_from_response(resp, latency_s=time.time() - t0)
+        return {
+            "run_id": f"explain-{uuid.uuid4().hex[:8]}",
+            "response": parsed,
+            "usage": usage,
+        }
+
+    async def run_packed(self, query: str, inputs: Dict[str, AgentInputs]) -> Dict[str, Any]:
+        """
+        Several traces in ONE call (shared system prompt + USER_QUERY).
+        Returns { run_id, responses: {item_id: <dict>}, usage: <whole call> }.
+        Items the model left out are simply absent from 'responses'.
+        """
+        user_content = _query_block(query) + _packed_block({iid: _item_blocks(inp) for iid, inp in inputs.items()})
+        t0 = time.time()
+        resp = await self.client.responses.parse(
+            model=self.model,
+            input=[{"role": "system", "content": _RELEVANCE_SYSTEM + _PACKED_SUFFIX},
+                   {"role": "user", "content": user_content}],
+            text_format=packed_output_model(self.text_format),
+            prompt_cache_key=prompt_cache_key(_RELEVANCE_SYSTEM + _PACKED_SUFFIX, query),
+        )
+        parsed = resp.output_parsed.model_dump() if hasattr(resp.output_parsed, "model_dump") else resp.output_parsed.dict()
+        usage = usage_from_response(resp, latency_s=time.time() - t0)
+        return {
+            "run_id": f"filter-{uuid.uuid4().hex[:8]}",
+            "responses": unpack_results(parsed, list(inputs.keys())),
+            "usage": usage,
+        }
+
+    async def run_multi(self, queries: Dict[str, str], inputs: AgentInputs) -> Dict[str, Any]:
+        """
+        One trace judged against several queries in ONE call (query ids as item ids).
+        Returns { run_id, responses: {query_id: <dict>}, usage: <whole call> }.
+        """
+        user_content = _queries_block(queries) + _item_blocks(inputs)
+        t0 = time.time()
+        resp = await self.client.responses.parse(
+            model=self.model,
+            input=[{"role": "system", "content": _RELEVANCE_SYSTEM + _MULTI_QUERY_SUFFIX},
+                   {"role": "user", "content": user_content}],
+            text_format=packed_output_model(self.text_format),
+            prompt_cache_key=prompt_cache_key(_RELEVANCE_SYSTEM + _MULTI_QUERY_SUFFIX, *queries.values()),
+        )
+        parsed = resp.output_parsed.model_dump() if hasattr(resp.output_parsed, "model_dump") else resp.output_parsed.dict()
+        usage = usage_from_response(resp, latency_s=time.time() - t0)
+        return {
+            "run_id": f"multi-{uuid.uuid4().hex[:8]}",
+            "responses": unpack_results(parsed, list(queries.keys())),
+            "usage": usage,
+        }
+
 # ------------------ Graph helpers ------------------
 def iter_trace_nodes(G) -> List[Dict[str, Any]]:
     out = []
@@ -125,113 +275,210 @@ def iter_trace_nodes(G) -> List[Dict[str, Any]]:
 def chunked(items: List[Any], size: int) -> List[List[Any]]:
     return [items[i:i+size] for i in range(0, len(items), size)]
 
-# ------------------ Cost helper (no schema dependence) ------------------
-def _enrich_usage_with_costs(usage: Dict[str, Any], pricing_per_million: Tuple[float, float]) -> Dict[str, Any]:
-    u = dict(usage or {})
-    pin, pout = pricing_per_million
-    in_tok  = int(u.get("input_tokens", 0) or 0)
-    out_tok = int(u.get("output_tokens", 0) or 0)
-    total   = int(u.get("total_tokens", in_tok + out_tok) or (in_tok + out_tok))
-    in_cost  = (in_tok  / 1_000_000.0) * pin
-    out_cost = (out_tok / 1_000_000.0) * pout
-    u.update({
-        "input_tokens": in_tok,
-        "output_tokens": out_tok,
-        "total_tokens": total,
-        "input_cost": in_cost,
-        "output_cost": out_cost,
-        "total_cost": in_cost + out_cost,
-    })
-    return u
+# per-trace annotations added by pre-LLM stages; copied verbatim onto the emitted item
+_ITEM_PASSTHROUGH_KEYS = ("prefilter_score", "section_uuid", "section_score", "ranked_position", "rank_score")
+
+def _item_extras(item: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: item[k] for k in _ITEM_PASSTHROUGH_KEYS if item.get(k) is not None}
+
+def _payload_tokens(p: AgentInputs) -> int:
+    return estimate_tokens(p.trace_block) + estimate_tokens(p.intents_block)
+
+def _trace_sizes(ops, traces: List[Dict[str, Any]], compaction: Optional[CompactionPolicy], model: str) -> Dict[str, int]:
+    """trace_uuid -> tokens of its per-trace prompt part (LPT sizing). Blocking; blocks and counts are memoized."""
+    return {
+        t["trace_uuid"]: count_tokens(_item_blocks(_payload_for(ops, t["bottom_uuid"], compaction)), model)
+        for t in traces if t.get("trace_uuid") and t.get("bottom_uuid")
+    }
+
+@lru_cache(maxsize=8192)
+def _payload_for(ops, bottom_uuid: str, compaction: Optional[CompactionPolicy] = None) -> AgentInputs:
+    """Rendered prompt blocks of one trace. The corpus is static, so pre-flight sizing and every later scan reuse them."""
+    bundle = ops.build_records_for_bottom(bottom_uuid)
+    tb = ops.format_trace_block(bundle["trace"], include_uuids=False, include_text=False)
+    ib, cb, report = render_blocks(
+        ops, bundle,
+        policy=compaction,
+        fields=["intent", "events", "summary"],  # what keys to include in the response?
+        include_levels=["section", "trace"],  # what intents to return - only for trace, or trace and section, or only for section?
+        citations=False,  # _item_blocks does not send <CITATIONS>
+    )
+    return AgentInputs(trace_block=tb, cites_block=cb, intents_block=ib, compaction=report)
 
 # ------------------ Retry wrapper (always returns the SAME envelope) ----------
-async def _call_with_retry(agent: AsyncAgent, query: str, payload: AgentInputs, *, max_retries=5) -> Dict[str, Any]:
+async def _call_with_retry(
+    agent: AsyncAgent,
+    query: str,
+    payload,
+    *,
+    packed: bool = False,
+    explain: Optional[bool] = None,
+    multi: bool = False,
+    retry: Optional[RetryPolicy] = None,
+) -> Dict[str, Any]:
     """
     Always returns:
       { run_id, response: <dict>, usage: {input_tokens, output_tokens, total_tokens} }
     On error, response={'error': '...'}, usage=0s — no schema keys are referenced.
+    packed=True: payload is {item_id: AgentInputs} and the envelope carries 'responses' instead.
+    explain=<relevant>: rationale call for that decision (two-stage mode).
+    multi=True: query is {query_id: text}, one trace against all of them ('responses' by query id).
+    retry: the run's shared RetryPolicy (a private one if omitted).
     """
-    delay = 0.6
-    for attempt in range(max_retries):
-        try:
-            return await agent.run(query, payload)
-        except APIStatusError as e:
-            code = getattr(e, "status_code", 0)
-            retryable = code in (429, 500, 502, 503, 504)
-            if retryable and attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            break
-        except Exception:
-            if attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            break
-    # unified error envelope:
-    return {
-        "run_id": f"filter-{uuid.uuid4().hex[:8]}",
-        "response": {"error": "agent_call_failed"},
-        "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
-    }
+    try:
+        if packed:
+            return await (retry or RetryPolicy()).call(lambda: agent.run_packed(query, payload))
+        if multi:
+            return await (retry or RetryPolicy()).call(lambda: agent.run_multi(query, payload))
+        if explain is not None:
+            return await (retry or RetryPolicy()).call(lambda: agent.explain(query, payload, explain))
+        return await (retry or RetryPolicy()).call(lambda: agent.run(query, payload))
+    except Exception as e:
+        # unified error envelope:
+        return {
+            "run_id": f"filter-{uuid.uuid4().hex[:8]}",
+            "response": {"error": "agent_call_failed", "error_kind": error_kind(e)},
+            **({"responses": {}} if packed or multi else {}),
+            "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
+        }
 
 # ------------------ ONE batch, fully parallel, as an event stream -----------
+_CONFIDENT_EXCLUSION_RATIONALE = "Excluded with high confidence; no rationale was requested for this trace."
+
 async def _stream_batch_parallel(
     batch_items: List[Dict[str, Any]],
     *,
     agent: AsyncAgent,
     ops,
     query: str,
-    pricing_per_million: Tuple[float, float],
+    pricing_per_million: Tuple[float, ...],
+    cascade: Optional[Dict[str, Any]] = None,
+    packing: Optional[Dict[str, int]] = None,
+    retry: Optional[RetryPolicy] = None,
+    budget: Optional[BudgetGuard] = None,
+    estimator: Optional[PreflightEstimator] = None,
+    compaction: Optional[CompactionPolicy] = None,
+    two_stage: Optional[Dict[str, Any]] = None,
+    stop: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    stopped: Optional[Dict[str, Any]] = None,
+    size_of: Optional[Callable[[Dict[str, Any]], int]] = None,
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
-    Yields events: batch_start, item_done, batch_progress, batch_end.
+    Yields events: batch_start, item_done, [item_update], batch_progress, batch_end.
     Each 'item_done' contains an 'item' object with:
       {
         run_id, trace_uuid, bottom_uuid, bottom_clause,
         response: <dict>,             # from your Pydantic schema (no hard-coding)
         usage: {tokens..., costs...}  # costs added here
+        cascade?: {tier, escalated, small_model, small_confidence}   # cascade mode only
+        packed?: {run_id, size}                                       # packed mode only
       }
+
+    cascade (optional): {"agent": <small AsyncAgent>, "pricing": (in, out), "confidence": float}.
+    The small tier answers first; `agent` (the large tier) is only called when the small tier
+    failed or reported confidence below the cut-off.
+
+    packing (optional): {"max_items": int, "token_budget": int}. First-tier calls are packed
+    several traces per request; traces missing from a packed response fall back to single calls.
+
+    budget (optional, with the run's estimator): every first-tier call is admitted against it;
+    refused traces come back with response {"error": "budget_exhausted"} and budget_skipped=True.
+
+    two_stage (optional): {"borderline": float}. The agents return decisions only ({relevant,
+    confidence}). Included traces, and excluded ones below the borderline confidence, go out with
+    rationale_status "pending" and get a follow-up rationale call, streamed as an 'item_update'
+    carrying the completed item (usage merged) and the follow-up's own usage. Confident
+    exclusions get a fixed rationale and rationale_status "not_requested".
+
+    stop (optional): called with every decided item; once it returns True the decisions still
+    queued or in flight are cancelled (rationale follow-ups still finish) and their traces are
+    put in `stopped["unscanned"]` for the caller to report.
+
+    size_of (optional): prompt tokens of a trace. Enables LPT scheduling: calls are started
+    largest first, and packs are built first-fit-decreasing on these sizes.
     """
+    stopped = stopped if stopped is not None else {}
     t0 = time.time()
     total = len(batch_items)
     done = 0
-    batch_in_tokens = 0
-    batch_out_tokens = 0
-    pin, pout = pricing_per_million
+    tally = UsageTally()
 
     yield {"type": "batch_start", "ts": time.time(), "size": total}
 
-    async def one(item: Dict[str, Any]) -> Dict[str, Any]:
-        if not item.get("bottom_uuid"):
-            # fabricate a minimal item using the same envelope shapes
-            usage = _enrich_usage_with_costs({"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}, pricing_per_million)
-            return {
-                "run_id": f"filter-{uuid.uuid4().hex[:8]}",
-                "trace_uuid": item.get("trace_uuid"),
-                "bottom_uuid": item.get("bottom_uuid"),
-                "bottom_clause": item.get("bottom_clause"),
-                "response": {"error": "missing bottom_uuid"},
-                "usage": usage,
-            }
+    first_agent = cascade["agent"] if cascade else agent
+    first_pricing = cascade["pricing"] if cascade else pricing_per_million
 
-        # Build blocks
-        bundle = ops.build_records_for_bottom(item["bottom_uuid"])
-        tb = ops.format_trace_block(bundle["trace"], include_uuids=False, include_text=False)
-        cb = ops.format_citations_block(bundle["trace"], bundle["cites"], include_uuids=False)
-        ib = ops.format_intents_block(
-            bundle["trace"], bundle["intents"],
-            fields=["intent", "events", "summary"],  # what keys to include in the response?
-            include_uuids=False,
-            include_levels=["section", "trace"]  # what intents to return - only for trace, or trace and section, or only for section?
-        )
-        payload = AgentInputs(trace_block=tb, cites_block=cb, intents_block=ib)
+    def missing(item: Dict[str, Any]) -> Dict[str, Any]:
+        # fabricate a minimal item using the same envelope shapes
+        usage = _enrich_usage_with_costs({"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}, pricing_per_million)
+        return {
+            "run_id": f"filter-{uuid.uuid4().hex[:8]}",
+            "trace_uuid": item.get("trace_uuid"),
+            "bottom_uuid": item.get("bottom_uuid"),
+            "bottom_clause": item.get("bottom_clause"),
+            "response": {"error": "missing bottom_uuid"},
+            "usage": usage,
+            **_item_extras(item),
+        }
+
+    def build_payload(item: Dict[str, Any]) -> AgentInputs:
+        return _payload_for(ops, item["bottom_uuid"], compaction)
+
+    def over_budget(item: Dict[str, Any]) -> Dict[str, Any]:
+        usage = _enrich_usage_with_costs({"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}, pricing_per_million)
+        return {
+            "run_id": f"budget-{uuid.uuid4().hex[:8]}",
+            "trace_uuid": item.get("trace_uuid"),
+            "bottom_uuid": item.get("bottom_uuid"),
+            "bottom_clause": item.get("bottom_clause"),
+            "response": {"error": "budget_exhausted"},
+            "usage": usage,
+            "budget_skipped": True,
+            **_item_extras(item),
+        }
+
+    async def within_budget(items: List[Dict[str, Any]], system: str, body: str, call) -> List[Dict[str, Any]]:
+        """Reserve the call's projected cost before sending it; once the budget is spent, items come back unscanned."""
+        if budget is None:
+            return await call()
+        cost = estimator.call_cost(system + _query_block(query), body, items=len(items))
+        if not budget.admit(cost):
+            return [over_budget(it) for it in items]
+        try:
+            out = await call()
+        except asyncio.CancelledError:  # early stop / client gone: release the reservation
+            budget.settle(cost, 0.0)
+            raise
+        budget.settle(cost, sum(float((o.get("usage") or {}).get("total_cost", 0.0) or 0.0) for o in out))
+        return out
 
-        # Agent call (stable envelope)
-        res = await _call_with_retry(agent, query, payload)
-        # enrich usage with costs (no schema knowledge)
-        enriched_usage = _enrich_usage_with_costs(res.get("usage") or {}, pricing_per_million)
+    async def decide(item: Dict[str, Any], payload: AgentInputs, first: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Run the (cascaded) decision for one trace. `first` is a pre-computed first-tier envelope (packed mode)."""
+        cascade_info: Optional[Dict[str, Any]] = None
+        if cascade:
+            small = first or await _call_with_retry(cascade["agent"], query, payload, retry=retry)
+            small_usage = _enrich_usage_with_costs(small.get("usage") or {}, cascade["pricing"])
+            small_resp = small.get("response") or {}
+            conf = small_resp.get("confidence")
+            confident = isinstance(conf, (int, float)) and conf >= cascade["confidence"] and "error" not in small_resp
+            cascade_info = {
+                "tier": "small" if confident else "large",
+                "escalated": not confident,
+                "small_model": cascade["agent"].model,
+                "small_confidence": conf,
+            }
+            if confident:
+                res, enriched_usage = small, small_usage
+            else:
+                res = await _call_with_retry(agent, query, payload, retry=retry)
+                cascade_info["large_model"] = agent.model
+                cascade_info["small_relevant"] = small_resp.get("relevant")
+                enriched_usage = _merge_usage(small_usage, _enrich_usage_with_costs(res.get("usage") or {}, pricing_per_million))
+        else:
+            # Agent call (stable envelope)
+            res = first or await _call_with_retry(agent, query, payload, retry=retry)
+            # enrich usage with costs (no schema knowledge)
+            enriched_usage = _enrich_usage_with_costs(res.get("usage") or {}, pricing_per_million)
         # assemble item (no schema knowledge)
         return {
             "run_id": res.get("run_id"),
@@ -240,49 +487,464 @@ async def _stream_batch_parallel(
             "bottom_clause": item.get("bottom_clause"),
             "response": res.get("response") or {},
             "usage": enriched_usage,
+            **({"cascade": cascade_info} if cascade_info else {}),
+            **({"packed": res["packed"]} if res.get("packed") else {}),
+            **_item_extras(item),
         }
 
-    tasks = [asyncio.create_task(one(it)) for it in batch_items]
+    async def one(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not item.get("bottom_uuid"):
+            return [missing(item)]
+        payload = build_payload(item)
 
-    for fut in asyncio.as_completed(tasks):
-        item_obj = await fut
-        u = item_obj.get("usage") or {}
-        batch_in_tokens  += int(u.get("input_tokens", 0) or 0)
-        batch_out_tokens += int(u.get("output_tokens", 0) or 0)
-        done += 1
+        async def call() -> List[Dict[str, Any]]:
+            return [await decide(item, payload)]
+        return await within_budget([item], _RELEVANCE_SYSTEM, _item_blocks(payload), call)
+
+    async def one_pack(entries: List[Tuple[Dict[str, Any], AgentInputs]]) -> List[Dict[str, Any]]:
+        ids = {f"T{i}": e for i, e in enumerate(entries, start=1)}
+        body = _packed_block({iid: _item_blocks(p) for iid, (_, p) in ids.items()})
+        return await within_budget([it for it, _ in entries], _RELEVANCE_SYSTEM + _PACKED_SUFFIX, body, lambda: run_pack(ids))
+
+    async def run_pack(ids: Dict[str, Tuple[Dict[str, Any], AgentInputs]]) -> List[Dict[str, Any]]:
+        res = await _call_with_retry(first_agent, query, {iid: p for iid, (_, p) in ids.items()}, packed=True, retry=retry)
+        answered = res.get("responses") or {}
+        # the call's usage is shared across all packed items in proportion to their prompt size
+        shares = dict(zip(ids, split_usage(res.get("usage") or {}, [_payload_tokens(p) for _, p in ids.values()])))
+        pack_info = {"run_id": res.get("run_id"), "size": len(ids), "answered": len(answered)}
+
+        async def fallback(item: Dict[str, Any], payload: AgentInputs, share: Dict[str, Any]) -> Dict[str, Any]:
+            obj = await decide(item, payload)  # single call; keep the wasted packed share on the bill
+            obj["usage"] = _merge_usage(_enrich_usage_with_costs(share, first_pricing), obj["usage"])
+            return obj
+
+        # answered items reuse the packed result (escalating if needed); the rest fall back to single calls
+        out: List[Any] = []
+        for iid, (item, payload) in ids.items():
+            if iid in answered:
+                first = {"run_id": res.get("run_id"), "response": answered[iid], "usage": shares[iid], "packed": pack_info}
+                out.append(decide(item, payload, first=first))
+            else:
+                out.append(fallback(item, payload, shares[iid]))
+        return list(await asyncio.gather(*out))
 
-        # emit the actual result right away
+    def wants_rationale(item_obj: Dict[str, Any]) -> bool:
+        resp = item_obj.get("response") or {}
+        if "error" in resp or not item_obj.get("bottom_uuid"):
+            return False
+        conf = resp.get("confidence")
+        return bool(resp.get("relevant")) or not isinstance(conf, (int, float)) or conf < two_stage["borderline"]
+
+    async def explain(item_obj: Dict[str, Any]) -> Dict[str, Any]:
+        """Stage two for one decided trace: the rationale, by the tier that made the decision."""
+        tier_small = cascade is not None and (item_obj.get("cascade") or {}).get("tier") == "small"
+        explainer, explainer_pricing = (cascade["agent"], cascade["pricing"]) if tier_small else (agent, pricing_per_million)
+        payload = build_payload(item_obj)
+        relevant = bool((item_obj.get("response") or {}).get("relevant"))
+        resp: Dict[str, Any] = {}
+        usage = _enrich_usage_with_costs({}, explainer_pricing)
+        status = "budget_exhausted"
+        cost = estimator.call_cost(_RELEVANCE_SYSTEM + _query_block(query), _item_blocks(payload)) if budget is not None else 0.0
+        if budget is None or budget.admit(cost):
+            res = await _call_with_retry(explainer, query, payload, explain=relevant, retry=retry)
+            resp = res.get("response") or {}
+            usage = _enrich_usage_with_costs(res.get("usage") or {}, explainer_pricing)
+            status = "failed" if "error" in resp else "done"
+            if budget is not None:
+                budget.settle(cost, float(usage.get("total_cost", 0.0) or 0.0))
+        return {
+            **item_obj,
+            "response": {**(item_obj.get("response") or {}), "rationale": resp.get("rationale")},
+            "usage": _merge_usage(item_obj.get("usage") or {}, usage),
+            "rationale_status": status,
+            "rationale_usage": usage,
+        }
+
+    if packing:
+        single = [it for it in batch_items if not it.get("bottom_uuid")]
+        entries = [(it, build_payload(it)) for it in batch_items if it.get("bottom_uuid")]
+        packer = pack_first_fit_decreasing if size_of else pack_by_token_budget
+        packs = packer(
+            entries,
+            size_of=(lambda e: size_of(e[0])) if size_of else (lambda e: _payload_tokens(e[1])),
+            token_budget=packing["token_budget"],
+            max_items=packing["max_items"],
+        )
+        units = [([it], one(it)) for it in single] + [([it for it, _ in p], one_pack(p)) for p in packs]
+    else:
+        units = [([it], one(it)) for it in batch_items]
+    if size_of:
+        # LPT: the longest calls start first, so the wave does not end waiting on a late long one
+        units.sort(key=lambda u: -sum(size_of(it) for it in u[0]))
+    task_items = {asyncio.create_task(coro): items for items, coro in units}  # traces each task decides
+    tasks = list(task_items)
+
+    def progress() -> Dict[str, Any]:
+        return {
+            "type": "batch_progress",
+            "ts": time.time(),
+            "done": done,
+            "total": total,
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
+            "batch_cost": tally.cost,
+            "cache": tally.cache(),
+            "elapsed_s": time.time() - t0,
+        }
+
+    # decisions and (two-stage) rationale follow-ups complete in any order; both stream as they land
+    followups: Set[asyncio.Task] = set()
+    pending = set(tasks)
+    try:
+        while pending:
+            finished, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for fut in finished:
+                if fut in followups:
+                    item_obj = fut.result()
+                    usage = item_obj.pop("rationale_usage")
+                    tally.add(usage)
+                    yield {"type": "item_update", "ts": time.time(), "done": done, "total": total, "item": item_obj, "usage": usage}
+                    yield progress()
+                    continue
+
+                for item_obj in fut.result():  # a packed task completes several traces at once
+                    tally.add(item_obj.get("usage") or {})
+                    done += 1
+
+                    if two_stage and not item_obj.get("budget_skipped"):
+                        resp = item_obj.setdefault("response", {})
+                        if wants_rationale(item_obj):
+                            resp["rationale"] = None
+                            item_obj["rationale_status"] = "pending"
+                            followup = asyncio.create_task(explain(dict(item_obj)))
+                            followups.add(followup)
+                            pending.add(followup)
+                        elif "error" not in resp:
+                            resp["rationale"] = _CONFIDENT_EXCLUSION_RATIONALE
+                            item_obj["rationale_status"] = "not_requested"
+
+                    # emit the actual result right away
+                    yield {
+                        "type": "item_done",
+                        "ts": time.time(),
+                        "done": done,
+                        "total": total,
+                        "item": item_obj,  # <-- your UI consumes this; it already has all fields
+                    }
+
+                    # also a lightweight progress tick
+                    yield progress()
+
+                    if stop is not None and "unscanned" not in stopped and stop(item_obj):
+                        # stop dispatching: queued and in-flight decisions are dropped, follow-ups finish
+                        dropped = [t for t in pending if t in task_items]
+                        await cancel_tasks(dropped)
+                        pending.difference_update(dropped)
+                        stopped["unscanned"] = [it for t in dropped for it in task_items[t]]
+    finally:
+        # cancelled consumer (client gone) → stop in-flight calls and retry sleeps too
+        await cancel_tasks([*tasks, *followups])
+
+    elapsed = time.time() - t0
+    yield {
+        "type": "batch_end",
+        "ts": time.time(),
+        "elapsed_s": elapsed,
+        "tokens_in": tally.tokens_in,
+        "tokens_out": tally.tokens_out,
+        "tokens_cached": tally.tokens_cached,
+        "batch_cost": tally.cost,
+        "cache": tally.cache(),
+        "size": total,
+    }
+
+# ------------------ Embedding prefilter (pre-LLM) ---------------------------
+_PREFILTER_RATIONALE = "Excluded because its embedding similarity to the query fell below the prefilter cut-off."
+_EMBED_PRICE_PER_MILLION = 0.02  # text-embedding-3-small
+
+async def _prefilter_traces(
+    traces: List[Dict[str, Any]],
+    *,
+    mg,
+    client: AsyncOpenAI,
+    query: str,
+    options: ScanOptions,
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Split traces into (candidates, prefiltered, report) using the persisted trace embeddings.
+    Never drops a trace it cannot score: traces missing from the index stay candidates,
+    and any failure (no index, stale index, embedding call error) disables the prefilter.
+    """
+    t0 = time.time()
+    report: Dict[str, Any] = {"enabled": False, "embed_model": options.embed_model}
+
+    index, status = get_trace_index(mg, options.embed_model) if mg is not None else (None, "no_manifest")
+    if index is None:
+        report["reason"] = f"index_{status}"
+        return traces, [], report
+
+    try:
+        qvec, q_tokens = await embed_query(client, query, embed_model=options.embed_model)
+    except Exception as e:
+        report["reason"] = f"query_embedding_failed: {type(e).__name__}"
+        return traces, [], report
+
+    scores = index.scores_for(qvec, (t.get("trace_uuid") for t in traces))
+    keep, cut = select_candidates(
+        scores,
+        top_k=options.prefilter_top_k,
+        threshold=options.prefilter_threshold,
+        recall_margin=options.prefilter_recall_margin,
+        min_candidates=options.prefilter_min_candidates,
+    )
+
+    candidates: List[Dict[str, Any]] = []
+    dropped: List[Dict[str, Any]] = []
+    for t in traces:
+        tid = t.get("trace_uuid")
+        scored = {**t, "prefilter_score": scores[tid]} if tid in scores else t
+        if tid in scores and tid not in keep:
+            dropped.append(scored)
+        else:
+            candidates.append(scored)
+
+    report.update({
+        "enabled": True,
+        "scored": len(scores),
+        "unscored": len(traces) - len(scores),
+        "candidates": len(candidates),
+        "prefiltered": len(dropped),
+        "query_embed_tokens": q_tokens,
+        "query_embed_cost": (q_tokens / 1e6) * _EMBED_PRICE_PER_MILLION,
+        "elapsed_s": time.time() - t0,
+        **cut,
+    })
+    return candidates, dropped, report
+
+
+async def _stream_skipped(
+    items: List[Dict[str, Any]],
+    *,
+    flag: str,
+    rationale: str,
+    pricing_per_million: Tuple[float, ...],
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Emit traces that never reach the LLM in the same batch/item_done shape as LLM results
+    (zero usage, relevant=False). `flag` names the stage that skipped them, e.g. "prefiltered".
+    """
+    t0 = time.time()
+    total = len(items)
+    yield {"type": "batch_start", "ts": time.time(), "size": total, flag: True}
+    for done, it in enumerate(items, start=1):
         yield {
             "type": "item_done",
             "ts": time.time(),
             "done": done,
             "total": total,
-            "item": item_obj,  # <-- your UI consumes this; it already has all fields
+            "item": {
+                "run_id": f"{flag}-{uuid.uuid4().hex[:8]}",
+                "trace_uuid": it.get("trace_uuid"),
+                "bottom_uuid": it.get("bottom_uuid"),
+                "bottom_clause": it.get("bottom_clause"),
+                "response": {"relevant": False, "rationale": rationale},
+                "usage": _enrich_usage_with_costs({"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}, pricing_per_million),
+                flag: True,
+                **_item_extras(it),
+            },
         }
+    yield {
+        "type": "batch_end",
+        "ts": time.time(),
+        "elapsed_s": time.time() - t0,
+        "tokens_in": 0,
+        "tokens_out": 0,
+        "batch_cost": 0.0,
+        "size": total,
+        flag: True,
+    }
 
-        # also a lightweight progress tick
+async def _stream_replayed(items: List[Dict[str, Any]]) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Replay item_done results checkpointed by an interrupted run (resume_run_id), unchanged
+    apart from a `replayed` flag; their usage was paid by the earlier run. Decisions kept from a
+    speculative start (made on the raw message, not the topic) also carry `speculative`, and
+    items reused from a preview (made on the preview's query) carry `preview`.
+    """
+    t0 = time.time()
+    total = len(items)
+    yield {"type": "batch_start", "ts": time.time(), "size": total, "replayed": True}
+    for done, it in enumerate(items, start=1):
         yield {
-            "type": "batch_progress",
+            "type": "item_done",
             "ts": time.time(),
             "done": done,
             "total": total,
-            "tokens_in": batch_in_tokens,
-            "tokens_out": batch_out_tokens,
-            "batch_cost": (batch_in_tokens/1e6)*pin + (batch_out_tokens/1e6)*pout,
-            "elapsed_s": time.time() - t0,
+            "replayed": True,
+            "speculative": bool(it.get("speculative")),
+            "preview": bool(it.get("preview")),
+            "item": {**it, "replayed": True},
         }
-
-    elapsed = time.time() - t0
     yield {
         "type": "batch_end",
         "ts": time.time(),
-        "elapsed_s": elapsed,
-        "tokens_in": batch_in_tokens,
-        "tokens_out": batch_out_tokens,
-        "batch_cost": (batch_in_tokens/1e6)*pin + (batch_out_tokens/1e6)*pout,
+        "elapsed_s": time.time() - t0,
+        "tokens_in": 0,
+        "tokens_out": 0,
+        "batch_cost": 0.0,
         "size": total,
+        "replayed": True,
+    }
+
+# ------------------ Relevance-first ordering (pre-LLM) -----------------------
+_EARLY_STOP_RATIONALE = "Not scanned: the scan stopped early (top-K reached or remaining traces unlikely to be relevant)."
+async def _order_traces(
+    traces: List[Dict[str, Any]],
+    *,
+    mg,
+    ops,
+    client: AsyncOpenAI,
+    query: str,
+    options: ScanOptions,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Rank the traces about to be dispatched (see scan_order.rank_traces). Embedding scores come
+    from the prefilter when it ran, else from one query embedding against the trace index;
+    without an index the ranking falls back to BM25. Never fails the scan: on error the graph
+    order is kept.
+    """
+    report: Dict[str, Any] = {"enabled": False, "prior": options.order_prior}
+    emb: Dict[str, float] = {t["trace_uuid"]: t["prefilter_score"] for t in traces if t.get("prefilter_score") is not None}
+    if not emb and options.order_prior in ("auto", "embedding", "hybrid") and mg is not None:
+        index, status = get_trace_index(mg, options.embed_model)
+        if index is None:
+            report["embedding"] = f"index_{status}"
+        else:
+            try:
+                qvec, q_tokens = await embed_query(client, query, embed_model=options.embed_model)
+                emb = index.scores_for(qvec, (t.get("trace_uuid") for t in traces))
+                report["query_embed_cost"] = (q_tokens / 1e6) * _EMBED_PRICE_PER_MILLION
+            except Exception as e:
+                report["embedding"] = f"query_embedding_failed: {type(e).__name__}"
+
+    try:
+        ranked, ranked_report = await asyncio.to_thread(
+            rank_traces, traces,
+            query=query, ops=ops, prior=options.order_prior,
+            embedding_scores=emb, use_history=options.order_use_history,
+        )
+    except Exception as e:
+        report["reason"] = f"ranking_failed: {type(e).__name__}"
+        return traces, report
+    return ranked, {**report, **ranked_report}
+
+# ------------------ Hierarchical pass: score Sections, prune their Traces ----
+_SECTION_PRUNED_RATIONALE = "Excluded because its parent section scored below the section relevance threshold."
+
+async def _stream_section_pass(
+    traces: List[Dict[str, Any]],
+    *,
+    G,
+    ops,
+    query: str,
+    model: str,
+    options: ScanOptions,
+    pricing_per_million: Tuple[float, ...],
+    out: Dict[str, Any],
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Score only the Sections that own the given traces (stream_all_sections), re-emitting
+    its events as section_* so the UI can paint section scores while we wait.
+
+    Fills `out` with: kept, pruned (trace lists) and report.
+    Traces without an owning Section, and Sections whose call failed, are always kept.
+    """
+    trace_to_section = ops.map_traces_to_ancestor("Section")
+    owners = {trace_to_section.get(t.get("trace_uuid")) for t in traces} - {None}
+
+    scores: Dict[str, float] = {}
+    tally = UsageTally()
+    async for evt in stream_all_sections(
+        G, ops,
+        topic=query,
+        model=options.section_model or model,
+        batch_size=options.section_batch_size,
+        pricing_per_million=pricing_per_million,
+        section_uuids=owners,
+    ):
+        if evt.get("type") == "item_done":
+            it = evt.get("item") or {}
+            resp = it.get("response") or {}
+            if isinstance(resp.get("score"), (int, float)):
+                scores[it.get("section_uuid")] = float(resp["score"])
+            tally.add(it.get("usage") or {})
+        yield {**evt, "type": f"section_{evt.get('type')}"}
+
+    kept: List[Dict[str, Any]] = []
+    pruned: List[Dict[str, Any]] = []
+    for t in traces:
+        sid = trace_to_section.get(t.get("trace_uuid"))
+        score = scores.get(sid) if sid else None
+        row = {**t, "section_uuid": sid, "section_score": score} if sid else t
+        if score is not None and score < options.section_threshold:
+            pruned.append(row)
+        else:
+            kept.append(row)
+
+    out["kept"], out["pruned"] = kept, pruned
+    out["report"] = {
+        "enabled": True,
+        "section_threshold": options.section_threshold,
+        "sections_scored": len(scores),
+        "sections_total": len(owners),
+        "sections_kept": sum(1 for s in scores.values() if s >= options.section_threshold),
+        "traces_kept": len(kept),
+        "traces_pruned": len(pruned),
+        "tokens_in": tally.tokens_in,
+        "tokens_out": tally.tokens_out,
+        "tokens_cached": tally.tokens_cached,
+        "cost": tally.cost,
     }
 
+# ------------------ Pre-flight packing layout ------------------------------
+def _preflight_packs(query: str, options: ScanOptions):
+    """Group one batch's rendered prompts the way _stream_batch_parallel packs them."""
+    prefix = _RELEVANCE_SYSTEM + _PACKED_SUFFIX + _query_block(query)
+
+    def pack(rendered: List[Tuple[str, str]]) -> List[Tuple[str, str, int]]:
+        packs = pack_by_token_budget(
+            [body for _, body in rendered],
+            size_of=estimate_tokens,
+            token_budget=options.pack_token_budget,
+            max_items=options.pack_max_items,
+        )
+        return [(prefix, _packed_block({f"T{i}": b for i, b in enumerate(p, start=1)}), len(p)) for p in packs]
+    return pack
+
+# ------------------ Per-run LLM layout (shared by the scan and its preview) ---
+def _llm_setup(agent: AsyncAgent, model: str, pricing_per_million: Tuple[float, ...], options: ScanOptions):
+    """(llm_agent, llm_pricing, cascade, packing, two_stage) as _stream_batch_parallel takes them."""
+    decision_format = RelevanceDecision if options.two_stage else RelevanceResult
+    # cascade: the large tier replaces the default agent; the small tier answers first
+    cascade: Optional[Dict[str, Any]] = None
+    llm_agent, llm_pricing = agent, pricing_per_million
+    if options.cascade:
+        llm_agent = AsyncAgent(model=options.cascade_large_model or model, text_format=decision_format)
+        llm_pricing = tuple(options.cascade_large_pricing or pricing_per_million)
+        cascade = {
+            "agent": AsyncAgent(
+                model=options.cascade_small_model,
+                text_format=RelevanceDecision if options.two_stage else ScoredRelevanceResult,
+            ),
+            "pricing": tuple(options.cascade_small_pricing),
+            "confidence": options.cascade_confidence,
+        }
+
+    packing = {"max_items": options.pack_max_items, "token_budget": options.pack_token_budget} if options.pack else None
+    two_stage = {"borderline": options.two_stage_borderline} if options.two_stage else None
+    return llm_agent, llm_pricing, cascade, packing, two_stage
+
 # ------------------ Whole run as an async **event stream** -------------------
 async def stream_all_traces(
     G,
@@ -292,13 +954,27 @@ async def stream_all_traces(
     model: str = "gpt-4o-mini",
     batch_size: int = 200,
     limit: Optional[int] = None,
-    pricing_per_million: Tuple[float, float] = (0.15, 0.60),
+    pricing_per_million: Tuple[float, ...] = (0.15, 0.075, 0.60),
     selected_trace_ids: Optional[List[str]] = None,   # <-- NEW
+    options: Optional[ScanOptions] = None,
+    mg=None,                                          # ManifestGraph; needed for corpus artefacts (embeddings)
+    completed: Optional[Dict[str, Dict[str, Any]]] = None,  # trace_uuid -> checkpointed item (resume)
+    lane: Optional[Lane] = None,                            # fair-share scheduler slot (the caller's tab)
+    budget: Optional[BudgetGuard] = None,                   # run / tab spend cap (see budget_for)
 ) -> AsyncGenerator[Dict[str, Any], None]:
     """
     Yields events for the entire run:
-      run_start, batch_header, (batch_*...), run_end
+      run_start,
+      [replayed batch],                                      # completed (resumed run)
+      [prefiltered batch],                                   # options.prefilter
+      [section_* sweep, section_pruning, section_pruned batch],  # options.scan_mode == "hierarchical"
+      [scan_order],                                          # options.order == "relevance" (or top-K / early stop)
+      batch_header, (batch_*...),
+      [early_stopped batch],                                 # top-K / early stop fired
+      run_end
     """
+    options = options or ScanOptions()
+
     # original list in graph order
     all_traces = iter_trace_nodes(G)
 
@@ -311,41 +987,219 @@ async def stream_all_traces(
         all_traces = all_traces[:limit]
 
     total_traces = len(all_traces)
-    batches = chunked(all_traces, batch_size)
-    num_batches = len(batches)
+    # two-stage: every tier returns a bare decision; rationales follow for the traces that need one
+    decision_format = RelevanceDecision if options.two_stage else RelevanceResult
+    agent = AsyncAgent(model=model, text_format=decision_format)
+
+    # resume: traces finished by the interrupted run are replayed, not re-scanned
+    replayed: List[Dict[str, Any]] = []
+    if completed:
+        replayed = [completed[t["trace_uuid"]] for t in all_traces if t.get("trace_uuid") in completed]
+        all_traces = [t for t in all_traces if t.get("trace_uuid") not in completed]
+
+    prefiltered: List[Dict[str, Any]] = []
+    prefilter_report: Dict[str, Any] = {"enabled": False}
+    if options.prefilter and all_traces:
+        all_traces, prefiltered, prefilter_report = await _prefilter_traces(
+            all_traces, mg=mg, client=agent.client, query=query, options=options,
+        )
+
+    hierarchical = options.scan_mode == "hierarchical"
+
+    # pre-flight: size every rendered prompt of the first tier (the one every trace goes through)
+    first_model = options.cascade_small_model if options.cascade else model
+    first_pricing = tuple(options.cascade_small_pricing) if options.cascade else tuple(pricing_per_million)
+    pipeline = "relevance.two_stage" if options.two_stage else "relevance"   # separate output-token priors
+    estimator = PreflightEstimator(
+        pipeline=pipeline, model=first_model, pricing_per_million=first_pricing,
+        concurrency=min(batch_size, MAX_INFLIGHT),
+    )
+    policy = compaction_policy(options)
+    sampled_compaction = CompactionTally(policy)
+
+    def render(t: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        if not t.get("bottom_uuid"):
+            return None
+        payload = _payload_for(ops, t["bottom_uuid"], policy)
+        sampled_compaction.add_payload(payload.compaction)
+        return _RELEVANCE_SYSTEM + _query_block(query), _item_blocks(payload)
+
+    preflight: Optional[Dict[str, Any]] = None
+    if options.preflight_enabled and all_traces:
+        preflight = await asyncio.to_thread(
+            project_run, estimator, all_traces,
+            render=render,
+            batch_size=batch_size,
+            sample_max=options.preflight_sample,
+            pack=_preflight_packs(query, options) if options.pack else None,
+        )
+        preflight["upper_bound"] = hierarchical   # the section sweep may still prune traces
+        preflight["cascade_escalations_excluded"] = bool(options.cascade)
+        preflight["compaction"] = sampled_compaction.summary()
 
     yield {
         "type": "run_start",
         "ts": time.time(),
         "model": model,
         "query": query,
+        "scan_mode": options.scan_mode,
         "total_traces": total_traces,   # <-- now reflects selection
+        "llm_traces": len(all_traces),  # upper bound in hierarchical mode (see section_pruning)
         "batch_size": batch_size,
-        "num_batches": num_batches,
-        "pricing_per_million": {"input_usd": pricing_per_million[0], "output_usd": pricing_per_million[1]},
+        "num_batches": len(chunked(all_traces, batch_size)),
+        "pricing_per_million": pricing_summary(pricing_per_million),
+        "prefilter": prefilter_report,
+        "resumed": len(replayed),
+        "speculative": sum(1 for it in replayed if it.get("speculative")),
+        "preview": sum(1 for it in replayed if it.get("preview")),
+        "preflight": preflight,
+        "budget": budget.summary() if budget else None,
     }
 
-    agent = AsyncAgent(model=model)
-    total_in_tokens = 0
-    total_out_tokens = 0
+    if replayed:
+        async for evt in _stream_replayed(replayed):
+            yield evt
+
+    if prefiltered:
+        async for evt in _stream_skipped(prefiltered, flag="prefiltered", rationale=_PREFILTER_RATIONALE,
+                                         pricing_per_million=pricing_per_million):
+            yield evt
+
+    section_pruned: List[Dict[str, Any]] = []
+    section_report: Dict[str, Any] = {"enabled": False}
+    if hierarchical and all_traces:
+        sec_out: Dict[str, Any] = {}
+        async for evt in _stream_section_pass(
+            all_traces, G=G, ops=ops, query=query, model=model, options=options,
+            pricing_per_million=pricing_per_million, out=sec_out,
+        ):
+            yield evt
+        all_traces, section_pruned, section_report = sec_out["kept"], sec_out["pruned"], sec_out["report"]
+        yield {"type": "section_pruning", "ts": time.time(), **section_report}
+
+        if section_pruned:
+            async for evt in _stream_skipped(section_pruned, flag="section_pruned", rationale=_SECTION_PRUNED_RATIONALE,
+                                             pricing_per_million=pricing_per_million):
+                yield evt
+
+    # relevance-first: the likeliest hits are dispatched (and answered) first
+    # (top-K / early stop only make sense on a ranked scan, so they rank too)
+    early_stop: Optional[EarlyStop] = None
+    if options.top_k or options.stop_expected_relevance is not None:
+        early_stop = EarlyStop(top_k=options.top_k, min_expected=options.stop_expected_relevance, window=options.stop_window)
+    order_report: Dict[str, Any] = {"enabled": False}
+    if (options.order == "relevance" or early_stop) and all_traces:
+        all_traces, order_report = await _order_traces(
+            all_traces, mg=mg, ops=ops, client=agent.client, query=query, options=options,
+        )
+        yield {"type": "scan_order", "ts": time.time(), **order_report}
+
+    # LPT: size every prompt (tokenizer, memoized) and dispatch the largest first, run-wide, so
+    # each batch holds similar sizes and no batch waits on one long straggler
+    schedule_report: Dict[str, Any] = {"mode": "arrival"}
+    size_of: Optional[Callable[[Dict[str, Any]], int]] = None
+    if options.schedule == "lpt" and not order_report.get("enabled") and all_traces:
+        t_sched = time.time()
+        sizes = await asyncio.to_thread(_trace_sizes, ops, all_traces, policy, first_model)
+        all_traces = sorted(all_traces, key=lambda t: -sizes.get(t.get("trace_uuid"), 0))
+        size_of = lambda t: sizes.get(t.get("trace_uuid"), 0)
+        ordered = sorted(sizes.values())
+        schedule_report = {
+            "mode": "lpt",
+            "sized": len(sizes),
+            "tokens_max": ordered[-1] if ordered else 0,
+            "tokens_median": ordered[len(ordered) // 2] if ordered else 0,
+            "elapsed_s": time.time() - t_sched,
+        }
+    elif options.schedule == "lpt":
+        schedule_report = {"mode": "arrival", "reason": "ranked scan keeps its rank order" if order_report.get("enabled") else "nothing to schedule"}
+
+    batches = chunked(all_traces, batch_size)
+    num_batches = len(batches)
+
+    llm_agent, llm_pricing, cascade, packing, two_stage = _llm_setup(agent, model, pricing_per_million, options)
+
+    tally = UsageTally()
+    escalated = 0
+    decided_small = 0    # traces the small model actually settled (not skipped, stopped or cancelled)
+    called = 0
+    rationales: Dict[str, int] = {}
+    confirmed: List[str] = []   # relevant traces of this run, remembered for the ordering of similar queries
+    retry = RetryPolicy(hedger=hedger_for(options), lane=lane)  # shared by every call of this run
+
+    def stop(item_obj: Dict[str, Any]) -> bool:
+        resp = item_obj.get("response") or {}
+        return early_stop.observe(None if "error" in resp else bool(resp.get("relevant")))
+
+    stopped: Dict[str, Any] = {}
+    early_stopped: List[Dict[str, Any]] = []
 
     for i, batch in enumerate(batches, start=1):
+        if "unscanned" in stopped:
+            early_stopped.extend(batch)
+            continue
         yield {"type": "batch_header", "index": i, "of": num_batches, "size": len(batch), "ts": time.time()}
 
         async for evt in _stream_batch_parallel(
             batch,
-            agent=agent,
+            agent=llm_agent,
             ops=ops,
             query=query,
-            pricing_per_million=pricing_per_million,
+            pricing_per_million=llm_pricing,
+            cascade=cascade,
+            packing=packing,
+            retry=retry,
+            budget=budget,
+            estimator=estimator,
+            compaction=policy,
+            two_stage=two_stage,
+            stop=stop if early_stop else None,
+            stopped=stopped,
+            size_of=size_of,
         ):
             yield evt
             if evt["type"] == "item_done":
-                u = (evt.get("item") or {}).get("usage") or {}
-                total_in_tokens  += int(u.get("input_tokens", 0) or 0)
-                total_out_tokens += int(u.get("output_tokens", 0) or 0)
+                item_obj = evt.get("item") or {}
+                tally.add(item_obj.get("usage") or {})
+                escalated += 1 if (item_obj.get("cascade") or {}).get("escalated") else 0
+                decided_small += 1 if (item_obj.get("cascade") or {}).get("tier") == "small" else 0
+                called += 0 if item_obj.get("budget_skipped") else 1
+                if (item_obj.get("response") or {}).get("relevant") is True:
+                    confirmed.append(item_obj.get("trace_uuid"))
+                status = item_obj.get("rationale_status")
+                if status == "not_requested":
+                    rationales[status] = rationales.get(status, 0) + 1
+            elif evt["type"] == "item_update":
+                tally.add(evt.get("usage") or {})
+                status = (evt.get("item") or {}).get("rationale_status") or "done"
+                rationales[status] = rationales.get(status, 0) + 1
 
-    grand_cost = (total_in_tokens/1e6)*pricing_per_million[0] + (total_out_tokens/1e6)*pricing_per_million[1]
+    if early_stop and early_stop.reason:
+        early_stopped = list(stopped.get("unscanned") or []) + early_stopped
+        if early_stopped:
+            async for evt in _stream_skipped(early_stopped, flag="early_stopped", rationale=_EARLY_STOP_RATIONALE,
+                                             pricing_per_million=pricing_per_million):
+                yield evt
+
+    compaction_report = CompactionTally(policy)
+    if policy is not None:
+        for t in all_traces:
+            if t.get("bottom_uuid"):
+                compaction_report.add_payload(_payload_for(ops, t["bottom_uuid"], policy).compaction)  # memoized
+
+    remember_results(query, confirmed)
+
+    if not cascade:  # a cascade mixes two models' output; keep the priors single-model
+        observe_run(pipeline, model, items=called, tokens_out=tally.tokens_out, avg_latency_s=tally.avg_latency())
+
+    hedge = retry.hedge_summary(llm_pricing)
+    if hedge is not None:
+        tally.add(hedge["usage"])  # the duplicates that lost the race were billed too
+
+    grand_cost = tally.cost
+    grand_cost += float(prefilter_report.get("query_embed_cost", 0.0) or 0.0)
+    grand_cost += float(section_report.get("cost", 0.0) or 0.0)
+    grand_cost += float(order_report.get("query_embed_cost", 0.0) or 0.0)
     yield {
         "type": "run_end",
         "ts": time.time(),
@@ -353,15 +1207,743 @@ async def stream_all_traces(
             "model": model,
             "query": query,
             "total_traces": total_traces,
+            "llm_traces": len(all_traces),
+            "resumed": len(replayed),
+            "speculative": sum(1 for it in replayed if it.get("speculative")),
+            "preview": sum(1 for it in replayed if it.get("preview")),
+            "prefiltered": len(prefiltered),
+            "section_pruned": len(section_pruned),
+            "scan_mode": options.scan_mode,
             "batch_size_parallelism": batch_size,
             "num_batches": num_batches,
-            "tokens_in": total_in_tokens,
-            "tokens_out": total_out_tokens,
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
             "estimated_cost": grand_cost,
-            "pricing_per_million": {"input_usd": pricing_per_million[0], "output_usd": pricing_per_million[1]},
+            "pricing_per_million": pricing_summary(pricing_per_million),
+            "cache": tally.cache(),
+            "prefilter": prefilter_report,
+            "sections": section_report,
+            "order": order_report,
+            "schedule": schedule_report,
+            "early_stop": {**early_stop.summary(), "skipped": len(early_stopped)} if early_stop else None,
+            "cascade": {
+                "enabled": bool(cascade),
+                "small_model": options.cascade_small_model if cascade else None,
+                "large_model": llm_agent.model if cascade else None,
+                "confidence": options.cascade_confidence if cascade else None,
+                "escalated": escalated,
+                "decided_small": decided_small,
+            },
+            "packing": packing,
+            "two_stage": {**two_stage, "rationales": rationales} if two_stage else None,
+            "retry": retry.summary(),
+            "hedge": hedge,
+            "preflight": preflight,
+            "budget": budget.summary() if budget else None,
+            "compaction": compaction_report.summary(),
+        },
+    }
+
+# ------------------ Multi-query run: several queries, one pass over the traces --
+def _multi_query_ids(queries: Any) -> Dict[str, str]:
+    """{query_id: text}; a plain list gets ids Q1..Qn. Blank and repeated formulations are dropped."""
+    pairs = queries.items() if isinstance(queries, dict) else ((f"Q{i}", q) for i, q in enumerate(queries or [], start=1))
+    out: Dict[str, str] = {}
+    seen = set()
+    for qid, q in pairs:
+        text = (q or "").strip()
+        if text and text.lower() not in seen:
+            seen.add(text.lower())
+            out[str(qid)] = text
+    return out
+
+async def _stream_multi_query_batch(
+    batch_items: List[Dict[str, Any]],
+    *,
+    agent: AsyncAgent,
+    ops,
+    queries: Dict[str, str],
+    pricing_per_million: Tuple[float, ...],
+    packed: bool = True,
+    retry: Optional[RetryPolicy] = None,
+    budget: Optional[BudgetGuard] = None,
+    estimator: Optional[PreflightEstimator] = None,
+    compaction: Optional[CompactionPolicy] = None,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Yields events: batch_start, item_done, batch_progress, batch_end.
+    One 'item_done' per (trace, query); the event and its item carry query_id. A trace's prompt
+    blocks are rendered once and shared by all of its queries.
+
+    packed=True: one call per trace answers every query (multi: {run_id, queries, answered} on the
+    item); queries the model left out fall back to single calls, keeping the packed share on
+    their bill. packed=False: one call per trace and query.
+    """
+    t0 = time.time()
+    total = len(batch_items) * len(queries)
+    done = 0
+    tally = UsageTally()
+
+    yield {"type": "batch_start", "ts": time.time(), "size": total}
+
+    multi_prefix = _RELEVANCE_SYSTEM + _MULTI_QUERY_SUFFIX + _queries_block(queries)
+
+    def item_for(item: Dict[str, Any], qid: str, res: Dict[str, Any], usage: Dict[str, Any], **extra) -> Dict[str, Any]:
+        return {
+            "run_id": res.get("run_id"),
+            "query_id": qid,
+            "trace_uuid": item.get("trace_uuid"),
+            "bottom_uuid": item.get("bottom_uuid"),
+            "bottom_clause": item.get("bottom_clause"),
+            "response": res.get("response") or {},
+            "usage": usage,
+            **extra,
+            **_item_extras(item),
+        }
+
+    def no_call(item: Dict[str, Any], qid: str, prefix: str, error: str, **extra) -> Dict[str, Any]:
+        usage = _enrich_usage_with_costs({"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}, pricing_per_million)
+        return item_for(item, qid, {"run_id": f"{prefix}-{uuid.uuid4().hex[:8]}", "response": {"error": error}}, usage, **extra)
+
+    async def admitted(prefix: str, body: str, n: int, call) -> Optional[Dict[str, Any]]:
+        """The call's envelope, or None when its projected cost no longer fits the budget."""
+        if budget is None:
+            return await call()
+        cost = estimator.call_cost(prefix, body, items=n)
+        if not budget.admit(cost):
+            return None
+        try:
+            res = await call()
+        except asyncio.CancelledError:  # client gone: release the reservation
+            budget.settle(cost, 0.0)
+            raise
+        spent = _enrich_usage_with_costs(res.get("usage") or {}, pricing_per_million)
+        budget.settle(cost, float(spent.get("total_cost", 0.0) or 0.0))
+        return res
+
+    async def single(item: Dict[str, Any], payload: AgentInputs, qid: str) -> Dict[str, Any]:
+        res = await admitted(
+            _RELEVANCE_SYSTEM + _query_block(queries[qid]), _item_blocks(payload), 1,
+            lambda: _call_with_retry(agent, queries[qid], payload, retry=retry),
+        )
+        if res is None:
+            return no_call(item, qid, "budget", "budget_exhausted", budget_skipped=True)
+        return item_for(item, qid, res, _enrich_usage_with_costs(res.get("usage") or {}, pricing_per_million))
+
+    async def one(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if not item.get("bottom_uuid"):
+            return [no_call(item, qid, "filter", "missing bottom_uuid") for qid in queries]
+        payload = _payload_for(ops, item["bottom_uuid"], compaction)
+        if not packed:
+            return list(await asyncio.gather(*(single(item, payload, qid) for qid in queries)))
+
+        res = await admitted(
+            multi_prefix, _item_blocks(payload), len(queries),
+            lambda: _call_with_retry(agent, queries, payload, multi=True, retry=retry),
+        )
+        if res is None:
+            return [no_call(item, qid, "budget", "budget_exhausted", budget_skipped=True) for qid in queries]
+        answered = res.get("responses") or {}
+        # one trace, so the prompt is shared evenly by its queries
+        shares = dict(zip(queries, split_usage(res.get("usage") or {}, [1.0] * len(queries))))
+        info = {"run_id": res.get("run_id"), "queries": len(queries), "answered": len(answered)}
+
+        async def fallback(qid: str) -> Dict[str, Any]:
+            obj = await single(item, payload, qid)
+            obj["usage"] = _merge_usage(_enrich_usage_with_costs(shares[qid], pricing_per_million), obj["usage"])
+            return obj
+
+        missed = [qid for qid in queries if qid not in answered]
+        redone = dict(zip(missed, await asyncio.gather(*(fallback(qid) for qid in missed))))
+        return [
+            redone[qid] if qid in redone else item_for(
+                item, qid, {"run_id": res.get("run_id"), "response": answered[qid]},
+                _enrich_usage_with_costs(shares[qid], pricing_per_million), multi=info,
+            )
+            for qid in queries
+        ]
+
+    tasks = [asyncio.create_task(one(it)) for it in batch_items]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            for item_obj in await fut:  # every query of one trace lands together
+                tally.add(item_obj.get("usage") or {})
+                done += 1
+                yield {
+                    "type": "item_done",
+                    "ts": time.time(),
+                    "done": done,
+                    "total": total,
+                    "query_id": item_obj["query_id"],
+                    "item": item_obj,
+                }
+                yield {
+                    "type": "batch_progress",
+                    "ts": time.time(),
+                    "done": done,
+                    "total": total,
+                    "tokens_in": tally.tokens_in,
+                    "tokens_out": tally.tokens_out,
+                    "tokens_cached": tally.tokens_cached,
+                    "batch_cost": tally.cost,
+                    "cache": tally.cache(),
+                    "elapsed_s": time.time() - t0,
+                }
+    finally:
+        await cancel_tasks(tasks)
+
+    yield {
+        "type": "batch_end",
+        "ts": time.time(),
+        "elapsed_s": time.time() - t0,
+        "tokens_in": tally.tokens_in,
+        "tokens_out": tally.tokens_out,
+        "tokens_cached": tally.tokens_cached,
+        "batch_cost": tally.cost,
+        "cache": tally.cache(),
+        "size": total,
+    }
+
+async def stream_multi_query_traces(
+    G,
+    ops,
+    *,
+    queries: Any,                                     # [text, ...] (ids Q1..Qn) or {query_id: text}
+    model: str = "gpt-4o-mini",
+    batch_size: int = 200,
+    limit: Optional[int] = None,
+    pricing_per_million: Tuple[float, ...] = (0.15, 0.075, 0.60),
+    selected_trace_ids: Optional[List[str]] = None,
+    options: Optional[ScanOptions] = None,
+    lane: Optional[Lane] = None,
+    budget: Optional[BudgetGuard] = None,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    One scan for several formulations of a topic: every trace is rendered once and judged against
+    all queries (one packed call per trace with options.multi_query_packed, else one call per query).
+    Yields run_start, batch_header, (batch_*...), run_end; item_done events are tagged by query_id.
+    run_end.summary.per_query holds each query's counts, tokens, cost and relevant traces;
+    summary.overlap compares them.
+
+    The pre-LLM stages (prefilter, section sweep, ranking, early stop), the cascade, trace packing
+    and two-stage outputs are single-query layouts; they are not applied here and run_start lists
+    them under multi_query.ignored_options. LPT scheduling and compaction are.
+    """
+    options = options or ScanOptions()
+    queries = _multi_query_ids(queries)
+    if not queries:
+        raise ValueError("stream_multi_query_traces needs at least one non-empty query")
+
+    all_traces = iter_trace_nodes(G)
+    if selected_trace_ids:
+        sel = set(selected_trace_ids)
+        all_traces = [t for t in all_traces if t.get("trace_uuid") in sel]
+    if limit:
+        all_traces = all_traces[:limit]
+
+    agent = AsyncAgent(model=model)
+    packed = options.multi_query_packed and len(queries) > 1
+    policy = compaction_policy(options)
+    ignored = [name for name, on in (
+        ("prefilter", options.prefilter),
+        ("hierarchical", options.scan_mode == "hierarchical"),
+        ("order", options.order == "relevance"),
+        ("early_stop", bool(options.top_k) or options.stop_expected_relevance is not None),
+        ("cascade", options.cascade),
+        ("pack", options.pack),
+        ("two_stage", options.two_stage),
+    ) if on]
+
+    estimator = PreflightEstimator(
+        pipeline="relevance", model=model, pricing_per_million=tuple(pricing_per_million),
+        concurrency=min(batch_size, MAX_INFLIGHT),
+    )
+    multi_prefix = _RELEVANCE_SYSTEM + _MULTI_QUERY_SUFFIX + _queries_block(queries)
+
+    def render(t: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        if not t.get("bottom_uuid"):
+            return None
+        return multi_prefix, _item_blocks(_payload_for(ops, t["bottom_uuid"], policy))
+
+    def layout(rendered: List[Tuple[str, str]]) -> List[Tuple[str, str, int]]:
+        if packed:
+            return [(prefix, body, len(queries)) for prefix, body in rendered]
+        return [(_RELEVANCE_SYSTEM + _query_block(q), body, 1) for _, body in rendered for q in queries.values()]
+
+    preflight: Optional[Dict[str, Any]] = None
+    if options.preflight_enabled and all_traces:
+        preflight = await asyncio.to_thread(
+            project_run, estimator, all_traces,
+            render=render, batch_size=batch_size, sample_max=options.preflight_sample, pack=layout,
+        )
+
+    schedule_report: Dict[str, Any] = {"mode": "arrival"}
+    if options.schedule == "lpt" and all_traces:
+        sizes = await asyncio.to_thread(_trace_sizes, ops, all_traces, policy, model)
+        all_traces = sorted(all_traces, key=lambda t: -sizes.get(t.get("trace_uuid"), 0))
+        schedule_report = {"mode": "lpt", "sized": len(sizes)}
+
+    batches = chunked(all_traces, batch_size)
+    yield {
+        "type": "run_start",
+        "ts": time.time(),
+        "model": model,
+        "queries": queries,
+        "total_traces": len(all_traces),
+        "llm_traces": len(all_traces),
+        "batch_size": batch_size,
+        "num_batches": len(batches),
+        "pricing_per_million": pricing_summary(pricing_per_million),
+        "multi_query": {"queries": len(queries), "packed": packed, "ignored_options": ignored},
+        "preflight": preflight,
+        "budget": budget.summary() if budget else None,
+    }
+
+    retry = RetryPolicy(hedger=hedger_for(options), lane=lane)
+    tally = UsageTally()
+    per_tally = {qid: UsageTally() for qid in queries}
+    counts = {qid: {"relevant": 0, "not_relevant": 0, "errors": 0, "budget_skipped": 0} for qid in queries}
+    hits: Dict[str, List[str]] = {qid: [] for qid in queries}
+    fallbacks = 0
+
+    for i, batch in enumerate(batches, start=1):
+        yield {"type": "batch_header", "index": i, "of": len(batches), "size": len(batch), "ts": time.time()}
+        async for evt in _stream_multi_query_batch(
+            batch,
+            agent=agent,
+            ops=ops,
+            queries=queries,
+            pricing_per_million=pricing_per_million,
+            packed=packed,
+            retry=retry,
+            budget=budget,
+            estimator=estimator,
+            compaction=policy,
+        ):
+            yield evt
+            if evt["type"] != "item_done":
+                continue
+            item_obj = evt.get("item") or {}
+            qid = item_obj.get("query_id")
+            resp = item_obj.get("response") or {}
+            tally.add(item_obj.get("usage") or {})
+            per_tally[qid].add(item_obj.get("usage") or {})
+            fallbacks += 1 if packed and item_obj.get("bottom_uuid") and "multi" not in item_obj and not item_obj.get("budget_skipped") else 0
+            if item_obj.get("budget_skipped"):
+                counts[qid]["budget_skipped"] += 1
+            elif "error" in resp:
+                counts[qid]["errors"] += 1
+            elif resp.get("relevant"):
+                counts[qid]["relevant"] += 1
+                hits[qid].append(item_obj.get("trace_uuid"))
+            else:
+                counts[qid]["not_relevant"] += 1
+
+    for qid, text in queries.items():
+        remember_results(text, hits[qid])
+
+    hedge = retry.hedge_summary(pricing_per_million)
+    if hedge is not None:
+        tally.add(hedge["usage"])
+
+    hit_sets = [set(v) for v in hits.values()]
+    yield {
+        "type": "run_end",
+        "ts": time.time(),
+        "summary": {
+            "model": model,
+            "queries": queries,
+            "total_traces": len(all_traces),
+            "batch_size_parallelism": batch_size,
+            "num_batches": len(batches),
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
+            "estimated_cost": tally.cost,
+            "pricing_per_million": pricing_summary(pricing_per_million),
+            "cache": tally.cache(),
+            "multi_query": {"queries": len(queries), "packed": packed, "fallbacks": fallbacks, "ignored_options": ignored},
+            "per_query": {
+                qid: {
+                    "query": text,
+                    **counts[qid],
+                    "tokens_in": per_tally[qid].tokens_in,
+                    "tokens_out": per_tally[qid].tokens_out,
+                    "tokens_cached": per_tally[qid].tokens_cached,
+                    "estimated_cost": per_tally[qid].cost,
+                    "relevant_trace_uuids": hits[qid],
+                }
+                for qid, text in queries.items()
+            },
+            "overlap": {
+                "relevant_to_all": len(set.intersection(*hit_sets)) if hit_sets else 0,
+                "relevant_to_any": len(set.union(*hit_sets)) if hit_sets else 0,
+            },
+            "schedule": schedule_report,
+            "retry": retry.summary(),
+            "hedge": hedge,
+            "preflight": preflight,
+            "budget": budget.summary() if budget else None,
+        },
+    }
+
+# ------------------ Bulk run (batch backend, non-interactive) ----------------
+def _relevance_request(query: str, model: str, payload: AgentInputs) -> Dict[str, Any]:
+    return response_body(
+        model=model,
+        system=_RELEVANCE_SYSTEM,
+        user=_query_block(query) + _item_blocks(payload),
+        text_format=RelevanceResult,
+        prompt_cache_key=prompt_cache_key(_RELEVANCE_SYSTEM, query),
+    )
+
+async def stream_bulk_traces(
+    G,
+    ops,
+    *,
+    query: str = "",
+    model: str = "gpt-4o-mini",
+    limit: Optional[int] = None,
+    pricing_per_million: Tuple[float, ...] = (0.15, 0.075, 0.60),
+    selected_trace_ids: Optional[List[str]] = None,
+    options: Optional[ScanOptions] = None,
+    backend: Optional[BatchBackend] = None,
+    job_id: Optional[str] = None,          # resume an existing job instead of creating one
+    jobs_dir=None,
+    poll_interval: float = DEFAULT_POLL_S,
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Same event stream as stream_all_traces (run_start, batch_start, item_done, batch_progress,
+    batch_end, run_end), but every trace goes through one batch job at batch pricing.
+    Prompts are rendered exactly like the interactive scan's (_payload_for, options' compaction).
+    Results arrive whenever the backend has them; a restarted process passes job_id to resume
+    and only receives the items it has not seen yet.
+    """
+    backend = backend or get_batch_backend()
+    if job_id:
+        job = BulkJob.load(job_id, jobs_dir)
+        query = job.data["meta"].get("query", query)
+        model = job.data["meta"].get("model", model)
+        pricing_per_million = tuple(job.data["meta"].get("pricing_per_million") or pricing_per_million)
+        missing: List[Dict[str, Any]] = []
+    else:
+        all_traces = iter_trace_nodes(G)
+        if selected_trace_ids:
+            sel = set(selected_trace_ids)
+            all_traces = [t for t in all_traces if t.get("trace_uuid") in sel]
+        if limit:
+            all_traces = all_traces[:limit]
+
+        policy = compaction_policy(options or ScanOptions())
+        requests = []
+        missing = []
+        for t in all_traces:
+            if not t.get("bottom_uuid"):
+                missing.append(t)
+                continue
+            payload = _payload_for(ops, t["bottom_uuid"], policy)
+            requests.append((t["trace_uuid"], _relevance_request(query, model, payload), t))
+
+        job = BulkJob.create(
+            pipeline="relevance",
+            requests=requests,
+            meta={"query": query, "model": model, "pricing_per_million": list(pricing_per_million)},
+            jobs_dir=jobs_dir,
+        )
+
+    pricing = batch_pricing(pricing_per_million)
+    total = int(job.data.get("count") or 0) + len(missing)
+    yield {
+        "type": "run_start",
+        "ts": time.time(),
+        "model": model,
+        "query": query,
+        "total_traces": total,
+        "batch_size": total,
+        "num_batches": 1,
+        "pricing_per_million": pricing_summary(pricing),
+        "bulk": {"job_id": job.job_id, "backend": backend.name, "resumed": bool(job_id)},
+    }
+
+    t0 = time.time()
+    tally = UsageTally()
+    done = 0
+    yield {"type": "batch_start", "ts": time.time(), "size": total, "bulk": True}
+
+    def _done(item_obj: Dict[str, Any]) -> List[Dict[str, Any]]:
+        tally.add(item_obj.get("usage") or {})
+        return [
+            {"type": "item_done", "ts": time.time(), "done": done, "total": total, "item": item_obj},
+            {
+                "type": "batch_progress",
+                "ts": time.time(),
+                "done": done,
+                "total": total,
+                "tokens_in": tally.tokens_in,
+                "tokens_out": tally.tokens_out,
+                "tokens_cached": tally.tokens_cached,
+                "batch_cost": tally.cost,
+                "elapsed_s": time.time() - t0,
+            },
+        ]
+
+    for t in missing:
+        done += 1
+        for evt in _done({
+            "run_id": f"bulk-{job.job_id}",
+            "trace_uuid": t.get("trace_uuid"),
+            "bottom_uuid": t.get("bottom_uuid"),
+            "bottom_clause": t.get("bottom_clause"),
+            "response": {"error": "missing bottom_uuid"},
+            "usage": _enrich_usage_with_costs({}, pricing),
+        }):
+            yield evt
+
+    async for cid, item, body, err in run_bulk_job(job, backend, poll_interval=poll_interval):
+        parsed, raw_usage = parse_response_body(body, RelevanceResult) if body is not None else (None, {})
+        done += 1
+        for evt in _done({
+            "run_id": f"bulk-{job.job_id}",
+            "trace_uuid": item.get("trace_uuid") or cid,
+            "bottom_uuid": item.get("bottom_uuid"),
+            "bottom_clause": item.get("bottom_clause"),
+            "response": parsed if parsed is not None else {"error": err or "unparseable_response"},
+            "usage": _enrich_usage_with_costs(raw_usage, pricing),
+            "bulk": True,
+            **_item_extras(item),
+        }):
+            yield evt
+
+    yield {
+        "type": "batch_end",
+        "ts": time.time(),
+        "elapsed_s": time.time() - t0,
+        "tokens_in": tally.tokens_in,
+        "tokens_out": tally.tokens_out,
+        "tokens_cached": tally.tokens_cached,
+        "batch_cost": tally.cost,
+        "size": total,
+        "bulk": True,
+    }
+    yield {
+        "type": "run_end",
+        "ts": time.time(),
+        "summary": {
+            "model": model,
+            "query": query,
+            "total_traces": total,
+            "delivered": done,
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
+            "estimated_cost": tally.cost,
+            "pricing_per_million": pricing_summary(pricing),
+            "bulk": {"job_id": job.job_id, "backend": backend.name, "status": job.data.get("status")},
         },
     }
 
+# ------------------ Sampling preview (before committing to a full scan) ------
+async def preview_traces(
+    G,
+    ops,
+    *,
+    query: str,
+    model: str = "gpt-4o-mini",
+    pricing_per_million: Tuple[float, ...] = (0.15, 0.075, 0.60),
+    selected_trace_ids: Optional[List[str]] = None,
+    options: Optional[ScanOptions] = None,
+    sample_size: int = 120,
+    seed: int = 0,
+    lane: Optional[Lane] = None,
+    checkpoint: Optional[ScanCheckpoint] = None,
+) -> Dict[str, Any]:
+    """
+    Scan a stratified random sample of the traces (one stratum per Subpart, see utils/sampling.py)
+    in a single parallel batch, laid out exactly like stream_all_traces would (cascade, packing,
+    two-stage), and extrapolate:
+      estimate: relevant count with a 95% interval, per-subpart estimates
+      cost:     sample spend, observed cost per trace → projected full / remaining scan cost,
+                plus the pre-flight projection of the full scan
+    Sampled items are written to `checkpoint`, so a full scan started with resume_run_id = its
+    run id replays them instead of paying for them again (when its topic passes _reuse_preview).
+    """
+    t0 = time.time()
+    options = options or ScanOptions()
+    traces = iter_trace_nodes(G)
+    if selected_trace_ids:
+        sel = set(selected_trace_ids)
+        traces = [t for t in traces if t.get("trace_uuid") in sel]
+
+    subparts = ops.map_traces_to_ancestor("Subpart")
+    labels = {sid: str(G.nodes[sid].get("label") or sid) for sid in set(subparts.values())}
+    sample, sizes = stratified_sample(
+        traces, stratum_of=lambda t: subparts.get(t.get("trace_uuid")), n=sample_size, seed=seed,
+    )
+    stratum = {t["trace_uuid"]: t.pop("stratum") for t in sample}
+
+    agent = AsyncAgent(model=model, text_format=RelevanceDecision if options.two_stage else RelevanceResult)
+    llm_agent, llm_pricing, cascade, packing, two_stage = _llm_setup(agent, model, pricing_per_million, options)
+    retry = RetryPolicy(hedger=hedger_for(options), lane=lane)
+    policy = compaction_policy(options)
+
+    outcomes: Dict[str, List[bool]] = {}
+    tally = UsageTally()
+    decided = 0
+    async for evt in _stream_batch_parallel(
+        sample,
+        agent=llm_agent,
+        ops=ops,
+        query=query,
+        pricing_per_million=llm_pricing,
+        cascade=cascade,
+        packing=packing,
+        retry=retry,
+        compaction=policy,
+        two_stage=two_stage,
+    ):
+        if evt["type"] == "item_done":
+            item_obj = evt.get("item") or {}
+            tally.add(item_obj.get("usage") or {})
+            resp = item_obj.get("response") or {}
+            if "error" not in resp:
+                decided += 1
+                outcomes.setdefault(stratum.get(item_obj.get("trace_uuid")), []).append(bool(resp.get("relevant")))
+            if checkpoint is not None and item_obj.get("rationale_status") != "pending":
+                await checkpoint.save(item_obj.get("trace_uuid"), item_obj)
+        elif evt["type"] == "item_update":
+            tally.add(evt.get("usage") or {})
+            if checkpoint is not None:
+                await checkpoint.save((evt.get("item") or {}).get("trace_uuid"), evt.get("item") or {})
+
+    hedge = retry.hedge_summary(llm_pricing)
+    if hedge is not None:
+        tally.add(hedge["usage"])
+
+    # full-scan projection: observed spend per decided trace, and the prompt-based pre-flight
+    per_trace = (tally.cost / decided) if decided else None
+    first_model = options.cascade_small_model if options.cascade else model
+    first_pricing = tuple(options.cascade_small_pricing) if options.cascade else tuple(pricing_per_million)
+    estimator = PreflightEstimator(
+        pipeline="relevance.two_stage" if options.two_stage else "relevance", model=first_model,
+        pricing_per_million=first_pricing, concurrency=min(200, MAX_INFLIGHT),
+    )
+
+    def render(t: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        if not t.get("bottom_uuid"):
+            return None
+        return _RELEVANCE_SYSTEM + _query_block(query), _item_blocks(_payload_for(ops, t["bottom_uuid"], policy))
+
+    preflight = await asyncio.to_thread(
+        project_run, estimator, traces,
+        render=render, batch_size=200, sample_max=options.preflight_sample,
+        pack=_preflight_packs(query, options) if options.pack else None,
+    ) if traces else None
+
+    return {
+        "query": query,
+        "model": model,
+        "seed": seed,
+        "estimate": estimate_relevant(sizes, outcomes, labels=labels),
+        "cost": {
+            "sample_cost": tally.cost,
+            "sample_tokens_in": tally.tokens_in,
+            "sample_tokens_out": tally.tokens_out,
+            "per_trace_observed": per_trace,
+            "projected_full_scan_cost": per_trace * len(traces) if per_trace is not None else None,
+            "projected_remaining_cost": per_trace * (len(traces) - decided) if per_trace is not None else None,
+            "preflight": preflight,
+        },
+        "reuse": {"resume_run_id": checkpoint.run_id if checkpoint is not None else None, "items": len(sample)},
+        "elapsed_s": time.time() - t0,
+    }
+
+
+_PREVIEW_PREFIX = "preview-"
+
+
+def _scan_scope(mg, selected_ids: List[str], options: ScanOptions) -> str:
+    """
+    What a relevance checkpoint was scanned over, apart from the query: corpus, model, trace set
+    and options. A preview runs on the raw message before topic_llm has produced the topic the
+    node scans with, so its checkpoint is matched on this scope instead of the query.
+    """
+    return scan_fingerprint(
+        "relevance-scope",
+        corpus=(mg.manifest.get("integrity") or {}).get("checksum"),
+        model=_SCAN_MODEL,
+        traces=selected_ids,
+        options=options.model_dump(),
+    )
+
+
+async def _reuse_preview(
+    store,
+    preview_id: str,
+    *,
+    scope: str,
+    topic: str,
+    options: ScanOptions,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    (items reusable by this scan, report). A preview ran before the topic existed, so its items
+    are reused only when it covered the same scope and its query is the topic or close enough to
+    it under the speculative-reuse gate (ScanOptions.speculative_reuse_similarity).
+    """
+    preview = ScanCheckpoint(store, pipeline="relevance", run_id=preview_id)
+    meta = await preview.meta()
+    query = str(meta.get("query") or "")
+    similarity = 1.0 if query.strip() == topic.strip() else query_similarity(query, topic)
+    if meta.get("scope") != scope:
+        reason = "scope"
+    elif similarity < options.speculative_reuse_similarity:
+        reason = "similarity"
+    else:
+        reason = None
+    items = await preview.load(scope=scope) if reason is None else {}
+    report = {"query": query, "topic": topic, "similarity": similarity, "kept": len(items), "discarded_reason": reason}
+    # provenance: judged against the preview's query, so they replay flagged and are never checkpointed
+    return {tid: {**it, "preview": True} for tid, it in items.items()}, report
+
+
+async def preview_for_tab(
+    store,
+    *,
+    tab_id: str,
+    query: str,
+    scan_options: Optional[Dict[str, Any]] = None,
+    sample_size: int = 120,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Preview of the relevance scan the tab would run next (same selection, model and options).
+    The result carries preview_id: pass it as resume_run_id to reuse the sampled items.
+    """
+    item = await store.aget(("cs25_context", tab_id), "latest")
+    ctx = item.value if item and hasattr(item, "value") else {}
+    mg, ops = _get_runtime()
+    options = ScanOptions.from_any(scan_options or ctx.get("scan_options"))
+    seed = random.randrange(1 << 30) if seed is None else seed
+
+    selected_ids = ctx.get("selected_ids", []) or []
+    preview_id = f"{_PREVIEW_PREFIX}{uuid.uuid4().hex}"
+    checkpoint = ScanCheckpoint(store, pipeline="relevance", run_id=preview_id)
+    await checkpoint.start(query=query, tab_id=tab_id, preview=True, scope=_scan_scope(mg, selected_ids, options))
+    report = await preview_traces(
+        mg.G,
+        ops,
+        query=query,
+        model=_SCAN_MODEL,
+        pricing_per_million=_SCAN_PRICING,
+        selected_trace_ids=selected_ids,
+        options=options,
+        sample_size=sample_size,
+        seed=seed,
+        lane=lane_for(tab_id, "interactive"),  # the user is waiting on it
+        checkpoint=checkpoint,
+    )
+    return {"preview_id": preview_id, **report}
+
 # Cache the loaded graph so we don't rebuild on every request
 _RUNTIME_CACHE = None
 
@@ -375,6 +1957,132 @@ def _get_runtime():
     return _RUNTIME_CACHE
 
 
+# the node's scan model (the preview samples with the same one)
+_SCAN_MODEL = "gpt-5-nano"
+_SCAN_PRICING = (0.05, 0.005, 0.40)
+
+
+# ------------------ Speculative start (while topic_llm is still running) -----
+async def _speculative_warmup(options: ScanOptions, selected_ids: List[str]) -> Dict[str, Any]:
+    """The scan's topic-independent preparation: every result lands in a process-wide memo the scan reads."""
+    mg, ops = await asyncio.to_thread(_get_runtime)
+    traces = iter_trace_nodes(mg.G)
+    if selected_ids:
+        sel = set(selected_ids)
+        traces = [t for t in traces if t.get("trace_uuid") in sel]
+    # prompt blocks + token counts of every trace (pre-flight, LPT sizing and the calls reuse them)
+    first_model = options.cascade_small_model if options.cascade else _SCAN_MODEL
+    sizes = await asyncio.to_thread(_trace_sizes, ops, traces, compaction_policy(options), first_model)
+    indexes: Dict[str, str] = {}
+    ranked_scan = options.order == "relevance" or bool(options.top_k) or options.stop_expected_relevance is not None
+    if options.prefilter or ranked_scan:
+        _, indexes["embedding"] = await asyncio.to_thread(get_trace_index, mg, options.embed_model)
+    if ranked_scan and (options.order_prior in ("bm25", "hybrid") or indexes.get("embedding") != "ok"):
+        await asyncio.to_thread(bm25_index, ops)
+        indexes["bm25"] = "ok"
+    return {"traces": traces, "warmed": len(sizes), "indexes": indexes}
+
+async def _speculative_decisions(
+    warmup: "asyncio.Task[Dict[str, Any]]",
+    *,
+    tab_id: str,
+    query: str,
+    options: ScanOptions,
+) -> Dict[str, Any]:
+    """Decide the traces the raw message ranks highest (one-stage, no budget: the count is capped by the options)."""
+    warm = await asyncio.shield(warmup)
+    mg, ops = _get_runtime()
+    agent = AsyncAgent(model=_SCAN_MODEL)
+    ranked, _ = await _order_traces(warm["traces"], mg=mg, ops=ops, client=agent.client, query=query, options=options)
+    single_stage = options.model_copy(update={"two_stage": False})
+    llm_agent, llm_pricing, cascade, packing, _ = _llm_setup(agent, _SCAN_MODEL, _SCAN_PRICING, single_stage)
+    items: Dict[str, Dict[str, Any]] = {}
+    async for evt in _stream_batch_parallel(
+        ranked[:options.speculative_evaluations],
+        agent=llm_agent,
+        ops=ops,
+        query=query,
+        pricing_per_million=llm_pricing,
+        cascade=cascade,
+        packing=packing,
+        retry=RetryPolicy(lane=lane_for(tab_id, "relevance")),
+        compaction=compaction_policy(options),
+    ):
+        if evt["type"] == "item_done":
+            item_obj = evt.get("item") or {}
+            # the speculative rank is not the scan's: drop it with the decision
+            items[item_obj.get("trace_uuid")] = {k: v for k, v in item_obj.items() if k not in ("ranked_position", "rank_score")}
+    return {"items": items, "usage": _merge_usage(*(it.get("usage") or {} for it in items.values()))}
+
+def start_speculative_scan(
+    run_id: Optional[str],
+    *,
+    tab_id: str,
+    query: str,
+    options: ScanOptions,
+    selected_ids: List[str],
+) -> Optional[Speculation]:
+    """
+    Called by topic_llm before its LLM call (ScanOptions.speculative). Starts, on the raw user
+    message, the "warmup" task and, with speculative_evaluations, the "decisions" task;
+    find_relevant_sections_llm takes them over by run id.
+    """
+    if not options.speculative or not run_id:
+        return None
+    spec = open_speculation(run_id, query)
+    warmup = spec.spawn("warmup", _speculative_warmup(options, selected_ids))
+    if options.speculative_evaluations and query.strip() and budget_for(options, tab_id) is None:
+        spec.spawn("decisions", _speculative_decisions(warmup, tab_id=tab_id, query=query, options=options))
+    return spec
+
+async def _reconcile_speculation(
+    spec: Speculation,
+    *,
+    topic: str,
+    options: ScanOptions,
+    reuse_decisions: bool = True,
+) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Any]]:
+    """
+    (decisions valid for the topic, report). Warm-up is always kept (the scan needs it whatever the
+    topic). Speculative decisions are kept only when the topic is close enough to the raw message
+    and the scan can reuse per-trace decisions (reuse_decisions; not in multi-query mode);
+    otherwise they are cancelled, or discarded when already made (their spend is still reported).
+    """
+    spec.topic_ready()
+    similarity = query_similarity(spec.query, topic)
+    speculated = "decisions" in spec.tasks
+    keep_decisions = speculated and reuse_decisions and similarity >= options.speculative_reuse_similarity
+    decided: Optional[Dict[str, Any]] = None
+    if speculated and not keep_decisions:
+        if spec.tasks["decisions"].done():
+            decided = await spec.keep("decisions")   # already paid for: reported, then discarded
+        else:
+            await spec.drop(["decisions"])
+    warm = await spec.keep("warmup") or {}
+    if keep_decisions:
+        decided = await spec.keep("decisions")
+    usage = (decided or {}).get("usage") or {}
+    report = {
+        "query": spec.query,
+        "topic": topic,
+        "similarity": similarity,
+        "warmed": warm.get("warmed", 0),
+        "indexes": warm.get("indexes", {}),
+        "decisions": {
+            "requested": options.speculative_evaluations if speculated else 0,
+            "made": len((decided or {}).get("items") or {}),
+            "kept": keep_decisions,
+            "discarded_reason": None if keep_decisions or not speculated else ("similarity" if reuse_decisions else "multi_query"),
+            "cost": float(usage.get("total_cost", 0.0) or 0.0),
+        },
+        "usage": usage if decided else None,
+        **spec.report(["warmup", "decisions"] if keep_decisions else ["warmup"]),
+    }
+    if not keep_decisions:
+        return {}, report
+    # provenance: judged against the raw message, so they replay flagged and are never checkpointed
+    return {tid: {**it, "speculative": True} for tid, it in ((decided or {}).get("items") or {}).items()}, report
+
 # --- add this small mapper helper above `find_relevant_sections_llm` ---
 # Map stream_all_traces events → namespaced UI types
 # ---- event type mapping (unchanged, but kept explicit) -----------------
@@ -385,10 +2093,21 @@ def _frs_wrap(evt: Dict[str, Any]) -> Dict[str, Any]:
         "batch_header":   "findRelevantSections.batchHeader",
         "batch_start":    "findRelevantSections.batchStart",
         "item_done":      "findRelevantSections.itemDone",
+        "item_update":    "findRelevantSections.itemUpdate",
         "batch_progress": "findRelevantSections.batchProgress",
         "batch_end":      "findRelevantSections.batchEnd",
         "run_end":        "findRelevantSections.runEnd",
         "error":          "findRelevantSections.error",
+        # hierarchical mode: section sweep streamed ahead of the trace scan
+        "section_run_start":      "findRelevantSections.sectionRunStart",
+        "section_batch_header":   "findRelevantSections.sectionBatchHeader",
+        "section_batch_start":    "findRelevantSections.sectionBatchStart",
+        "section_item_done":      "findRelevantSections.sectionItemDone",
+        "section_batch_progress": "findRelevantSections.sectionBatchProgress",
+        "section_batch_end":      "findRelevantSections.sectionBatchEnd",
+        "section_run_end":        "findRelevantSections.sectionRunEnd",
+        "section_pruning":        "findRelevantSections.sectionPruning",
+        "scan_order":             "findRelevantSections.scanOrder",
     }
     return {**evt, "type": mapping.get(t, f"findRelevantSections.{t or 'event'}")}
 
@@ -407,6 +2126,26 @@ async def find_relevant_sections_llm(
     selected_count = len(selected_ids)
 
     mg, ops = _get_runtime()
+    options = ScanOptions.from_any(state.get("scan_options") or ctx.get("scan_options"))
+    topic = state.get("topic", "") or ""
+
+    # per-item checkpoints under this run id; resume_run_id replays an interrupted run's results
+    checkpoint = ScanCheckpoint(store, pipeline="relevance", run_id=state.get("run_id"))
+    completed: Dict[str, Dict[str, Any]] = {}
+    scope = _scan_scope(mg, selected_ids, options)
+    resume_run_id = state.get("resume_run_id")
+    # multi-query items are per trace AND query: per-trace checkpoints and speculative decisions
+    # cannot stand in for them, so that mode neither resumes nor reuses (and says so below)
+    multi_query = bool(options.compare_queries)
+    preview_report: Optional[Dict[str, Any]] = None
+    if resume_run_id and not multi_query:
+        if resume_run_id.startswith(_PREVIEW_PREFIX):
+            # a preview: same scope, and its query must still answer for the topic
+            completed, preview_report = await _reuse_preview(store, resume_run_id, scope=scope, topic=topic, options=options)
+        else:
+            # an interrupted run must have scanned the same topic
+            completed = await ScanCheckpoint(store, pipeline="relevance", run_id=resume_run_id).load(query=topic)
+    await checkpoint.start(query=topic, tab_id=tab_id, scope=scope)
 
     # helper: emit via bus; stream layer will add tab_id if missing
     async def emit(evt: Dict[str, Any]) -> None:
@@ -417,31 +2156,108 @@ async def find_relevant_sections_llm(
         "type": "findRelevantSections.nodeStart",
         "node": "find_relevant_sections_llm",
         "ts": time.time(),
-        "data": {"selectedCount": selected_count},
+        "data": {
+            "selectedCount": selected_count,
+            "resumeRunId": resume_run_id,
+            "resumed": len(completed),
+            "resumeIgnored": "multi_query" if resume_run_id and multi_query else None,
+            "preview": preview_report,
+        },
     })
 
+    # speculative start: topic_llm began preparing this scan on the raw user message
+    speculation = take_speculation(state.get("run_id"))
+    if speculation is not None:
+        reused, spec_report = await _reconcile_speculation(
+            speculation, topic=topic, options=options, reuse_decisions=not multi_query,
+        )
+        completed = {**reused, **completed}   # a resumed run's checkpoints win
+        await emit({
+            "type": "findRelevantSections.speculation",
+            "node": "find_relevant_sections_llm",
+            "ts": time.time(),
+            "data": spec_report,
+        })
+
     # optional throttling for chatty progress
     last_progress_ts = 0.0
 
-    try:
-        async for evt in stream_all_traces(
+    # bulk relevance is the lowest scheduler class; queue position goes out while we wait for slots
+    lane = lane_for(tab_id, "relevance")
+    queue_reporter = asyncio.create_task(report_queue(
+        lane, lambda q: emit({"type": "findRelevantSections.queued", "node": "find_relevant_sections_llm", "ts": time.time(), "queue": q}),
+    ))
+
+    def scan():
+        if multi_query:
+            # the topic and its alternative formulations, judged in one pass (Q1 = the topic)
+            return stream_multi_query_traces(
+                mg.G,
+                ops,
+                queries=[topic, *options.compare_queries],
+                model=_SCAN_MODEL,
+                batch_size=200,
+                pricing_per_million=_SCAN_PRICING,
+                selected_trace_ids=selected_ids,
+                options=options,
+                lane=lane,
+                budget=budget_for(options, tab_id),
+            )
+        return stream_all_traces(
             mg.G,
             ops,
-            query=state.get("topic", "") or "",
-            model="gpt-5-nano",
+            query=topic,
+            model=_SCAN_MODEL,
             batch_size=200,
             limit=None,
-            pricing_per_million=(0.05, 0.40),
+            pricing_per_million=_SCAN_PRICING,
             selected_trace_ids=selected_ids,
-        ):
+            options=options,
+            mg=mg,
+            completed=completed,
+            lane=lane,
+            budget=budget_for(options, tab_id),
+        )
+
+    # identical concurrent scans (other tab, double click) share one fan-out
+    scan_key = scan_fingerprint(
+        "relevance",
+        corpus=(mg.manifest.get("integrity") or {}).get("checksum"),
+        model=_SCAN_MODEL,
+        query=topic,
+        traces=selected_ids,
+        options=options.model_dump(),
+        resumed=list(completed),
+    )
+    events = coalesce(scan_key, scan) if options.coalesce else scan()
+
+    try:
+        async for evt in events:
+            if evt["type"] == "item_done" and not (evt.get("item") or {}).get("budget_skipped") \
+                    and not (evt.get("item") or {}).get("early_stopped") \
+                    and not evt.get("query_id") \
+                    and not (evt.get("item") or {}).get("speculative") \
+                    and not (evt.get("item") or {}).get("preview") \
+                    and (evt.get("item") or {}).get("rationale_status") != "pending":
+                # budget-skipped / early-stopped traces are left out, so a resumed full scan covers them
+                # (multi-query items are per trace AND query, which the per-trace checkpoint cannot key;
+                # speculative and preview decisions were made on another query, not on this topic);
+                # two-stage items still waiting for their rationale are saved by the item_update
+                item_obj = evt.get("item") or {}
+                await checkpoint.save(item_obj.get("trace_uuid"), {k: v for k, v in item_obj.items() if k != "replayed"})
+            elif evt["type"] == "item_update":
+                # two-stage rationale landed: the checkpoint keeps the completed item
+                item_obj = evt.get("item") or {}
+                await checkpoint.save(item_obj.get("trace_uuid"), item_obj)
             wrapped = _frs_wrap(evt)
 
             # throttle only the progress ticks if needed
-            if wrapped["type"] == "findRelevantSections.batchProgress":
+            if wrapped["type"] in ("findRelevantSections.batchProgress", "findRelevantSections.sectionBatchProgress"):
                 now = time.time()
                 if now - last_progress_ts < 0.05:  # ~20/s max
                     continue
                 last_progress_ts = now
+                wrapped["queue"] = lane.status()
 
             await emit(wrapped)
 
@@ -461,6 +2277,8 @@ async def find_relevant_sections_llm(
         })
         summary = f"FindRelevantSections failed for {selected_count} traces: {e}"
         return {"messages": [AIMessage(content=summary)]}
+    finally:
+        queue_reporter.cancel()
 
     # node done ping
     await emit({
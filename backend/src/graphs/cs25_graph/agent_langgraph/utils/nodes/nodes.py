@@ -12,7 +12,10 @@ from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, Tool
 from langchain_core.messages.utils import get_buffer_string
 from src.graphs.cs25_graph.agent_langgraph.utils.state import AgentState
 
-from langchain_openai import ChatOpenAI
+from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_chat_openai
+from src.graphs.cs25_graph.agent_langgraph.utils.scan_options import ScanOptions
+from src.graphs.cs25_graph.agent_langgraph.utils.speculation import discard_speculation
+from src.graphs.cs25_graph.agent_langgraph.utils.nodes.find_relevant_sections import start_speculative_scan
 import os
 from langgraph.prebuilt import InjectedState, InjectedStore
 from langgraph.store.base import BaseStore
@@ -83,7 +86,7 @@ async def tool_calling_llm(
     if not OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY is not set")
 
-    llm = ChatOpenAI(model="gpt-4o", api_key=OPENAI_API_KEY)
+    llm = get_chat_openai("gpt-4o", api_key=OPENAI_API_KEY)
 
     llm_with_tools = llm.bind_tools([explain_selected_sections, find_relevant_sections])
     # ✅ Clean, nicely formatted message history
@@ -313,7 +316,7 @@ async def recommend_sections_llm(
     if not OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY is not set")
 
-    llm = ChatOpenAI(model="gpt-4o", api_key=OPENAI_API_KEY)
+    llm = get_chat_openai("gpt-4o", api_key=OPENAI_API_KEY)
 
     llm_with_tools = llm.bind_tools([recommend_sections, think_tool])
     # ✅ Clean, nicely formatted message history
@@ -410,7 +413,7 @@ async def topic_llm(
     if not OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY is not set")
 
-    llm = ChatOpenAI(model="gpt-4o", api_key=OPENAI_API_KEY)
+    llm = get_chat_openai("gpt-4o", api_key=OPENAI_API_KEY)
 
     # ✅ Clean, nicely formatted message history
     history_text = get_buffer_string(
@@ -430,6 +433,16 @@ async def topic_llm(
 
     snapshot_rows = ctx.get("snapshotRows", [])
 
+    # speculative mode: the relevance scan starts preparing on the raw user message right away
+    messages = state.get("messages", [])
+    speculation = start_speculative_scan(
+        state.get("run_id"),
+        tab_id=tab_id,
+        query=str(messages[-1].content if messages else ""),
+        options=ScanOptions.from_any(state.get("scan_options") or ctx.get("scan_options")),
+        selected_ids=selected_ids,
+    )
+
     print(f"FROZEN: {state['selections_frozen']}, at {state['selections_frozen_at']}")
 
     snapshot_count = len(snapshot_rows)
@@ -486,7 +499,14 @@ Failure handling
 HISTORY OF CONVERSATION:  
 {message_history}  
 """
-    llm_response = llm.invoke(prompt)
+    # async, so the event loop keeps serving the speculative scan while gpt-4o answers
+    try:
+        llm_response = await llm.ainvoke(prompt)
+    except BaseException:
+        await discard_speculation(state.get("run_id"))
+        raise
+    if speculation is not None:
+        speculation.topic_ready()
 
     #return {"messages": [llm_response], "topic": llm_response.content}
 
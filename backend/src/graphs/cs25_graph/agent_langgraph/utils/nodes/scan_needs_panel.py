@@ -3,25 +3,34 @@ import os
 import time
 import json
 import asyncio
-import random
-from typing import Any, Dict, List, Optional, AsyncGenerator, Tuple
+from typing import Any, Dict, List, Optional, AsyncGenerator
 
 from pydantic import BaseModel, Field
 from openai import AsyncOpenAI, APIStatusError
 from langchain_core.messages import AIMessage
 
 from src.graphs.cs25_graph.agent_langgraph.utils.progress_bus import emit as bus_emit
+from src.graphs.cs25_graph.agent_langgraph.utils.scan_options import ScanOptions
+from src.graphs.cs25_graph.agent_langgraph.utils.hedging import hedger_for
+from src.graphs.cs25_graph.agent_langgraph.utils.retry import RetryPolicy, error_kind
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import cancel_tasks
+from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import lane_for, report_queue
+from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+from src.graphs.cs25_graph.agent_langgraph.utils.preflight import count_tokens
+from src.graphs.cs25_graph.agent_langgraph.utils.usage import (
+    enrich_usage_with_costs as _enrich_usage,
+    merge_usage as _merge_usage,
+    pricing_summary, usage_from_response, prompt_cache_key, UsageTally,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.packing import (
+    estimate_tokens, pack_by_token_budget, pack_first_fit_decreasing, packed_output_model, unpack_results, split_usage,
+)
 
 
 # ------------------ OpenAI client ------------------
 
-_OPENAI_CLIENT: Optional[AsyncOpenAI] = None
-
 def get_openai_client() -> AsyncOpenAI:
-    global _OPENAI_CLIENT
-    if _OPENAI_CLIENT is None:
-        _OPENAI_CLIENT = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    return _OPENAI_CLIENT
+    return get_async_openai()
 
 
 # ------------------ Store helpers ------------------
@@ -73,23 +82,28 @@ class NeedEvalOutput(BaseModel):
     message: str = Field(description="<= 40 words. Concrete explanation why/why not.")
 
 
-def _enrich_usage(usage: Dict[str, Any], pricing_per_million: Tuple[float, float]) -> Dict[str, Any]:
-    u = dict(usage or {})
-    pin, pout = pricing_per_million
-    in_tok  = int(u.get("input_tokens", 0) or 0)
-    out_tok = int(u.get("output_tokens", 0) or 0)
-    total   = int(u.get("total_tokens", in_tok + out_tok) or (in_tok + out_tok))
-    in_cost  = (in_tok  / 1_000_000.0) * pin
-    out_cost = (out_tok / 1_000_000.0) * pout
-    u.update({
-        "input_tokens": in_tok,
-        "output_tokens": out_tok,
-        "total_tokens": total,
-        "input_cost": in_cost,
-        "output_cost": out_cost,
-        "total_cost": in_cost + out_cost,
-    })
-    return u
+class NeedDecision(BaseModel):
+    # two-stage mode, stage one: no message; it is written afterwards for triggered / borderline needs only
+    trigger: bool = Field(description="True if this need applies to the user scenario/question.")
+    confidence: float = Field(ge=0, le=1, description="0..1 confidence in trigger decision.")
+
+
+class NeedMessage(BaseModel):
+    message: str = Field(description="<= 40 words. Concrete explanation why/why not.")
+
+
+_NOT_REQUESTED_MESSAGE = "Not triggered (high confidence); no explanation was requested."
+
+
+def _decision_block(trigger: bool) -> str:
+    # after the need block, so the message call reuses the decision call's cached prefix
+    return f"""
+
+<DECISION>
+trigger={str(bool(trigger)).lower()}
+</DECISION>
+
+The decision above is final. Write only its message."""
 
 
 async def _call_with_retry(
@@ -98,52 +112,41 @@ async def _call_with_retry(
     model: str,
     system: str,
     user: str,
-    max_retries: int = 5,
+    text_format=NeedEvalOutput,
+    cache_key: Optional[str] = None,
+    retry: Optional[RetryPolicy] = None,
 ) -> Dict[str, Any]:
-    delay = 0.6
-    for attempt in range(max_retries):
-        try:
-            print("="*80)
-            print(f"[E42][needsPanel][system message]\n {system} \n\n")
-            print(f"[E42][needsPanel][user message]\n {user} \n\n")
-            print("-" * 80)
-            resp = await client.responses.parse(
-                model=model,
-                input=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user},
-                ],
-                text_format=NeedEvalOutput,
-            )
-
-            parsed_obj = resp.output_parsed
-            parsed = parsed_obj.model_dump(mode="json") if hasattr(parsed_obj, "model_dump") else parsed_obj.dict()
-
-            usage = {
-                "input_tokens": getattr(resp.usage, "input_tokens", 0) if getattr(resp, "usage", None) else 0,
-                "output_tokens": getattr(resp.usage, "output_tokens", 0) if getattr(resp, "usage", None) else 0,
-                "total_tokens": getattr(resp.usage, "total_tokens", 0) if getattr(resp, "usage", None) else 0,
-            }
+    async def call():
+        print("="*80)
+        print(f"[E42][needsPanel][system message]\n {system} \n\n")
+        print(f"[E42][needsPanel][user message]\n {user} \n\n")
+        print("-" * 80)
+        t0 = time.time()
+        resp = await client.responses.parse(
+            model=model,
+            input=[
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ],
+            text_format=text_format,
+            **({"prompt_cache_key": cache_key} if cache_key else {}),
+        )
+        return resp, time.time() - t0
 
-            return {"ok": True, "parsed": parsed, "usage": usage}
+    try:
+        resp, latency = await (retry or RetryPolicy()).call(call)
+    except APIStatusError as e:
+        code = getattr(e, "status_code", 0)
+        return {"ok": False, "error": f"APIStatusError({code})", "error_kind": error_kind(e), "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}}
+    except Exception as e:
+        return {"ok": False, "error": f"{type(e).__name__}: {e}", "error_kind": error_kind(e), "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}}
 
-        except APIStatusError as e:
-            code = getattr(e, "status_code", 0)
-            retryable = code in (429, 500, 502, 503, 504)
-            if retryable and attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            return {"ok": False, "error": f"APIStatusError({code})", "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}}
+    parsed_obj = resp.output_parsed
+    parsed = parsed_obj.model_dump(mode="json") if hasattr(parsed_obj, "model_dump") else parsed_obj.dict()
 
-        except Exception as e:
-            if attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            return {"ok": False, "error": f"{type(e).__name__}: {e}", "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}}
+    usage = usage_from_response(resp, latency_s=latency)
 
-    return {"ok": False, "error": "agent_call_failed", "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}}
+    return {"ok": True, "parsed": parsed, "usage": usage}
 
 
 # ------------------ Node (emits streaming events via progress_bus) ------------------
@@ -155,6 +158,7 @@ async def scan_needs_panel(state, store, **kwargs):
     Emits (via progress bus):
       - needsPanel.runStart
       - needsPanel.item
+      - needsPanel.itemUpdate   (two-stage mode: the message of a triggered / borderline need)
       - needsPanel.progress
       - needsPanel.runEnd / needsPanel.error
 
@@ -172,7 +176,13 @@ async def scan_needs_panel(state, store, **kwargs):
     model = kwargs.get("model") or os.getenv("NEEDS_PANEL_MODEL", "gpt-5.2")
     batch_size = int(kwargs.get("batch_size") or 25)
     concurrency = int(kwargs.get("concurrency") or 12)
-    pricing_per_million = kwargs.get("pricing_per_million") or (0.05, 0.40)
+    pricing_per_million = kwargs.get("pricing_per_million") or (0.05, 0.005, 0.40)
+    options = ScanOptions.from_any(kwargs.get("scan_options") or kwargs)
+    small_model = options.cascade_small_model if options.cascade else None
+    if options.cascade:
+        model = options.cascade_large_model or model
+        pricing_per_million = tuple(options.cascade_large_pricing or pricing_per_million)
+    decision_format = NeedDecision if options.two_stage else NeedEvalOutput
 
     async def emit(evt_type: str, payload: Dict[str, Any], **meta_extra: Any) -> None:
         metadata = {
@@ -205,7 +215,7 @@ async def scan_needs_panel(state, store, **kwargs):
             needs.append(it)
 
     total = len(needs)
-    await emit("needsPanel.runStart", {"total": total, "model": model, "query": user_query})
+    await emit("needsPanel.runStart", {"total": total, "model": model, "small_model": small_model, "query": user_query})
 
     client = get_openai_client()
     sem = asyncio.Semaphore(max(1, concurrency))
@@ -224,37 +234,36 @@ Rules:
 - If the scenario is too vague, set trigger=false with low confidence and ask for the missing detail in message (still <=40 words).
 """.strip()
 
+    packed_system = system + """
+
+Batch mode:
+- You will receive several ITEMs, each ONE need, all judged against the same USER SCENARIO/QUESTION.
+- Judge every ITEM independently and return exactly one result per ITEM, copying its id into item_id.
+"""
+
+    # system + USER_QUERY is the shared prefix of every call in this scan; the need block comes last
+    single_key = prompt_cache_key(system, user_query)
+    packed_key = prompt_cache_key(packed_system, user_query)
+
     done = 0
-    total_in = 0
-    total_out = 0
-    pin, pout = pricing_per_million
+    tally = UsageTally()
+    lane = lane_for(tab_id, "interactive")  # ahead of any bulk scan in the shared LLM scheduler
+    retry = RetryPolicy(hedger=hedger_for(options), lane=lane)  # shared by every eval of this scan
+    escalated = 0
 
     # Persist last results (optional but useful for refresh)
     results_map: Dict[str, Any] = {}
 
-    async def eval_one(it: Dict[str, Any]) -> Dict[str, Any]:
-        nid = str(it.get("need_id") or "")
-        need_code = str(it.get("need_code") or "")
-        headline = str(it.get("headline") or "")
-        statement = str(it.get("statement") or "")
-        rationale = str(it.get("rationale") or "")
-        paragraph_name = (it.get("paragraph_name") or None)
-        intents_block = (it.get("intents_block_trace") or None)
-
+    def need_block(it: Dict[str, Any]) -> str:
         inp = NeedEvalInput(
             user_query=user_query,
-            need_headline=headline,
-            need_statement=statement,
-            need_rationale=rationale,
-            paragraph_name=paragraph_name,
-            intents_block_trace=intents_block,
+            need_headline=str(it.get("headline") or ""),
+            need_statement=str(it.get("statement") or ""),
+            need_rationale=str(it.get("rationale") or ""),
+            paragraph_name=(it.get("paragraph_name") or None),
+            intents_block_trace=(it.get("intents_block_trace") or None),
         )
-
-        user = f"""
-<USER_QUERY>
-{inp.user_query}
-</USER_QUERY>
-
+        return f"""
 <NEED_HEADLINE>
 {inp.need_headline}
 </NEED_HEADLINE>
@@ -276,10 +285,38 @@ Rules:
 </TRACE_INTENTS>
 """.strip()
 
-        async with sem:
-            res = await _call_with_retry(client, model=model, system=system, user=user)
+    def single_user(it: Dict[str, Any]) -> str:
+        return f"""
+<USER_QUERY>
+{user_query}
+</USER_QUERY>
+
+{need_block(it)}
+""".strip()
 
-        usage = _enrich_usage(res.get("usage") or {}, pricing_per_million)
+    async def eval_one(it: Dict[str, Any], first: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """One need. `first` is a pre-computed first-tier result (packed mode); otherwise it is called here."""
+        nid = str(it.get("need_id") or "")
+        need_code = str(it.get("need_code") or "")
+        user = single_user(it)
+
+        cascade: Optional[Dict[str, Any]] = None
+        async with sem:
+            if small_model:
+                # cheap tier first; only uncertain / failed needs reach the large model
+                small = first or await _call_with_retry(client, model=small_model, system=system, user=user, text_format=decision_format, cache_key=single_key, retry=retry)
+                small_usage = _enrich_usage(small.get("usage") or {}, tuple(options.cascade_small_pricing))
+                conf = float((small.get("parsed") or {}).get("confidence", 0.0) or 0.0)
+                confident = bool(small.get("ok")) and conf >= options.cascade_confidence
+                cascade = {"tier": "small" if confident else "large", "escalated": not confident, "small_confidence": conf}
+                if confident:
+                    res, usage = small, small_usage
+                else:
+                    res = await _call_with_retry(client, model=model, system=system, user=user, text_format=decision_format, cache_key=single_key, retry=retry)
+                    usage = _merge_usage(small_usage, _enrich_usage(res.get("usage") or {}, pricing_per_million))
+            else:
+                res = first or await _call_with_retry(client, model=model, system=system, user=user, text_format=decision_format, cache_key=single_key, retry=retry)
+                usage = _enrich_usage(res.get("usage") or {}, pricing_per_million)
 
         if not res.get("ok"):
             return {
@@ -288,6 +325,7 @@ Rules:
                 "ok": False,
                 "error": res.get("error") or "eval_failed",
                 "usage": usage,
+                "cascade": cascade,
             }
 
         parsed = res.get("parsed") or {}
@@ -299,57 +337,184 @@ Rules:
             "confidence": float(parsed.get("confidence", 0.0) or 0.0),
             "message": (parsed.get("message") or "").strip(),
             "usage": usage,
+            "cascade": cascade,
         }
 
-    # batch the needs, but stream per-need completion
-    for i in range(0, total, batch_size):
-        chunk = needs[i : i + batch_size]
-        tasks = [asyncio.create_task(eval_one(it)) for it in chunk]
-
-        for fut in asyncio.as_completed(tasks):
-            obj = await fut
-            done += 1
-
-            u = obj.get("usage") or {}
-            total_in += int(u.get("input_tokens", 0) or 0)
-            total_out += int(u.get("output_tokens", 0) or 0)
-
-            # store result for refresh
-            if obj.get("need_id"):
-                results_map[obj["need_id"]] = {
-                    "ok": obj.get("ok", False),
-                    "trigger": obj.get("trigger", False),
-                    "confidence": obj.get("confidence", 0.0),
-                    "message": obj.get("message", ""),
-                    "error": obj.get("error"),
-                }
-
-            await emit(
-                "needsPanel.item",
-                {
-                    "need_id": obj.get("need_id"),
-                    "need_code": obj.get("need_code"),
-                    "ok": obj.get("ok", False),
-                    "trigger": obj.get("trigger", False),
-                    "confidence": obj.get("confidence", 0.0),
-                    "message": obj.get("message", ""),
-                    "error": obj.get("error"),
-                    # optional: per-need usage (UI can ignore)
-                    "usage": obj.get("usage"),
-                },
-            )
+    async def eval_single(it: Dict[str, Any]) -> List[Dict[str, Any]]:
+        return [await eval_one(it)]
 
-            # lightweight progress
-            await emit(
-                "needsPanel.progress",
-                {
-                    "done": done,
-                    "total": total,
-                    "tokens_in": total_in,
-                    "tokens_out": total_out,
-                    "estimated_cost": (total_in / 1e6) * pin + (total_out / 1e6) * pout,
-                },
+    async def eval_pack(pack: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Several needs in ONE first-tier call; needs missing from the reply fall back to eval_one."""
+        ids = {f"N{k}": it for k, it in enumerate(pack, start=1)}
+        user = f"""
+<USER_QUERY>
+{user_query}
+</USER_QUERY>
+
+""" + "\n\n".join(f'<ITEM id="{iid}">\n{need_block(it)}\n</ITEM>' for iid, it in ids.items())
+
+        async with sem:
+            res = await _call_with_retry(
+                client,
+                model=small_model or model,
+                system=packed_system,
+                user=user.strip(),
+                text_format=packed_output_model(decision_format),
+                cache_key=packed_key,
+                retry=retry,
             )
+        answered = unpack_results(res.get("parsed") or {}, list(ids)) if res.get("ok") else {}
+        shares = dict(zip(ids, split_usage(res.get("usage") or {}, [estimate_tokens(need_block(it)) for it in pack])))
+
+        async def fallback(it: Dict[str, Any], share: Dict[str, Any]) -> Dict[str, Any]:
+            obj = await eval_one(it)  # single call; keep the wasted packed share on the bill
+            first_pricing = tuple(options.cascade_small_pricing) if small_model else pricing_per_million
+            obj["usage"] = _merge_usage(_enrich_usage(share, first_pricing), obj.get("usage") or {})
+            return obj
+
+        jobs = [
+            eval_one(it, first={"ok": True, "parsed": answered[iid], "usage": shares[iid]})
+            if iid in answered else fallback(it, shares[iid])
+            for iid, it in ids.items()
+        ]
+        return list(await asyncio.gather(*jobs))
+
+    # two-stage: messages for triggered / borderline needs, written after their decision is out
+    by_id = {str(it.get("need_id") or ""): it for it in needs}
+    followups: List[asyncio.Task] = []
+    messages_by_status: Dict[str, int] = {}
+
+    def wants_message(obj: Dict[str, Any]) -> bool:
+        return bool(obj.get("trigger")) or float(obj.get("confidence", 0.0) or 0.0) < options.two_stage_borderline
+
+    async def explain(obj: Dict[str, Any]) -> None:
+        nid = obj.get("need_id")
+        tier_small = (obj.get("cascade") or {}).get("tier") == "small"
+        m, m_pricing = (small_model, tuple(options.cascade_small_pricing)) if tier_small else (model, pricing_per_million)
+        async with sem:
+            res = await _call_with_retry(
+                client,
+                model=m,
+                system=system,
+                user=single_user(by_id[nid]) + _decision_block(obj.get("trigger", False)),
+                text_format=NeedMessage,
+                cache_key=single_key,
+                retry=retry,
+            )
+        usage = _enrich_usage(res.get("usage") or {}, m_pricing)
+        tally.add(usage)
+        status = "done" if res.get("ok") else "failed"
+        messages_by_status[status] = messages_by_status.get(status, 0) + 1
+        message = ((res.get("parsed") or {}).get("message") or "").strip()
+        if nid in results_map:
+            results_map[nid].update({"message": message, "message_status": status})
+        await emit(
+            "needsPanel.itemUpdate",
+            {
+                "need_id": nid,
+                "need_code": obj.get("need_code"),
+                "message": message,
+                "message_status": status,
+                "error": res.get("error"),
+                "usage": usage,  # the follow-up call only
+            },
+        )
+
+    # LPT: largest prompts first (run-wide and inside each batch), packs first-fit-decreasing
+    lpt = options.schedule == "lpt"
+    if lpt:
+        sizes = {id(it): count_tokens(need_block(it), small_model or model) for it in needs}
+        needs.sort(key=lambda it: -sizes[id(it)])
+        need_size = lambda it: sizes[id(it)]
+    else:
+        need_size = lambda it: estimate_tokens(need_block(it))
+
+    # batch the needs, but stream per-need completion
+    queue_reporter = asyncio.create_task(report_queue(lane, lambda q: emit("needsPanel.queued", {"queue": q})))
+    try:
+        for i in range(0, total, batch_size):
+            chunk = needs[i : i + batch_size]
+            if options.pack:
+                packs = (pack_first_fit_decreasing if lpt else pack_by_token_budget)(
+                    chunk,
+                    size_of=need_size,
+                    token_budget=options.pack_token_budget,
+                    max_items=options.pack_max_items,
+                )
+                tasks = [asyncio.create_task(eval_pack(p)) for p in packs]
+            else:
+                tasks = [asyncio.create_task(eval_single(it)) for it in chunk]
+
+            try:
+                for fut in asyncio.as_completed(tasks):
+                    for obj in await fut:  # a packed task completes several needs at once
+                        done += 1
+
+                        u = obj.get("usage") or {}
+                        tally.add(u)
+                        escalated += 1 if (obj.get("cascade") or {}).get("escalated") else 0
+
+                        if options.two_stage and obj.get("ok"):
+                            if wants_message(obj) and obj.get("need_id") in by_id:
+                                obj["message_status"] = "pending"
+                                followups.append(asyncio.create_task(explain(obj)))
+                            else:
+                                obj["message"] = _NOT_REQUESTED_MESSAGE
+                                obj["message_status"] = "not_requested"
+                                messages_by_status["not_requested"] = messages_by_status.get("not_requested", 0) + 1
+
+                        # store result for refresh
+                        if obj.get("need_id"):
+                            results_map[obj["need_id"]] = {
+                                "ok": obj.get("ok", False),
+                                "trigger": obj.get("trigger", False),
+                                "confidence": obj.get("confidence", 0.0),
+                                "message": obj.get("message", ""),
+                                "message_status": obj.get("message_status"),
+                                "error": obj.get("error"),
+                            }
+
+                        await emit(
+                            "needsPanel.item",
+                            {
+                                "need_id": obj.get("need_id"),
+                                "need_code": obj.get("need_code"),
+                                "ok": obj.get("ok", False),
+                                "trigger": obj.get("trigger", False),
+                                "confidence": obj.get("confidence", 0.0),
+                                "message": obj.get("message", ""),
+                                "message_status": obj.get("message_status"),  # two-stage only; "pending" → itemUpdate follows
+                                "error": obj.get("error"),
+                                # optional: per-need usage (UI can ignore)
+                                "usage": obj.get("usage"),
+                                "cascade": obj.get("cascade"),
+                            },
+                        )
+
+                        # lightweight progress
+                        await emit(
+                            "needsPanel.progress",
+                            {
+                                "done": done,
+                                "total": total,
+                                "tokens_in": tally.tokens_in,
+                                "tokens_out": tally.tokens_out,
+                                "tokens_cached": tally.tokens_cached,
+                                "estimated_cost": tally.cost,
+                                "cache": tally.cache(),
+                                "queue": lane.status(),
+                            },
+                        )
+            finally:
+                await cancel_tasks(tasks)
+        await asyncio.gather(*followups)
+    finally:
+        await cancel_tasks(followups)
+        queue_reporter.cancel()
+
+    hedge = retry.hedge_summary(pricing_per_million)
+    if hedge is not None:
+        tally.add(hedge["usage"])  # the duplicates that lost the race were billed too
 
     # persist latest scan summary + map
     try:
@@ -363,10 +528,11 @@ Rules:
                 "results": results_map,
                 "summary": {
                     "total": total,
-                    "tokens_in": total_in,
-                    "tokens_out": total_out,
-                    "estimated_cost": (total_in / 1e6) * pin + (total_out / 1e6) * pout,
-                    "pricing_per_million": {"input_usd": pin, "output_usd": pout},
+                    "tokens_in": tally.tokens_in,
+                    "tokens_out": tally.tokens_out,
+                    "tokens_cached": tally.tokens_cached,
+                    "estimated_cost": tally.cost,
+                    "pricing_per_million": pricing_summary(pricing_per_million),
                 },
             },
         )
@@ -379,9 +545,15 @@ Rules:
         {
             "total": total,
             "done": done,
-            "tokens_in": total_in,
-            "tokens_out": total_out,
-            "estimated_cost": (total_in / 1e6) * pin + (total_out / 1e6) * pout,
+            "tokens_in": tally.tokens_in,
+            "tokens_out": tally.tokens_out,
+            "tokens_cached": tally.tokens_cached,
+            "estimated_cost": tally.cost,
+            "cache": tally.cache(),
+            "cascade": {"small_model": small_model, "large_model": model, "escalated": escalated} if small_model else None,
+            "two_stage": {"borderline": options.two_stage_borderline, "messages": messages_by_status} if options.two_stage else None,
+            "retry": retry.summary(),
+            "hedge": hedge,
         },
     )
 
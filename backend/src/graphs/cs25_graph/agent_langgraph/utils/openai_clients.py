@@ -0,0 +1,161 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/openai_clients.py
+
+import os
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from openai import AsyncOpenAI
+from langchain_openai import ChatOpenAI
+
+from src.graphs.cs25_graph.agent_langgraph.utils.llm_backend import (
+    MockChatModel, backend_stats, chat_mock_backend, make_backend,
+)
+
+
+# ------------------ Process-wide OpenAI clients (shared connection pool) ------------------
+#
+# Every fan-out (relevance, needs table, needs panel, recommend, bulk) and the LangChain chat
+# nodes share ONE httpx pool, so warm keep-alive connections and TLS sessions survive across
+# scans. Pool limits are sized for the widest fan-out (relevance runs 200 calls per wave).
+# The FastAPI lifespan calls close_openai_clients() on shutdown.
+
+POOL_MAX_CONNECTIONS = int(os.getenv("OPENAI_POOL_MAX_CONNECTIONS", "256"))
+POOL_MAX_KEEPALIVE = int(os.getenv("OPENAI_POOL_MAX_KEEPALIVE", "128"))
+POOL_KEEPALIVE_EXPIRY_S = float(os.getenv("OPENAI_POOL_KEEPALIVE_EXPIRY_S", "60"))
+REQUEST_TIMEOUT_S = float(os.getenv("OPENAI_TIMEOUT_S", "600"))
+CONNECT_TIMEOUT_S = float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "10"))
+
+
+class _PoolStats:
+    def __init__(self):
+        self.requests = 0
+        self.waiting = 0
+        self.wait_total_s = 0.0
+        self.wait_max_s = 0.0
+
+    def acquired(self, wait_s: float) -> None:
+        self.waiting -= 1
+        self.wait_total_s += wait_s
+        self.wait_max_s = max(self.wait_max_s, wait_s)
+
+
+class _StatsTransport(httpx.AsyncHTTPTransport):
+    """
+    Default httpx transport plus pool diagnostics. Pool wait is the time between handing the
+    request to the pool and the first connection-level trace event (connect or send headers),
+    i.e. how long the request queued for a free connection.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = _PoolStats()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        t0 = time.monotonic()
+        acquired = False
+        prev = request.extensions.get("trace")
+        self.stats.requests += 1
+        self.stats.waiting += 1
+
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            nonlocal acquired
+            if not acquired and not event_name.startswith("connection_pool"):
+                acquired = True
+                self.stats.acquired(time.monotonic() - t0)
+            if prev is not None:
+                await prev(event_name, info)
+
+        request.extensions["trace"] = trace
+        try:
+            return await super().handle_async_request(request)
+        finally:
+            if not acquired:
+                acquired = True
+                self.stats.acquired(time.monotonic() - t0)
+
+    def snapshot(self) -> Dict[str, Any]:
+        conns = list(getattr(self._pool, "connections", []) or [])
+        idle = sum(1 for c in conns if c.is_idle())
+        s = self.stats
+        return {
+            "connections": len(conns),
+            "in_use": len(conns) - idle,
+            "idle": idle,
+            "waiting": s.waiting,
+            "requests": s.requests,
+            "avg_wait_s": (s.wait_total_s / s.requests) if s.requests else 0.0,
+            "max_wait_s": s.wait_max_s,
+            "limits": {
+                "max_connections": POOL_MAX_CONNECTIONS,
+                "max_keepalive": POOL_MAX_KEEPALIVE,
+                "keepalive_expiry_s": POOL_KEEPALIVE_EXPIRY_S,
+            },
+        }
+
+
+_TRANSPORT: Optional[_StatsTransport] = None
+_HTTP_CLIENT: Optional[httpx.AsyncClient] = None
+_CLIENTS: Dict[str, AsyncOpenAI] = {}
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """The shared pooled httpx client (also handed to ChatOpenAI via http_async_client)."""
+    global _TRANSPORT, _HTTP_CLIENT
+    if _HTTP_CLIENT is None or _HTTP_CLIENT.is_closed:
+        _TRANSPORT = _StatsTransport(
+            limits=httpx.Limits(
+                max_connections=POOL_MAX_CONNECTIONS,
+                max_keepalive_connections=POOL_MAX_KEEPALIVE,
+                keepalive_expiry=POOL_KEEPALIVE_EXPIRY_S,
+            ),
+        )
+        _HTTP_CLIENT = httpx.AsyncClient(
+            transport=_TRANSPORT,
+            timeout=httpx.Timeout(REQUEST_TIMEOUT_S, connect=CONNECT_TIMEOUT_S),
+            follow_redirects=True,
+        )
+    return _HTTP_CLIENT
+
+
+def _pooled_client(key: str) -> AsyncOpenAI:
+    client = _CLIENTS.get(key)
+    if client is None or (_HTTP_CLIENT is not None and _HTTP_CLIENT.is_closed):
+        client = AsyncOpenAI(api_key=key or None, http_client=get_http_client())
+        _CLIENTS[key] = client
+    return client
+
+
+def get_async_openai(api_key: Optional[str] = None) -> AsyncOpenAI:
+    """
+    One AsyncOpenAI per API key, all on the shared pool — or the mock / cassette backend
+    when LLM_BACKEND says so (see llm_backend.py).
+    """
+    key = api_key or os.getenv("OPENAI_API_KEY") or ""
+    return make_backend(lambda: _pooled_client(key))
+
+
+def get_chat_openai(model: str, api_key: Optional[str] = None) -> Any:
+    """
+    The chat model for the LangChain nodes: ChatOpenAI on the shared pool, or MockChatModel
+    when LLM_BACKEND is mock / replay (see llm_backend.py), so those modes stay offline.
+    """
+    mock = chat_mock_backend()
+    if mock is not None:
+        return MockChatModel(backend=mock, model_name=model)
+    return ChatOpenAI(model=model, api_key=api_key or os.getenv("OPENAI_API_KEY"), http_async_client=get_http_client())
+
+
+def pool_stats() -> Dict[str, Any]:
+    if _TRANSPORT is None:
+        return {"connections": 0, "in_use": 0, "idle": 0, "waiting": 0, "requests": 0, "clients": 0, "llm_backend": backend_stats()}
+    return {**_TRANSPORT.snapshot(), "clients": len(_CLIENTS), "llm_backend": backend_stats()}
+
+
+async def close_openai_clients() -> None:
+    """Close the shared pool (FastAPI lifespan shutdown)."""
+    global _TRANSPORT, _HTTP_CLIENT
+    _CLIENTS.clear()
+    if _HTTP_CLIENT is not None:
+        await _HTTP_CLIENT.aclose()
+    _HTTP_CLIENT, _TRANSPORT = None, None
@@ -0,0 +1,152 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/packing.py
+
+from typing import Any, Callable, Dict, List, Optional, Sequence, Type, TypeVar
+from pydantic import BaseModel, Field, create_model
+
+T = TypeVar("T")
+
+
+# ------------------ Packed (multi-item) LLM calls ------------------
+#
+# One responses.parse call evaluates several items that share the same system prompt and
+# query. The structured output is a list of the per-item schema plus an `item_id` key the
+# model must echo back, so results can be unpacked into the usual one-event-per-item stream.
+# Callers fall back to single calls for any item missing from the packed response.
+
+_CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """Cheap char-based token estimate; good enough to size packs."""
+    return (len(text or "") + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN
+
+
+def pack_by_token_budget(
+    entries: Sequence[T],
+    *,
+    size_of: Callable[[T], int],
+    token_budget: int,
+    max_items: int,
+) -> List[List[T]]:
+    """
+    Greedy, order-preserving packing: start a new pack when adding the next entry would
+    exceed `token_budget` or `max_items`. An entry larger than the budget gets a pack of its own.
+    """
+    packs: List[List[T]] = []
+    cur: List[T] = []
+    cur_tokens = 0
+    for e in entries:
+        n = max(0, int(size_of(e)))
+        if cur and (cur_tokens + n > token_budget or len(cur) >= max_items):
+            packs.append(cur)
+            cur, cur_tokens = [], 0
+        cur.append(e)
+        cur_tokens += n
+    if cur:
+        packs.append(cur)
+    return packs
+
+
+def pack_first_fit_decreasing(
+    entries: Sequence[T],
+    *,
+    size_of: Callable[[T], int],
+    token_budget: int,
+    max_items: int,
+) -> List[List[T]]:
+    """
+    Bin packing for LPT scheduling: entries largest first, each into the first pack it still
+    fits (tokens and item count), else a new pack. Returns packs largest first, so the longest
+    calls are dispatched first. Fewer, fuller packs than the order-preserving greedy packer.
+    """
+    sized = sorted(((max(0, int(size_of(e))), e) for e in entries), key=lambda se: -se[0])
+    packs: List[List[T]] = []
+    loads: List[int] = []
+    for n, e in sized:
+        for k, load in enumerate(loads):
+            if load + n <= token_budget and len(packs[k]) < max_items:
+                packs[k].append(e)
+                loads[k] += n
+                break
+        else:
+            packs.append([e])
+            loads.append(n)
+    return [p for _, p in sorted(zip(loads, packs), key=lambda lp: -lp[0])]
+
+
+_PACKED_MODELS: Dict[str, Type[BaseModel]] = {}
+
+
+def packed_output_model(item_model: Type[BaseModel]) -> Type[BaseModel]:
+    """
+    Wrap a per-item schema into {results: [ {item_id, ...item fields} ]}.
+    Built once per schema and cached (the OpenAI client caches the JSON schema by class).
+    """
+    key = f"{item_model.__module__}.{item_model.__qualname__}"
+    if key not in _PACKED_MODELS:
+        entry = create_model(
+            f"Packed{item_model.__name__}Entry",
+            __base__=item_model,
+            item_id=(str, Field(description="Copy the ITEM id exactly as given.")),
+        )
+        _PACKED_MODELS[key] = create_model(
+            f"Packed{item_model.__name__}",
+            results=(List[entry], Field(description="One entry per ITEM, in any order.")),
+        )
+    return _PACKED_MODELS[key]
+
+
+def unpack_results(parsed: Dict[str, Any], expected_ids: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """item_id -> per-item dict (item_id stripped). Unknown and duplicate ids are ignored."""
+    wanted = set(expected_ids)
+    out: Dict[str, Dict[str, Any]] = {}
+    for r in (parsed or {}).get("results") or []:
+        if not isinstance(r, dict):
+            continue
+        iid = str(r.get("item_id") or "").strip()
+        if iid in wanted and iid not in out:
+            out[iid] = {k: v for k, v in r.items() if k != "item_id"}
+    return out
+
+
+def split_usage(usage: Dict[str, Any], weights: Sequence[float]) -> List[Dict[str, int]]:
+    """
+    Share one call's raw token usage across the items it answered.
+    Input and cached (prefix-hit) tokens follow `weights` (each item's prompt size); output tokens
+    split evenly. Integer shares always add back up to the call totals, and no item is given more
+    cached tokens than input tokens.
+    """
+    n = len(weights)
+    if n == 0:
+        return []
+    in_tok = int((usage or {}).get("input_tokens", 0) or 0)
+    out_tok = int((usage or {}).get("output_tokens", 0) or 0)
+    cached = min(int((usage or {}).get("cached_tokens", 0) or 0), in_tok)
+    wsum = float(sum(weights)) or float(n)
+    norm = [(w / wsum) if sum(weights) else 1.0 / n for w in weights]
+
+    def _share(total: int, fractions: List[float]) -> List[int]:
+        parts = [int(total * f) for f in fractions]
+        parts[-1] += total - sum(parts)
+        return parts
+
+    ins = _share(in_tok, norm)
+    outs = _share(out_tok, [1.0 / n] * n)
+    hits = _share(cached, norm)
+    # rounding can push an item's cached share past its input share; move the excess to items with room
+    spill = 0
+    for i in range(n):
+        over = hits[i] - ins[i]
+        if over > 0:
+            hits[i] -= over
+            spill += over
+    for i in range(n):
+        if spill <= 0:
+            break
+        room = min(ins[i] - hits[i], spill)
+        hits[i] += room
+        spill -= room
+    return [
+        {"input_tokens": a, "output_tokens": b, "total_tokens": a + b, "cached_tokens": c}
+        for a, b, c in zip(ins, outs, hits)
+    ]
@@ -0,0 +1,302 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/preflight.py
+
+import os
+import math
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from src.graphs.cs25_graph.agent_langgraph.utils.usage import enrich_usage_with_costs
+from src.graphs.cs25_graph.agent_langgraph.utils.packing import estimate_tokens
+
+try:
+    import tiktoken
+except ImportError:  # optional: falls back to the char-based estimate
+    tiktoken = None
+
+
+# ------------------ Pre-flight token / cost / wall-time projection ------------------
+#
+# Before a scan dispatches anything, each rendered prompt is tokenized and the run is projected:
+# input tokens (with the shared system + query prefix counted as cached after the first call),
+# output tokens and per-call latency from what earlier runs of the same pipeline/model produced
+# (defaults until there is history), and wall time from the batch layout and concurrency.
+# The projection goes out in run_start; BudgetGuard uses the same per-call estimate to stop
+# dispatching once a run or tab budget would be exceeded.
+
+_FALLBACK_ENCODING = "o200k_base"      # gpt-4o / gpt-5 family
+_CACHE_MIN_PREFIX = 1024               # provider prefix caching starts at 1024 tokens ...
+_CACHE_STEP = 128                      # ... and grows in 128-token steps
+
+_DEFAULT_OUTPUT_TOKENS = {"relevance": 250, "relevance.two_stage": 150, "needs": 900}   # per item, reasoning tokens included
+_DEFAULT_CALL_LATENCY_S = float(os.getenv("PREFLIGHT_DEFAULT_LATENCY_S", "6"))
+_PRIOR_WEIGHT = 0.3                    # EWMA weight of the latest run
+
+
+# ------------------ Tokenizer ------------------
+
+@lru_cache(maxsize=16)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        pass
+    try:
+        return tiktoken.get_encoding(_FALLBACK_ENCODING)
+    except Exception:  # e.g. BPE file not downloadable (offline)
+        return None
+
+
+@lru_cache(maxsize=32768)
+def _count(text: str, model: str) -> int:
+    enc = _encoding(model)
+    if enc is None:
+        return estimate_tokens(text)
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def count_tokens(text: Optional[str], model: str) -> int:
+    """Tokens of `text` for `model` (tiktoken when installed, char estimate otherwise). Memoized per text."""
+    return _count(text or "", model) if text else 0
+
+
+def tokenizer_name(model: str) -> str:
+    enc = _encoding(model)
+    return enc.name if enc is not None else "chars/4"
+
+
+# ------------------ Learned priors (per pipeline + model) ------------------
+
+_PRIORS: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+
+def _prior(pipeline: str, model: str) -> Dict[str, float]:
+    p = _PRIORS.get((pipeline, model))
+    if p is not None:
+        return p
+    return {
+        "output_tokens_per_item": float(_DEFAULT_OUTPUT_TOKENS.get(pipeline, 300)),
+        "latency_s": _DEFAULT_CALL_LATENCY_S,
+        "runs": 0,
+    }
+
+
+def observe_run(pipeline: str, model: str, *, items: int, tokens_out: int, avg_latency_s: Optional[float]) -> None:
+    """Fold a finished run into the priors the next projection uses."""
+    if items <= 0:
+        return
+    p = dict(_prior(pipeline, model))
+    w = 1.0 if not p["runs"] else _PRIOR_WEIGHT
+    p["output_tokens_per_item"] = (1 - w) * p["output_tokens_per_item"] + w * (tokens_out / items)
+    if avg_latency_s:
+        p["latency_s"] = (1 - w) * p["latency_s"] + w * avg_latency_s
+    p["runs"] += 1
+    _PRIORS[(pipeline, model)] = p
+
+
+# ------------------ Projection ------------------
+
+class PreflightEstimator:
+    """
+    Sizes the calls of one run. `prefix` is the part of the prompt shared by every call
+    (system + query, eligible for prefix caching); `body` is the per-call remainder.
+    """
+
+    def __init__(
+        self,
+        *,
+        pipeline: str,
+        model: str,
+        pricing_per_million: Sequence[float],
+        concurrency: int,
+    ):
+        self.pipeline = pipeline
+        self.model = model
+        self.pricing = tuple(pricing_per_million)
+        self.concurrency = max(1, int(concurrency))
+        self.prior = _prior(pipeline, model)
+
+        self.calls = 0
+        self.items = 0
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.tokens_cached = 0
+        self.cost = 0.0
+        self._seen_prefixes: set = set()
+        self._batch_calls: Dict[int, int] = {}
+        self.sampled_from: Optional[int] = None
+
+    def call_usage(self, prefix: str, body: str, *, items: int = 1, first: bool = False) -> Dict[str, Any]:
+        """Projected enriched usage of one call (costs included)."""
+        prefix_tokens = count_tokens(prefix, self.model)
+        in_tok = prefix_tokens + count_tokens(body, self.model)
+        cached = 0
+        if not first and prefix_tokens >= _CACHE_MIN_PREFIX:
+            cached = (prefix_tokens // _CACHE_STEP) * _CACHE_STEP
+        out_tok = int(round(self.prior["output_tokens_per_item"] * max(1, items)))
+        return enrich_usage_with_costs(
+            {"input_tokens": in_tok, "output_tokens": out_tok, "total_tokens": in_tok + out_tok, "cached_tokens": cached},
+            self.pricing,
+        )
+
+    def call_cost(self, prefix: str, body: str, *, items: int = 1) -> float:
+        return float(self.call_usage(prefix, body, items=items)["total_cost"])
+
+    def add_call(self, prefix: str, body: str, *, items: int = 1, batch: int = 0) -> None:
+        first = prefix not in self._seen_prefixes
+        self._seen_prefixes.add(prefix)
+        u = self.call_usage(prefix, body, items=items, first=first)
+        self.calls += 1
+        self.items += max(1, items)
+        self.tokens_in += u["input_tokens"]
+        self.tokens_out += u["output_tokens"]
+        self.tokens_cached += u["cached_tokens"]
+        self.cost += u["total_cost"]
+        self._batch_calls[batch] = self._batch_calls.get(batch, 0) + 1
+
+    def scale_to(self, calls_total: int, batch_calls: Dict[int, int]) -> None:
+        """Extrapolate a sampled projection to the full run (batch layout given by the caller)."""
+        if not self.calls or calls_total <= self.calls:
+            return
+        f = calls_total / self.calls
+        self.sampled_from = self.calls
+        self.items = int(round(self.items * f))
+        self.tokens_in = int(round(self.tokens_in * f))
+        self.tokens_out = int(round(self.tokens_out * f))
+        self.tokens_cached = int(round(self.tokens_cached * f))
+        self.cost *= f
+        self.calls = calls_total
+        self._batch_calls = dict(batch_calls)
+
+    def wall_s(self) -> float:
+        # batches run one after another; inside a batch every call is in flight at once, up to `concurrency`
+        waves = sum(math.ceil(n / self.concurrency) for n in self._batch_calls.values())
+        return waves * float(self.prior["latency_s"])
+
+    def projection(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "tokenizer": tokenizer_name(self.model),
+            "calls": self.calls,
+            "items": self.items,
+            "tokens_in": self.tokens_in,
+            "tokens_cached": self.tokens_cached,
+            "tokens_out": self.tokens_out,
+            "estimated_cost": self.cost,
+            "concurrency": self.concurrency,
+            "wall_s": self.wall_s(),
+            "assumed": {
+                "output_tokens_per_item": self.prior["output_tokens_per_item"],
+                "latency_s": self.prior["latency_s"],
+                "from_runs": int(self.prior["runs"]),
+            },
+            "sampled_from": self.sampled_from,
+        }
+
+
+def project_run(
+    estimator: PreflightEstimator,
+    items: Sequence[Any],
+    *,
+    render: Callable[[Any], Optional[Tuple[str, str]]],
+    batch_size: int,
+    sample_max: int = 300,
+    pack: Optional[Callable[[List[Tuple[str, str]]], List[Tuple[str, str, int]]]] = None,
+) -> Dict[str, Any]:
+    """
+    Project a run that sends `items` in batches of `batch_size`. render(item) -> (prefix, body),
+    or None when the item makes no LLM call. pack (optional) turns one batch's rendered prompts
+    into the packed calls actually sent: [(prefix, body, n_items)].
+    Runs above `sample_max` items are sized on an even stride sample and extrapolated.
+    Blocking (rendering + tokenizing); call it through asyncio.to_thread.
+    """
+    n = len(items)
+    stride = max(1, math.ceil(n / max(1, sample_max)))
+    sampled_items = 0
+    batch_sizes: Dict[int, int] = {}
+    for b, start in enumerate(range(0, n, max(1, batch_size))):
+        batch = items[start:start + batch_size]
+        batch_sizes[b] = len(batch)
+        rendered = []
+        for i, it in enumerate(batch, start=start):
+            if i % stride:
+                continue
+            sampled_items += 1
+            r = render(it)
+            if r is not None:
+                rendered.append(r)
+        calls = pack(rendered) if pack else [(p, body, 1) for p, body in rendered]
+        for prefix, body, k in calls:
+            estimator.add_call(prefix, body, items=k, batch=b)
+
+    if stride > 1 and sampled_items:
+        calls_per_item = estimator.calls / sampled_items
+        batch_calls = {b: max(1, round(size * calls_per_item)) for b, size in batch_sizes.items()}
+        estimator.scale_to(sum(batch_calls.values()), batch_calls)
+    return estimator.projection()
+
+
+# ------------------ Budget guard ------------------
+
+_TAB_SPEND: Dict[str, float] = {}
+
+
+class BudgetGuard:
+    """
+    Admission control for one run. Every call reserves its projected cost before it is sent;
+    the reservation is replaced by the actual cost when it returns. Once a call does not fit
+    the run budget or the tab budget (spend of every run of the tab in this process), the
+    guard closes and nothing more is dispatched.
+    """
+
+    def __init__(self, *, tab_id: str, run_budget_usd: Optional[float] = None, tab_budget_usd: Optional[float] = None):
+        self.tab_id = tab_id or "-"
+        self.run_budget = run_budget_usd
+        self.tab_budget = tab_budget_usd
+        self.spent = 0.0
+        self.reserved = 0.0
+        self.admitted = 0
+        self.refused = 0
+        self.exhausted = False
+
+    def _fits(self, cost: float) -> bool:
+        if self.run_budget is not None and self.spent + self.reserved + cost > self.run_budget:
+            return False
+        if self.tab_budget is not None and _TAB_SPEND.get(self.tab_id, 0.0) + self.reserved + cost > self.tab_budget:
+            return False
+        return True
+
+    def admit(self, projected_cost: float) -> bool:
+        if self.exhausted or not self._fits(projected_cost):
+            self.exhausted = True
+            self.refused += 1
+            return False
+        self.reserved += projected_cost
+        self.admitted += 1
+        return True
+
+    def settle(self, projected_cost: float, actual_cost: float) -> None:
+        self.reserved = max(0.0, self.reserved - projected_cost)
+        self.spent += actual_cost
+        _TAB_SPEND[self.tab_id] = _TAB_SPEND.get(self.tab_id, 0.0) + actual_cost
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "run_budget_usd": self.run_budget,
+            "tab_budget_usd": self.tab_budget,
+            "spent_usd": self.spent,
+            "tab_spent_usd": _TAB_SPEND.get(self.tab_id, 0.0),
+            "admitted_calls": self.admitted,
+            "refused_calls": self.refused,
+            "exhausted": self.exhausted,
+        }
+
+
+def budget_for(options: Any, tab_id: str) -> Optional[BudgetGuard]:
+    """A BudgetGuard for one run if ScanOptions sets a run or tab budget, else None."""
+    run_b = getattr(options, "budget_usd", None)
+    tab_b = getattr(options, "tab_budget_usd", None)
+    if run_b is None and tab_b is None:
+        return None
+    return BudgetGuard(tab_id=tab_id, run_budget_usd=run_b, tab_budget_usd=tab_b)
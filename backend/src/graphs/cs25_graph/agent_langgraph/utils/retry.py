@@ -0,0 +1,244 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/retry.py
+
+import time
+import random
+import asyncio
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Sequence, TypeVar
+
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+from src.graphs.cs25_graph.agent_langgraph.utils.hedging import Hedger
+from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import Lane
+
+T = TypeVar("T")
+
+
+# ------------------ Shared retry policy (one per scan run) ------------------
+#
+# Replaces the per-module "sleep 0.6 * 2^n" loops. One RetryPolicy is shared by every
+# concurrent task of a run, so:
+#   - delays honour Retry-After / retry-after-ms / x-ratelimit-reset-* headers, and a 429
+#     pauses the whole run until the reset instead of letting 200 tasks retry in lockstep;
+#   - without a header, backoff is decorrelated jitter (no synchronized retry waves);
+#   - each error kind has its own attempt limit (client errors are never retried);
+#   - retries draw from a run-wide budget;
+#   - a circuit breaker fails calls fast while the recent error rate is above a threshold.
+# summary() goes into the pipeline's run_end.
+
+# attempts (incl. the first) per error kind
+DEFAULT_ATTEMPTS: Dict[str, int] = {
+    "rate_limit": 6,
+    "server": 4,
+    "timeout": 3,
+    "connection": 4,
+    "other": 2,     # unknown exceptions (e.g. a malformed structured output) get one more try
+    "client": 1,    # 400/401/403/404/422: retrying cannot help
+}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the breaker is open."""
+
+
+def error_kind(e: BaseException) -> str:
+    if isinstance(e, APIStatusError):
+        code = int(getattr(e, "status_code", 0) or 0)
+        if code == 429:
+            return "rate_limit"
+        if code in (408, 409) or code >= 500:
+            return "server"
+        return "client"
+    if isinstance(e, APITimeoutError):   # subclass of APIConnectionError: check first
+        return "timeout"
+    if isinstance(e, APIConnectionError):
+        return "connection"
+    if isinstance(e, CircuitOpenError):
+        return "circuit_open"
+    return "other"
+
+
+def _parse_duration(v: str) -> Optional[float]:
+    """'1s', '6m0s', '250ms', '0.5' -> seconds (x-ratelimit-reset-* format)."""
+    v = (v or "").strip()
+    if not v:
+        return None
+    try:
+        return float(v)
+    except ValueError:
+        pass
+    total, num, i = 0.0, "", 0
+    while i < len(v):
+        ch = v[i]
+        if ch.isdigit() or ch == ".":
+            num += ch
+            i += 1
+            continue
+        unit = "ms" if v.startswith("ms", i) else ch
+        i += len(unit)
+        if not num:
+            return None
+        total += float(num) * {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}.get(unit, 0.0)
+        num = ""
+    return total if not num else None
+
+
+def retry_after_s(e: BaseException) -> Optional[float]:
+    """Server-advised wait from the error response headers, if any."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000.0
+        except ValueError:
+            pass
+    ra = headers.get("retry-after")
+    if ra:
+        try:
+            return float(ra)
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(ra).timestamp() - time.time())
+            except Exception:
+                pass
+    resets = [_parse_duration(headers.get(h, "")) for h in ("x-ratelimit-reset-requests", "x-ratelimit-reset-tokens")]
+    resets = [r for r in resets if r is not None]
+    return max(resets) if resets else None
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        *,
+        attempts: Optional[Dict[str, int]] = None,
+        base_delay: float = 0.5,
+        max_delay: float = 20.0,
+        budget_ratio: float = 0.2,        # retries allowed per first attempt across the run ...
+        budget_min: int = 20,             # ... but never fewer than this
+        breaker_window: int = 50,
+        breaker_min_calls: int = 20,
+        breaker_error_rate: float = 0.5,
+        breaker_cooldown_s: float = 15.0,
+        hedger: Optional[Hedger] = None,  # hedge each attempt against the run's tail latency
+        lane: Optional[Lane] = None,      # fair-share slot per attempt (retry sleeps hold none)
+    ):
+        self.attempts = {**DEFAULT_ATTEMPTS, **(attempts or {})}
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.budget_min = budget_min
+        self.breaker_min_calls = breaker_min_calls
+        self.breaker_error_rate = breaker_error_rate
+        self.breaker_cooldown_s = breaker_cooldown_s
+        self.hedger = hedger
+        self.lane = lane
+
+        self._outcomes: deque = deque(maxlen=breaker_window)   # True = failure
+        self._open_until = 0.0
+        self._pause_until = 0.0
+
+        self.calls = 0
+        self.retries = 0
+        self.retries_by_kind: Dict[str, int] = {}
+        self.failures_by_kind: Dict[str, int] = {}
+        self.gave_up = 0
+        self.budget_exhausted = 0
+        self.breaker_trips = 0
+        self.short_circuited = 0
+        self.header_waits = 0
+        self.wait_s = 0.0
+
+    # --- budget / breaker -------------------------------------------------------
+    def _budget_left(self) -> bool:
+        return self.retries < max(self.budget_min, int(self.calls * self.budget_ratio))
+
+    def _record(self, failed: bool) -> None:
+        self._outcomes.append(failed)
+        if not failed or time.monotonic() < self._open_until:
+            return
+        n = len(self._outcomes)
+        if n >= self.breaker_min_calls and sum(self._outcomes) / n >= self.breaker_error_rate:
+            self._open_until = time.monotonic() + self.breaker_cooldown_s
+            self._outcomes.clear()
+            self.breaker_trips += 1
+
+    async def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            self.wait_s += seconds
+            await asyncio.sleep(seconds)
+
+    # --- main entry -----------------------------------------------------------------
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run fn() under the policy; raises the last error once retrying stops."""
+        self.calls += 1
+        if self.hedger is not None:
+            attempt = lambda: self.hedger.run(fn, lane=self.lane)   # each duplicate takes its own slot
+        else:
+            attempt = fn if self.lane is None else (lambda: self.lane.run(fn))
+        tries: Dict[str, int] = {}
+        prev_delay = self.base_delay
+        while True:
+            # run-wide pause after a rate-limit reset header
+            await self._sleep(self._pause_until - time.monotonic())
+            if time.monotonic() < self._open_until:
+                self.short_circuited += 1
+                raise CircuitOpenError(f"circuit open for {self._open_until - time.monotonic():.1f}s")
+            try:
+                out = await attempt()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                kind = error_kind(e)
+                self.failures_by_kind[kind] = self.failures_by_kind.get(kind, 0) + 1
+                self._record(kind != "client")
+                tries[kind] = tries.get(kind, 0) + 1
+                if tries[kind] >= self.attempts.get(kind, 1):
+                    self.gave_up += 1
+                    raise
+                if not self._budget_left():
+                    self.budget_exhausted += 1
+                    self.gave_up += 1
+                    raise
+                advised = retry_after_s(e)
+                if advised is not None:
+                    self.header_waits += 1
+                    delay = min(self.max_delay, advised) + random.uniform(0, 0.25)
+                    if kind == "rate_limit":
+                        self._pause_until = max(self._pause_until, time.monotonic() + delay)
+                else:
+                    # decorrelated jitter: spreads concurrent retries apart
+                    delay = min(self.max_delay, random.uniform(self.base_delay, prev_delay * 3))
+                prev_delay = max(delay, self.base_delay)
+                self.retries += 1
+                self.retries_by_kind[kind] = self.retries_by_kind.get(kind, 0) + 1
+                await self._sleep(delay)
+                continue
+            self._record(False)
+            return out
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "retries_by_kind": dict(self.retries_by_kind),
+            "failures_by_kind": dict(self.failures_by_kind),
+            "gave_up": self.gave_up,
+            "budget_exhausted": self.budget_exhausted,
+            "breaker_trips": self.breaker_trips,
+            "short_circuited": self.short_circuited,
+            "header_waits": self.header_waits,
+            "wait_s": self.wait_s,
+        }
+
+    def hedge_summary(self, pricing_per_million: Optional[Sequence[float]] = None) -> Optional[Dict[str, Any]]:
+        """Hedger summary; with pricing, also the duplicates' extra usage and cost."""
+        if self.hedger is None:
+            return None
+        out = self.hedger.summary()
+        if pricing_per_million is not None:
+            out["usage"] = self.hedger.usage_with_costs(pricing_per_million)
+        return out
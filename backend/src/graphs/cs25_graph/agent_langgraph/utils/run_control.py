@@ -0,0 +1,117 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/run_control.py
+
+import asyncio
+import contextlib
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from src.graphs.cs25_graph.agent_langgraph.utils.usage import UsageTally
+
+
+# ------------------ Run registry (cancellation + partial usage) ------------------
+#
+# Every streamed graph run registers a handle under its run_id. Cancelling a run (client
+# disconnect or POST /runs/{run_id}/cancel) sets `cancelled`; the stream layer then cancels
+# the graph task, which propagates CancelledError into the node and its per-item LLM tasks.
+# Per-item usage seen on the progress bus is tallied here, so a cancelled run still reports
+# what it spent.
+
+# progress events that carry exactly one item's usage (aggregates are ignored to avoid double counting)
+_PER_ITEM_EVENTS = {
+    "findRelevantSections.itemDone": ("item", "usage"),
+    "findRelevantSections.sectionItemDone": ("item", "usage"),
+    "needsTables.itemsBatch": ("usage",),
+    "needsPanel.item": ("payload", "usage"),
+    # speculative decisions made before the scan; kept ones are replayed, so only counted here
+    "findRelevantSections.speculation": ("data", "usage"),
+}
+
+
+class RunHandle:
+    def __init__(self, run_id: str, tab_id: str, sink: str):
+        self.run_id = run_id
+        self.tab_id = tab_id
+        self.sink = sink
+        self.started_at = time.time()
+        self.cancelled = asyncio.Event()
+        self.cancel_reason: Optional[str] = None
+        self.items = 0
+        self.tally = UsageTally()
+
+    def cancel(self, reason: str = "client") -> None:
+        if not self.cancelled.is_set():
+            self.cancel_reason = reason
+            self.cancelled.set()
+
+    def track(self, evt: Dict[str, Any]) -> None:
+        """Add the usage of a per-item progress event to this run's running total."""
+        path = _PER_ITEM_EVENTS.get(str((evt or {}).get("type") or ""))
+        if not path or evt.get("replayed"):  # replayed checkpoints were paid by an earlier run
+            return
+        u: Any = evt
+        for k in path:
+            u = u.get(k) if isinstance(u, dict) else None
+        if isinstance(u, dict):
+            self.items += 1
+            self.tally.add(u)
+
+    def usage(self) -> Dict[str, Any]:
+        return {
+            "items": self.items,
+            "tokens_in": self.tally.tokens_in,
+            "tokens_out": self.tally.tokens_out,
+            "tokens_cached": self.tally.tokens_cached,
+            "cost": self.tally.cost,
+            "elapsed_s": time.time() - self.started_at,
+        }
+
+
+_runs: Dict[str, RunHandle] = {}
+
+
+def open_run(run_id: str, *, tab_id: str, sink: str) -> RunHandle:
+    handle = RunHandle(run_id, tab_id, sink)
+    _runs[run_id] = handle
+    return handle
+
+
+def close_run(run_id: str) -> Optional[RunHandle]:
+    return _runs.pop(run_id, None)
+
+
+def get_run(run_id: str) -> Optional[RunHandle]:
+    return _runs.get(run_id)
+
+
+def cancel_run(run_id: str, reason: str = "client") -> Optional[RunHandle]:
+    """Flag a live run as cancelled. Returns its handle, or None if the run is unknown/finished."""
+    handle = _runs.get(run_id)
+    if handle is not None:
+        handle.cancel(reason)
+    return handle
+
+
+async def cancel_tasks(tasks: Iterable["asyncio.Task[Any]"]) -> None:
+    """Cancel whatever is still pending (in-flight calls and their retry sleeps) and wait for it."""
+    pending = [t for t in tasks if not t.done()]
+    for t in pending:
+        t.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def watch_disconnect(
+    is_disconnected: Callable[[], Awaitable[bool]],
+    run_id: str,
+    *,
+    interval: float = 1.0,
+) -> None:
+    """Poll the transport and cancel the run once the client has gone away."""
+    handle = _runs.get(run_id)
+    while handle is None or not handle.cancelled.is_set():
+        with contextlib.suppress(Exception):
+            if await is_disconnected():
+                cancel_run(run_id, "disconnect")
+                return
+        await asyncio.sleep(interval)
+        handle = handle or _runs.get(run_id)
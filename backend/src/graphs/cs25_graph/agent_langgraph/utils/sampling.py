@@ -0,0 +1,121 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/sampling.py
+
+import math
+import random
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# ------------------ Stratified sampling preview ------------------
+#
+# A preview scans a stratified random sample of the traces (one stratum per Subpart) and
+# extrapolates how many of ALL traces are relevant:
+#   allocation   proportional to stratum size, at least `min_per_stratum` where the stratum has them
+#   estimate     N̂ = Σ N_h · p_h, with the usual stratified variance
+#                Var = Σ N_h² · (1 - n_h/N_h) · p_h(1-p_h) / (n_h - 1)
+#   per stratum  N_h · Wilson interval of p_h (well-behaved for small n_h and p_h near 0)
+# Sampling is seeded, so a preview is reproducible for the same traces and seed.
+
+_Z95 = 1.96
+UNASSIGNED = "__unassigned__"
+
+
+def allocate(sizes: Dict[str, int], n: int, *, min_per_stratum: int = 2) -> Dict[str, int]:
+    """Sample size per stratum: proportional (largest remainders), floors first, never above N_h."""
+    total = sum(sizes.values())
+    n = min(max(0, n), total)
+    alloc = {h: min(N, min_per_stratum) for h, N in sizes.items()}
+    left = n - sum(alloc.values())
+    if left <= 0:
+        return alloc
+    room = {h: N - alloc[h] for h, N in sizes.items() if N > alloc[h]}
+    room_total = sum(room.values())
+    shares = {h: left * r / room_total for h, r in room.items()} if room_total else {}
+    for h, share in shares.items():
+        alloc[h] += int(share)
+    short = n - sum(alloc.values())
+    for h in sorted(shares, key=lambda h: -(shares[h] - int(shares[h])))[:max(0, short)]:
+        alloc[h] += 1
+    return alloc
+
+
+def stratified_sample(
+    items: Sequence[Dict[str, Any]],
+    *,
+    stratum_of: Callable[[Dict[str, Any]], Optional[str]],
+    n: int,
+    min_per_stratum: int = 2,
+    seed: int = 0,
+) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    """(sampled items, stratum sizes). Each sampled item is tagged with its `stratum`."""
+    strata: Dict[str, List[Dict[str, Any]]] = {}
+    for it in items:
+        strata.setdefault(stratum_of(it) or UNASSIGNED, []).append(it)
+    sizes = {h: len(v) for h, v in strata.items()}
+    alloc = allocate(sizes, n, min_per_stratum=min_per_stratum)
+    rng = random.Random(seed)
+    sample: List[Dict[str, Any]] = []
+    for h in sorted(strata):
+        sample.extend({**it, "stratum": h} for it in rng.sample(strata[h], alloc.get(h, 0)))
+    return sample, sizes
+
+
+def _wilson(hits: int, n: int, z: float = _Z95) -> Tuple[float, float]:
+    if n <= 0:
+        return 0.0, 1.0
+    p = hits / n
+    centre = p + z * z / (2 * n)
+    spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    denom = 1 + z * z / n
+    return max(0.0, (centre - spread) / denom), min(1.0, (centre + spread) / denom)
+
+
+def estimate_relevant(
+    sizes: Dict[str, int],
+    outcomes: Dict[str, List[bool]],
+    *,
+    labels: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
+    """
+    Relevant-count estimate over all strata from the sampled outcomes (stratum -> [relevant?]).
+    Strata without any decided sample contribute their Wilson "know nothing" range to the
+    interval and nothing to the point estimate.
+    """
+    labels = labels or {}
+    total = sum(sizes.values())
+    point = 0.0
+    var = 0.0
+    unknown = 0
+    hits_total = 0
+    per: List[Dict[str, Any]] = []
+    for h, N in sorted(sizes.items(), key=lambda kv: -kv[1]):
+        got = outcomes.get(h) or []
+        n_h, hits = len(got), sum(1 for x in got if x)
+        hits_total += hits
+        lo, hi = _wilson(hits, n_h)
+        if n_h:
+            p = hits / n_h
+            point += N * p
+            if n_h > 1:
+                var += N * N * (1 - n_h / N) * p * (1 - p) / (n_h - 1)
+        else:
+            unknown += N
+        per.append({
+            "stratum": h,
+            "label": labels.get(h, "unassigned" if h == UNASSIGNED else h),
+            "traces": N,
+            "sampled": n_h,
+            "relevant_in_sample": hits,
+            "estimated_relevant": N * hits / n_h if n_h else None,
+            "ci95": [N * lo, N * hi],
+        })
+    half = _Z95 * math.sqrt(var)
+    return {
+        "traces": total,
+        "sampled": sum(len(v) for v in outcomes.values()),
+        "relevant_in_sample": hits_total,
+        "estimated_relevant": point,
+        # the sample's own hits are certain; strata never sampled widen the upper end
+        "ci95": [max(float(hits_total), point - half), min(float(total), point + half + unknown)],
+        "estimated_fraction": (point / (total - unknown)) if total > unknown else None,
+        "per_stratum": per,
+    }
@@ -0,0 +1,117 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/scan_options.py
+
+from typing import Any, Dict, List, Literal, Optional, Tuple
+from pydantic import BaseModel, Field
+
+
+class ScanOptions(BaseModel):
+    """
+    Per-run knobs for the trace fan-out pipelines.
+
+    Arrives from the frontend as a plain dict (RunIn.scan_options → AgentState.scan_options).
+    Every field has a default that reproduces the original "send everything to the LLM" scan,
+    so an empty/missing dict is always safe.
+    """
+
+    # --- embedding prefilter ----------------------------------------------------
+    prefilter: bool = Field(False, description="Score traces against the query embedding before any LLM call.")
+    prefilter_top_k: Optional[int] = Field(None, ge=1, description="Keep the best K traces (before recall margin).")
+    prefilter_threshold: Optional[float] = Field(None, description="Keep traces with cosine >= threshold (before recall margin).")
+    prefilter_recall_margin: float = Field(0.25, ge=0.0, le=1.0, description="Widen K by this fraction and lower the threshold by it.")
+    prefilter_min_candidates: int = Field(50, ge=0, description="Never send fewer than this many traces to the LLM.")
+    embed_model: str = "text-embedding-3-small"
+
+    # --- hierarchical (section-first) scan ---------------------------------------
+    scan_mode: Literal["flat", "hierarchical"] = "flat"
+    section_threshold: float = Field(0.3, ge=0.0, le=1.0, description="Descend into a Section only if its score >= this.")
+    section_model: Optional[str] = Field(None, description="Model for the section sweep; defaults to the trace model.")
+    section_batch_size: int = Field(100, ge=1)
+
+    # --- scan ordering (likely-relevant traces dispatched first) -------------------
+    order: Literal["graph", "relevance"] = Field("graph", description="'relevance': rank traces by cheap priors before dispatch.")
+    order_prior: Literal["auto", "embedding", "bm25", "hybrid"] = Field("auto", description="auto → embedding when the index is available, else BM25.")
+    order_use_history: bool = Field(True, description="Boost traces earlier runs found relevant for a similar query.")
+
+    # --- top-K / early stop (implies relevance ordering) ----------------------------
+    top_k: Optional[int] = Field(None, ge=1, description="Stop dispatching once this many relevant traces are confirmed.")
+    stop_expected_relevance: Optional[float] = Field(None, gt=0.0, lt=1.0, description="Stop once the recent hit rate's upper bound falls below this.")
+    stop_window: int = Field(100, ge=10, description="Most recent decisions the expected-relevance stop rule looks at.")
+
+    # --- model cascade (cheap tier first, escalate only uncertain items) ---------
+    cascade: bool = False
+    cascade_small_model: str = "gpt-5-nano"
+    cascade_small_pricing: Tuple[float, ...] = Field((0.05, 0.005, 0.40), description="(input, cached_input, output) USD per million tokens.")
+    cascade_large_model: Optional[str] = Field(None, description="Escalation tier; None → the pipeline's own model.")
+    cascade_large_pricing: Optional[Tuple[float, ...]] = Field(None, description="None → the pipeline's own pricing.")
+    cascade_confidence: float = Field(0.75, ge=0.0, le=1.0, description="Escalate when the small tier is less confident than this.")
+
+    # --- packed requests (several items per LLM call) ---------------------------
+    pack: bool = False
+    pack_max_items: int = Field(10, ge=1, description="Upper bound on items per packed call.")
+    pack_token_budget: int = Field(12000, ge=500, description="Estimated per-item prompt tokens allowed in one packed call.")
+
+    # --- fan-out scheduling ------------------------------------------------------------
+    schedule: Literal["arrival", "lpt"] = Field("arrival", description="'lpt': largest prompts first and first-fit-decreasing packs; ranked scans keep their rank order.")
+
+    # --- hedged requests (duplicate the slowest calls) ---------------------------
+    hedge: bool = False
+    hedge_percentile: float = Field(0.95, gt=0.0, lt=1.0, description="Hedge a call once it is slower than this latency percentile of the run.")
+    hedge_budget: float = Field(0.05, ge=0.0, le=1.0, description="Duplicate calls allowed per call across the run.")
+
+    # --- two-stage outputs (decision first, rationale only where it is read) -------
+    two_stage: bool = Field(False, description="Ask for a bare decision + confidence; explain only positive / borderline items in a follow-up call.")
+    two_stage_borderline: float = Field(0.7, ge=0.0, le=1.0, description="Negative decisions below this confidence are explained too.")
+
+    # --- multi-query scan (several formulations of the topic, one pass) -------------
+    compare_queries: List[str] = Field(default_factory=list, description="Further formulations judged in the same pass as the topic; item_done is tagged by query_id. Not resumable: resume_run_id and speculative decisions are ignored (nodeStart.resumeIgnored, speculation.decisions.discarded_reason).")
+    multi_query_packed: bool = Field(True, description="All queries of a trace in one structured call; else one call per query (blocks still built once).")
+
+    # --- speculative start (scan prepared while topic_llm is still running) ---------
+    speculative: bool = Field(False, description="Warm the scan on the raw user message (prompt blocks, token counts, indexes) while the topic is generated.")
+    speculative_evaluations: int = Field(0, ge=0, le=500, description="Also decide this many top-ranked traces against the raw message; kept only if the topic matches it, then replayed with item.speculative and never checkpointed.")
+    speculative_reuse_similarity: float = Field(0.7, ge=0.0, le=1.0, description="Query-term overlap (Jaccard) with the topic needed to keep speculative decisions (raw message) or preview items (preview query).")
+
+    # --- prompt compaction (token budgets per block) -------------------------------
+    compact: bool = False
+    compact_intents_tokens: int = Field(700, ge=50, description="Token budget of the rendered intents block.")
+    compact_citations_tokens: int = Field(400, ge=50, description="Token budget of the rendered citations block (only for prompts that send one; the relevance and needs prompts do not).")
+    compact_max_events: int = Field(4, ge=0, description="Events kept per intent (ranked by novelty) once over budget.")
+    compact_max_inbound_cites: int = Field(6, ge=1, description="Inbound citations kept per node once over budget.")
+    compact_use_digests: bool = Field(True, description="Swap in an Intent's precomputed digest when the block is over budget.")
+    compact_prefer_section_digest: bool = Field(False, description="Always show the section digest instead of the full section intent.")
+
+    # --- pre-flight projection + budget -------------------------------------------
+    preflight: Optional[bool] = Field(None, description="Tokenize the rendered prompts and project tokens/cost/wall time in run_start. None: only when a budget is set.")
+    preflight_sample: int = Field(300, ge=1, description="Size at most this many prompts; larger runs are extrapolated from an even sample.")
+    budget_usd: Optional[float] = Field(None, gt=0, description="Stop dispatching once this run's projected spend would pass this.")
+    tab_budget_usd: Optional[float] = Field(None, gt=0, description="Same, across every run of the tab in this process.")
+
+    # --- single-flight -----------------------------------------------------------
+    coalesce: bool = Field(True, description="Share one fan-out between identical concurrent scans.")
+
+    @property
+    def preflight_enabled(self) -> bool:
+        """Explicit preflight wins; left unset, a run projects its cost only when it has a budget to guard."""
+        if self.preflight is not None:
+            return self.preflight
+        return self.budget_usd is not None or self.tab_budget_usd is not None
+
+    @classmethod
+    def from_any(cls, raw: Any) -> "ScanOptions":
+        """Tolerant parse: unknown keys are ignored, bad values fall back to defaults."""
+        if isinstance(raw, ScanOptions):
+            return raw
+        if not isinstance(raw, dict):
+            return cls()
+        known = {k: v for k, v in raw.items() if k in cls.model_fields}
+        try:
+            return cls(**known)
+        except Exception:
+            out: Dict[str, Any] = {}
+            for k, v in known.items():
+                try:
+                    cls(**{k: v})
+                    out[k] = v
+                except Exception:
+                    continue
+            return cls(**out)
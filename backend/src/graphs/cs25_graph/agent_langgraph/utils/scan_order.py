@@ -0,0 +1,245 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/scan_order.py
+
+import math
+import re
+import time
+from collections import Counter, deque
+from functools import lru_cache
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from src.graphs.cs25_graph.corpus_embeddings import trace_embedding_text
+
+
+# ------------------ Relevance-first scan ordering ------------------
+#
+# The LLM scan dispatches traces in list order, so whatever goes first is answered first.
+# rank_traces orders them by cheap priors, most-likely-relevant first:
+#   embedding  cosine to the query (persisted trace index; free when the prefilter already scored them)
+#   bm25       lexical match of the query against the same text the embeddings are built from
+#   section    section scores of the hierarchical sweep, when it ran
+#   history    traces confirmed relevant by earlier runs of this process for a similar query
+# Signals are on different scales, so they are combined by reciprocal rank fusion.
+# Nothing is dropped: the order changes, the set of scanned traces does not.
+
+_RRF_K = 60                      # standard reciprocal-rank-fusion damping
+_HISTORY_MAX = 64                # finished runs remembered
+_HISTORY_MIN_SIMILARITY = 0.34   # query term overlap (Jaccard) for a past run to count
+
+_WORD = re.compile(r"[a-z0-9]+")
+_STOP = frozenset("""
+a an and any are as at be been by can could do does for from has have how in into is it its may must
+of on or shall should that the their there these this those to was were what when which with would
+""".split())
+
+
+def _tokens(text: Any) -> List[str]:
+    return [w for w in _WORD.findall(str(text or "").lower()) if w not in _STOP and len(w) > 1]
+
+
+# ------------------ BM25 ------------------
+
+class Bm25Index:
+    """Okapi BM25 over one short document per trace (postings in memory)."""
+
+    def __init__(self, docs: Dict[str, str], *, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[str, int]]] = {}
+        self.length: Dict[str, int] = {}
+        for doc_id, text in docs.items():
+            tf = Counter(_tokens(text))
+            self.length[doc_id] = sum(tf.values())
+            for term, n in tf.items():
+                self.postings.setdefault(term, []).append((doc_id, n))
+        self.n_docs = len(docs)
+        self.avg_length = (sum(self.length.values()) / self.n_docs) if self.n_docs else 0.0
+
+    def scores(self, query: str, doc_ids: Optional[Iterable[str]] = None) -> Dict[str, float]:
+        """BM25 of `query` for the documents matching at least one query term (restricted to doc_ids)."""
+        wanted = set(doc_ids) if doc_ids is not None else None
+        out: Dict[str, float] = {}
+        for term in set(_tokens(query)):
+            plist = self.postings.get(term) or []
+            if not plist:
+                continue
+            idf = math.log(1.0 + (self.n_docs - len(plist) + 0.5) / (len(plist) + 0.5))
+            for doc_id, tf in plist:
+                if wanted is not None and doc_id not in wanted:
+                    continue
+                norm = self.k1 * (1.0 - self.b + self.b * self.length[doc_id] / (self.avg_length or 1.0))
+                out[doc_id] = out.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return out
+
+
+@lru_cache(maxsize=2)
+def bm25_index(ops) -> Bm25Index:
+    """Built once per loaded corpus (a few seconds: one record bundle per trace); blocking."""
+    docs = {
+        nid: trace_embedding_text(ops, data["bottom_uuid"])
+        for nid, data in ops.G.nodes(data=True)
+        if data.get("ntype") == "Trace" and data.get("bottom_uuid")
+    }
+    return Bm25Index(docs)
+
+
+# ------------------ Results of earlier runs ------------------
+
+_HISTORY: "deque[Tuple[FrozenSet[str], FrozenSet[str]]]" = deque(maxlen=_HISTORY_MAX)
+
+
+def remember_results(query: str, relevant_trace_ids: Iterable[str]) -> None:
+    """Record the traces a finished run confirmed relevant, for the ordering of later similar queries."""
+    terms = frozenset(_tokens(query))
+    ids = frozenset(t for t in relevant_trace_ids if t)
+    if terms and ids:
+        _HISTORY.append((terms, ids))
+
+
+def _jaccard(a: FrozenSet[str], b: FrozenSet[str]) -> float:
+    return len(a & b) / len(a | b) if (a or b) else 0.0
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Query term overlap (Jaccard, stop words dropped), 0..1."""
+    return _jaccard(frozenset(_tokens(a)), frozenset(_tokens(b)))
+
+
+def history_scores(query: str) -> Dict[str, float]:
+    """trace_uuid -> summed query similarity of the earlier runs that found it relevant."""
+    terms = frozenset(_tokens(query))
+    out: Dict[str, float] = {}
+    if not terms:
+        return out
+    for past_terms, ids in _HISTORY:
+        sim = _jaccard(terms, past_terms)
+        if sim < _HISTORY_MIN_SIMILARITY:
+            continue
+        for t in ids:
+            out[t] = out.get(t, 0.0) + sim
+    return out
+
+
+# ------------------ Fusion ------------------
+
+def _rrf(signals: Dict[str, Dict[str, float]]) -> Dict[str, float]:
+    fused: Dict[str, float] = {}
+    for scores in signals.values():
+        ranked = sorted(scores.items(), key=lambda kv: -kv[1])
+        for rank, (tid, _) in enumerate(ranked, start=1):
+            fused[tid] = fused.get(tid, 0.0) + 1.0 / (_RRF_K + rank)
+    return fused
+
+
+def rank_traces(
+    traces: List[Dict[str, Any]],
+    *,
+    query: str,
+    ops,
+    prior: str = "auto",
+    embedding_scores: Optional[Dict[str, float]] = None,
+    use_history: bool = True,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Reorder `traces` most-likely-relevant first. Each returned trace carries ranked_position
+    (1-based dispatch position) and rank_score (fused score, 0 when no signal matched it).
+    prior: "embedding" | "bm25" | "hybrid" (both) | "auto" (embedding when available, else bm25).
+    Traces no signal scored keep their relative order, after the scored ones.
+    Blocking on the first call (BM25 build); call it through asyncio.to_thread.
+    """
+    t0 = time.time()
+    ids = [t.get("trace_uuid") for t in traces if t.get("trace_uuid")]
+    wanted = set(ids)
+
+    signals: Dict[str, Dict[str, float]] = {}
+    if embedding_scores and prior in ("auto", "embedding", "hybrid"):
+        signals["embedding"] = {t: s for t, s in embedding_scores.items() if t in wanted}
+    if prior in ("bm25", "hybrid") or not signals:
+        bm = bm25_index(ops).scores(query, ids)
+        if bm:
+            signals["bm25"] = bm
+    sections = {t["trace_uuid"]: float(t["section_score"]) for t in traces
+                if t.get("trace_uuid") and isinstance(t.get("section_score"), (int, float))}
+    if sections:
+        signals["section"] = sections
+    if use_history:
+        hist = {t: s for t, s in history_scores(query).items() if t in wanted}
+        if hist:
+            signals["history"] = hist
+
+    fused = _rrf(signals)
+    order = sorted(range(len(traces)), key=lambda i: -fused.get(traces[i].get("trace_uuid"), 0.0))  # stable
+    ranked = [
+        {**traces[i], "ranked_position": pos, "rank_score": fused.get(traces[i].get("trace_uuid"), 0.0)}
+        for pos, i in enumerate(order, start=1)
+    ]
+    report = {
+        "enabled": True,
+        "prior": prior,
+        "signals": {name: len(scores) for name, scores in signals.items()},
+        "unscored": sum(1 for t in traces if t.get("trace_uuid") not in fused),
+        "traces": len(traces),
+        "elapsed_s": time.time() - t0,
+    }
+    return ranked, report
+
+
+# ------------------ Top-K / early stop ------------------
+
+def _wilson_upper(hits: int, n: int, z: float = 1.96) -> float:
+    if n <= 0:
+        return 1.0
+    p = hits / n
+    centre = p + z * z / (2 * n)
+    spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    return min(1.0, (centre + spread) / (1 + z * z / n))
+
+
+class EarlyStop:
+    """
+    Stop rule for a ranked scan, fed every decision in completion order (≈ rank order).
+      top_k:            stop once this many traces are confirmed relevant.
+      min_expected:     sequential test: stop once the 95% upper bound of the hit rate over the
+                        last `window` decisions is below this, i.e. the candidates still to come
+                        (ranked lower) are not expected to be relevant often enough to be worth it.
+                        With no hits the bound is ≈ 3.84 / (window + 3.84), so small windows can
+                        only test loose thresholds (100 decisions → ~0.037).
+    """
+
+    def __init__(self, *, top_k: Optional[int] = None, min_expected: Optional[float] = None, window: int = 100):
+        self.top_k = top_k
+        self.min_expected = min_expected
+        self.window: "deque[bool]" = deque(maxlen=max(1, window))
+        self.decided = 0
+        self.relevant = 0
+        self.reason: Optional[str] = None
+
+    def observe(self, relevant: Optional[bool]) -> bool:
+        """Record one decision (None = no decision, e.g. failed call); True once the scan should stop."""
+        if self.reason:
+            return True
+        if relevant is None:
+            return False
+        self.decided += 1
+        self.relevant += 1 if relevant else 0
+        self.window.append(bool(relevant))
+        if self.top_k and self.relevant >= self.top_k:
+            self.reason = "top_k"
+        elif (
+            self.min_expected is not None
+            and len(self.window) == self.window.maxlen
+            and _wilson_upper(sum(self.window), len(self.window)) < self.min_expected
+        ):
+            self.reason = "expected_relevance"
+        return self.reason is not None
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "top_k": self.top_k,
+            "min_expected_relevance": self.min_expected,
+            "window": self.window.maxlen,
+            "decided": self.decided,
+            "relevant": self.relevant,
+            "recent_hit_rate": (sum(self.window) / len(self.window)) if self.window else None,
+            "stopped": self.reason is not None,
+            "stop_reason": self.reason,
+        }
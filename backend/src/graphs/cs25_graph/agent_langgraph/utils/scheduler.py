@@ -0,0 +1,239 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/scheduler.py
+
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+# ------------------ Fair-share LLM scheduler ------------------
+#
+# Every LLM attempt of the fan-outs passes through one process-wide gate (RetryPolicy asks
+# its Lane for a slot around each attempt; retry sleeps hold no slot). When all slots are
+# busy, waiters are served:
+#   1. by priority class: interactive (needs panel) > needs (needs table, strands) > relevance;
+#   2. within a class, round-robin across tabs, so one tab's 2,700-trace scan cannot starve
+#      another tab's 30-item scan;
+#   3. the lowest class never gets the last RESERVED slots, so an interactive call finds a free
+#      slot without waiting for a bulk call to finish;
+#   4. a waiter older than AGING_S moves up one class (no indefinite starvation).
+# Lane.status() gives queue position and an ETA from the recent completion rate; the nodes put
+# it on their progress events.
+
+MAX_INFLIGHT = int(os.getenv("LLM_MAX_INFLIGHT", "256"))
+RESERVED = int(os.getenv("LLM_SCHED_RESERVED_SLOTS", "32"))
+AGING_S = float(os.getenv("LLM_SCHED_AGING_S", "30"))
+ENABLED = os.getenv("LLM_SCHEDULER", "1") not in ("0", "false", "False")
+
+PRIORITIES: Dict[str, int] = {"interactive": 0, "needs": 1, "relevance": 2}
+_LOWEST = max(PRIORITIES.values())
+
+
+class _Waiter:
+    __slots__ = ("lane", "fut", "enqueued_at", "prio")
+
+    def __init__(self, lane: "Lane", prio: int):
+        self.lane = lane
+        self.prio = prio
+        self.fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.enqueued_at = time.monotonic()
+
+
+class FairScheduler:
+    def __init__(self, *, max_inflight: int = MAX_INFLIGHT, reserved: int = RESERVED, aging_s: float = AGING_S):
+        self.max_inflight = max(1, max_inflight)
+        self.reserved = max(0, min(reserved, self.max_inflight - 1))
+        self.aging_s = aging_s
+        self.in_flight = 0
+        # prio -> tab_id -> FIFO of that tab's waiters; dict order is the round-robin order
+        self._queues: Dict[int, "OrderedDict[str, Deque[_Waiter]]"] = {p: OrderedDict() for p in sorted(set(PRIORITIES.values()))}
+        self._rate = 0.0          # completions per second (EWMA)
+        self._last_done = time.monotonic()
+        self.granted_by_class: Dict[int, int] = {p: 0 for p in self._queues}
+        self.wait_s_by_class: Dict[int, float] = {p: 0.0 for p in self._queues}
+
+    # --- slots ----------------------------------------------------------------------
+    def _limit(self, prio: int) -> int:
+        return self.max_inflight - (self.reserved if prio >= _LOWEST else 0)
+
+    def _waiting_at_or_above(self, prio: int) -> bool:
+        return any(self._queues[p] for p in self._queues if p <= prio)
+
+    async def acquire(self, lane: "Lane") -> None:
+        prio = lane.prio
+        if self.in_flight < self._limit(prio) and not self._waiting_at_or_above(prio):
+            self._grant(lane, prio, 0.0)
+            return
+        w = _Waiter(lane, prio)
+        self._queues[prio].setdefault(lane.tab_id, deque()).append(w)
+        lane.waiting += 1
+        try:
+            await w.fut
+        except asyncio.CancelledError:
+            if w.fut.done() and not w.fut.cancelled():
+                self.release(lane)          # granted, but the caller went away first
+            else:
+                self._remove(w)
+                lane.waiting -= 1
+            raise
+
+    def _grant(self, lane: "Lane", prio: int, waited: float) -> None:
+        self.in_flight += 1
+        lane.in_flight += 1
+        self.granted_by_class[prio] = self.granted_by_class.get(prio, 0) + 1
+        self.wait_s_by_class[prio] = self.wait_s_by_class.get(prio, 0.0) + waited
+
+    def release(self, lane: "Lane") -> None:
+        self.in_flight -= 1
+        lane.in_flight -= 1
+        now = time.monotonic()
+        dt = max(1e-3, now - self._last_done)
+        self._last_done = now
+        self._rate = 0.9 * self._rate + 0.1 * (1.0 / dt)
+        self._dispatch()
+
+    def _remove(self, w: _Waiter) -> None:
+        q = self._queues[w.prio]
+        dq = q.get(w.lane.tab_id)
+        if dq is None:
+            return
+        try:
+            dq.remove(w)
+        except ValueError:
+            return
+        if not dq:
+            del q[w.lane.tab_id]
+
+    def _age(self) -> None:
+        now = time.monotonic()
+        for prio in list(self._queues)[1:]:
+            q = self._queues[prio]
+            for tab_id in list(q):
+                dq = q[tab_id]
+                if dq and now - dq[0].enqueued_at >= self.aging_s:
+                    w = dq.popleft()
+                    if not dq:
+                        del q[tab_id]
+                    w.prio = prio - 1
+                    w.enqueued_at = now  # next promotion needs another full AGING_S
+                    self._queues[w.prio].setdefault(tab_id, deque()).append(w)
+
+    def _next(self) -> Optional[_Waiter]:
+        for prio, q in self._queues.items():
+            if not q:
+                continue
+            if self.in_flight >= self._limit(prio):
+                return None          # lower classes have an equal or smaller limit
+            tab_id, dq = next(iter(q.items()))
+            w = dq.popleft()
+            if dq:
+                q.move_to_end(tab_id)  # round-robin: this tab goes to the back of its class
+            else:
+                del q[tab_id]
+            return w
+        return None
+
+    def _dispatch(self) -> None:
+        if self.aging_s > 0:
+            self._age()
+        while self.in_flight < self.max_inflight:
+            w = self._next()
+            if w is None:
+                return
+            if w.fut.done():       # cancelled while queued
+                continue
+            w.lane.waiting -= 1
+            self._grant(w.lane, w.prio, time.monotonic() - w.enqueued_at)
+            w.fut.set_result(True)
+
+    # --- reporting ------------------------------------------------------------------
+    def position(self, lane: "Lane") -> int:
+        """Slots that will be handed out before this lane's next waiter (0 if it is not waiting)."""
+        if not lane.waiting:
+            return 0
+        ahead = 0
+        for prio, q in self._queues.items():
+            if lane.tab_id in q:
+                # round-robin: one slot for each tab in front of us in this class
+                for tab_id in q:
+                    if tab_id == lane.tab_id:
+                        break
+                    ahead += 1
+                return ahead
+            ahead += sum(len(dq) for dq in q.values())
+        return ahead
+
+    def stats(self) -> Dict[str, Any]:
+        names = {v: k for k, v in PRIORITIES.items()}
+        return {
+            "max_inflight": self.max_inflight,
+            "reserved": self.reserved,
+            "in_flight": self.in_flight,
+            "waiting": {names[p]: sum(len(dq) for dq in q.values()) for p, q in self._queues.items()},
+            "tabs_waiting": {names[p]: len(q) for p, q in self._queues.items()},
+            "completions_per_s": self._rate,
+            "avg_wait_s": {
+                names[p]: (self.wait_s_by_class[p] / self.granted_by_class[p]) if self.granted_by_class.get(p) else 0.0
+                for p in self._queues
+            },
+        }
+
+
+class Lane:
+    """One tab's view of the scheduler for one pipeline class."""
+
+    def __init__(self, scheduler: Optional[FairScheduler], tab_id: str, priority: str):
+        if priority not in PRIORITIES:
+            raise ValueError(f"unknown priority class: {priority}")
+        self.scheduler = scheduler
+        self.tab_id = tab_id or "-"
+        self.priority = priority
+        self.prio = PRIORITIES[priority]
+        self.waiting = 0
+        self.in_flight = 0
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        if self.scheduler is None:
+            return await fn()
+        await self.scheduler.acquire(self)
+        try:
+            return await fn()
+        finally:
+            self.scheduler.release(self)
+
+    def status(self) -> Dict[str, Any]:
+        s = self.scheduler
+        if s is None:
+            return {"priority": self.priority, "waiting": 0, "in_flight": self.in_flight, "position": 0, "eta_s": 0.0}
+        pos = s.position(self)
+        eta = (pos + 1) / s._rate if (self.waiting and s._rate > 0) else 0.0
+        return {
+            "priority": self.priority,
+            "waiting": self.waiting,
+            "in_flight": self.in_flight,
+            "position": pos,
+            "eta_s": eta,
+            "eta_start_ts": time.time() + eta,
+        }
+
+
+_scheduler: Optional[FairScheduler] = FairScheduler() if ENABLED else None
+
+
+def lane_for(tab_id: str, priority: str) -> Lane:
+    return Lane(_scheduler, tab_id, priority)
+
+
+def scheduler_stats() -> Dict[str, Any]:
+    return _scheduler.stats() if _scheduler is not None else {"enabled": False}
+
+
+async def report_queue(lane: Lane, emit: Callable[[Dict[str, Any]], Awaitable[None]], *, interval: float = 1.0) -> None:
+    """Emit the lane's queue status while any of its calls is waiting for a slot (run as a task)."""
+    while True:
+        await asyncio.sleep(interval)
+        if lane.waiting:
+            await emit(lane.status())
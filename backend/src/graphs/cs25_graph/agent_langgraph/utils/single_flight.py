@@ -0,0 +1,195 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/single_flight.py
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import hashlib
+import contextlib
+from typing import Any, AsyncGenerator, AsyncIterator, Callable, Dict, List, Optional
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+
+
+# ------------------ Single-flight scan coalescing ------------------
+#
+# Two callers starting the same scan (same corpus, model, query, trace set and options) share
+# one fan-out. The first caller's generator runs in a background "flight"; every caller —
+# including the first — reads the flight's event log from the start, so a late subscriber
+# replays what was already emitted and then follows live. The flight is cancelled only when
+# its last subscriber goes away.
+#
+# Across workers (SINGLE_FLIGHT_REDIS=1 and REDIS_URL set): the worker that wins a Redis lock
+# publishes the events to a Redis stream; the other workers' flights read that stream instead
+# of calling the LLM.
+
+REDIS_URL = os.getenv("REDIS_URL")
+USE_REDIS = os.getenv("SINGLE_FLIGHT_REDIS", "0") in ("1", "true", "True")
+LOCK_TTL_S = int(os.getenv("SINGLE_FLIGHT_LOCK_TTL", "60"))
+STREAM_TTL_S = int(os.getenv("SINGLE_FLIGHT_STREAM_TTL", "600"))
+
+_END = "__end__"
+_WORKER = uuid.uuid4().hex
+
+
+def scan_fingerprint(pipeline: str, **parts: Any) -> str:
+    """Canonical key for a scan: list values are sorted, so trace-set order does not matter."""
+    canon = {k: (sorted(map(str, v)) if isinstance(v, (list, set, tuple)) else v) for k, v in parts.items()}
+    blob = json.dumps({"pipeline": pipeline, **canon}, sort_keys=True, ensure_ascii=False, default=str)
+    return f"{pipeline}-{hashlib.sha1(blob.encode('utf-8')).hexdigest()[:20]}"
+
+
+class _Flight:
+    def __init__(self, key: str):
+        self.key = key
+        self.events: List[Dict[str, Any]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.remote = False          # events come from another worker's flight
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def push(self, evt: Dict[str, Any]) -> None:
+        self.events.append(evt)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done, self.error = True, error
+        self._notify()
+
+    def _notify(self) -> None:
+        ev, self._changed = self._changed, asyncio.Event()
+        ev.set()
+
+
+_flights: Dict[str, _Flight] = {}
+_redis = None
+
+
+async def _get_redis():
+    global _redis
+    if USE_REDIS and REDIS_URL and aioredis and _redis is None:
+        _redis = aioredis.from_url(REDIS_URL, decode_responses=True)
+    return _redis
+
+
+async def _run_local(flight: _Flight, factory: Callable[[], AsyncIterator[Dict[str, Any]]], r=None) -> None:
+    """Drive the real scan; with `r`, also publish each event for other workers."""
+    stream, lock = f"sf:events:{flight.key}", f"sf:lock:{flight.key}"
+    last_beat = time.time()
+    err: Optional[BaseException] = None
+    try:
+        async for evt in factory():
+            flight.push(evt)
+            if r is not None:
+                with contextlib.suppress(Exception):
+                    await r.xadd(stream, {"e": json.dumps(evt, ensure_ascii=False, default=str)})
+                    if time.time() - last_beat > LOCK_TTL_S / 3:
+                        await r.expire(lock, LOCK_TTL_S)
+                        last_beat = time.time()
+    except BaseException as e:  # incl. CancelledError: subscribers must see the flight end
+        err = e
+    finally:
+        if r is not None:
+            with contextlib.suppress(Exception):
+                await r.xadd(stream, {"e": json.dumps({"type": _END, "error": repr(err) if err else None})})
+                await r.expire(stream, STREAM_TTL_S)
+                await r.delete(lock)
+        flight.finish(err)
+    if isinstance(err, asyncio.CancelledError):
+        raise err
+
+
+async def _run_remote(flight: _Flight, r) -> None:
+    """Follow another worker's flight through its Redis stream."""
+    stream, lock = f"sf:events:{flight.key}", f"sf:lock:{flight.key}"
+    last_id = "0"
+    err: Optional[BaseException] = None
+    try:
+        while True:
+            resp = await r.xread({stream: last_id}, block=5000, count=200)
+            if not resp:
+                if not await r.exists(lock):
+                    raise RuntimeError("single-flight leader lost")
+                continue
+            for _, entries in resp:
+                for entry_id, fields in entries:
+                    last_id = entry_id
+                    evt = json.loads(fields.get("e") or "{}")
+                    if evt.get("type") == _END:
+                        if evt.get("error"):
+                            raise RuntimeError(f"single-flight leader failed: {evt['error']}")
+                        return
+                    flight.push(evt)
+    except BaseException as e:
+        err = e
+        if isinstance(e, asyncio.CancelledError):
+            raise
+    finally:
+        flight.finish(err)
+
+
+async def _start(key: str, factory: Callable[[], AsyncIterator[Dict[str, Any]]]) -> _Flight:
+    flight = _Flight(key)
+    _flights[key] = flight
+    r = None
+    with contextlib.suppress(Exception):
+        r = await _get_redis()
+    if r is not None:
+        try:
+            leader = await r.set(f"sf:lock:{key}", _WORKER, nx=True, ex=LOCK_TTL_S)
+            if leader:
+                await r.delete(f"sf:events:{key}")
+        except Exception:
+            leader, r = True, None  # Redis trouble: just run locally
+        if not leader:
+            flight.remote = True
+            flight.task = asyncio.create_task(_run_remote(flight, r))
+            return flight
+    flight.task = asyncio.create_task(_run_local(flight, factory, r))
+    return flight
+
+
+async def coalesce(
+    key: str,
+    factory: Callable[[], AsyncIterator[Dict[str, Any]]],
+) -> AsyncGenerator[Dict[str, Any], None]:
+    """
+    Yield the events of the scan identified by `key`, starting `factory()` only if no flight
+    for `key` is running. Events a subscriber did not start itself are tagged `coalesced`.
+    """
+    flight = _flights.get(key)
+    owner = flight is None
+    if owner:
+        flight = await _start(key, factory)
+    flight.subscribers += 1
+    shared = not owner or flight.remote
+    i = 0
+    try:
+        while True:
+            changed = flight._changed
+            while i < len(flight.events):
+                evt = flight.events[i]
+                i += 1
+                yield {**evt, "coalesced": key} if shared else evt
+            if flight.done:
+                if flight.error is not None and not isinstance(flight.error, asyncio.CancelledError):
+                    raise flight.error
+                return
+            await changed.wait()
+    finally:
+        flight.subscribers -= 1
+        if flight.subscribers <= 0:
+            if _flights.get(key) is flight:
+                _flights.pop(key, None)
+            if flight.task is not None and not flight.task.done():
+                flight.task.cancel()
+                with contextlib.suppress(BaseException):
+                    await flight.task
+        elif flight.done and _flights.get(key) is flight:
+            _flights.pop(key, None)
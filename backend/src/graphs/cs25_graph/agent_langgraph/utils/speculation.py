@@ -0,0 +1,102 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/speculation.py
+
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Iterable, List, Optional
+
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import cancel_tasks
+
+
+# ------------------ Speculative start ------------------
+#
+# topic_llm has to finish a full LLM round trip before the relevance scan can begin. Work that
+# does not depend on the final topic (or that can be checked against it afterwards) is started
+# on the raw user message instead, as named background tasks registered under the run id.
+# The consumer takes the Speculation over once the topic is known and, per task, either keeps
+# the result (awaiting it if still running) or drops it (cancelled, result discarded).
+# time_saved_s is the part of the kept work that ran while the topic was still being generated.
+
+class Speculation:
+    def __init__(self, run_id: str, query: str):
+        self.run_id = run_id
+        self.query = query
+        self.started = time.monotonic()
+        self.ready_at: Optional[float] = None          # when the final input (topic) was known
+        self.tasks: Dict[str, "asyncio.Task[Any]"] = {}
+        self.spans: Dict[str, List[Optional[float]]] = {}
+        self.errors: Dict[str, str] = {}
+
+    def spawn(self, name: str, coro: Awaitable[Any]) -> "asyncio.Task[Any]":
+        async def timed() -> Any:
+            span: List[Optional[float]] = [time.monotonic(), None]
+            self.spans[name] = span
+            try:
+                return await coro
+            finally:
+                span[1] = time.monotonic()
+
+        task = asyncio.create_task(timed())
+        self.tasks[name] = task
+        return task
+
+    def topic_ready(self) -> None:
+        if self.ready_at is None:
+            self.ready_at = time.monotonic()
+
+    async def keep(self, name: str) -> Any:
+        """Result of a speculative task (waits for it if still running); None if it failed or was never spawned."""
+        task = self.tasks.get(name)
+        if task is None:
+            return None
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if task.cancelled():   # dropped earlier
+                return None
+            task.cancel()          # the consumer itself is being cancelled: take the work down with it
+            raise
+        except Exception as e:
+            self.errors[name] = f"{type(e).__name__}: {e}"
+            return None
+
+    async def drop(self, names: Optional[Iterable[str]] = None) -> None:
+        """Cancel speculative tasks (all when names is None); their results are discarded."""
+        picked = list(self.tasks) if names is None else [n for n in names if n in self.tasks]
+        await cancel_tasks([self.tasks[n] for n in picked])
+
+    def report(self, kept: Iterable[str]) -> Dict[str, Any]:
+        now = time.monotonic()
+        ready = self.ready_at if self.ready_at is not None else now
+        saved = 0.0
+        for name in kept:
+            span = self.spans.get(name)
+            if span:
+                # the tasks run side by side, so the saving is the longest overlap, not their sum
+                saved = max(saved, min(span[1] or now, ready) - span[0])
+        return {
+            "topic_s": ready - self.started,
+            "tasks_s": {n: (s[1] or now) - s[0] for n, s in self.spans.items()},
+            "time_saved_s": max(0.0, saved),
+            "errors": dict(self.errors),
+        }
+
+
+_SPECULATIONS: Dict[str, Speculation] = {}
+
+
+def open_speculation(run_id: str, query: str) -> Speculation:
+    spec = Speculation(run_id, query)
+    _SPECULATIONS[run_id] = spec
+    return spec
+
+
+def take_speculation(run_id: Optional[str]) -> Optional[Speculation]:
+    """Hand the run's speculation to its consumer (once)."""
+    return _SPECULATIONS.pop(run_id, None) if run_id else None
+
+
+async def discard_speculation(run_id: Optional[str]) -> None:
+    """Run ended (or failed) before anything took its speculation over: cancel it."""
+    spec = take_speculation(run_id)
+    if spec is not None:
+        await spec.drop()
@@ -1,6 +1,6 @@
 # backend/src/graphs/cs25_graph/agent_langgraph/utils/state.py
 
-from typing import Annotated, Literal, NotRequired, Optional
+from typing import Annotated, Any, Dict, Literal, NotRequired, Optional
 from langgraph.prebuilt.chat_agent_executor import AgentState
 from typing import Optional
 from langgraph.graph import MessagesState
@@ -24,6 +24,10 @@ class AgentState(MessagesState):
     system_status: Optional[str] = None  # NEW
     needs_trigger: Optional[str] = None
 
+    scan_options: Optional[Dict[str, Any]] = None  # per-run ScanOptions (raw dict from the FE)
+    run_id: Optional[str] = None                   # stream run id; scan checkpoints are saved under it
+    resume_run_id: Optional[str] = None            # replay checkpoints of this earlier run, scan only the rest
+
 
 # -------------------------------
 # Needs Panel (batch scan) state
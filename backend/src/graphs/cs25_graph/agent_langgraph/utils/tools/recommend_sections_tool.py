@@ -1,6 +1,6 @@
 # backend/src/graphs/cs25_graph/agent_langgraph/utils/tools/recommend_sections_tool.py
 
-from typing import Annotated, Optional, Any
+from typing import Annotated, Optional
 from langchain_core.messages import ToolMessage
 from langchain_core.tools import tool, InjectedToolCallId
 from langgraph.types import Command
@@ -10,11 +10,17 @@ from src.graphs.cs25_graph.agent_langgraph.utils.state import AgentState
 
 from src.graphs.cs25_graph.utils import ManifestGraph, GraphOps
 
-import os, uuid, asyncio, time, random, json
-from typing import Dict, Any, List, Optional, Tuple, Callable, AsyncGenerator
+import uuid, asyncio, time, random, json
+from typing import List, Optional, Callable, AsyncGenerator
 from pydantic import BaseModel, Field
-from openai import AsyncOpenAI, APIStatusError
+from openai import APIStatusError
 
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import cancel_tasks
+from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+from src.graphs.cs25_graph.agent_langgraph.utils.usage import (
+    enrich_usage_with_costs as _enrich_usage_with_costs,
+    usage_from_response, prompt_cache_key, UsageTally,
+)
 
 
 # -------- agent schema for recommending sections --------------------
@@ -30,7 +36,7 @@ class RecResult(BaseModel):
 class SectionRecommender:
     def __init__(self, model: str, api_key: Optional[str] = None):
         self.model = model
-        self.client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.client = get_async_openai(api_key)
 
     async def run(self, inputs: RecInputs) -> dict:
         system = ("""
@@ -77,37 +83,18 @@ Important:
 </INTENTS>
 """
         # print(f"user_content: {user_content}")
+        t0 = time.time()
         resp = await self.client.responses.parse(
             model=self.model,
             input=[{"role": "system", "content": system},
                    {"role": "user", "content": user_content}],
             text_format=RecResult,
+            prompt_cache_key=prompt_cache_key(system, inputs.topic),  # system + TOPIC prefix is shared by the sweep
         )
         parsed = resp.output_parsed.model_dump()
-        usage = {"input_tokens": resp.usage.input_tokens,
-                 "output_tokens": resp.usage.output_tokens,
-                 "total_tokens": resp.usage.total_tokens}
+        usage = usage_from_response(resp, latency_s=time.time() - t0)
         return {"response": parsed, "usage": usage}
 
-# ------------------ Cost helper (no schema dependence) ------------------
-def _enrich_usage_with_costs(usage: Dict[str, Any], pricing_per_million: Tuple[float, float]) -> Dict[str, Any]:
-    u = dict(usage or {})
-    pin, pout = pricing_per_million
-    in_tok  = int(u.get("input_tokens", 0) or 0)
-    out_tok = int(u.get("output_tokens", 0) or 0)
-    total   = int(u.get("total_tokens", in_tok + out_tok) or (in_tok + out_tok))
-    in_cost  = (in_tok  / 1_000_000.0) * pin
-    out_cost = (out_tok / 1_000_000.0) * pout
-    u.update({
-        "input_tokens": in_tok,
-        "output_tokens": out_tok,
-        "total_tokens": total,
-        "input_cost": in_cost,
-        "output_cost": out_cost,
-        "total_cost": in_cost + out_cost,
-    })
-    return u
-
 # -------------- batch streaming over Sections -----------------------
 async def _stream_sections_batch_parallel(
     batch_items: list[dict],
@@ -119,8 +106,7 @@ async def _stream_sections_batch_parallel(
 ) -> AsyncGenerator[dict, None]:
     t0 = time.time()
     total, done = len(batch_items), 0
-    pin, pout = pricing_per_million
-    batch_in, batch_out = 0, 0
+    tally = UsageTally()
 
     yield {"type": "batch_start", "ts": time.time(), "size": total}
 
@@ -130,7 +116,12 @@ async def _stream_sections_batch_parallel(
         sb = ops.format_section_context_block(bundle["trace"], include_uuids=False)
         ib = ops.format_section_intents_block(sid, bundle["intents"], include_uuids=False)
         rec_inputs = RecInputs(topic=topic, section_block=sb, intents_block=ib)
-        res = await agent.run(rec_inputs)
+        try:
+            res = await agent.run(rec_inputs)
+        except Exception as e:
+            # one failing section must not sink the whole sweep; callers treat a missing score as "unknown"
+            res = {"response": {"error": f"{type(e).__name__}: {e}"},
+                   "usage": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}}
         # annotate
         u = res.get("usage") or {}
         u = _enrich_usage_with_costs(u, pricing_per_million)
@@ -150,32 +141,37 @@ async def _stream_sections_batch_parallel(
         }
 
     tasks = [asyncio.create_task(one(it)) for it in batch_items]
-    for fut in asyncio.as_completed(tasks):
-        evt = await fut
-        done += 1
-        evt["done"] = done
-        usage = evt["item"]["usage"]
-        batch_in  += int(usage.get("input_tokens", 0) or 0)
-        batch_out += int(usage.get("output_tokens", 0) or 0)
-        yield evt
-        yield {
-            "type": "batch_progress",
-            "ts": time.time(),
-            "done": done,
-            "total": total,
-            "tokens_in": batch_in,
-            "tokens_out": batch_out,
-            "batch_cost": (batch_in/1e6)*pin + (batch_out/1e6)*pout,
-            "elapsed_s": time.time() - t0,
-        }
+    try:
+        for fut in asyncio.as_completed(tasks):
+            evt = await fut
+            done += 1
+            evt["done"] = done
+            tally.add(evt["item"]["usage"])
+            yield evt
+            yield {
+                "type": "batch_progress",
+                "ts": time.time(),
+                "done": done,
+                "total": total,
+                "tokens_in": tally.tokens_in,
+                "tokens_out": tally.tokens_out,
+                "tokens_cached": tally.tokens_cached,
+                "batch_cost": tally.cost,
+                "cache": tally.cache(),
+                "elapsed_s": time.time() - t0,
+            }
+    finally:
+        await cancel_tasks(tasks)
 
     yield {
         "type": "batch_end",
         "ts": time.time(),
         "elapsed_s": time.time() - t0,
-        "tokens_in": batch_in,
-        "tokens_out": batch_out,
-        "batch_cost": (batch_in/1e6)*pin + (batch_out/1e6)*pout,
+        "tokens_in": tally.tokens_in,
+        "tokens_out": tally.tokens_out,
+        "tokens_cached": tally.tokens_cached,
+        "batch_cost": tally.cost,
+        "cache": tally.cache(),
         "size": total,
     }
 
@@ -189,8 +185,11 @@ async def stream_all_sections(
     batch_size: int = 50,
     limit: Optional[int] = None,
     pricing_per_million: tuple[float, float] = (0.05, 0.40),
+    section_uuids: Optional[set] = None,   # restrict the sweep (e.g. sections owning the selected traces)
 ) -> AsyncGenerator[dict, None]:
     secs = ops.iter_section_nodes()
+    if section_uuids is not None:
+        secs = [s for s in secs if s.get("section_uuid") in section_uuids]
     if limit:
         secs = secs[:limit]
     batches = [secs[i:i+batch_size] for i in range(0, len(secs), batch_size)]
@@ -205,7 +204,7 @@ async def stream_all_sections(
            "pricing_per_million": {"input_usd": pricing_per_million[0], "output_usd": pricing_per_million[1]}}
 
     agent = SectionRecommender(model=model)
-    total_in, total_out = 0, 0
+    tally = UsageTally()
 
     for i, batch in enumerate(batches, 1):
         yield {"type": "batch_header", "index": i, "of": len(batches), "size": len(batch), "ts": time.time()}
@@ -214,11 +213,8 @@ async def stream_all_sections(
         ):
             yield evt
             if evt["type"] == "item_done":
-                u = evt["item"]["usage"]
-                total_in  += int(u.get("input_tokens", 0) or 0)
-                total_out += int(u.get("output_tokens", 0) or 0)
+                tally.add(evt["item"]["usage"])
 
-    grand_cost = (total_in/1e6)*pricing_per_million[0] + (total_out/1e6)*pricing_per_million[1]
     yield {"type": "run_end",
            "ts": time.time(),
            "summary": {"model": model,
@@ -226,10 +222,12 @@ async def stream_all_sections(
                        "total_sections": len(secs),
                        "batch_size_parallelism": batch_size,
                        "num_batches": len(batches),
-                       "tokens_in": total_in,
-                       "tokens_out": total_out,
-                       "estimated_cost": grand_cost,
-                       "pricing_per_million": {"input_usd": pricing_per_million[0], "output_usd": pricing_per_million[1]}}}
+                       "tokens_in": tally.tokens_in,
+                       "tokens_out": tally.tokens_out,
+                       "tokens_cached": tally.tokens_cached,
+                       "estimated_cost": tally.cost,
+                       "pricing_per_million": {"input_usd": pricing_per_million[0], "output_usd": pricing_per_million[1]},
+                       "cache": tally.cache()}}
 
 
 
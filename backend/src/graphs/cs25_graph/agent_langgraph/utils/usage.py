@@ -0,0 +1,134 @@
+# backend/src/graphs/cs25_graph/agent_langgraph/utils/usage.py
+
+import hashlib
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+# ------------------ Token usage & cost (shared by every fan-out pipeline) ------------------
+#
+# pricing_per_million is (input_usd, cached_input_usd, output_usd), the model's published rates.
+# A legacy (input_usd, output_usd) pair has no cached rate, so cached tokens are billed at full input price.
+
+
+def usage_from_response(resp: Any, *, latency_s: Optional[float] = None) -> Dict[str, Any]:
+    """Raw token counts from a Responses API result, including prefix-cache hits."""
+    u = getattr(resp, "usage", None)
+    if u is None:
+        out: Dict[str, Any] = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached_tokens": 0}
+    else:
+        details = getattr(u, "input_tokens_details", None)
+        out = {
+            "input_tokens": int(getattr(u, "input_tokens", 0) or 0),
+            "output_tokens": int(getattr(u, "output_tokens", 0) or 0),
+            "total_tokens": int(getattr(u, "total_tokens", 0) or 0),
+            "cached_tokens": int(getattr(details, "cached_tokens", 0) or 0) if details is not None else 0,
+        }
+    if latency_s is not None:
+        out["latency_s"] = latency_s
+    return out
+
+
+def pricing_rates(pricing_per_million: Sequence[float]) -> Tuple[float, float, float]:
+    """(input, cached_input, output) USD per million tokens."""
+    p = [float(x) for x in pricing_per_million]
+    if len(p) == 2:
+        return p[0], p[0], p[1]
+    return p[0], p[1], p[2]
+
+
+def pricing_summary(pricing_per_million: Sequence[float]) -> Dict[str, float]:
+    """The pricing block reported in run summaries."""
+    pin, pcached, pout = pricing_rates(pricing_per_million)
+    return {"input_usd": pin, "cached_input_usd": pcached, "output_usd": pout}
+
+
+def enrich_usage_with_costs(usage: Dict[str, Any], pricing_per_million: Sequence[float]) -> Dict[str, Any]:
+    u = dict(usage or {})
+    pin, pcached, pout = pricing_rates(pricing_per_million)
+    in_tok  = int(u.get("input_tokens", 0) or 0)
+    out_tok = int(u.get("output_tokens", 0) or 0)
+    cached  = min(int(u.get("cached_tokens", 0) or 0), in_tok)
+    total   = int(u.get("total_tokens", in_tok + out_tok) or (in_tok + out_tok))
+    in_cost  = ((in_tok - cached) / 1_000_000.0) * pin + (cached / 1_000_000.0) * pcached
+    out_cost = (out_tok / 1_000_000.0) * pout
+    u.update({
+        "input_tokens": in_tok,
+        "output_tokens": out_tok,
+        "total_tokens": total,
+        "cached_tokens": cached,
+        "input_cost": in_cost,
+        "output_cost": out_cost,
+        "total_cost": in_cost + out_cost,
+        "cache_savings": (cached / 1_000_000.0) * (pin - pcached),
+    })
+    return u
+
+
+def merge_usage(*usages: Dict[str, Any]) -> Dict[str, Any]:
+    """Sum token, cost and latency fields of several enriched usages (e.g. both cascade tiers)."""
+    out: Dict[str, Any] = {}
+    for u in usages:
+        for k, v in (u or {}).items():
+            if isinstance(v, (int, float)) and not isinstance(v, bool):
+                out[k] = out.get(k, 0) + v
+    return out
+
+
+class UsageTally:
+    """
+    Running totals for progress events. Costs are summed from enriched per-item usage
+    (so cached-token discounts and mixed-model pricing are already applied).
+    Latency is split by whether the call hit the prefix cache.
+    """
+
+    def __init__(self):
+        self.tokens_in = 0
+        self.tokens_out = 0
+        self.tokens_cached = 0
+        self.cost = 0.0
+        self.cache_savings = 0.0
+        self._lat = {True: [0.0, 0], False: [0.0, 0]}
+
+    def add(self, usage: Dict[str, Any]) -> None:
+        u = usage or {}
+        cached = int(u.get("cached_tokens", 0) or 0)
+        self.tokens_in += int(u.get("input_tokens", 0) or 0)
+        self.tokens_out += int(u.get("output_tokens", 0) or 0)
+        self.tokens_cached += cached
+        self.cost += float(u.get("total_cost", 0.0) or 0.0)
+        self.cache_savings += float(u.get("cache_savings", 0.0) or 0.0)
+        if u.get("latency_s") is not None:
+            bucket = self._lat[cached > 0]
+            bucket[0] += float(u["latency_s"])
+            bucket[1] += 1
+
+    def avg_latency(self) -> Optional[float]:
+        total = self._lat[True][0] + self._lat[False][0]
+        n = self._lat[True][1] + self._lat[False][1]
+        return (total / n) if n else None
+
+    def cache(self) -> Dict[str, Any]:
+        def _avg(hit: bool) -> Optional[float]:
+            total, n = self._lat[hit]
+            return (total / n) if n else None
+        return {
+            "tokens_cached": self.tokens_cached,
+            "hit_rate": (self.tokens_cached / self.tokens_in) if self.tokens_in else 0.0,
+            "savings": self.cache_savings,
+            "avg_latency_cached_s": _avg(True),
+            "avg_latency_uncached_s": _avg(False),
+        }
+
+
+# ------------------ Prompt prefix caching ------------------
+
+def prompt_cache_key(*shared_parts: str) -> str:
+    """
+    Routing hint for provider-side prefix caching: every request of one scan that shares the
+    same system prompt + query gets the same key, so they land on the same cache.
+    """
+    h = hashlib.sha1()
+    for p in shared_parts:
+        h.update((p or "").encode("utf-8"))
+        h.update(b"\x00")
+    return f"e42-{h.hexdigest()[:16]}"
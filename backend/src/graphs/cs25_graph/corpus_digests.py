@@ -0,0 +1,246 @@
+# backend/src/graphs/cs25_graph/corpus_digests.py
+
+import json, time, asyncio, hashlib
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from src.graphs.cs25_graph.utils import ManifestGraph
+
+
+# ------------------------------
+# Section / Trace digests (corpus-compile time artefact)
+# ------------------------------
+#
+# Every Intent node (attached to a Section or to a Trace) gets a short "digest": a few sentences
+# the relevance and needs prompts can show instead of the full intent / summary / events text
+# (see agent_langgraph/utils/compaction.py).
+#
+# The digests live IN the corpus bundle, as attribute records for the existing Intent nodes:
+#   nodes/NODES_digests.jsonl   {"uuid": <intent uuid>, "digest": ..., "digest_version": ..., ...}
+# listed last in manifest.bundle.nodes, so ManifestGraph merges them onto the Intent nodes.
+# Writing them changes the corpus checksum: run this BEFORE corpus_embeddings.
+#
+# Incremental: each record stores a hash of the text it was made from plus the digest version;
+# a rerun only calls the LLM for intents that are new or whose text / version changed, and drops
+# records of intents that no longer exist.
+
+DIGEST_VERSION = "d1"          # bump when the prompt or limits change → everything is regenerated
+DEFAULT_DIGEST_MODEL = "gpt-5-mini"
+DIGEST_FILE = "nodes/NODES_digests.jsonl"
+_WORD_LIMITS = {"Section": 60, "Trace": 40}
+
+_DIGEST_SYSTEM = """
+You condense CS-25 regulatory intent records for an AI that screens regulations for relevance.
+
+Write ONE digest of at most {words} words that keeps:
+- what the rule requires or allows, and for which aircraft, systems or conditions;
+- the hazards or failure cases it addresses;
+- named exceptions or scope limits.
+Drop history, amendment references and explanations of terms unless they change applicability.
+Plain sentences, no lists, no paragraph numbers unless essential.
+"""
+
+
+class DigestOutput(BaseModel):
+    digest: str = Field(description="The condensed digest, within the word limit.")
+
+
+def _source_text(node: Dict[str, Any]) -> str:
+    parts = []
+    if node.get("intent"):
+        parts.append(f"INTENT: {str(node['intent']).strip()}")
+    if node.get("summary"):
+        parts.append(f"SUMMARY: {str(node['summary']).strip()}")
+    events = node.get("events") or []
+    if isinstance(events, list) and events:
+        parts.append("EVENTS:\n" + "\n".join(f"- {str(e).strip()}" for e in events))
+    return "\n\n".join(parts)
+
+
+def _source_hash(text: str) -> str:
+    return "sha256:" + hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+
+def intent_owners(mg: ManifestGraph) -> List[Tuple[str, str, str]]:
+    """(intent_uuid, owner ntype "Section"|"Trace", owner label) for every Intent node."""
+    G = mg.G
+    out: List[Tuple[str, str, str]] = []
+    for nid, data in G.nodes(data=True):
+        if data.get("ntype") != "Intent":
+            continue
+        for src, _, d in G.in_edges(nid, data=True):
+            if d.get("relation") != "HAS_INTENT":
+                continue
+            owner = G.nodes.get(src, {})
+            kind = owner.get("ntype")
+            if kind == "Section":
+                out.append((nid, "Section", str(owner.get("label") or owner.get("number") or "")))
+            elif kind == "Trace":
+                out.append((nid, "Trace", str(owner.get("bottom") or "")))
+            break
+    return out
+
+
+def _load_existing(path: Path) -> Dict[str, Dict[str, Any]]:
+    if not path.exists():
+        return {}
+    out: Dict[str, Dict[str, Any]] = {}
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rec = json.loads(line)
+                if rec.get("uuid"):
+                    out[rec["uuid"]] = rec
+    return out
+
+
+def plan_digests(mg: ManifestGraph, *, model: str, force: bool = False) -> Dict[str, Any]:
+    """
+    Diff the corpus against the existing digest file:
+      {"todo": [(uuid, kind, label, source_text)], "keep": {uuid: record}, "removed": [uuid], "existing": int}
+    """
+    existing = _load_existing(mg.corpus_dir / DIGEST_FILE)
+    todo: List[Tuple[str, str, str, str]] = []
+    keep: Dict[str, Dict[str, Any]] = {}
+    live = set()
+    for uuid, kind, label in intent_owners(mg):
+        live.add(uuid)
+        text = _source_text(mg.G.nodes[uuid])
+        if not text:
+            continue
+        rec = existing.get(uuid)
+        fresh = (
+            rec is not None and not force
+            and rec.get("digest_version") == DIGEST_VERSION
+            and rec.get("digest_model") == model
+            and rec.get("digest_source") == _source_hash(text)
+            and rec.get("digest")
+        )
+        if fresh:
+            keep[uuid] = rec
+        else:
+            todo.append((uuid, kind, label, text))
+    removed = [u for u in existing if u not in live]
+    return {"todo": todo, "keep": keep, "removed": removed, "existing": len(existing)}
+
+
+async def build_digests(
+    mg: ManifestGraph,
+    client,
+    *,
+    model: str = DEFAULT_DIGEST_MODEL,
+    concurrency: int = 16,
+    force: bool = False,
+    dry_run: bool = False,
+) -> Dict[str, Any]:
+    """
+    Generate missing / stale digests with `client` (any Responses-API client: the pooled
+    OpenAI client, or the mock / cassette backends via LLM_BACKEND), write the bundle file,
+    register it in the manifest and refresh the corpus checksum.
+    """
+    from src.graphs.cs25_graph.agent_langgraph.utils.retry import RetryPolicy
+    from src.graphs.cs25_graph.agent_langgraph.utils.usage import usage_from_response
+
+    t0 = time.time()
+    plan = plan_digests(mg, model=model, force=force)
+    report: Dict[str, Any] = {
+        "version": DIGEST_VERSION,
+        "model": model,
+        "existing": plan["existing"],
+        "reused": len(plan["keep"]),
+        "to_generate": len(plan["todo"]),
+        "removed": len(plan["removed"]),
+    }
+    if dry_run:
+        return {**report, "dry_run": True}
+
+    sem = asyncio.Semaphore(max(1, concurrency))
+    retry = RetryPolicy()
+    tokens = {"input_tokens": 0, "output_tokens": 0}
+    failed: List[str] = []
+
+    async def one(uuid: str, kind: str, label: str, text: str) -> Optional[Dict[str, Any]]:
+        system = _DIGEST_SYSTEM.format(words=_WORD_LIMITS[kind])
+        user = f"<{kind.upper()}>{label}</{kind.upper()}>\n\n{text}"
+        async with sem:
+            try:
+                resp = await retry.call(lambda: client.responses.parse(
+                    model=model,
+                    input=[{"role": "system", "content": system}, {"role": "user", "content": user}],
+                    text_format=DigestOutput,
+                ))
+            except Exception:
+                failed.append(uuid)
+                return None
+        u = usage_from_response(resp)
+        tokens["input_tokens"] += u["input_tokens"]
+        tokens["output_tokens"] += u["output_tokens"]
+        digest = (resp.output_parsed.digest or "").strip()
+        if not digest:
+            failed.append(uuid)
+            return None
+        return {
+            "uuid": uuid,
+            "digest": digest,
+            "digest_of": kind,
+            "digest_version": DIGEST_VERSION,
+            "digest_model": model,
+            "digest_source": _source_hash(text),
+            "digest_created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        }
+
+    made = await asyncio.gather(*(one(*t) for t in plan["todo"]))
+    records = {**plan["keep"], **{r["uuid"]: r for r in made if r}}
+
+    path = mg.corpus_dir / DIGEST_FILE
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as f:
+        for uuid in sorted(records):
+            f.write(json.dumps(records[uuid], ensure_ascii=False) + "\n")
+
+    # attribute records must load after the Intent nodes they extend
+    nodes = [p for p in (mg.manifest.setdefault("bundle", {}).get("nodes") or []) if p != DIGEST_FILE]
+    mg.manifest["bundle"]["nodes"] = nodes + [DIGEST_FILE]
+    mg._resolve_bundle_paths()
+    integrity = mg.update_manifest()
+
+    return {
+        **report,
+        "generated": len(plan["todo"]) - len(failed),
+        "failed": failed,
+        "written": str(path),
+        "count": len(records),
+        "usage": tokens,
+        "corpus_checksum": (integrity.get("integrity") or {}).get("checksum"),
+        "elapsed_s": time.time() - t0,
+    }
+
+
+# ------------------------------
+# CLI:  python -m src.graphs.cs25_graph.corpus_digests [model] [--force] [--dry-run]
+# ------------------------------
+
+async def _main(model: str, force: bool, dry_run: bool) -> None:
+    from dotenv import load_dotenv, find_dotenv
+    load_dotenv(find_dotenv(".env"))
+
+    mg = ManifestGraph()
+    print("LOAD:", mg.load())
+    from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+    client = get_async_openai()  # honours LLM_BACKEND (mock / cassettes) like the pipelines
+    report = await build_digests(mg, client, model=model, force=force, dry_run=dry_run)
+    print("DIGESTS:", json.dumps(report, indent=2))
+    if not dry_run:
+        print("NOTE: corpus checksum changed; rebuild embeddings (python -m src.graphs.cs25_graph.corpus_embeddings).")
+
+
+if __name__ == "__main__":
+    import sys
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    asyncio.run(_main(
+        args[0] if args else DEFAULT_DIGEST_MODEL,
+        force="--force" in sys.argv,
+        dry_run="--dry-run" in sys.argv,
+    ))
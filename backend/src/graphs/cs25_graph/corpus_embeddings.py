@@ -0,0 +1,282 @@
+# backend/src/graphs/cs25_graph/corpus_embeddings.py
+
+import json, time, asyncio
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple, Iterable
+
+import numpy as np
+from openai import AsyncOpenAI
+
+from src.graphs.cs25_graph.utils import ManifestGraph, GraphOps
+
+
+# ------------------------------
+# Trace embeddings (corpus-compile time artefact)
+# ------------------------------
+#
+# Layout next to manifest.json:
+#   embeddings/TRACE_EMBEDDINGS_<embed_model>.npy        float32 [n_traces, dims], L2-normalised
+#   embeddings/TRACE_EMBEDDINGS_<embed_model>.meta.json  { trace_ids, embed_model, dims, corpus_checksum, ... }
+#
+# The artefact is NOT part of the manifest bundle (it would change the corpus checksum).
+# Instead the meta file records the checksum it was built against, and the loader
+# refuses a stale index.
+
+DEFAULT_EMBED_MODEL = "text-embedding-3-small"
+EMBED_DIR = "embeddings"
+_MAX_EMBED_CHARS = 8000  # well below the 8191-token input cap of the embedding models
+
+
+def _artefact_paths(corpus_dir: Path, embed_model: str) -> Tuple[Path, Path]:
+    stem = f"TRACE_EMBEDDINGS_{embed_model}"
+    base = corpus_dir / EMBED_DIR
+    return base / f"{stem}.npy", base / f"{stem}.meta.json"
+
+
+def _intent_lines(intents: List[Dict[str, Any]], uuid_node: Optional[str]) -> List[str]:
+    out: List[str] = []
+    for entry in intents or []:
+        if uuid_node and entry.get("uuid_node") != uuid_node:
+            continue
+        for it in entry.get("intents") or []:
+            if it.get("summary"):
+                out.append(f"SUMMARY: {str(it['summary']).strip()}")
+            if it.get("intent"):
+                out.append(f"INTENT: {str(it['intent']).strip()}")
+            events = it.get("events") or []
+            if isinstance(events, list) and events:
+                out.append("EVENTS: " + " | ".join(str(e).strip() for e in events[:8]))
+    return out
+
+
+def trace_embedding_text(ops: GraphOps, bottom_uuid: str) -> str:
+    """
+    Plain-text view of one trace used for embedding:
+      paragraph id + section label + trace intent + section intent.
+    Kept deliberately close to what the relevance prompt shows the LLM.
+    """
+    bundle = ops.build_records_for_bottom(bottom_uuid)
+    trace = bundle.get("trace") or []
+    section = next((n for n in trace if n.get("ntype") == "Section"), None)
+    bottom = trace[-1] if trace else {}
+
+    lines = [
+        f"PARAGRAPH: {bottom.get('paragraph_id') or ''}",
+        f"SECTION: {(section or {}).get('label') or ''}",
+    ]
+    lines += _intent_lines(bundle.get("intents") or [], bottom_uuid)
+    if section:
+        lines += _intent_lines(bundle.get("intents") or [], section.get("uuid"))
+    return "\n".join(lines).strip()[:_MAX_EMBED_CHARS]
+
+
+def _normalise_rows(X: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(X, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (X / norms).astype(np.float32)
+
+
+async def embed_texts(
+    client: AsyncOpenAI,
+    texts: List[str],
+    *,
+    embed_model: str = DEFAULT_EMBED_MODEL,
+    batch_size: int = 256,
+) -> Tuple[np.ndarray, int]:
+    """Returns (L2-normalised matrix, prompt tokens used)."""
+    vecs: List[List[float]] = []
+    tokens = 0
+    for i in range(0, len(texts), batch_size):
+        resp = await client.embeddings.create(model=embed_model, input=texts[i:i + batch_size])
+        vecs.extend([d.embedding for d in resp.data])
+        usage = getattr(resp, "usage", None)
+        tokens += int(getattr(usage, "prompt_tokens", 0) or 0) if usage else 0
+    if not vecs:
+        return np.zeros((0, 0), dtype=np.float32), tokens
+    return _normalise_rows(np.array(vecs, dtype=np.float32)), tokens
+
+
+async def build_trace_embeddings(
+    mg: ManifestGraph,
+    ops: GraphOps,
+    client: AsyncOpenAI,
+    *,
+    embed_model: str = DEFAULT_EMBED_MODEL,
+    batch_size: int = 256,
+) -> Dict[str, Any]:
+    """
+    Embed every Trace in the corpus and persist the matrix + meta next to manifest.json.
+    Run this whenever the corpus is recompiled (after ManifestGraph.update_manifest()).
+    """
+    t0 = time.time()
+    rows: List[Tuple[str, str]] = []
+    for nid, data in mg.G.nodes(data=True):
+        if data.get("ntype") != "Trace" or not data.get("bottom_uuid"):
+            continue
+        rows.append((nid, trace_embedding_text(ops, data["bottom_uuid"])))
+
+    X, tokens = await embed_texts(client, [t for _, t in rows], embed_model=embed_model, batch_size=batch_size)
+
+    npy_path, meta_path = _artefact_paths(mg.corpus_dir, embed_model)
+    npy_path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(npy_path, X)
+
+    meta = {
+        "embed_model": embed_model,
+        "dims": int(X.shape[1]) if X.size else 0,
+        "count": len(rows),
+        "trace_ids": [tid for tid, _ in rows],
+        "corpus_checksum": (mg.manifest.get("integrity") or {}).get("checksum"),
+        "corpus_content_rev": (mg.manifest.get("integrity") or {}).get("content_rev"),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "prompt_tokens": tokens,
+    }
+    meta_path.write_text(json.dumps(meta, ensure_ascii=False) + "\n", encoding="utf-8")
+
+    return {
+        "written": [str(npy_path), str(meta_path)],
+        "count": len(rows),
+        "dims": meta["dims"],
+        "prompt_tokens": tokens,
+        "elapsed_s": time.time() - t0,
+    }
+
+
+# ------------------------------
+# Query-time index
+# ------------------------------
+
+class TraceEmbeddingIndex:
+    """
+    In-memory view of the persisted trace embeddings.
+    All scoring is a single NumPy mat-vec (cosine, rows are pre-normalised).
+    """
+
+    def __init__(self, X: np.ndarray, trace_ids: List[str], meta: Dict[str, Any]):
+        self.X = X
+        self.trace_ids = trace_ids
+        self.meta = meta
+        self.embed_model: str = meta.get("embed_model") or DEFAULT_EMBED_MODEL
+        self._row: Dict[str, int] = {tid: i for i, tid in enumerate(trace_ids)}
+
+    @classmethod
+    def load(cls, mg: ManifestGraph, embed_model: str = DEFAULT_EMBED_MODEL) -> Tuple[Optional["TraceEmbeddingIndex"], str]:
+        """Returns (index | None, status). status ∈ {"ok", "missing", "stale", "corrupt"}."""
+        npy_path, meta_path = _artefact_paths(mg.corpus_dir, embed_model)
+        if not (npy_path.exists() and meta_path.exists()):
+            return None, "missing"
+        try:
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            X = np.load(npy_path)
+        except Exception:
+            return None, "corrupt"
+
+        declared = (mg.manifest.get("integrity") or {}).get("checksum")
+        if declared and meta.get("corpus_checksum") != declared:
+            return None, "stale"
+
+        ids = meta.get("trace_ids") or []
+        if X.ndim != 2 or X.shape[0] != len(ids):
+            return None, "corrupt"
+        return cls(X.astype(np.float32, copy=False), ids, meta), "ok"
+
+    def has(self, trace_uuid: str) -> bool:
+        return trace_uuid in self._row
+
+    def scores_for(self, qvec: np.ndarray, trace_uuids: Iterable[str]) -> Dict[str, float]:
+        """Cosine similarity for the requested traces that exist in the index."""
+        ids = [t for t in trace_uuids if t in self._row]
+        if not ids:
+            return {}
+        rows = np.fromiter((self._row[t] for t in ids), dtype=np.int64, count=len(ids))
+        sims = self.X[rows] @ qvec.astype(np.float32, copy=False).reshape(-1)
+        return {t: float(s) for t, s in zip(ids, sims.tolist())}
+
+
+def select_candidates(
+    scores: Dict[str, float],
+    *,
+    top_k: Optional[int] = None,
+    threshold: Optional[float] = None,
+    recall_margin: float = 0.25,
+    min_candidates: int = 0,
+) -> Tuple[set, Dict[str, Any]]:
+    """
+    Pick the traces that go on to the LLM.
+
+    - top_k:     keep the ceil(top_k * (1 + recall_margin)) best scores
+    - threshold: keep scores >= threshold * (1 - recall_margin)
+    - both set:  union of the two (recall wins over savings)
+    - min_candidates: floor, filled from the best remaining scores
+    If neither top_k nor threshold is set, everything is a candidate.
+    """
+    ranked = sorted(scores.items(), key=lambda kv: -kv[1])
+    margin = max(0.0, float(recall_margin or 0.0))
+    keep: set = set()
+
+    eff_k = None
+    if top_k:
+        eff_k = int(np.ceil(int(top_k) * (1.0 + margin)))
+        keep.update(t for t, _ in ranked[:eff_k])
+
+    eff_threshold = None
+    if threshold is not None:
+        eff_threshold = float(threshold) * (1.0 - margin)
+        keep.update(t for t, s in ranked if s >= eff_threshold)
+
+    if not top_k and threshold is None:
+        keep = set(scores.keys())
+
+    floor = max(0, int(min_candidates or 0))
+    if len(keep) < floor:
+        for t, _ in ranked:
+            if len(keep) >= floor:
+                break
+            keep.add(t)
+
+    cutoff = min((scores[t] for t in keep), default=None)
+    return keep, {
+        "effective_top_k": eff_k,
+        "effective_threshold": eff_threshold,
+        "score_cutoff": cutoff,
+        "recall_margin": margin,
+        "min_candidates": floor,
+    }
+
+
+_INDEX_CACHE: Dict[str, Tuple[Optional[TraceEmbeddingIndex], str]] = {}
+
+
+def get_trace_index(mg: ManifestGraph, embed_model: str = DEFAULT_EMBED_MODEL) -> Tuple[Optional[TraceEmbeddingIndex], str]:
+    """Load once per (corpus_dir, model) and reuse."""
+    key = f"{mg.corpus_dir}::{embed_model}"
+    if key not in _INDEX_CACHE:
+        _INDEX_CACHE[key] = TraceEmbeddingIndex.load(mg, embed_model)
+    return _INDEX_CACHE[key]
+
+
+async def embed_query(client: AsyncOpenAI, text: str, *, embed_model: str = DEFAULT_EMBED_MODEL) -> Tuple[np.ndarray, int]:
+    X, tokens = await embed_texts(client, [text or ""], embed_model=embed_model, batch_size=1)
+    return (X[0] if X.size else np.zeros((0,), dtype=np.float32)), tokens
+
+
+# ------------------------------
+# CLI:  python -m src.graphs.cs25_graph.corpus_embeddings [embed_model]
+# ------------------------------
+
+async def _main(embed_model: str) -> None:
+    from dotenv import load_dotenv, find_dotenv
+    load_dotenv(find_dotenv(".env"))
+
+    mg = ManifestGraph()
+    print("LOAD:", mg.load())
+    ops = GraphOps(mg.G)
+    from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+    client = get_async_openai()  # honours LLM_BACKEND (mock / cassettes) like the pipelines
+    report = await build_trace_embeddings(mg, ops, client, embed_model=embed_model)
+    print("EMBEDDINGS:", json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    import sys
+    asyncio.run(_main(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_EMBED_MODEL))
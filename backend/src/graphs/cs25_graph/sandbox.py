@@ -82,10 +82,12 @@ class WorkflowAgentTester:
 # parallel_llm_runner.py
 # parallel_runner.py
 # streaming_runner.py
-import os, uuid, asyncio, time, random
+import os, uuid, asyncio, time
 from typing import Dict, Any, List, Optional, Tuple, Callable
 from pydantic import BaseModel, Field
-from openai import AsyncOpenAI, APIStatusError
+from openai import APIStatusError
+from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import get_async_openai
+from src.graphs.cs25_graph.agent_langgraph.utils.retry import RetryPolicy
 
 # ------------------ Agent (async, structured output) ------------------
 class AgentInputs(BaseModel):
@@ -100,7 +102,7 @@ class RelevanceResult(BaseModel):
 class AsyncAgent:
     def __init__(self, model: str = "gpt-4o-mini", api_key: Optional[str] = None):
         self.model = model
-        self.client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+        self.client = get_async_openai(api_key)
 
     async def run(self, query: str, inputs: AgentInputs) -> Dict[str, Any]:
         system = (
@@ -156,25 +158,13 @@ def chunked(items: List[Any], size: int) -> List[List[Any]]:
     return [items[i:i+size] for i in range(0, len(items), size)]
 
 # ------------------ Retry wrapper ------------------
-async def _call_with_retry(agent: AsyncAgent, query: str, payload: AgentInputs, *, max_retries=5):
-    delay = 0.6
-    for attempt in range(max_retries):
-        try:
-            return await agent.run(query, payload)
-        except APIStatusError as e:
-            code = getattr(e, "status_code", 0)
-            retryable = code in (429, 500, 502, 503, 504)
-            if retryable and attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            return {"ok": False, "error": str(e), "status_code": code}
-        except Exception as e:
-            if attempt < max_retries - 1:
-                await asyncio.sleep(delay + random.uniform(0, 0.4))
-                delay = min(delay * 2, 6)
-                continue
-            return {"ok": False, "error": repr(e), "status_code": None}
+async def _call_with_retry(agent: AsyncAgent, query: str, payload: AgentInputs, *, retry: Optional[RetryPolicy] = None):
+    try:
+        return await (retry or RetryPolicy()).call(lambda: agent.run(query, payload))
+    except APIStatusError as e:
+        return {"ok": False, "error": str(e), "status_code": getattr(e, "status_code", 0)}
+    except Exception as e:
+        return {"ok": False, "error": repr(e), "status_code": None}
 
 # ------------------ Core: one parallel batch with live events ------------------
 async def _run_batch_parallel(
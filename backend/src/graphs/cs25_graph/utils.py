@@ -785,6 +785,7 @@ class GraphOps:
                 "intent": intent_node.get("intent"),
                 "summary": intent_node.get("summary"),
                 "events": intent_node.get("events"),
+                "digest": intent_node.get("digest"),  # short precomputed summary, if the corpus has one
             })
 
         # 1) HAS_INTENT from any node in trace
@@ -1370,6 +1371,32 @@ class GraphOps:
                 })
         return out
 
+    # --- NEW: Trace → owning ancestor of one ntype (Section, Subpart, ...) -
+    def map_traces_to_ancestor(self, ntype: str) -> dict[str, str]:
+        """
+        { trace_uuid: ancestor_uuid } for every Trace whose bottom paragraph sits under a node
+        of `ntype` (the nearest one). Section groups the section-first scan, Subpart the strata
+        of the sampling preview. Cached per ntype on first use (the graph is immutable once loaded).
+        """
+        maps = getattr(self, "_trace_ancestor_maps", None)
+        if maps is None:
+            maps = self._trace_ancestor_maps = {}
+        if ntype in maps:
+            return maps[ntype]
+        parent_map = self._parent_map()
+        out: dict[str, str] = {}
+        for tid, td in self.G.nodes(data=True):
+            if td.get("ntype") != "Trace":
+                continue
+            cur = td.get("bottom_uuid")
+            while cur in parent_map:
+                cur = parent_map[cur]
+                if self.G.nodes[cur].get("ntype") == ntype:
+                    out[tid] = cur
+                    break
+        maps[ntype] = out
+        return out
+
     # --- NEW: generic upward trace starting at any node -----------------
     def _build_trace_from_node(self, start_uuid: str) -> list[dict]:
         """
@@ -0,0 +1,365 @@
+# backend/src/loadtest/harness.py
+"""
+End-to-end load test for the NDJSON scan endpoints.
+
+Starts the FastAPI app in-process (uvicorn on a loopback port) against the local mock LLM
+server, then drives N concurrent relevance (/api/cs25/agent_langgraph/run/stream) and
+needs-panel (/api/cs25/needs_panel/run/stream) clients.
+
+Reports per pipeline: time-to-first-item, items/sec, p50/p95/p99 per-item LLM latency;
+and for the worker: event-loop lag and RSS growth. With --check, the results are compared
+against thresholds.json and the process exits 1 on a regression.
+
+  cd backend
+  python -m src.loadtest.harness --relevance-tabs 8 --needs-tabs 8 --check
+  python -m src.loadtest.harness --out loadtest.json --latency-median 0.3 --rate-429 0.02
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import asyncio
+import argparse
+import resource
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+THRESHOLDS_PATH = Path(__file__).with_name("thresholds.json")
+
+RELEVANCE_ITEM_EVENT = "findRelevantSections.itemDone"
+NEEDS_PANEL_ITEM_EVENT = "needsPanel.item"
+
+
+# ------------------ measurements ------------------
+
+def percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc), falling back to the peak RSS."""
+    try:
+        with open("/proc/self/statm") as fh:
+            pages = int(fh.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except Exception:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1e6 if sys.platform == "darwin" else peak / 1e3
+
+
+class LoopLagMonitor:
+    """Samples how late a periodic sleep wakes up: the time the loop was busy elsewhere."""
+
+    def __init__(self, interval_s: float = 0.05):
+        self.interval_s = interval_s
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval_s)
+            self.samples.append(max(0.0, loop.time() - t0 - self.interval_s))
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def summary(self) -> Dict[str, Any]:
+        ms = [s * 1000.0 for s in self.samples]
+        return {
+            "samples": len(ms),
+            "p50_ms": percentile(ms, 0.50),
+            "p99_ms": percentile(ms, 0.99),
+            "max_ms": max(ms) if ms else None,
+        }
+
+
+class ClientRun:
+    def __init__(self, pipeline: str, tab_id: str):
+        self.pipeline = pipeline
+        self.tab_id = tab_id
+        self.t_start = time.monotonic()
+        self.t_first_item: Optional[float] = None
+        self.t_end: Optional[float] = None
+        self.items = 0
+        self.item_latencies: List[float] = []
+        self.events = 0
+        self.error: Optional[str] = None
+
+    def item(self, usage: Optional[Dict[str, Any]]) -> None:
+        if self.t_first_item is None:
+            self.t_first_item = time.monotonic()
+        self.items += 1
+        lat = (usage or {}).get("latency_s")
+        if isinstance(lat, (int, float)):
+            self.item_latencies.append(float(lat))
+
+
+def summarise(runs: List[ClientRun]) -> Dict[str, Any]:
+    ttfi = [r.t_first_item - r.t_start for r in runs if r.t_first_item is not None]
+    walls = [(r.t_end or time.monotonic()) - r.t_start for r in runs]
+    items = sum(r.items for r in runs)
+    lat = [x for r in runs for x in r.item_latencies]
+    t0 = min((r.t_start for r in runs), default=0.0)
+    t1 = max(((r.t_end or t0) for r in runs), default=t0)
+    return {
+        "clients": len(runs),
+        "errors": sum(1 for r in runs if r.error),
+        "error_samples": [r.error for r in runs if r.error][:3],
+        "items": items,
+        "items_per_s": (items / (t1 - t0)) if t1 > t0 else 0.0,
+        "ttfi_p50_s": percentile(ttfi, 0.50),
+        "ttfi_p95_s": percentile(ttfi, 0.95),
+        "wall_p95_s": percentile(walls, 0.95),
+        "item_latency_p50_s": percentile(lat, 0.50),
+        "item_latency_p95_s": percentile(lat, 0.95),
+        "item_latency_p99_s": percentile(lat, 0.99),
+    }
+
+
+# ------------------ clients ------------------
+
+async def _ndjson(resp):
+    async for line in resp.aiter_lines():
+        line = line.strip()
+        if line:
+            yield json.loads(line)
+
+
+async def relevance_client(http, i: int, trace_ids: List[str], scan_options: Dict[str, Any]) -> ClientRun:
+    run = ClientRun("relevance", f"loadtest-rel-{i}")
+    body = {
+        "tab_id": run.tab_id,
+        "query": f"load test {i}: heat exchanger header leaks near flammable fluid lines",
+        "context": {"selected_ids": trace_ids, "selections_frozen": False},
+        "scan_options": scan_options,
+    }
+    try:
+        async with http.stream("POST", "/api/cs25/agent_langgraph/run/stream", json=body) as resp:
+            resp.raise_for_status()
+            async for evt in _ndjson(resp):
+                run.events += 1
+                if evt.get("type") == RELEVANCE_ITEM_EVENT:
+                    run.item((evt.get("item") or {}).get("usage"))
+                elif evt.get("type") == "error":
+                    run.error = str(evt.get("message"))
+    except Exception as e:
+        run.error = f"{type(e).__name__}: {e}"
+    run.t_end = time.monotonic()
+    return run
+
+
+def _synthetic_needs(i: int, n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "need_id": f"lt-{i}-{k}",
+            "headline": f"Load-test need {k}",
+            "statement": f"The installation shall prevent hazardous leakage of flammable fluid (case {k}).",
+            "rationale": "Synthetic need generated by the load-test harness.",
+            "paragraph_name": "CS 25.863",
+        }
+        for k in range(n)
+    ]
+
+
+async def needs_panel_client(http, i: int, n_needs: int, scan_options: Dict[str, Any]) -> ClientRun:
+    run = ClientRun("needs_panel", f"loadtest-np-{i}")
+    try:
+        r = await http.post(
+            "/api/cs25/needs_panel/state/sync",
+            json={"tab_id": run.tab_id, "payload": {"items": _synthetic_needs(i, n_needs)}, "metadata": {}},
+        )
+        r.raise_for_status()
+        run.t_start = time.monotonic()  # the sync is setup, not part of the measured scan
+        body = {
+            "tab_id": run.tab_id,
+            "payload": {"query": f"load test {i}: fuel line routing near engine bay", "node_kwargs": {"scan_options": scan_options}},
+            "metadata": {},
+        }
+        async with http.stream("POST", "/api/cs25/needs_panel/run/stream", json=body) as resp:
+            resp.raise_for_status()
+            async for evt in _ndjson(resp):
+                run.events += 1
+                if evt.get("type") == NEEDS_PANEL_ITEM_EVENT:
+                    run.item((evt.get("payload") or {}).get("usage"))
+                elif evt.get("type") in ("needsPanel.error", "error"):
+                    run.error = str(evt.get("payload") or evt.get("message"))
+    except Exception as e:
+        run.error = f"{type(e).__name__}: {e}"
+    run.t_end = time.monotonic()
+    return run
+
+
+# ------------------ orchestration ------------------
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def run_load(args: argparse.Namespace) -> Dict[str, Any]:
+    # the app must see the mock before any client or settings module is created
+    from src.graphs.cs25_graph.agent_langgraph.utils.llm_backend import MockBackend
+    from src.loadtest.mock_llm_server import MockLLMServer
+
+    mock = MockLLMServer(MockBackend(
+        seed=args.seed,
+        latency_median_s=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        tail_p=args.tail_p,
+        latency_per_1k_s=args.latency_per_1k,
+        rate_429=args.rate_429,
+        rate_5xx=args.rate_5xx,
+    )).start()
+    os.environ["OPENAI_BASE_URL"] = mock.base_url
+    os.environ["OPENAI_API_BASE"] = mock.base_url  # LangChain's ChatOpenAI
+    os.environ["OPENAI_API_KEY"] = os.environ.get("LOADTEST_OPENAI_API_KEY", "sk-loadtest")
+    os.environ["LLM_BACKEND"] = "openai"  # go through the real pooled client and HTTP
+    if not args.redis:
+        os.environ["REDIS_URL"] = "redis://127.0.0.1:1"  # unreachable → app falls back to in-memory store
+
+    import httpx
+    import uvicorn
+    from src.app.main import app
+    from src.graphs.cs25_graph.agent_langgraph.utils.nodes.find_relevant_sections import _get_runtime, iter_trace_nodes
+    from src.graphs.cs25_graph.agent_langgraph.utils.openai_clients import pool_stats
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        if serve_task.done():
+            serve_task.result()
+        await asyncio.sleep(0.05)
+
+    mg, _ = _get_runtime()
+    all_ids = [t["trace_uuid"] for t in iter_trace_nodes(mg.G) if t.get("trace_uuid")]
+    scan_options = {"coalesce": False, **json.loads(args.scan_options or "{}")}
+
+    def trace_slice(i: int) -> List[str]:
+        # distinct slices per tab so tabs do not share work through caches or single-flight
+        start = (i * args.traces_per_tab) % max(1, len(all_ids))
+        ids = all_ids[start:start + args.traces_per_tab]
+        return ids if len(ids) == args.traces_per_tab else (ids + all_ids)[:args.traces_per_tab]
+
+    lag = LoopLagMonitor()
+    rss_before = rss_mb()
+    lag.start()
+    t0 = time.monotonic()
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=httpx.Timeout(args.timeout)) as http:
+            jobs = [relevance_client(http, i, trace_slice(i), scan_options) for i in range(args.relevance_tabs)]
+            jobs += [needs_panel_client(http, i, args.needs_per_tab, scan_options) for i in range(args.needs_tabs)]
+            runs: List[ClientRun] = await asyncio.gather(*jobs)
+    finally:
+        await lag.stop()
+        server.should_exit = True
+        await serve_task
+        mock.stop()
+
+    rss_after = rss_mb()
+    return {
+        "config": {
+            "relevance_tabs": args.relevance_tabs,
+            "needs_tabs": args.needs_tabs,
+            "traces_per_tab": args.traces_per_tab,
+            "needs_per_tab": args.needs_per_tab,
+            "mock": {"latency_median_s": args.latency_median, "latency_sigma": args.latency_sigma,
+                     "latency_per_1k_s": args.latency_per_1k, "tail_p": args.tail_p, "rate_429": args.rate_429, "rate_5xx": args.rate_5xx},
+            "scan_options": scan_options,
+        },
+        "wall_s": time.monotonic() - t0,
+        "relevance": summarise([r for r in runs if r.pipeline == "relevance"]),
+        "needs_panel": summarise([r for r in runs if r.pipeline == "needs_panel"]),
+        "worker": {
+            "loop_lag": lag.summary(),
+            "rss_before_mb": rss_before,
+            "rss_after_mb": rss_after,
+            "rss_growth_mb": rss_after - rss_before,
+            "openai_pool": pool_stats(),
+        },
+        "mock_llm": mock.stats(),
+    }
+
+
+# ------------------ regression thresholds ------------------
+
+def _lookup(results: Dict[str, Any], dotted: str) -> Any:
+    cur: Any = results
+    for part in dotted.split("."):
+        cur = cur.get(part) if isinstance(cur, dict) else None
+    return cur
+
+
+def check_thresholds(results: Dict[str, Any], thresholds: Dict[str, Any]) -> List[str]:
+    """
+    thresholds.json: {"max": {"relevance.ttfi_p95_s": 5, ...}, "min": {"relevance.items_per_s": 50, ...}}
+    Returns human-readable violations (empty list = pass). A missing metric counts as a violation.
+    """
+    failures: List[str] = []
+    for kind, cmp in (("max", lambda v, lim: v <= lim), ("min", lambda v, lim: v >= lim)):
+        for metric, limit in (thresholds.get(kind) or {}).items():
+            value = _lookup(results, metric)
+            if not isinstance(value, (int, float)):
+                failures.append(f"{metric}: missing (limit {kind} {limit})")
+            elif not cmp(value, limit):
+                failures.append(f"{metric}: {value:.3f} violates {kind} {limit}")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Load-test the CS-25 NDJSON scan endpoints against a mock LLM.")
+    p.add_argument("--relevance-tabs", type=int, default=8)
+    p.add_argument("--needs-tabs", type=int, default=8)
+    p.add_argument("--traces-per-tab", type=int, default=200)
+    p.add_argument("--needs-per-tab", type=int, default=100)
+    p.add_argument("--scan-options", default=None, help="JSON ScanOptions applied to every tab")
+    p.add_argument("--latency-median", type=float, default=0.4)
+    p.add_argument("--latency-sigma", type=float, default=0.35)
+    p.add_argument("--tail-p", type=float, default=0.01)
+    p.add_argument("--latency-per-1k", type=float, default=0.0, help="extra mock latency per 1k input tokens")
+    p.add_argument("--rate-429", type=float, default=0.0)
+    p.add_argument("--rate-5xx", type=float, default=0.0)
+    p.add_argument("--seed", default="loadtest")
+    p.add_argument("--timeout", type=float, default=600.0)
+    p.add_argument("--redis", action="store_true", help="use REDIS_URL instead of the in-memory store")
+    p.add_argument("--out", default=None, help="write the results JSON here")
+    p.add_argument("--check", action="store_true", help="fail on regressions against --thresholds")
+    p.add_argument("--thresholds", default=str(THRESHOLDS_PATH))
+    args = p.parse_args(argv)
+
+    results = asyncio.run(run_load(args))
+    text = json.dumps(results, indent=2, default=str)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+
+    if args.check:
+        failures = check_thresholds(results, json.loads(Path(args.thresholds).read_text(encoding="utf-8")))
+        for f in failures:
+            print(f"[loadtest][REGRESSION] {f}", file=sys.stderr)
+        if failures:
+            return 1
+        print("[loadtest] thresholds OK", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,146 @@
+# backend/src/loadtest/makespan.py
+"""
+Makespan benchmark: the same relevance scan dispatched in arrival order and with LPT
+scheduling (ScanOptions.schedule="lpt": largest prompts first, first-fit-decreasing packs).
+
+Runs stream_all_traces in-process against MockBackend. Mock latency has a per-input-token term
+(--latency-per-1k), so long prompts are slow calls like they are against the real API. Latency
+jitter is keyed by request hash, so both schedules see exactly the same per-call latencies and
+only the dispatch order differs.
+
+  cd backend
+  python -m src.loadtest.makespan --traces 1000 --batch-size 200 --max-inflight 64
+  python -m src.loadtest.makespan --pack --out makespan.json --min-improvement 0.05
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+async def _scan(schedule: str, args: argparse.Namespace, trace_ids: List[str]) -> Dict[str, Any]:
+    from src.graphs.cs25_graph.agent_langgraph.utils.llm_backend import MockBackend, use_llm_backend
+    from src.graphs.cs25_graph.agent_langgraph.utils.nodes.find_relevant_sections import _get_runtime, stream_all_traces
+    from src.graphs.cs25_graph.agent_langgraph.utils.scan_options import ScanOptions
+    from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import lane_for
+
+    # a fresh mock per run: same seed → same latency for the same request
+    use_llm_backend(MockBackend(
+        seed=args.seed,
+        latency_median_s=args.latency_median,
+        latency_sigma=args.latency_sigma,
+        tail_p=0.0,
+        latency_per_1k_s=args.latency_per_1k,
+    ))
+    mg, ops = _get_runtime()
+    options = ScanOptions.from_any({
+        "schedule": schedule,
+        "pack": args.pack,
+        "preflight": False,
+        "coalesce": False,
+        **json.loads(args.scan_options or "{}"),
+    })
+
+    t0 = time.monotonic()
+    batch_t0 = t0
+    batch_walls: List[float] = []
+    items = 0
+    summary: Dict[str, Any] = {}
+    try:
+        async for evt in stream_all_traces(
+            mg.G, ops,
+            query="heat exchanger header leaks near flammable fluid lines",
+            model="gpt-5-nano",
+            batch_size=args.batch_size,
+            pricing_per_million=(0.05, 0.005, 0.40),
+            selected_trace_ids=trace_ids,
+            options=options,
+            mg=mg,
+            lane=lane_for(f"makespan-{schedule}", "interactive"),
+        ):
+            t = evt.get("type")
+            if t == "batch_start":
+                batch_t0 = time.monotonic()
+            elif t == "batch_end":
+                batch_walls.append(time.monotonic() - batch_t0)
+            elif t == "item_done":
+                items += 1
+            elif t == "run_end":
+                summary = evt.get("summary") or {}
+    finally:
+        use_llm_backend(None)
+
+    return {
+        "schedule": schedule,
+        "makespan_s": time.monotonic() - t0,
+        "items": items,
+        "batch_walls_s": batch_walls,
+        "schedule_report": summary.get("schedule"),
+    }
+
+
+async def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    from src.graphs.cs25_graph.agent_langgraph.utils.nodes.find_relevant_sections import _get_runtime, iter_trace_nodes
+    from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import MAX_INFLIGHT
+
+    mg, _ = _get_runtime()
+    trace_ids = [t["trace_uuid"] for t in iter_trace_nodes(mg.G) if t.get("trace_uuid")][: args.traces]
+
+    arrival = await _scan("arrival", args, trace_ids)
+    lpt = await _scan("lpt", args, trace_ids)
+    saved = arrival["makespan_s"] - lpt["makespan_s"]
+    return {
+        "config": {
+            "traces": len(trace_ids),
+            "batch_size": args.batch_size,
+            "max_inflight": MAX_INFLIGHT,
+            "pack": args.pack,
+            "mock": {"latency_median_s": args.latency_median, "latency_sigma": args.latency_sigma,
+                     "latency_per_1k_s": args.latency_per_1k, "seed": args.seed},
+        },
+        "arrival": arrival,
+        "lpt": lpt,
+        "makespan_saved_s": saved,
+        "makespan_improvement": (saved / arrival["makespan_s"]) if arrival["makespan_s"] else None,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    p = argparse.ArgumentParser(description="Compare scan makespan with arrival-order and LPT dispatch (mock LLM).")
+    p.add_argument("--traces", type=int, default=1000)
+    p.add_argument("--batch-size", type=int, default=200)
+    p.add_argument("--max-inflight", type=int, default=64, help="scheduler slots (LLM_MAX_INFLIGHT)")
+    p.add_argument("--pack", action="store_true", help="packed multi-trace calls")
+    p.add_argument("--scan-options", default=None, help="extra JSON ScanOptions for both runs")
+    p.add_argument("--latency-median", type=float, default=0.3)
+    p.add_argument("--latency-sigma", type=float, default=0.2)
+    p.add_argument("--latency-per-1k", type=float, default=0.5)
+    p.add_argument("--seed", default="makespan")
+    p.add_argument("--out", default=None, help="write the results JSON here")
+    p.add_argument("--min-improvement", type=float, default=None, help="exit 1 if LPT saves less than this fraction")
+    args = p.parse_args(argv)
+
+    # the scheduler reads its slot count at import
+    os.environ["LLM_MAX_INFLIGHT"] = str(args.max_inflight)
+    results = asyncio.run(run_benchmark(args))
+    text = json.dumps(results, indent=2, default=str)
+    print(text)
+    if args.out:
+        Path(args.out).write_text(text, encoding="utf-8")
+
+    gain = results.get("makespan_improvement")
+    print(f"[makespan] arrival {results['arrival']['makespan_s']:.2f}s → lpt {results['lpt']['makespan_s']:.2f}s"
+          f" ({(gain or 0.0) * 100:.1f}% shorter)", file=sys.stderr)
+    if args.min_improvement is not None and (gain is None or gain < args.min_improvement):
+        print(f"[makespan][REGRESSION] improvement below {args.min_improvement}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
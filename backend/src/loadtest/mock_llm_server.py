@@ -0,0 +1,143 @@
+# backend/src/loadtest/mock_llm_server.py
+
+import time
+import asyncio
+import threading
+from typing import Any, Dict, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from openai import APIStatusError
+
+from src.graphs.cs25_graph.agent_langgraph.utils.llm_backend import MockBackend
+
+
+# ------------------ Local mock OpenAI server ------------------
+#
+# Serves /v1/responses, /v1/chat/completions and /v1/embeddings from MockBackend over real
+# HTTP, so the app under test keeps its own pooled clients, LangChain's ChatOpenAI included
+# (point OPENAI_BASE_URL here). Runs on its own thread + event loop, so its latency sleeps
+# never show up as event-loop lag in the app being measured.
+
+def create_app(backend: MockBackend) -> FastAPI:
+    app = FastAPI(title="mock-openai")
+
+    def _error(e: APIStatusError) -> JSONResponse:
+        headers = {k: v for k, v in e.response.headers.items() if k.lower().startswith(("retry-after", "x-ratelimit"))}
+        return JSONResponse(
+            status_code=e.status_code,
+            headers=headers,
+            content={"error": {"message": str(e), "type": "mock_error", "code": str(e.status_code)}},
+        )
+
+    @app.post("/v1/responses")
+    async def responses(request: Request):
+        body = await request.json()
+        try:
+            resp = await backend.responses.create(**body)
+        except APIStatusError as e:
+            return _error(e)
+        out = resp.model_dump()
+        usage = out.get("usage") or {}
+        return {
+            "id": out["id"],
+            "object": "response",
+            "created_at": int(time.time()),
+            "status": "completed",
+            "model": body.get("model"),
+            "output": [{
+                "id": f"msg_{out['id'][-16:]}",
+                "type": "message",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": out["output_text"], "annotations": []}],
+            }],
+            "parallel_tool_calls": False,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {**usage, "output_tokens_details": {"reasoning_tokens": 0}},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        # same role/content pairs as a Responses input, so the mock keys and prices them the same way
+        kwargs: Dict[str, Any] = {
+            "model": body.get("model"),
+            "input": [{"role": m.get("role"), "content": m.get("content")} for m in body.get("messages") or []],
+        }
+        fmt = body.get("response_format") or {}
+        if fmt.get("type") == "json_schema":
+            kwargs["text"] = {"format": {"type": "json_schema", **(fmt.get("json_schema") or {})}}
+        try:
+            resp = await backend.responses.create(**kwargs)
+        except APIStatusError as e:
+            return _error(e)
+        out = resp.model_dump()
+        usage = out.get("usage") or {}
+        return {
+            "id": f"chatcmpl-{out['id'][-16:]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": out["output_text"]}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": usage.get("input_tokens", 0),
+                "completion_tokens": usage.get("output_tokens", 0),
+                "total_tokens": usage.get("total_tokens", 0),
+            },
+        }
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        try:
+            resp = await backend.embeddings.create(**body)
+        except APIStatusError as e:
+            return _error(e)
+        return resp.model_dump()
+
+    @app.get("/stats")
+    async def stats():
+        return backend.stats()
+
+    return app
+
+
+class MockLLMServer:
+    """uvicorn on a background thread; `base_url` is ready once start() returns."""
+
+    def __init__(self, backend: Optional[MockBackend] = None, *, host: str = "127.0.0.1", port: int = 0):
+        self.backend = backend or MockBackend()
+        self.host = host
+        self.port = port
+        self._server: Optional[uvicorn.Server] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    def start(self, timeout_s: float = 10.0) -> "MockLLMServer":
+        config = uvicorn.Config(create_app(self.backend), host=self.host, port=self.port, log_level="warning", lifespan="off")
+        self._server = uvicorn.Server(config)
+        self._thread = threading.Thread(target=lambda: asyncio.run(self._server.serve()), name="mock-llm", daemon=True)
+        self._thread.start()
+        deadline = time.time() + timeout_s
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("mock LLM server did not start")
+            time.sleep(0.02)
+        if not self.port:
+            self.port = self._server.servers[0].sockets[0].getsockname()[1]
+        return self
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.should_exit = True
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.backend.stats()
@@ -0,0 +1,57 @@
+# backend/tests/conftest.py
+# Run from backend/:  python -m pytest -q tests
+
+import sys
+from pathlib import Path
+
+import pytest
+
+BACKEND = Path(__file__).resolve().parents[1]
+if str(BACKEND) not in sys.path:
+    sys.path.insert(0, str(BACKEND))
+
+
+@pytest.fixture
+def mock_llm():
+    """A fast, deterministic MockBackend installed for the test (no network, no tail latency)."""
+    llm_backend = pytest.importorskip("src.graphs.cs25_graph.agent_langgraph.utils.llm_backend")
+    backend = llm_backend.MockBackend(latency_median_s=0.005, latency_sigma=0.5, tail_p=0.0)
+    llm_backend.use_llm_backend(backend)
+    yield backend
+    llm_backend.use_llm_backend(None)
+
+
+@pytest.fixture
+def tiny_corpus():
+    """
+    (G, ops) of a small CS-25 shaped graph: Document > Subpart > Section > Paragraph, one Trace
+    anchored to each paragraph with its Intent, and a Section intent. 24 traces, t0..t23.
+    """
+    nx = pytest.importorskip("networkx")
+    from src.graphs.cs25_graph.utils import GraphOps
+
+    G = nx.MultiDiGraph()
+    G.add_node("doc", ntype="Document", label="CS-25", title="Large Aeroplanes")
+    G.add_node("sp-e", ntype="Subpart", label="Subpart E", code="E", title="Powerplant")
+    G.add_node("s963", ntype="Section", label="CS 25.963", number="25.963", title="Fuel tanks: general")
+    G.add_node("si963", ntype="Intent", intent="Fuel tanks must withstand loads without leaking.",
+               summary="Fuel tank strength and leak prevention.", events=["tank rupture", "fuel leak"],
+               digest="Fuel tanks stay intact.")
+    G.add_edge("doc", "sp-e", relation="CONTAINS")
+    G.add_edge("sp-e", "s963", relation="CONTAINS")
+    G.add_edge("s963", "si963", relation="HAS_INTENT")
+    for i in range(24):
+        p, t, it = f"p{i}", f"t{i}", f"i{i}"
+        G.add_node(p, ntype="Paragraph", paragraph_id=f"25.963({i})", text=f"Requirement {i} for fuel tank venting and ignition sources.")
+        G.add_node(t, ntype="Trace", bottom_uuid=p, bottom=f"25.963({i})")
+        G.add_node(it, ntype="Intent", intent=f"Prevent fuel vapour ignition scenario {i}.",
+                   summary=f"Scenario {i}: vapour near an ignition source.",
+                   events=[f"spark {i}", f"hot surface {i}", f"lightning strike {i}", f"static discharge {i}", f"pump overheat {i}"],
+                   digest=f"Ignition scenario {i}.")
+        G.add_edge("s963", p, relation="CONTAINS")
+        G.add_edge(t, p, relation="HAS_ANCHOR")
+        G.add_edge(t, it, relation="HAS_INTENT")
+        if i:
+            G.add_edge(p, "p0", relation="CITES",
+                       ref={"ref_source": f"25.963({i})", "role": "reference", "comment": f"Scenario {i} relies on the venting rule."})
+    return G, GraphOps(G)
@@ -0,0 +1,60 @@
+# backend/tests/test_bulk_jobs.py
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from src.graphs.cs25_graph.agent_langgraph.utils.bulk_jobs import BulkJob, LocalBatchBackend, run_bulk_job
+
+
+async def _echo(body):
+    if body.get("fail"):
+        raise RuntimeError("boom")
+    return {"echo": body.get("n")}
+
+
+def _create(tmp_path, n=4, fail=()):
+    requests = [(f"c{i}", {"n": i, "fail": i in fail}, {"trace_uuid": f"t{i}"}) for i in range(n)]
+    return BulkJob.create(pipeline="relevance", requests=requests, meta={"query": "q"}, jobs_dir=tmp_path / "jobs")
+
+
+async def _collect(job, backend):
+    return [r async for r in run_bulk_job(job, backend, poll_interval=0.01)]
+
+
+def test_bulk_job_round_trip(tmp_path):
+    job = _create(tmp_path, fail={2})
+    backend = LocalBatchBackend(root=tmp_path / "batches", handler=_echo)
+    results = {cid: (item, body, err) for cid, item, body, err in asyncio.run(_collect(job, backend))}
+    assert set(results) == {"c0", "c1", "c2", "c3"}
+    assert results["c1"] == ({"trace_uuid": "t1"}, {"echo": 1}, None)
+    assert results["c2"][1] is None and "boom" in results["c2"][2]
+
+    reloaded = BulkJob.load(job.job_id, tmp_path / "jobs")
+    assert reloaded.data["status"] == "completed"
+    assert reloaded.data["backend"] == "local"
+    assert reloaded.delivered() == set(results)
+
+
+def test_bulk_job_resume_skips_delivered(tmp_path):
+    job = _create(tmp_path)
+    job.mark_delivered(["c0", "c3"])          # as if an earlier run streamed these before dying
+    backend = LocalBatchBackend(root=tmp_path / "batches", handler=_echo)
+    first = asyncio.run(_collect(job, backend))
+    assert sorted(cid for cid, *_ in first) == ["c1", "c2"]
+
+    # a second resume of the finished job has nothing left to deliver, unless replayed
+    again = BulkJob.load(job.job_id, tmp_path / "jobs")
+    assert asyncio.run(_collect(again, backend)) == []
+
+    async def replay():
+        return [r async for r in run_bulk_job(again, backend, poll_interval=0.01, replay=True)]
+
+    assert len(asyncio.run(replay())) == 4
+
+
+def test_load_unknown_job(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        BulkJob.load("relevance-nope", tmp_path)
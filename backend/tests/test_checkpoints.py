@@ -0,0 +1,87 @@
+# backend/tests/test_checkpoints.py
+
+import asyncio
+
+from src.graphs.cs25_graph.agent_langgraph.utils.checkpoints import ScanCheckpoint
+
+
+class _Item:
+    def __init__(self, key, value):
+        self.key, self.value = key, value
+
+
+class _MemoryStore:
+    """The aput/aget/asearch slice of a LangGraph BaseStore, in memory."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def aput(self, namespace, key, value):
+        self.data.setdefault(tuple(namespace), {})[key] = value
+
+    async def aget(self, namespace, key):
+        value = self.data.get(tuple(namespace), {}).get(key)
+        return _Item(key, value) if value is not None else None
+
+    async def asearch(self, namespace, query=None, limit=10):
+        return [_Item(k, v) for k, v in list(self.data.get(tuple(namespace), {}).items())[:limit]]
+
+
+def test_save_and_load_round_trip():
+    async def go():
+        store = _MemoryStore()
+        run = ScanCheckpoint(store, pipeline="relevance", run_id="run-1")
+        await run.start(query="fuel tank venting", tab_id="tab")
+        await run.save("t1", {"trace_uuid": "t1", "response": {"relevant": True}})
+        await run.save("t2", {"trace_uuid": "t2", "response": {"relevant": False}})
+        await run.save(None, {"ignored": True})
+        return await ScanCheckpoint(store, pipeline="relevance", run_id="run-1").load(query="fuel tank venting")
+
+    loaded = asyncio.run(go())
+    assert set(loaded) == {"t1", "t2"}
+    assert loaded["t1"]["response"] == {"relevant": True}
+
+
+def test_load_rejects_mismatched_meta_and_unknown_runs():
+    async def go():
+        store = _MemoryStore()
+        run = ScanCheckpoint(store, pipeline="relevance", run_id="run-1")
+        await run.start(query="fuel tank venting", scope="s1")
+        await run.save("t1", {"trace_uuid": "t1"})
+        other_query = await ScanCheckpoint(store, pipeline="relevance", run_id="run-1").load(query="cabin pressure")
+        by_scope = await ScanCheckpoint(store, pipeline="relevance", run_id="run-1").load(scope="s1")
+        other_pipeline = await ScanCheckpoint(store, pipeline="needs", run_id="run-1").load(query="fuel tank venting")
+        unknown = await ScanCheckpoint(store, pipeline="relevance", run_id="run-2").load()
+        return other_query, by_scope, other_pipeline, unknown
+
+    other_query, by_scope, other_pipeline, unknown = asyncio.run(go())
+    assert other_query == {}
+    assert set(by_scope) == {"t1"}
+    assert other_pipeline == {} and unknown == {}
+
+
+def test_disabled_without_store_or_run_id():
+    async def go():
+        cp = ScanCheckpoint(None, pipeline="relevance", run_id="run-1")
+        await cp.start(query="q")
+        await cp.save("t1", {"x": 1})
+        return cp.enabled, ScanCheckpoint(_MemoryStore(), pipeline="relevance", run_id=None).enabled, await cp.load()
+
+    assert asyncio.run(go()) == (False, False, {})
+
+
+def test_store_errors_never_break_the_scan():
+    class Broken(_MemoryStore):
+        async def aput(self, *a, **k):
+            raise ConnectionError("redis down")
+
+        async def aget(self, *a, **k):
+            raise ConnectionError("redis down")
+
+    async def go():
+        cp = ScanCheckpoint(Broken(), pipeline="relevance", run_id="run-1")
+        await cp.start(query="q")
+        await cp.save("t1", {"x": 1})
+        return await cp.load(query="q")
+
+    assert asyncio.run(go()) == {}
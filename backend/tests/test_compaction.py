@@ -0,0 +1,80 @@
+# backend/tests/test_compaction.py
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("networkx")
+
+from src.graphs.cs25_graph.agent_langgraph.utils.compaction import (
+    CompactionPolicy, CompactionTally, render_blocks,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.nodes import find_relevant_sections as frs
+from src.graphs.cs25_graph.agent_langgraph.utils.scan_options import ScanOptions
+
+_RENDER = dict(fields=["intent", "events", "summary"], include_levels=["section", "trace"])
+_TIGHT = CompactionPolicy(intents_tokens=40, citations_tokens=60, max_events=2, max_inbound_cites=3)
+
+
+# ------------------ render_blocks ------------------
+
+def test_over_budget_blocks_are_compacted_step_by_step(tiny_corpus):
+    _, ops = tiny_corpus
+    bundle = ops.build_records_for_bottom("p0")   # 23 inbound citations, 5 events per intent
+    intents_md, cites_md, report = render_blocks(ops, bundle, policy=_TIGHT, **_RENDER)
+
+    ir, cr = report["intents"], report["citations"]
+    assert ir["tokens_after"] < ir["tokens_before"]
+    assert ir["steps"][0] == "rank_events" and ir["events_dropped"] > 0
+    assert "pump overheat 0" not in intents_md
+    assert cr["tokens_after"] < cr["tokens_before"]
+    assert cr["cites_dropped"] >= 23 - _TIGHT.max_inbound_cites
+    assert cites_md.count("- from:") <= _TIGHT.max_inbound_cites
+
+
+def test_blocks_under_budget_and_without_a_policy_are_rendered_verbatim(tiny_corpus):
+    _, ops = tiny_corpus
+    bundle = ops.build_records_for_bottom("p0")
+    plain_intents, plain_cites, none_report = render_blocks(ops, bundle, policy=None, **_RENDER)
+    intents_md, _, report = render_blocks(ops, bundle, policy=CompactionPolicy(intents_tokens=5000), **_RENDER)
+
+    assert none_report is None
+    assert intents_md == plain_intents and "pump overheat 0" in intents_md
+    assert report["intents"]["steps"] == [] and report["intents"]["tokens_after"] == report["intents"]["tokens_before"]
+    assert plain_cites.count("- from:") == 23
+
+
+def test_unsent_citations_are_not_rendered_or_reported(tiny_corpus):
+    _, ops = tiny_corpus
+    _, cites_md, report = render_blocks(ops, ops.build_records_for_bottom("p0"), policy=_TIGHT, citations=False, **_RENDER)
+    assert cites_md == ""
+    assert set(report) == {"intents"}
+
+    tally = CompactionTally(_TIGHT)
+    tally.add_payload(report)
+    assert tally.summary()["cites_dropped"] == 0
+
+
+# ------------------ whole-run stream (MockBackend) ------------------
+
+def _scan_summary(G, ops, options):
+    async def go():
+        return [evt async for evt in frs.stream_all_traces(
+            G, ops, query="fuel tank venting near ignition sources", model="gpt-5-nano",
+            pricing_per_million=frs._SCAN_PRICING, options=options,
+        )]
+    return asyncio.run(go())[-1]["summary"]
+
+
+def test_compacted_scan_sends_fewer_tokens_and_reports_the_savings(mock_llm, tiny_corpus):
+    G, ops = tiny_corpus
+    full = _scan_summary(G, ops, ScanOptions())
+    compact = _scan_summary(G, ops, ScanOptions(compact=True, compact_intents_tokens=50, compact_max_events=2))
+
+    report = compact["compaction"]
+    assert full["compaction"] == {"enabled": False}
+    assert report["enabled"] and report["blocks"] == report["compacted"] == 24
+    assert report["events_dropped"] > 0 and report["cites_dropped"] == 0   # the relevance prompt sends no citations
+    saved = report["tokens_before"] - report["tokens_after"]
+    assert full["tokens_in"] - compact["tokens_in"] == pytest.approx(saved, rel=0.05)   # block joins tokenize a little differently
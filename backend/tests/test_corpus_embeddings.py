@@ -0,0 +1,37 @@
+# backend/tests/test_corpus_embeddings.py
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("networkx")
+pytest.importorskip("openai")
+
+from src.graphs.cs25_graph.corpus_embeddings import select_candidates
+
+SCORES = {f"t{i}": 1.0 - i / 10 for i in range(10)}   # t0 = 1.0 ... t9 = 0.1
+
+
+def test_no_criteria_keeps_everything():
+    keep, info = select_candidates(SCORES)
+    assert keep == set(SCORES)
+    assert info["effective_top_k"] is None
+
+
+def test_top_k_is_widened_by_the_recall_margin():
+    keep, info = select_candidates(SCORES, top_k=4, recall_margin=0.25)
+    assert info["effective_top_k"] == 5
+    assert keep == {"t0", "t1", "t2", "t3", "t4"}
+
+
+def test_threshold_is_lowered_by_the_recall_margin():
+    keep, info = select_candidates(SCORES, threshold=0.7, recall_margin=0.25)
+    assert abs(info["effective_threshold"] - 0.525) < 1e-9
+    assert keep == {"t0", "t1", "t2", "t3", "t4"}
+
+
+def test_top_k_and_threshold_union_and_floor():
+    keep, _ = select_candidates(SCORES, top_k=1, threshold=0.85, recall_margin=0.0)
+    assert keep == {"t0", "t1"}
+    keep, info = select_candidates(SCORES, top_k=1, recall_margin=0.0, min_candidates=4)
+    assert keep == {"t0", "t1", "t2", "t3"}
+    assert abs(info["score_cutoff"] - 0.7) < 1e-9
@@ -0,0 +1,191 @@
+# backend/tests/test_find_relevant_sections.py
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("networkx")
+
+from src.graphs.cs25_graph.agent_langgraph.utils.checkpoints import ScanCheckpoint
+from src.graphs.cs25_graph.agent_langgraph.utils.nodes import find_relevant_sections as frs
+from src.graphs.cs25_graph.agent_langgraph.utils.preflight import BudgetGuard
+from src.graphs.cs25_graph.agent_langgraph.utils.scan_options import ScanOptions
+from src.graphs.cs25_graph.agent_langgraph.utils.speculation import take_speculation
+
+
+class _Item:
+    def __init__(self, key, value):
+        self.key, self.value = key, value
+
+
+class _MemoryStore:
+    """The aput/aget/asearch slice of a LangGraph BaseStore, in memory."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def aput(self, namespace, key, value):
+        self.data.setdefault(tuple(namespace), {})[key] = value
+
+    async def aget(self, namespace, key):
+        value = self.data.get(tuple(namespace), {}).get(key)
+        return _Item(key, value) if value is not None else None
+
+    async def asearch(self, namespace, query=None, limit=10):
+        return [_Item(k, v) for k, v in list(self.data.get(tuple(namespace), {}).items())[:limit]]
+
+
+async def _collect(agen):
+    return [evt async for evt in agen]
+
+
+# ------------------ preview reuse ------------------
+
+def _preview_store(query="fuel tank venting near ignition sources", scope="scope-1"):
+    async def go():
+        store = _MemoryStore()
+        cp = ScanCheckpoint(store, pipeline="relevance", run_id="preview-abc")
+        await cp.start(query=query, tab_id="tab", preview=True, scope=scope)
+        await cp.save("t1", {"trace_uuid": "t1", "response": {"relevant": True}})
+        await cp.save("t2", {"trace_uuid": "t2", "response": {"relevant": False}})
+        return store
+    return asyncio.run(go())
+
+
+def _reuse(store, *, topic, scope="scope-1"):
+    return asyncio.run(frs._reuse_preview(store, "preview-abc", scope=scope, topic=topic, options=ScanOptions()))
+
+
+def test_preview_items_are_reused_for_the_same_topic_and_flagged():
+    items, report = _reuse(_preview_store(), topic="fuel tank venting near ignition sources")
+    assert set(items) == {"t1", "t2"}
+    assert all(it["preview"] for it in items.values())
+    assert report["kept"] == 2 and report["discarded_reason"] is None
+
+
+def test_preview_items_are_dropped_when_the_topic_moved_away():
+    items, report = _reuse(_preview_store(), topic="cabin pressure relief valve sizing")
+    assert items == {}
+    assert report["discarded_reason"] == "similarity" and report["similarity"] < 0.7
+
+
+def test_preview_items_are_dropped_for_another_scope():
+    items, report = _reuse(_preview_store(), topic="fuel tank venting near ignition sources", scope="scope-2")
+    assert items == {} and report["discarded_reason"] == "scope"
+
+
+def test_replayed_preview_items_carry_the_flag():
+    events = asyncio.run(_collect(frs._stream_replayed([{"trace_uuid": "t1", "preview": True}, {"trace_uuid": "t2"}])))
+    done = [e for e in events if e["type"] == "item_done"]
+    assert [e["preview"] for e in done] == [True, False]
+    assert all(e["replayed"] and e["item"]["replayed"] for e in done)
+
+
+# ------------------ whole-run stream (MockBackend) ------------------
+
+def _scan(G, ops, **kw):
+    kw.setdefault("query", "fuel tank venting near ignition sources")
+    return frs.stream_all_traces(G, ops, model="gpt-5-nano", pricing_per_million=frs._SCAN_PRICING, **kw)
+
+
+def test_cancelled_scan_stops_its_in_flight_calls(mock_llm, tiny_corpus):
+    G, ops = tiny_corpus
+    mock_llm.latency_median_s = 30.0   # every call is still in flight when the client goes away
+
+    async def go():
+        seen = []
+
+        async def consume():
+            async for evt in _scan(G, ops):
+                seen.append(evt["type"])
+
+        task = asyncio.create_task(consume())
+
+        async def all_dispatched():
+            while mock_llm.calls.get("responses.parse", 0) < 24:
+                await asyncio.sleep(0.01)
+        await asyncio.wait_for(all_dispatched(), timeout=5)
+
+        t0 = time.monotonic()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        leftover = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        return seen, time.monotonic() - t0, leftover
+
+    seen, elapsed, leftover = asyncio.run(go())
+    assert elapsed < 1.0
+    assert leftover == []
+    assert "item_done" not in seen and "run_end" not in seen
+
+
+def test_top_k_stops_dispatching_and_reports_the_rest_as_early_stopped(mock_llm, tiny_corpus):
+    G, ops = tiny_corpus
+    events = asyncio.run(_collect(_scan(G, ops, batch_size=4, options=ScanOptions(top_k=1))))
+
+    done = [e["item"] for e in events if e["type"] == "item_done"]
+    stopped = [it for it in done if it.get("early_stopped")]
+    summary = events[-1]["summary"]
+    assert len(done) == 24                                       # every trace is accounted for
+    assert mock_llm.calls["responses.parse"] <= 4                # nothing past the first batch was sent
+    assert summary["early_stop"]["stop_reason"] == "top_k"
+    assert summary["early_stop"]["relevant"] == 1
+    assert summary["early_stop"]["skipped"] == len(stopped) >= 24 - 4
+    assert all("error" not in it["response"] for it in done if not it.get("early_stopped"))
+    assert any(e["type"] == "scan_order" for e in events)        # top-K ranks before dispatch
+
+
+def test_budget_stops_dispatch_and_skips_the_rest(mock_llm, tiny_corpus):
+    G, ops = tiny_corpus
+    options = ScanOptions(budget_usd=0.0005)
+    guard = BudgetGuard(tab_id="tab-frs-budget", run_budget_usd=options.budget_usd)
+    events = asyncio.run(_collect(_scan(G, ops, batch_size=4, options=options, budget=guard)))
+
+    done = [e["item"] for e in events if e["type"] == "item_done"]
+    skipped = [it for it in done if it.get("budget_skipped")]
+    summary = events[-1]["summary"]
+    assert events[0]["preflight"]["estimated_cost"] > options.budget_usd   # projected over budget up front
+    assert len(done) == 24
+    assert skipped and mock_llm.calls["responses.parse"] == 24 - len(skipped)
+    assert summary["budget"]["exhausted"]
+    assert summary["budget"]["spent_usd"] <= options.budget_usd
+
+
+# ------------------ speculative start (MockBackend) ------------------
+
+def _speculate(monkeypatch, G, ops, *, topic, run_id, evaluations=4):
+    monkeypatch.setattr(frs, "_RUNTIME_CACHE", (SimpleNamespace(G=G), ops))   # the tiny corpus stands in for the manifest
+    query = "fuel tank venting near ignition sources"
+    options = ScanOptions(speculative=True, speculative_evaluations=evaluations, order_prior="bm25")   # no embedding index here
+
+    async def go():
+        frs.start_speculative_scan(run_id, tab_id="tab-spec", query=query, options=options, selected_ids=[])
+        await asyncio.sleep(0.05)   # topic_llm's round trip
+        return await frs._reconcile_speculation(take_speculation(run_id), topic=topic, options=options)
+
+    return asyncio.run(go())
+
+
+def test_speculative_decisions_are_kept_for_a_matching_topic(monkeypatch, mock_llm, tiny_corpus):
+    G, ops = tiny_corpus
+    items, report = _speculate(monkeypatch, G, ops, topic="fuel tank venting near ignition sources", run_id="spec-keep")
+
+    assert len(items) == 4 and mock_llm.calls["responses.parse"] == 4
+    assert all(it["speculative"] and "ranked_position" not in it for it in items.values())
+    assert report["decisions"]["kept"] and report["decisions"]["discarded_reason"] is None
+    assert report["warmed"] == 24
+    assert report["usage"]["input_tokens"] > 0
+
+
+def test_speculative_decisions_are_discarded_when_the_topic_moved_away(monkeypatch, mock_llm, tiny_corpus):
+    G, ops = tiny_corpus
+    items, report = _speculate(monkeypatch, G, ops, topic="cabin pressure relief valve sizing", run_id="spec-drop")
+
+    assert items == {}
+    assert not report["decisions"]["kept"]
+    assert report["decisions"]["discarded_reason"] == "similarity"
+    assert report["similarity"] < ScanOptions().speculative_reuse_similarity
+    assert report["warmed"] == 24                  # the topic-independent warm-up is kept either way
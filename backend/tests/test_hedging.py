@@ -0,0 +1,93 @@
+# backend/tests/test_hedging.py
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("langchain_core")
+
+from pydantic import BaseModel
+
+from src.graphs.cs25_graph.agent_langgraph.utils.hedging import Hedger
+from src.graphs.cs25_graph.agent_langgraph.utils.llm_backend import MockBackend
+from src.graphs.cs25_graph.agent_langgraph.utils.retry import RetryPolicy
+from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import FairScheduler, Lane
+
+
+class _Answer(BaseModel):
+    relevant: bool
+
+
+def _backend() -> MockBackend:
+    # constant 20 ms calls; a call flagged slow hits the tail at 50x
+    return MockBackend(latency_median_s=0.02, latency_sigma=0.0, tail_p=0.0, tail_factor=50)
+
+
+def _call(backend: MockBackend, slow_first: bool = False):
+    """fn() for Hedger.run; with slow_first only the first invocation lands in the slow tail."""
+    calls = []
+
+    async def fn():
+        backend.tail_p = 1.0 if slow_first and not calls else 0.0
+        calls.append(1)
+        resp = await backend.responses.parse(
+            model="gpt-5-nano",
+            input=[{"role": "system", "content": "judge"}, {"role": "user", "content": "trace 1"}],
+            text_format=_Answer,
+        )
+        return resp, 0.0
+
+    return fn
+
+
+def _warm(hedger: Hedger, backend: MockBackend):
+    async def go():
+        for _ in range(hedger.min_samples):
+            await hedger.run(_call(backend))
+    asyncio.run(go())
+
+
+def test_slow_call_is_hedged_and_the_cancelled_loser_is_billed():
+    backend = _backend()
+    hedger = Hedger(min_samples=3, min_delay_s=0.05, budget_ratio=1.0)
+    _warm(hedger, backend)
+
+    resp, _ = asyncio.run(hedger.run(_call(backend, slow_first=True)))
+
+    assert resp.output_parsed is not None
+    assert hedger.hedged == 1 and hedger.hedge_wins == 1
+    assert hedger.estimated_losers == 1
+    assert hedger.usage["input_tokens"] == resp.usage.input_tokens
+    assert hedger.usage["output_tokens"] == resp.usage.output_tokens
+
+
+def test_queue_wait_does_not_trigger_a_hedge():
+    backend = _backend()
+    hedger = Hedger(min_samples=3, min_delay_s=0.05, budget_ratio=1.0)
+    _warm(hedger, backend)
+
+    async def go():
+        lane = Lane(FairScheduler(max_inflight=1, reserved=0), "tab-a", "interactive")
+        blocker = asyncio.ensure_future(lane.run(lambda: asyncio.sleep(0.2)))
+        await asyncio.sleep(0)
+        out = await hedger.run(_call(backend), lane=lane)   # 200 ms queued, 20 ms in the slot
+        await blocker
+        return out
+
+    asyncio.run(go())
+    assert hedger.hedged == 0
+
+
+def test_retry_policy_reports_the_duplicates_usage_and_cost():
+    backend = _backend()
+    hedger = Hedger(min_samples=3, min_delay_s=0.05, budget_ratio=1.0)
+    _warm(hedger, backend)
+    policy = RetryPolicy(base_delay=0.0, max_delay=0.0, hedger=hedger)
+
+    asyncio.run(policy.call(_call(backend, slow_first=True)))
+
+    hedge = policy.hedge_summary((0.05, 0.005, 0.40))
+    assert hedge["hedged_calls"] == 1
+    assert hedge["usage"]["input_tokens"] > 0
+    assert hedge["usage"]["total_cost"] > 0
@@ -0,0 +1,69 @@
+# backend/tests/test_packing.py
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from src.graphs.cs25_graph.agent_langgraph.utils.packing import (
+    pack_by_token_budget, pack_first_fit_decreasing, split_usage, unpack_results,
+)
+
+
+def test_split_usage_shares_add_back_up():
+    usage = {"input_tokens": 1001, "output_tokens": 97, "cached_tokens": 769}
+    shares = split_usage(usage, [3, 1, 5, 2])
+    assert sum(s["input_tokens"] for s in shares) == 1001
+    assert sum(s["output_tokens"] for s in shares) == 97
+    assert sum(s["cached_tokens"] for s in shares) == 769
+    assert all(s["total_tokens"] == s["input_tokens"] + s["output_tokens"] for s in shares)
+
+
+def test_split_usage_cached_follows_input_weights():
+    shares = split_usage({"input_tokens": 400, "output_tokens": 40, "cached_tokens": 200}, [1, 3])
+    assert [s["input_tokens"] for s in shares] == [100, 300]
+    assert [s["cached_tokens"] for s in shares] == [50, 150]
+    assert [s["output_tokens"] for s in shares] == [20, 20]
+
+
+def test_split_usage_never_caches_more_than_an_item_read():
+    # fully cached call with uneven weights: rounding must not put cached > input anywhere
+    for n in range(1, 8):
+        weights = [i * 7 % 5 + 1 for i in range(n)]
+        shares = split_usage({"input_tokens": 101, "output_tokens": 0, "cached_tokens": 101}, weights)
+        assert sum(s["cached_tokens"] for s in shares) == 101
+        assert all(s["cached_tokens"] <= s["input_tokens"] for s in shares)
+
+
+def test_split_usage_edge_cases():
+    assert split_usage({"input_tokens": 10}, []) == []
+    shares = split_usage({}, [0, 0])
+    assert [s["cached_tokens"] for s in shares] == [0, 0]
+    # cached can never exceed the call's input
+    shares = split_usage({"input_tokens": 10, "cached_tokens": 50}, [1])
+    assert shares[0]["cached_tokens"] == 10
+
+
+def test_pack_by_token_budget_keeps_order_and_limits():
+    sizes = {"a": 40, "b": 50, "c": 30, "d": 200, "e": 10}
+    packs = pack_by_token_budget(list(sizes), size_of=sizes.get, token_budget=100, max_items=2)
+    assert packs == [["a", "b"], ["c"], ["d"], ["e"]]   # oversized "d" gets a pack of its own
+
+
+def test_pack_first_fit_decreasing_fills_packs_largest_first():
+    sizes = {"a": 60, "b": 50, "c": 40, "d": 30, "e": 20}
+    packs = pack_first_fit_decreasing(list(sizes), size_of=sizes.get, token_budget=100, max_items=3)
+    assert sorted(x for p in packs for x in p) == sorted(sizes)
+    assert all(sum(sizes[x] for x in p) <= 100 and len(p) <= 3 for p in packs)
+    assert len(packs) == 2                                   # greedy in this order needs 3
+    loads = [sum(sizes[x] for x in p) for p in packs]
+    assert loads == sorted(loads, reverse=True)
+
+
+def test_unpack_results_ignores_unknown_and_duplicate_ids():
+    parsed = {"results": [
+        {"item_id": "1", "relevant": True},
+        {"item_id": "1", "relevant": False},
+        {"item_id": "9", "relevant": True},
+        "junk",
+    ]}
+    assert unpack_results(parsed, ["1", "2"]) == {"1": {"relevant": True}}
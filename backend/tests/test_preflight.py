@@ -0,0 +1,69 @@
+# backend/tests/test_preflight.py
+
+import pytest
+
+pytest.importorskip("pydantic")
+
+from src.graphs.cs25_graph.agent_langgraph.utils.preflight import (
+    BudgetGuard, PreflightEstimator, budget_for, project_run,
+)
+from src.graphs.cs25_graph.agent_langgraph.utils.scan_options import ScanOptions
+
+_PRICING = (0.05, 0.005, 0.40)
+_PREFIX = "SYSTEM " * 3000          # well over the 1024-token prefix-cache minimum
+
+
+def _estimator(**kw):
+    return PreflightEstimator(pipeline="test.preflight", model="gpt-5-nano", pricing_per_million=_PRICING, concurrency=kw.pop("concurrency", 10))
+
+
+def test_shared_prefix_is_cached_after_the_first_call():
+    est = _estimator()
+    first = est.call_usage(_PREFIX, "trace 1", first=True)
+    later = est.call_usage(_PREFIX, "trace 2")
+    assert first["cached_tokens"] == 0
+    assert later["cached_tokens"] > 0 and later["cached_tokens"] % 128 == 0
+    assert later["total_cost"] < first["total_cost"]
+
+
+def test_project_run_extrapolates_a_sample_to_the_whole_run():
+    items = [f"trace {i}" for i in range(1000)]
+    full = project_run(_estimator(), items, render=lambda it: (_PREFIX, it), batch_size=200, sample_max=1000)
+    sampled = project_run(_estimator(), items, render=lambda it: (_PREFIX, it), batch_size=200, sample_max=100)
+
+    assert full["calls"] == sampled["calls"] == 1000
+    assert full["sampled_from"] is None and sampled["sampled_from"] == 100
+    assert sampled["estimated_cost"] == pytest.approx(full["estimated_cost"], rel=0.05)
+    assert full["wall_s"] == sampled["wall_s"]       # 5 batches of 200 at concurrency 10
+
+
+def test_items_without_a_call_are_not_projected():
+    out = project_run(_estimator(), ["a", None, "b"], render=lambda it: (_PREFIX, it) if it else None, batch_size=10)
+    assert out["calls"] == 2
+
+
+def test_budget_guard_admits_until_the_run_budget_and_then_stays_closed():
+    guard = BudgetGuard(tab_id="tab-run-budget", run_budget_usd=1.0)
+    assert guard.admit(0.4) and guard.admit(0.4)
+    assert not guard.admit(0.4)                       # 0.8 reserved + 0.4 > 1.0
+    guard.settle(0.4, 0.1)                            # actual spend came in lower ...
+    assert not guard.admit(0.1)                       # ... but an exhausted guard never reopens
+    s = guard.summary()
+    assert s["admitted_calls"] == 2 and s["refused_calls"] == 2 and s["exhausted"]
+    assert s["spent_usd"] == pytest.approx(0.1)
+
+
+def test_tab_budget_is_shared_by_every_run_of_the_tab():
+    first = BudgetGuard(tab_id="tab-shared", tab_budget_usd=1.0)
+    assert first.admit(0.6)
+    first.settle(0.6, 0.7)
+    second = BudgetGuard(tab_id="tab-shared", tab_budget_usd=1.0)
+    assert not second.admit(0.4)                      # 0.7 spent by the first run
+    assert BudgetGuard(tab_id="tab-other", tab_budget_usd=1.0).admit(0.4)
+
+
+def test_budget_for_only_guards_runs_with_a_budget():
+    assert budget_for(ScanOptions(), "tab") is None
+    guard = budget_for(ScanOptions(budget_usd=2.0), "tab")
+    assert guard is not None and guard.run_budget == 2.0 and guard.tab_budget is None
+    assert ScanOptions(budget_usd=2.0).preflight_enabled and not ScanOptions().preflight_enabled
@@ -0,0 +1,94 @@
+# backend/tests/test_retry.py
+
+import asyncio
+
+import pytest
+
+openai = pytest.importorskip("openai")
+httpx = pytest.importorskip("httpx")
+
+from src.graphs.cs25_graph.agent_langgraph.utils.retry import CircuitOpenError, RetryPolicy, error_kind, retry_after_s
+
+
+def _status_error(code: int, headers=None):
+    request = httpx.Request("POST", "https://api.invalid/v1/responses")
+    response = httpx.Response(code, headers=headers or {}, request=request)
+    cls = openai.RateLimitError if code == 429 else openai.APIStatusError
+    return cls(f"status {code}", response=response, body=None)
+
+
+def _flaky(errors):
+    """fn() raising the given errors in turn, then returning "ok"; .calls counts attempts."""
+    errors = list(errors)
+
+    async def fn():
+        fn.calls += 1
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    fn.calls = 0
+    return fn
+
+
+def _policy(**kw):
+    return RetryPolicy(base_delay=0.0, max_delay=0.0, **kw)   # no real sleeping
+
+
+def test_error_kind():
+    assert error_kind(_status_error(429)) == "rate_limit"
+    assert error_kind(_status_error(503)) == "server"
+    assert error_kind(_status_error(404)) == "client"
+    assert error_kind(ValueError("bad output")) == "other"
+
+
+def test_retry_after_headers():
+    assert retry_after_s(_status_error(429, {"retry-after-ms": "1500"})) == 1.5
+    assert retry_after_s(_status_error(429, {"retry-after": "2"})) == 2.0
+    assert retry_after_s(ValueError()) is None
+
+
+def test_retries_then_succeeds():
+    policy = _policy()
+    fn = _flaky([_status_error(503), _status_error(503)])
+    assert asyncio.run(policy.call(fn)) == "ok"
+    assert fn.calls == 3
+    assert policy.summary()["retries_by_kind"] == {"server": 2}
+
+
+def test_client_errors_are_not_retried():
+    policy = _policy()
+    fn = _flaky([_status_error(400)])
+    with pytest.raises(openai.APIStatusError):
+        asyncio.run(policy.call(fn))
+    assert fn.calls == 1
+    assert policy.gave_up == 1
+
+
+def test_per_kind_attempt_limit():
+    policy = _policy(attempts={"other": 3})
+    fn = _flaky([ValueError()] * 5)
+    with pytest.raises(ValueError):
+        asyncio.run(policy.call(fn))
+    assert fn.calls == 3
+
+
+def test_run_wide_retry_budget():
+    policy = _policy(budget_min=1, budget_ratio=0.0)
+    assert asyncio.run(policy.call(_flaky([ValueError()]))) == "ok"
+    fn = _flaky([ValueError()])
+    with pytest.raises(ValueError):
+        asyncio.run(policy.call(fn))          # the one retry of the run is spent
+    assert policy.budget_exhausted == 1
+
+
+def test_breaker_opens_and_fails_fast():
+    policy = _policy(attempts={"server": 1}, breaker_min_calls=3, breaker_error_rate=0.5, breaker_cooldown_s=60)
+    for _ in range(3):
+        with pytest.raises(openai.APIStatusError):
+            asyncio.run(policy.call(_flaky([_status_error(500)])))
+    fn = _flaky([])
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(policy.call(fn))
+    assert fn.calls == 0
+    assert policy.summary()["breaker_trips"] == 1
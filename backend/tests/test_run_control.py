@@ -0,0 +1,56 @@
+# backend/tests/test_run_control.py
+
+import pytest
+
+pytest.importorskip("fastapi")
+pytest.importorskip("langgraph")
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.app.routers.router_cs25 import router as cs25_router
+from src.app.routers.router_cs25_needs_panel import router as needs_panel_router
+from src.graphs.cs25_graph.agent_langgraph.utils.run_control import close_run, get_run, open_run
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(cs25_router, prefix="/api")
+    app.include_router(needs_panel_router, prefix="/api")
+    return TestClient(app)
+
+
+def _item_done(cost, *, replayed=False):
+    usage = {"input_tokens": 1000, "output_tokens": 100, "cached_tokens": 0, "total_cost": cost}
+    return {"type": "findRelevantSections.itemDone", "replayed": replayed, "item": {"usage": usage}}
+
+
+@pytest.mark.parametrize("path", ["/api/cs25/agent_langgraph/runs/{}/cancel", "/api/cs25/needs_panel/runs/{}/cancel"])
+def test_cancel_flags_the_live_run_and_returns_its_spend(client, path):
+    handle = open_run("run-cancel", tab_id="tab", sink="test")
+    try:
+        handle.track(_item_done(0.002))
+        handle.track(_item_done(0.003))
+        handle.track(_item_done(0.5, replayed=True))                        # paid by an earlier run
+        handle.track({"type": "findRelevantSections.batchProgress", "batch_cost": 9.0})   # aggregate, ignored
+
+        r = client.post(path.format("run-cancel"))
+
+        assert r.status_code == 200
+        body = r.json()
+        assert body["ok"] and body["run_id"] == "run-cancel"
+        assert body["usage"]["items"] == 2
+        assert body["usage"]["cost"] == pytest.approx(0.005)
+        assert get_run("run-cancel").cancelled.is_set()
+        assert get_run("run-cancel").cancel_reason == "client"
+    finally:
+        close_run("run-cancel")
+
+
+@pytest.mark.parametrize("path", ["/api/cs25/agent_langgraph/runs/{}/cancel", "/api/cs25/needs_panel/runs/{}/cancel"])
+def test_cancel_of_an_unknown_or_finished_run_is_404(client, path):
+    open_run("run-done", tab_id="tab", sink="test")
+    close_run("run-done")
+    assert client.post(path.format("run-done")).status_code == 404
+    assert client.post(path.format("never-started")).status_code == 404
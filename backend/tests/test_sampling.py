@@ -0,0 +1,52 @@
+# backend/tests/test_sampling.py
+
+from src.graphs.cs25_graph.agent_langgraph.utils.sampling import (
+    UNASSIGNED, allocate, estimate_relevant, stratified_sample,
+)
+
+
+def test_allocate_is_proportional_with_floors():
+    alloc = allocate({"big": 900, "mid": 90, "tiny": 1}, 100, min_per_stratum=2)
+    assert sum(alloc.values()) == 100
+    assert alloc["tiny"] == 1                 # never above the stratum size
+    assert alloc["mid"] >= 2
+    assert alloc["big"] > alloc["mid"] * 5
+
+
+def test_allocate_caps_at_population():
+    sizes = {"a": 3, "b": 4}
+    assert allocate(sizes, 50) == sizes
+    assert allocate(sizes, 0, min_per_stratum=0) == {"a": 0, "b": 0}
+
+
+def test_stratified_sample_is_seeded_and_tagged():
+    items = [{"id": i, "part": "A" if i % 3 else None} for i in range(60)]
+    first, sizes = stratified_sample(items, stratum_of=lambda it: it["part"], n=12, seed=7)
+    again, _ = stratified_sample(items, stratum_of=lambda it: it["part"], n=12, seed=7)
+    assert first == again
+    assert sizes == {"A": 40, UNASSIGNED: 20}
+    assert len(first) == 12
+    assert {it["stratum"] for it in first} == {"A", UNASSIGNED}
+
+
+def test_estimate_relevant_point_and_interval():
+    sizes = {"a": 100, "b": 50}
+    outcomes = {"a": [True] * 5 + [False] * 15, "b": [False] * 10}
+    est = estimate_relevant(sizes, outcomes)
+    assert est["traces"] == 150
+    assert est["sampled"] == 30
+    assert est["relevant_in_sample"] == 5
+    assert abs(est["estimated_relevant"] - 25.0) < 1e-9
+    lo, hi = est["ci95"]
+    assert 5 <= lo <= 25.0 <= hi <= 150
+    assert abs(est["estimated_fraction"] - 25.0 / 150) < 1e-9
+    per = {p["stratum"]: p for p in est["per_stratum"]}
+    assert per["b"]["estimated_relevant"] == 0.0
+    assert per["b"]["ci95"][1] > 0            # Wilson: zero hits is not certainty
+
+
+def test_estimate_relevant_unsampled_stratum_widens_upper_bound():
+    est = estimate_relevant({"a": 10, "never": 40}, {"a": [True, False]})
+    assert est["estimated_relevant"] == 5.0
+    assert est["ci95"][1] >= 45.0
+    assert est["estimated_fraction"] == 0.5
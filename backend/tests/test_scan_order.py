@@ -0,0 +1,40 @@
+# backend/tests/test_scan_order.py
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("networkx")
+pytest.importorskip("openai")
+
+from src.graphs.cs25_graph.agent_langgraph.utils.scan_order import EarlyStop, query_similarity
+
+
+def test_early_stop_top_k():
+    stop = EarlyStop(top_k=2)
+    assert stop.observe(True) is False
+    assert stop.observe(None) is False        # failed call: not a decision
+    assert stop.observe(False) is False
+    assert stop.observe(True) is True
+    assert stop.observe(False) is True        # stays stopped
+    s = stop.summary()
+    assert (s["decided"], s["relevant"], s["stop_reason"]) == (3, 2, "top_k")
+
+
+def test_early_stop_expected_relevance_needs_a_full_window():
+    stop = EarlyStop(min_expected=0.05, window=100)
+    assert not any(stop.observe(False) for _ in range(99))
+    assert stop.observe(False) is True        # upper bound with 0/100 hits ≈ 0.037 < 0.05
+    assert stop.summary()["stop_reason"] == "expected_relevance"
+
+
+def test_early_stop_keeps_going_while_hits_arrive():
+    stop = EarlyStop(min_expected=0.05, window=20)
+    assert not any(stop.observe(i % 4 == 0) for i in range(200))
+    assert stop.summary()["stopped"] is False
+
+
+def test_query_similarity_ignores_stop_words_and_case():
+    assert query_similarity("Heat exchanger header leaks", "leaks of the heat exchanger HEADER") == 1.0
+    assert query_similarity("fuel tank venting", "cabin pressure") == 0.0
+    assert 0.0 < query_similarity("fuel tank venting", "fuel tank inerting") < 1.0
+    assert query_similarity("", "") == 0.0
@@ -0,0 +1,109 @@
+# backend/tests/test_scheduler.py
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("openai")
+pytest.importorskip("langchain_core")
+
+from pydantic import BaseModel
+
+from src.graphs.cs25_graph.agent_langgraph.utils.scheduler import FairScheduler, Lane
+
+
+class _Answer(BaseModel):
+    relevant: bool
+
+
+def _caller(backend, order):
+    """fn factory for Lane.run: records who got the slot, then makes one MockBackend call."""
+    def make(tag, i):
+        async def fn():
+            order.append(tag)
+            return await backend.responses.parse(
+                model="gpt-5-nano",
+                input=[{"role": "system", "content": "judge"}, {"role": "user", "content": f"{tag} {i}"}],
+                text_format=_Answer,
+            )
+        return fn
+    return make
+
+
+async def _queue(lanes_and_counts, backend, order, *, scheduler):
+    """Hold the only slot while every lane queues its calls, then let them drain."""
+    call = _caller(backend, order)
+    gate = asyncio.Event()
+    holder = asyncio.ensure_future(Lane(scheduler, "holder", "interactive").run(gate.wait))
+    await asyncio.sleep(0)
+    tasks = []
+    for lane, n in lanes_and_counts:
+        for i in range(n):
+            tasks.append(asyncio.ensure_future(lane.run(call(lane.tab_id, i))))
+            await asyncio.sleep(0)   # enqueue in this order
+    gate.set()
+    await asyncio.gather(holder, *tasks)
+
+
+def test_tabs_of_one_class_take_turns(mock_llm):
+    async def go():
+        s = FairScheduler(max_inflight=1, reserved=0)
+        order = []
+        await _queue([(Lane(s, "big", "relevance"), 6), (Lane(s, "small", "relevance"), 2)], mock_llm, order, scheduler=s)
+        return order, s
+
+    order, s = asyncio.run(go())
+    # round-robin: the small tab's two calls do not wait behind the big tab's six
+    assert order[:4] == ["big", "small", "big", "small"]
+    assert s.in_flight == 0
+
+
+def test_higher_class_is_served_first(mock_llm):
+    async def go():
+        s = FairScheduler(max_inflight=1, reserved=0)
+        order = []
+        await _queue([(Lane(s, "bulk", "relevance"), 4), (Lane(s, "panel", "interactive"), 2)], mock_llm, order, scheduler=s)
+        return order
+
+    assert asyncio.run(go())[:2] == ["panel", "panel"]
+
+
+def test_reserved_slots_stay_free_for_interactive_calls(mock_llm):
+    async def go():
+        s = FairScheduler(max_inflight=3, reserved=1)
+        bulk = Lane(s, "bulk", "relevance")
+        gate = asyncio.Event()
+        held = [asyncio.ensure_future(bulk.run(gate.wait)) for _ in range(3)]
+        await asyncio.sleep(0)
+        bulk_in_flight, bulk_waiting = bulk.in_flight, bulk.waiting
+
+        panel = Lane(s, "panel", "interactive")
+        resp = await asyncio.wait_for(panel.run(_caller(mock_llm, [])("panel", 0)), timeout=2)
+        gate.set()
+        await asyncio.gather(*held)
+        return bulk_in_flight, bulk_waiting, resp, s.stats()
+
+    bulk_in_flight, bulk_waiting, resp, stats = asyncio.run(go())
+    assert (bulk_in_flight, bulk_waiting) == (2, 1)     # the last slot is never given to bulk relevance
+    assert resp.output_parsed is not None
+    assert stats["avg_wait_s"]["interactive"] == 0.0 and stats["in_flight"] == 0
+
+
+def test_cancelled_waiter_leaves_the_queue_without_leaking_a_slot():
+    async def go():
+        s = FairScheduler(max_inflight=1, reserved=0)
+        lane = Lane(s, "tab", "needs")
+        gate = asyncio.Event()
+        holder = asyncio.ensure_future(lane.run(gate.wait))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(lane.run(gate.wait))
+        await asyncio.sleep(0)
+        position = s.position(lane)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        waiting_after_cancel = lane.waiting
+        gate.set()
+        await holder
+        return position, waiting_after_cancel, s.in_flight, lane.in_flight
+
+    assert asyncio.run(go()) == (0, 0, 0, 0)
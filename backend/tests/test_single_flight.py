@@ -0,0 +1,77 @@
+# backend/tests/test_single_flight.py
+
+import asyncio
+
+import pytest
+
+pytest.importorskip("langgraph")
+pytest.importorskip("networkx")
+
+from src.graphs.cs25_graph.agent_langgraph.utils import single_flight
+from src.graphs.cs25_graph.agent_langgraph.utils.nodes import find_relevant_sections as frs
+
+_QUERY = "fuel tank venting near ignition sources"
+
+
+def _factory(G, ops):
+    return lambda: frs.stream_all_traces(G, ops, query=_QUERY, model="gpt-5-nano", pricing_per_million=frs._SCAN_PRICING)
+
+
+def _key(G):
+    return single_flight.scan_fingerprint("relevance", model="gpt-5-nano", query=_QUERY, traces=[t for t in G if t.startswith("t")])
+
+
+async def _collect(agen):
+    return [evt async for evt in agen]
+
+
+def test_fingerprint_ignores_trace_order():
+    assert single_flight.scan_fingerprint("relevance", query=_QUERY, traces=["t2", "t1"]) == \
+        single_flight.scan_fingerprint("relevance", query=_QUERY, traces=["t1", "t2"])
+
+
+def test_identical_concurrent_scans_share_one_fan_out(mock_llm, tiny_corpus):
+    G, ops = tiny_corpus
+    key = _key(G)
+    mock_llm.latency_median_s = 0.2
+
+    async def go():
+        first = asyncio.create_task(_collect(single_flight.coalesce(key, _factory(G, ops))))
+        while not mock_llm.calls.get("responses.parse"):           # the flight is already mid-scan
+            await asyncio.sleep(0.005)
+        second = await _collect(single_flight.coalesce(key, _factory(G, ops)))
+        return await first, second
+
+    first, second = asyncio.run(go())
+    assert mock_llm.calls["responses.parse"] == 24                   # one scan's worth of calls
+    assert [e["type"] for e in first] == [e["type"] for e in second]  # the late subscriber replays from the start
+    assert not any("coalesced" in e for e in first)
+    assert all(e["coalesced"] == key for e in second)
+    assert key not in single_flight._flights
+
+
+def test_flight_outlives_a_leaving_subscriber_and_stops_with_the_last(mock_llm, tiny_corpus):
+    G, ops = tiny_corpus
+    key = _key(G)
+    mock_llm.latency_median_s = 30.0
+
+    async def go():
+        a = asyncio.create_task(_collect(single_flight.coalesce(key, _factory(G, ops))))
+        b = asyncio.create_task(_collect(single_flight.coalesce(key, _factory(G, ops))))
+        while mock_llm.calls.get("responses.parse", 0) < 24:
+            await asyncio.sleep(0.01)
+        flight = single_flight._flights[key]
+
+        a.cancel()
+        await asyncio.gather(a, return_exceptions=True)
+        still_running = not flight.task.done()
+
+        b.cancel()
+        await asyncio.gather(b, return_exceptions=True)
+        return still_running, flight
+
+    still_running, flight = asyncio.run(go())
+    assert still_running
+    assert flight.task.cancelled() and flight.done
+    assert key not in single_flight._flights
+    assert mock_llm.calls["responses.parse"] == 24
@@ -0,0 +1,28 @@
+# backend/tests/test_usage.py
+
+import pytest
+
+from src.graphs.cs25_graph.agent_langgraph.utils.usage import (
+    enrich_usage_with_costs, pricing_rates, pricing_summary,
+)
+
+
+def test_cached_tokens_are_billed_at_the_models_cached_rate():
+    u = enrich_usage_with_costs(
+        {"input_tokens": 2_000_000, "output_tokens": 1_000_000, "cached_tokens": 1_000_000},
+        (0.05, 0.005, 0.40),
+    )
+    assert u["input_cost"] == pytest.approx(0.05 + 0.005)
+    assert u["output_cost"] == pytest.approx(0.40)
+    assert u["cache_savings"] == pytest.approx(0.045)
+
+
+def test_legacy_pair_has_no_cached_discount():
+    assert pricing_rates((0.15, 0.60)) == (0.15, 0.15, 0.60)
+    u = enrich_usage_with_costs({"input_tokens": 1_000_000, "output_tokens": 0, "cached_tokens": 1_000_000}, (0.15, 0.60))
+    assert u["input_cost"] == pytest.approx(0.15)
+    assert u["cache_savings"] == 0
+
+
+def test_pricing_summary_reports_all_three_rates():
+    assert pricing_summary((0.05, 0.005, 0.40)) == {"input_usd": 0.05, "cached_input_usd": 0.005, "output_usd": 0.40}